@@ -0,0 +1,151 @@
+import os
+import time
+from datetime import datetime, timedelta
+from tempfile import TemporaryDirectory
+
+from django.core.management.base import BaseCommand
+
+from apps.automacoes.services import atualizar_ld
+
+
+def _dados_sinteticos(quantidade):
+    """Linhas da LD e índices no formato de indexar_tudo(), sem tocar na rede."""
+    base = datetime(2025, 1, 1)
+    indices = {"eng": {}, "grd": {}, "pcf": {}, "pcf_resp": {}, "grd_resp": {}}
+    linhas = []
+
+    for n in range(quantidade):
+        codigo = f"I-DE-{n // 2:05d}"
+        rev = str(n % 2)
+        data = base + timedelta(minutes=n)
+        grd = f"GRD-{n % 900:04d}"
+        pcf = f"PCF-{codigo}_R{rev}A"
+
+        linhas.append(dict(zip(atualizar_ld.COLUNAS_LD, [codigo, float(rev)] + [None] * 14)))
+
+        indices["eng"].setdefault(codigo, {})[rev] = {"path": f"/eng/{codigo}", "file": "", "date": data}
+        if n % 3:
+            indices["grd"].setdefault(codigo, {})[rev] = {"grd": grd, "path": f"/grd/{grd}", "date": data}
+        if n % 4 == 0:
+            indices["pcf"].setdefault(codigo, {})[f"{rev}A"] = {"pcf": pcf, "path": f"/pcf/{pcf}", "date": data, "rev": f"{rev}A"}
+            indices["pcf_resp"].setdefault(codigo, {})[f"{rev}A"] = {"pcf": pcf, "path": f"/resp/{pcf}", "date": data, "rev": f"{rev}A"}
+            indices["grd_resp"][pcf.upper()] = grd
+
+        # reemissões da PCF: várias revisões por código, como na pasta real
+        for sufixo in ("B", "C", "AB")[: n % 4]:
+            rev_pcf = f"{rev}{sufixo}"
+            nome = f"PCF-{codigo}_R{rev_pcf}"
+            indices["pcf"].setdefault(codigo, {})[rev_pcf] = {"pcf": nome, "path": f"/pcf/{nome}", "date": data, "rev": rev_pcf}
+
+    return linhas, indices
+
+
+class Command(BaseCommand):
+    help = "Mede o cálculo em memória da LD (melhor PCF, regras B/H–Q, change-set e blocos de gravação) com dados sintéticos."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--linhas",
+            type=int,
+            default=20000,
+            help="Quantidade de linhas sintéticas.",
+        )
+        parser.add_argument(
+            "--repeticoes",
+            type=int,
+            default=3,
+            help="Quantas vezes medir; vale o melhor tempo.",
+        )
+
+    def handle(self, *args, **options):
+        quantidade = max(int(options["linhas"]), 1)
+        repeticoes = max(int(options["repeticoes"]), 1)
+
+        linhas, indices = _dados_sinteticos(quantidade)
+        chaves = [(linha["B"], atualizar_ld.normalizar_rev(linha["C"])) for linha in linhas]
+
+        detalhado = atualizar_ld.LOG_DETALHADO
+        atualizar_ld.LOG_DETALHADO = False
+        try:
+            tempos_calculo = []
+            tempos_blocos = []
+            tempos_pcf_varredura = []
+            tempos_pcf_indice = []
+            tempos_pcf_consulta = []
+            for _ in range(repeticoes):
+                # duas abas: a varredura repete o trabalho, o índice é montado uma vez
+                inicio = time.perf_counter()
+                for _aba in range(2):
+                    varredura = [
+                        (
+                            atualizar_ld._melhor_pcf(indices["pcf"].get(codigo, {}), rev, datetime.min),
+                            atualizar_ld._melhor_pcf(indices["pcf_resp"].get(codigo, {}), rev, datetime(1900, 1, 1)),
+                        )
+                        for codigo, rev in chaves
+                    ]
+                tempos_pcf_varredura.append(time.perf_counter() - inicio)
+
+                inicio = time.perf_counter()
+                por_base = {
+                    chave: atualizar_ld.indexar_pcf_por_base(indices[chave], atualizar_ld.DATA_VAZIA_PCF[chave])
+                    for chave in ("pcf", "pcf_resp")
+                }
+                tempos_pcf_indice.append(time.perf_counter() - inicio)
+
+                inicio = time.perf_counter()
+                for _aba in range(2):
+                    consulta = [
+                        (
+                            por_base["pcf"].get(codigo, {}).get(rev),
+                            por_base["pcf_resp"].get(codigo, {}).get(rev),
+                        )
+                        for codigo, rev in chaves
+                    ]
+                tempos_pcf_consulta.append(time.perf_counter() - inicio)
+
+                inicio = time.perf_counter()
+                resultados = atualizar_ld.calcular_aba_ld(linhas, indices, {})
+                tempos_calculo.append(time.perf_counter() - inicio)
+
+                inicio = time.perf_counter()
+                alteracoes = atualizar_ld.calcular_alteracoes(linhas, resultados)
+                blocos = atualizar_ld.blocos_alterados(alteracoes)
+                tempos_blocos.append(time.perf_counter() - inicio)
+
+            # execução seguinte sem mudanças: todas as linhas saem pelas impressões
+            apos = [atualizar_ld._linha_apos(linha, resultados.get(i)) for i, linha in enumerate(linhas)]
+            with TemporaryDirectory() as tmp:
+                arquivo = os.path.join(tmp, "impressoes.json")
+                inicio = time.perf_counter()
+                impressoes = atualizar_ld.ImpressoesLinhasLD(arquivo, full=True)
+                atualizar_ld.calcular_aba_ld(apos, indices, {}, impressoes=impressoes)
+                impressoes.salvar()
+                tempo_impressoes = time.perf_counter() - inicio
+
+                tempos_incremental = []
+                for _ in range(repeticoes):
+                    incremental = atualizar_ld.ImpressoesLinhasLD(arquivo)
+                    inicio = time.perf_counter()
+                    atualizar_ld.calcular_aba_ld(apos, indices, {}, impressoes=incremental)
+                    tempos_incremental.append(time.perf_counter() - inicio)
+        finally:
+            atualizar_ld.LOG_DETALHADO = detalhado
+
+        self.stdout.write(self.style.SUCCESS(f"Benchmark LD ({quantidade} linhas, melhor de {repeticoes})"))
+        if consulta != varredura:
+            self.stderr.write("Índice por revisão base divergiu da varredura das PCFs.")
+
+        varredura_ms = min(tempos_pcf_varredura) * 1000
+        indice_ms = (min(tempos_pcf_indice) + min(tempos_pcf_consulta)) * 1000
+        self.stdout.write(
+            f"Melhor PCF (2 abas): varredura {varredura_ms:.1f} ms, "
+            f"índice por revisão base {indice_ms:.1f} ms "
+            f"(montagem {min(tempos_pcf_indice) * 1000:.1f} ms, {varredura_ms / max(indice_ms, 1e-6):.1f}x)"
+        )
+        self.stdout.write(f"Cálculo das linhas: {min(tempos_calculo) * 1000:.1f} ms")
+        self.stdout.write(f"Change-set e blocos: {min(tempos_blocos) * 1000:.1f} ms ({len(alteracoes)} alterações, {len(blocos)} blocos)")
+        self.stdout.write(
+            f"Com impressões: primeira execução {tempo_impressoes * 1000:.1f} ms, "
+            f"seguinte sem mudanças {min(tempos_incremental) * 1000:.1f} ms "
+            f"({incremental.resumo()['puladas']} linhas puladas)"
+        )
@@ -0,0 +1,97 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.automacoes.models import PCFTimeline
+from apps.automacoes.services import timeline_pcfs
+
+
+TIPO_BENCHMARK = "Benchmark PCF"
+
+
+def _registros_sinteticos(quantidade, versao=0):
+    """{tipo: {chave: valores}} como o job monta; ``versao`` muda 1 a cada 10 linhas."""
+    registros = {}
+    for n in range(quantidade):
+        documento = f"I-DE-{n // 3:06d}"
+        revisao = "0BDF"[n % 3]
+        pcf_link = f"PCF-{documento}_R{revisao}"
+        mudou = versao and n % 10 == 0
+        registros[(documento, revisao, pcf_link)] = {
+            "caminho": f"\\\\servidor\\PCFs\\{pcf_link}.xlsx",
+            "numero_pcf": f"PCF-{documento}",
+            "titulo": f"Documento {n // 3}",
+            "data_recebimento": "2025-03-10 00:00:00",
+            "open_comments": (n + versao) % 5 if mudou else n % 5,
+            "qtd_comentarios": 5 + n % 7,
+            "status_final": "REPROVADA" if mudou else "APROVADA",
+        }
+    return {TIPO_BENCHMARK: registros}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede a gravação da PCFTimeline (bulk com diff x update_or_create linha a linha) "
+        "com linhas sintéticas; tudo roda numa transação desfeita no fim."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--linhas",
+            type=int,
+            default=50000,
+            help="Quantidade de linhas sintéticas.",
+        )
+        parser.add_argument(
+            "--amostra-legado",
+            type=int,
+            default=2000,
+            help="Linhas gravadas com update_or_create para estimar o caminho antigo.",
+        )
+
+    def handle(self, *args, **options):
+        quantidade = max(int(options["linhas"]), 1)
+        amostra = max(min(int(options["amostra_legado"]), quantidade), 1)
+
+        inicial = _registros_sinteticos(quantidade)
+        alterado = _registros_sinteticos(quantidade, versao=1)
+        # 1% das PCFs some da pasta na terceira execução
+        reduzido = {
+            tipo: {chave: valores for i, (chave, valores) in enumerate(registros.items()) if i % 100}
+            for tipo, registros in alterado.items()
+        }
+
+        with transaction.atomic():
+            PCFTimeline.objects.filter(tipo=TIPO_BENCHMARK).delete()
+
+            execucoes = [
+                ("primeira (tabela vazia)", timeline_pcfs.sincronizar_pcfs_timeline(inicial)),
+                ("sem mudanças", timeline_pcfs.sincronizar_pcfs_timeline(inicial)),
+                ("10% alteradas, 1% removidas", timeline_pcfs.sincronizar_pcfs_timeline(reduzido)),
+            ]
+
+            inicio = time.perf_counter()
+            for (documento, revisao, pcf_link), valores in list(inicial[TIPO_BENCHMARK].items())[:amostra]:
+                PCFTimeline.objects.update_or_create(
+                    tipo=TIPO_BENCHMARK,
+                    numero_documento=documento,
+                    revisao_pcf=revisao,
+                    pcf_link=pcf_link,
+                    defaults=valores,
+                )
+            legado = time.perf_counter() - inicio
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS(f"Benchmark PCFTimeline ({quantidade} linhas)"))
+        for nome, resultado in execucoes:
+            self.stdout.write(
+                f"{nome}: {resultado['segundos'] * 1000:.0f} ms "
+                f"({resultado['criados']} criadas, {resultado['atualizados']} atualizadas, "
+                f"{resultado['inalterados']} inalteradas, {resultado['removidos']} removidas)"
+            )
+        self.stdout.write(
+            f"update_or_create linha a linha: {legado * 1000:.0f} ms em {amostra} linhas "
+            f"(~{legado / amostra * quantidade:.1f} s estimados para {quantidade})"
+        )
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from apps.automacoes.services.km_indexer import relatorio_duplicados_km
+
+
+class Command(BaseCommand):
+    help = "Lista arquivos KM duplicados (mesma impressão digital em pastas diferentes)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--extensao",
+            default=None,
+            help="Filtra por extensão, por exemplo .dwg.",
+        )
+        parser.add_argument(
+            "--limite",
+            type=int,
+            default=200,
+            help="Quantidade máxima de grupos listados.",
+        )
+
+    def handle(self, *args, **options):
+        relatorio = relatorio_duplicados_km(
+            extensao=options["extensao"],
+            limite=options["limite"],
+        )
+
+        self.stdout.write(self.style.SUCCESS("Duplicados KM"))
+        self.stdout.write(f"Grupos: {relatorio['total_grupos']}")
+        self.stdout.write(f"Bytes redundantes: {relatorio['bytes_redundantes']}")
+
+        if relatorio["sem_impressao"]:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{relatorio['sem_impressao']} arquivos ativos sem impressão digital "
+                    "(habilite KM_IMPRESSAO_DIGITAL e rode a reindexação incremental)."
+                )
+            )
+
+        for grupo in relatorio["grupos"]:
+            self.stdout.write(
+                f"{grupo['impressao_digital']} {grupo['tamanho_bytes']} bytes, {grupo['copias']} cópias"
+            )
+            for caminho in grupo["caminhos"]:
+                self.stdout.write(f"  {caminho}")
@@ -0,0 +1,72 @@
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from apps.automacoes.services.km_indexer import geracao_indice_km
+from apps.automacoes.services.km_memory_index import IndiceCompactoKM, carregar_registros_banco
+
+
+class Command(BaseCommand):
+    help = "Mede tempo de construção e memória do índice KM compacto em memória."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--legacy",
+            action="store_true",
+            help="Também mede a antiga lista de dicts para comparação.",
+        )
+
+    def _medir(self, construtor):
+        tracemalloc.start()
+        inicio = time.monotonic()
+        try:
+            resultado = construtor()
+            duracao = time.monotonic() - inicio
+            memoria, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return resultado, duracao, memoria, pico
+
+    def _linha(self, rotulo, duracao, memoria, pico, total):
+        self.stdout.write(
+            f"{rotulo:<10} arquivos={total} construcao={duracao:.3f}s "
+            f"memoria={memoria / 1024 / 1024:.2f} MB pico={pico / 1024 / 1024:.2f} MB"
+        )
+
+    def handle(self, *args, **options):
+        geracao = geracao_indice_km()
+
+        indice, duracao, memoria, pico = self._medir(
+            lambda: IndiceCompactoKM.construir(carregar_registros_banco(), geracao=geracao)
+        )
+
+        self.stdout.write(self.style.SUCCESS("Índice KM compacto"))
+        self._linha("compacto", duracao, memoria, pico, len(indice))
+
+        stats = indice.estatisticas()
+        self.stdout.write(
+            f"pastas={stats['pastas']} sufixos={stats['sufixos']} "
+            f"stems_excecao={stats['stems_excecao']} "
+            f"memoria_estimada={stats['memoria_estimada_bytes'] / 1024 / 1024:.2f} MB"
+        )
+
+        if not options.get("legacy"):
+            return
+
+        def construir_legado():
+            return [
+                {
+                    "path": Path(caminho),
+                    "nome_norm": nome_norm,
+                    "stem_norm": stem_norm,
+                    "suffix": (extensao or "").lower(),
+                    "is_transmittal_letter": transmittal,
+                }
+                for caminho, _, extensao, nome_norm, stem_norm, transmittal in carregar_registros_banco()
+                if nome_norm
+            ]
+
+        itens, duracao, memoria, pico = self._medir(construir_legado)
+        self._linha("legado", duracao, memoria, pico, len(itens))
@@ -0,0 +1,65 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.automacoes.services.km_indexer import indexar_km_banco
+from apps.automacoes.services.km_watcher import ObservadorKM
+
+
+class Command(BaseCommand):
+    help = "Observa a árvore KM por polling e aplica as alterações no índice KM."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=None,
+            help="Segundos entre verificações (padrão: KM_WATCHER_INTERVALO_SEGUNDOS).",
+        )
+        parser.add_argument(
+            "--ciclos",
+            type=int,
+            default=0,
+            help="Quantidade de verificações antes de encerrar (0 = contínuo).",
+        )
+        parser.add_argument(
+            "--base",
+            default=None,
+            help="Raiz a observar (padrão: pasta KM configurada).",
+        )
+        parser.add_argument(
+            "--sincronizar",
+            action="store_true",
+            help="Executa uma reindexação incremental antes de começar a observar.",
+        )
+
+    def handle(self, *args, **options):
+        intervalo = options["intervalo"]
+        if intervalo is None:
+            intervalo = float(getattr(settings, "KM_WATCHER_INTERVALO_SEGUNDOS", 120))
+
+        observador = ObservadorKM(options["base"])
+        pastas = observador.inicializar()
+        self.stdout.write(self.style.SUCCESS(f"Observando {observador.base} ({pastas} pastas)."))
+
+        if options["sincronizar"]:
+            resultado = indexar_km_banco(observador.base, incremental=True)
+            self.stdout.write(resultado["mensagem"])
+
+        ciclo = 0
+        try:
+            while not options["ciclos"] or ciclo < options["ciclos"]:
+                time.sleep(max(intervalo, 0))
+                ciclo += 1
+
+                resultado = observador.verificar()
+                if resultado["pastas_relistadas"] or resultado["desativados"]:
+                    self.stdout.write(
+                        f"Ciclo {ciclo}: {resultado['pastas_relistadas']} pastas relistadas, "
+                        f"{resultado['criados']} novos, {resultado['atualizados']} atualizados, "
+                        f"{resultado['desativados']} desativados "
+                        f"({resultado['duracao_segundos']}s)."
+                    )
+        except KeyboardInterrupt:
+            self.stdout.write("Observador KM encerrado.")
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('automacoes', '0021_documentokm_agreed_delivery_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='kmfileindex',
+            name='indexado_em',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('automacoes', '0022_alter_kmfileindex_indexado_em'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KMResolucaoDocumento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(db_index=True, max_length=255)),
+                ('permitir_transmittal', models.BooleanField(default=False)),
+                ('caminho_completo', models.TextField()),
+                ('score', models.IntegerField(default=0)),
+                ('gerado_em', models.DateTimeField(auto_now=True)),
+                ('arquivo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resolucoes', to='automacoes.kmfileindex')),
+            ],
+            options={
+                'verbose_name': 'Resolução de documento KM',
+                'verbose_name_plural': 'Resoluções de documentos KM',
+                'ordering': ['chave'],
+                'constraints': [models.UniqueConstraint(fields=('chave', 'permitir_transmittal'), name='uniq_kmresolucao_chave_transmittal')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('automacoes', '0023_kmresolucaodocumento'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kmfileindex',
+            name='impressao_digital',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('automacoes', '0024_kmfileindex_impressao_digital'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KMParticaoIndexacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('execucao', models.CharField(db_index=True, max_length=64)),
+                ('particao', models.TextField()),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('EXECUTANDO', 'Executando'), ('CONCLUIDA', 'Concluída'), ('FALHOU', 'Falhou')], db_index=True, default='PENDENTE', max_length=20)),
+                ('tentativas', models.PositiveIntegerField(default=0)),
+                ('arquivos', models.PositiveIntegerField(default=0)),
+                ('criados', models.PositiveIntegerField(default=0)),
+                ('atualizados', models.PositiveIntegerField(default=0)),
+                ('desativados', models.PositiveIntegerField(default=0)),
+                ('erros', models.PositiveIntegerField(default=0)),
+                ('erro', models.TextField(blank=True)),
+                ('erros_detalhe', models.JSONField(blank=True, default=list)),
+                ('duracao_segundos', models.FloatField(default=0)),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Partição de indexação KM',
+                'verbose_name_plural': 'Partições de indexação KM',
+                'ordering': ['execucao', 'particao'],
+                'constraints': [models.UniqueConstraint(fields=('execucao', 'particao'), name='uniq_kmparticao_execucao_particao')],
+            },
+        ),
+    ]
@@ -249,6 +249,7 @@ class KMFileIndex(models.Model):
     extensao = models.CharField(max_length=20, blank=True, db_index=True)
     tamanho_bytes = models.BigIntegerField(default=0)
     modificado_em = models.DateTimeField(null=True, blank=True)
+    impressao_digital = models.CharField(max_length=64, blank=True, db_index=True)
 
     nome_normalizado = models.CharField(max_length=600, blank=True, db_index=True)
     stem_normalizado = models.CharField(max_length=600, blank=True, db_index=True)
@@ -258,7 +259,7 @@ class KMFileIndex(models.Model):
     ativo = models.BooleanField(default=True, db_index=True)
 
     criado_em = models.DateTimeField(auto_now_add=True)
-    indexado_em = models.DateTimeField(auto_now=True)
+    indexado_em = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ["nome_arquivo"]
@@ -273,6 +274,98 @@ class KMFileIndex(models.Model):
     def __str__(self):
         return self.nome_arquivo
 
+
+class KMResolucaoDocumento(models.Model):
+    """
+    Resolução pré-calculada código documental → melhor arquivo KM.
+
+    Gerada pela reindexação KM com as mesmas regras de pontuação da busca
+    ao vivo, nas variantes com e sem Transmittal Letters.
+    """
+
+    chave = models.CharField(max_length=255, db_index=True)
+    permitir_transmittal = models.BooleanField(default=False)
+    arquivo = models.ForeignKey(
+        KMFileIndex,
+        on_delete=models.CASCADE,
+        related_name="resolucoes",
+    )
+    caminho_completo = models.TextField()
+    score = models.IntegerField(default=0)
+    gerado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["chave"]
+        verbose_name = "Resolução de documento KM"
+        verbose_name_plural = "Resoluções de documentos KM"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["chave", "permitir_transmittal"],
+                name="uniq_kmresolucao_chave_transmittal",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.chave} → {self.caminho_completo}"
+
+
+class KMParticaoIndexacao(models.Model):
+    """
+    Checkpoint de uma partição (pasta de primeiro nível) da reindexação KM
+    particionada. Uma execução interrompida é retomada a partir das
+    partições ainda não concluídas.
+    """
+
+    STATUS_PENDENTE = "PENDENTE"
+    STATUS_EXECUTANDO = "EXECUTANDO"
+    STATUS_CONCLUIDA = "CONCLUIDA"
+    STATUS_FALHOU = "FALHOU"
+
+    STATUS_CHOICES = [
+        (STATUS_PENDENTE, "Pendente"),
+        (STATUS_EXECUTANDO, "Executando"),
+        (STATUS_CONCLUIDA, "Concluída"),
+        (STATUS_FALHOU, "Falhou"),
+    ]
+
+    execucao = models.CharField(max_length=64, db_index=True)
+    particao = models.TextField()
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDENTE,
+        db_index=True,
+    )
+    tentativas = models.PositiveIntegerField(default=0)
+
+    arquivos = models.PositiveIntegerField(default=0)
+    criados = models.PositiveIntegerField(default=0)
+    atualizados = models.PositiveIntegerField(default=0)
+    desativados = models.PositiveIntegerField(default=0)
+    erros = models.PositiveIntegerField(default=0)
+    erro = models.TextField(blank=True)
+    erros_detalhe = models.JSONField(default=list, blank=True)
+    duracao_segundos = models.FloatField(default=0)
+
+    iniciado_em = models.DateTimeField(blank=True, null=True)
+    concluido_em = models.DateTimeField(blank=True, null=True)
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["execucao", "particao"]
+        verbose_name = "Partição de indexação KM"
+        verbose_name_plural = "Partições de indexação KM"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["execucao", "particao"],
+                name="uniq_kmparticao_execucao_particao",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.execucao} {self.particao} [{self.status}]"
+
+
 class PCFTimeline(models.Model):
     tipo = models.CharField(max_length=50, blank=True)
 
@@ -1,10 +1,35 @@
+import hashlib
+import json
+import ntpath
 import os
-import shutil
+import threading
+import time
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy
 from datetime import datetime, timedelta, date
+from itertools import accumulate
 import xlwings as xw
 import re
 
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from openpyxl import load_workbook
+from openpyxl.formatting.rule import CellIsRule
+from openpyxl.formatting.formatting import ConditionalFormattingList
+from openpyxl.formula.tokenizer import Token, Tokenizer
+from openpyxl.formula.translate import Translator
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+from openpyxl.utils import column_index_from_string, get_column_letter
+from openpyxl.worksheet.cell_range import CellRange, MultiCellRange
+from openpyxl.worksheet.formula import ArrayFormula
+
 from apps.automacoes.models import DocumentoLD
+from apps.automacoes.services.backups_planilha import BackupsPlanilha
+from apps.automacoes.services.cache_json import CacheJSON
+from apps.automacoes.services.log_automacao import LogAutomacao
+from apps.automacoes.services.xlsx_hyperlinks import extrair_hyperlinks_xlsx
 
 
 # ==========================================================
@@ -25,8 +50,8 @@ TIMELINE_PCF = r"\\virm-rgr022\FILESERVER\Projetos\05_HANDYMAX\09. Doc Control\9
 
 PASTA_LOGS = r"\\virm-rgr022\FILESERVER\Projetos\05_HANDYMAX\09. Doc Control\3 - LD\Logs"
 PASTA_BACKUPS = os.path.join(PASTA_LOGS, "Backups")
-os.makedirs(PASTA_BACKUPS, exist_ok=True)
-os.makedirs(PASTA_LOGS, exist_ok=True)
+CACHE_VARREDURA_ARQUIVO = os.path.join(PASTA_LOGS, "cache_varredura_ld.json")
+IMPRESSOES_LINHAS_ARQUIVO = os.path.join(PASTA_LOGS, "impressoes_linhas_ld.json")
 
 EXTENSOES = {".doc", ".docx", ".pdf", ".dwg", ".xls", ".xlsx", ".xlsm"}
 
@@ -36,6 +61,38 @@ EXTENSOES = {".doc", ".docx", ".pdf", ".dwg", ".xls", ".xlsx", ".xlsm"}
 # ✅ LOG detalhado (mostra qual arquivo/pasta foi usado em J/K/L/M/O/P/Q)
 LOG_DETALHADO = True
 
+# ✅ Varredura das pastas da rede: cada raiz é percorrida uma vez, em paralelo por raiz
+VARREDURA_PARALELA = True
+
+# ✅ Cache persistente da varredura (pasta com mtime inalterado não é listada de novo)
+USAR_CACHE_VARREDURA = True
+
+# ✅ LD incremental: linha cujas entradas não mudaram desde a última execução não é recalculada
+USAR_IMPRESSOES_LINHAS = True
+
+# ✅ Motor da planilha:
+# "xlwings"  = Excel aberto via COM (só Windows com Excel instalado)
+# "openpyxl" = sem Excel: lê a aba inteira em memória e grava o arquivo numa passada
+MOTOR_XLWINGS = "xlwings"
+MOTOR_OPENPYXL = "openpyxl"
+MOTOR_LD = getattr(settings, "LD_MOTOR", MOTOR_XLWINGS)
+
+# ✅ Gravação da LD no banco: tamanho dos lotes do upsert
+LD_BANCO_BATCH_SIZE = 500
+
+# ✅ Motor xlwings em blocos: lê B..Q de uma vez e grava só as faixas alteradas
+XLWINGS_EM_BLOCO = getattr(settings, "LD_XLWINGS_EM_BLOCO", True)
+
+# ✅ Backups da planilha (gzip, sem cópia quando o conteúdo não mudou):
+# ficam os N mais recentes + o último de cada um dos últimos dias/semanas
+BACKUP_MANTER_ULTIMOS = 10
+BACKUP_MANTER_DIARIOS = 14
+BACKUP_MANTER_SEMANAIS = 8
+
+# ✅ Simulação (dry-run): máximo de alterações por aba devolvidas no resultado do job
+# (o change-set completo vai para o JSON na pasta de logs)
+LIMITE_ALTERACOES_RESULTADO = 2000
+
 # ✅ Como preencher a coluna K (data):
 # "DOC" = data do arquivo encontrado dentro do GRD (mais fiel)
 # "GRD" = data da pasta GRD (pode mudar se mexerem na pasta depois)
@@ -66,6 +123,10 @@ FREEZE_PANES = False
 APLICAR_FORMATACAO = True
 ULTIMA_COLUNA = "Q"  # na sua LD vai até Q
 
+# ✅ Bloco fixo da aba MEDIÇÃO (A4:F577)
+MEDICAO_PRIMEIRA_LINHA = 4
+MEDICAO_ULTIMA_LINHA = 577
+
 # Excel constants
 xlCenter = -4108
 xlLeft = -4131
@@ -79,14 +140,11 @@ DATE_NUMBERFORMAT_FALLBACK = "dd/mm/yyyy"  # formato invariável do Excel, funci
 # ==========================================================
 LOG_FILE = None  # será definido no processar()
 
+# terminal na hora; o arquivo na rede é gravado em lotes por uma thread
+LOG = LogAutomacao()
+
 def log(msg: str):
-    print(msg)
-    if LOG_FILE:
-        try:
-            with open(LOG_FILE, "a", encoding="utf-8") as f:
-                f.write(msg + "\n")
-        except Exception:
-            pass
+    LOG.escrever(msg, arquivo=LOG_FILE)
 
 def _fmt_dt(dt):
     if not dt:
@@ -99,13 +157,26 @@ def _fmt_dt(dt):
 # ==========================================================
 # BACKUP
 # ==========================================================
+def backups_ld():
+    return BackupsPlanilha(
+        PLANILHA,
+        PASTA_BACKUPS,
+        marcador="_BK_",
+        manter_ultimos=BACKUP_MANTER_ULTIMOS,
+        manter_diarios=BACKUP_MANTER_DIARIOS,
+        manter_semanais=BACKUP_MANTER_SEMANAIS,
+    )
+
+
 def backup_planilha():
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    nome, ext = os.path.splitext(os.path.basename(PLANILHA))
-    destino = os.path.join(PASTA_BACKUPS, f"{nome}_BK_{ts}{ext}")
-    shutil.copy2(PLANILHA, destino)
-    log(f"🔒 Backup criado: {destino}")
-    return destino
+    resultado = backups_ld().criar()
+    if resultado["novo"]:
+        log(f"🔒 Backup criado: {resultado['caminho']}")
+    else:
+        log(f"🔒 Planilha igual ao último backup, cópia dispensada: {resultado['caminho']}")
+    if resultado["removidos"]:
+        log(f"   - Retenção: {len(resultado['removidos'])} backups antigos removidos")
+    return resultado["caminho"]
 
 # ==========================================================
 # DATA HELPERS (garante data real + dd/mm/aaaa)
@@ -373,9 +444,272 @@ def garantir_autofiltro(ws):
         except Exception:
             pass
 
+# ==========================================================
+# VARREDURA (scandir com stat reaproveitado)
+# ==========================================================
+def _listar_pasta(root):
+    """
+    Lista uma pasta com scandir. Retorna (arquivos, subpastas) ou None
+    quando a pasta não pode ser lida.
+    """
+    try:
+        with os.scandir(root) as it:
+            entradas = list(it)
+    except OSError:
+        return None
+
+    arquivos = []
+    subpastas = []
+    for entrada in entradas:
+        try:
+            eh_pasta = entrada.is_dir()
+        except OSError:
+            eh_pasta = False
+
+        if eh_pasta:
+            subpastas.append((os.path.join(root, entrada.name), entrada))
+            continue
+
+        try:
+            st = entrada.stat()
+        except OSError:
+            st = None
+        arquivos.append((entrada.name, st))
+
+    return arquivos, subpastas
+
+
+def _empilhar_subpastas(pilha, subpastas):
+    for caminho, entrada in reversed(subpastas):
+        try:
+            if entrada.is_symlink():
+                continue
+        except OSError:
+            continue
+        pilha.append(caminho)
+
+
+def _walk_com_stat(topo):
+    """
+    Mesmo percurso de os.walk(topo): top-down, pastas na ordem do scandir,
+    sem entrar em links de pasta e ignorando pastas ilegíveis.
+
+    Gera (root, arquivos, subpastas), onde arquivos = [(nome, stat|None)]
+    com o stat vindo do próprio DirEntry (no Windows não há ida extra ao
+    servidor) e subpastas = [(caminho, DirEntry)].
+    """
+    pilha = [topo]
+    while pilha:
+        root = pilha.pop()
+        listagem = _listar_pasta(root)
+        if listagem is None:
+            continue
+
+        arquivos, subpastas = listagem
+        yield root, arquivos, subpastas
+        _empilhar_subpastas(pilha, subpastas)
+
+
+# ==========================================================
+# CACHE PERSISTENTE DA VARREDURA
+# ==========================================================
+class _StatCache:
+    __slots__ = ("st_mtime", "st_ctime")
+
+    def __init__(self, st_mtime, st_ctime):
+        self.st_mtime = st_mtime
+        self.st_ctime = st_ctime
+
+
+class _SubpastaCache:
+    """Substitui o DirEntry de uma subpasta servida pelo cache."""
+
+    __slots__ = ("path", "_link")
+
+    def __init__(self, path, link):
+        self.path = path
+        self._link = link
+
+    def is_symlink(self):
+        return self._link
+
+    def stat(self):
+        return os.stat(self.path)
+
+
+def _eh_link(entrada):
+    try:
+        return entrada.is_symlink()
+    except OSError:
+        return True
+
+
+class CacheVarreduraLD(CacheJSON):
+    """
+    Cache em arquivo (JSON, em PASTA_LOGS) da listagem de cada pasta:
+    mtime da pasta, arquivos com mtime/ctime e subpastas.
+
+    Na execução seguinte, pasta com o mesmo mtime é servida do cache com um
+    único stat, sem nova listagem. Alterar o conteúdo de um arquivo sem
+    criar/renomear/remover nada na pasta não muda o mtime dela no Windows;
+    para esses casos use ``full=True`` (``--full``).
+    """
+
+    CHAVE = "pastas"
+    DESCRICAO = "o cache de varredura"
+    # estimativa por entrada de uma listagem SMB (FILE_BOTH_DIR_INFORMATION + nome UTF-16)
+    BYTES_POR_ENTRADA = 94
+
+    def __init__(self, caminho=None, full=False):
+        super().__init__(caminho or CACHE_VARREDURA_ARQUIVO, full=full, avisar=lambda mensagem: log(f"⚠️ {mensagem}"))
+        self.hits = 0
+        self.misses = 0
+        self.bytes_poupados = 0
+        # as raízes podem ser percorridas em paralelo (VARREDURA_PARALELA)
+        self._lock = threading.Lock()
+
+    def _estimar_bytes(self, registro):
+        nomes = [item[0] for item in registro["arquivos"]] + [item[0] for item in registro["subpastas"]]
+        return sum(self.BYTES_POR_ENTRADA + 2 * len(nome) for nome in nomes)
+
+    def walk(self, topo):
+        """Mesmo contrato de _walk_com_stat, consultando o cache por pasta."""
+        pilha = [topo]
+        while pilha:
+            root = pilha.pop()
+            try:
+                mtime = os.stat(root).st_mtime
+            except OSError:
+                continue
+
+            registro = self.anterior.get(root)
+            if registro is not None and registro.get("mtime") == mtime:
+                with self._lock:
+                    self.hits += 1
+                    self.bytes_poupados += self._estimar_bytes(registro)
+                arquivos = [
+                    (nome, _StatCache(m, c) if m is not None else None)
+                    for nome, m, c in registro["arquivos"]
+                ]
+                subpastas = [
+                    (os.path.join(root, nome), _SubpastaCache(os.path.join(root, nome), link))
+                    for nome, link in registro["subpastas"]
+                ]
+            else:
+                listagem = _listar_pasta(root)
+                if listagem is None:
+                    continue
+
+                with self._lock:
+                    self.misses += 1
+                arquivos, subpastas = listagem
+                registro = {
+                    "mtime": mtime,
+                    "arquivos": [
+                        [nome, st.st_mtime, st.st_ctime] if st is not None else [nome, None, None]
+                        for nome, st in arquivos
+                    ],
+                    "subpastas": [
+                        [os.path.basename(caminho), _eh_link(entrada)]
+                        for caminho, entrada in subpastas
+                    ],
+                }
+
+            self.atual[root] = registro
+            yield root, arquivos, subpastas
+            _empilhar_subpastas(pilha, subpastas)
+
+    def resumo(self):
+        total = self.hits + self.misses
+        return {
+            "pastas": total,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+            "bytes_poupados": self.bytes_poupados,
+            "full": self.full,
+        }
+
+
+def _dt_stat(st, origem: str) -> datetime | None:
+    """Equivalente a _file_datetime, a partir de um stat já obtido."""
+    if st is None:
+        return None
+    try:
+        if origem.upper() == "CTIME":
+            return datetime.fromtimestamp(st.st_ctime)
+        return datetime.fromtimestamp(st.st_mtime)
+    except Exception:
+        return None
+
+
+class _MtimePastas:
+    """
+    mtime de pastas, memorizado. Os DirEntry vistos na varredura são
+    guardados e só consultados quando a pasta é pedida.
+    """
+
+    def __init__(self):
+        self._entradas = {}
+        self._cache = {}
+
+    def registrar(self, subpastas):
+        for caminho, entrada in subpastas:
+            self._entradas.setdefault(os.path.normcase(caminho), entrada)
+
+    def _mtime(self, caminho):
+        chave = os.path.normcase(caminho)
+        if chave not in self._cache:
+            entrada = self._entradas.get(chave)
+            try:
+                self._cache[chave] = entrada.stat().st_mtime if entrada else os.path.getmtime(caminho)
+            except Exception:
+                self._cache[chave] = None
+        return self._cache[chave]
+
+    def isdir(self, caminho) -> bool:
+        if os.path.normcase(caminho) in self._entradas:
+            return self._mtime(caminho) is not None
+        return os.path.isdir(caminho)
+
+    def datetime(self, caminho) -> datetime | None:
+        mtime = self._mtime(caminho)
+        return datetime.fromtimestamp(mtime) if mtime is not None else None
+
+
 # ==========================================================
 # INDEXADORES
 # ==========================================================
+def _acumular_engenharia(idx, root, arquivos):
+    for f, st in arquivos:
+        nome, ext = os.path.splitext(f)
+        if ext.lower() not in EXTENSOES:
+            continue
+        if "_R" not in nome:
+            continue
+
+        codigo, resto = nome.split("_R", 1)
+        mrev = re.match(r"([0-9A-Z]+)", str(resto).strip().upper())
+        if not mrev:
+            continue
+
+        rev = normalizar_rev(mrev.group(1))
+        if not rev:
+            continue
+
+        full = os.path.join(root, f)
+        dt = _dt_stat(st, "MTIME")
+
+        codigo = codigo.strip()
+        existente = idx.get(codigo, {}).get(rev)
+        if (existente is None) or (dt and dt > existente["date"]):
+            idx.setdefault(codigo, {})[rev] = {
+                "path": root,
+                "file": full,
+                "date": dt
+            }
+
+
 def indexar_engenharia_info():
     """
     Retorna:
@@ -383,35 +717,62 @@ def indexar_engenharia_info():
     Se encontrar duplicado (mesmo codigo+rev em lugares diferentes), mantém o mais recente.
     """
     idx = {}
-    for root, _, files in os.walk(PASTA_DOCS):
-        for f in files:
-            nome, ext = os.path.splitext(f)
-            if ext.lower() not in EXTENSOES:
-                continue
-            if "_R" not in nome:
-                continue
+    for root, arquivos, _ in _walk_com_stat(PASTA_DOCS):
+        _acumular_engenharia(idx, root, arquivos)
+    return idx
 
-            codigo, resto = nome.split("_R", 1)
-            mrev = re.match(r"([0-9A-Z]+)", str(resto).strip().upper())
-            if not mrev:
-                continue
 
-            rev = normalizar_rev(mrev.group(1))
-            if not rev:
-                continue
+def _acumular_grds(idx, root, arquivos, mtimes):
+    grd = extrair_grd_do_caminho(root)
+    if not grd:
+        return
 
-            full = os.path.join(root, f)
-            dt = _file_datetime(full, "MTIME")
+    # tentar apontar para a pasta raiz do GRD
+    grd_dir = os.path.join(PASTA_GRD, grd)
+    if not mtimes.isdir(grd_dir):
+        grd_dir = root  # fallback
+
+    dt_grd = mtimes.datetime(grd_dir)
+
+    for f, st in arquivos:
+        nome = os.path.splitext(f)[0]
+        if "_R" not in nome:
+            continue
+
+        codigo, resto = nome.split("_R", 1)
+        mrev = re.match(r"([0-9A-Z]+)", resto.strip().upper())
+        if not mrev:
+            continue
+
+        rev = normalizar_rev(mrev.group(1))
+        full = os.path.join(root, f)
+
+        dt_doc = _dt_stat(st, "MTIME")
+        if DATA_K_ORIGEM.upper() == "GRD" and dt_grd:
+            dt_k = dt_grd
+        else:
+            dt_k = dt_doc or dt_grd
+
+        codigo = codigo.strip()
+        existente = idx.get(codigo, {}).get(rev)
+
+        # se houver duplicado, fica com o mais recente (dt_k)
+        if existente is None:
+            escolher = True
+        else:
+            ex_dt = existente.get("date")
+            escolher = (dt_k and ex_dt and dt_k > ex_dt) or (ex_dt is None and dt_k is not None)
+
+        if escolher:
+            idx.setdefault(codigo, {})[rev] = {
+                "grd": grd,
+                "path": grd_dir,
+                "date": dt_k,
+                "doc_file": full,   # para LOG detalhado
+                "doc_dt": dt_doc,
+                "grd_dt": dt_grd
+            }
 
-            codigo = codigo.strip()
-            existente = idx.get(codigo, {}).get(rev)
-            if (existente is None) or (dt and dt > existente["date"]):
-                idx.setdefault(codigo, {})[rev] = {
-                    "path": root,
-                    "file": full,
-                    "date": dt
-                }
-    return idx
 
 def indexar_grds():
     """
@@ -421,61 +782,49 @@ def indexar_grds():
         - "GRD" => mtime da pasta raiz do GRD
     """
     idx = {}
-    for root, _, files in os.walk(PASTA_GRD):
-        grd = extrair_grd_do_caminho(root)
-        if not grd:
-            continue
-
-        # tentar apontar para a pasta raiz do GRD
-        grd_dir = os.path.join(PASTA_GRD, grd)
-        if not os.path.isdir(grd_dir):
-            grd_dir = root  # fallback
+    mtimes = _MtimePastas()
+    for root, arquivos, subpastas in _walk_com_stat(PASTA_GRD):
+        mtimes.registrar(subpastas)
+        _acumular_grds(idx, root, arquivos, mtimes)
+    return idx
 
-        dt_grd = None
-        try:
-            dt_grd = datetime.fromtimestamp(os.path.getmtime(grd_dir))
-        except Exception:
-            dt_grd = None
 
-        for f in files:
-            nome = os.path.splitext(f)[0]
-            if "_R" not in nome:
-                continue
+def _acumular_pcfs(idx, root, arquivos, excluir_norm, data_origem):
+    root_norm = os.path.normpath(root).lower()
+    if any(root_norm.startswith(p) for p in excluir_norm):
+        return
 
-            codigo, resto = nome.split("_R", 1)
-            mrev = re.match(r"([0-9A-Z]+)", resto.strip().upper())
-            if not mrev:
-                continue
+    for f, st in arquivos:
+        nome, ext = os.path.splitext(f)
+        if ext.lower() not in (".xlsx", ".xlsm"):
+            continue
+        if not nome.upper().startswith("PCF-"):
+            continue
+        if "_R" not in nome:
+            continue
 
-            rev = normalizar_rev(mrev.group(1))
-            full = os.path.join(root, f)
+        base = nome[4:]
+        codigo, resto = base.split("_R", 1)
+        mrev = re.match(r"([0-9A-Z]+)", resto.strip().upper())
+        if not mrev:
+            continue
 
-            dt_doc = _file_datetime(full, "MTIME")
-            if DATA_K_ORIGEM.upper() == "GRD" and dt_grd:
-                dt_k = dt_grd
-            else:
-                dt_k = dt_doc or dt_grd
+        rev = normalizar_rev(mrev.group(1))
+        caminho = os.path.join(root, f)
+        dt = _dt_stat(st, data_origem)
+
+        codigo = codigo.strip()
+        existente = idx.get(codigo, {}).get(rev)
+        info = {
+            "pcf": nome,
+            "path": caminho,
+            "date": dt,
+            "rev": rev
+        }
 
-            codigo = codigo.strip()
-            existente = idx.get(codigo, {}).get(rev)
+        if (existente is None) or (dt and dt > existente["date"]):
+            idx.setdefault(codigo, {})[rev] = info
 
-            # se houver duplicado, fica com o mais recente (dt_k)
-            if existente is None:
-                escolher = True
-            else:
-                ex_dt = existente.get("date")
-                escolher = (dt_k and ex_dt and dt_k > ex_dt) or (ex_dt is None and dt_k is not None)
-
-            if escolher:
-                idx.setdefault(codigo, {})[rev] = {
-                    "grd": grd,
-                    "path": grd_dir,
-                    "date": dt_k,
-                    "doc_file": full,   # para LOG detalhado
-                    "doc_dt": dt_doc,
-                    "grd_dt": dt_grd
-                }
-    return idx
 
 def indexar_pcfs(pasta, excluir_subpastas=None, data_origem="MTIME"):
     """
@@ -487,59 +836,126 @@ def indexar_pcfs(pasta, excluir_subpastas=None, data_origem="MTIME"):
     excluir_subpastas = excluir_subpastas or []
     excluir_norm = [os.path.normpath(p).lower() for p in excluir_subpastas]
 
-    for root, _, files in os.walk(pasta):
-        root_norm = os.path.normpath(root).lower()
-        if any(root_norm.startswith(p) for p in excluir_norm):
-            continue
+    for root, arquivos, _ in _walk_com_stat(pasta):
+        _acumular_pcfs(idx, root, arquivos, excluir_norm, data_origem)
+    return idx
 
-        for f in files:
-            nome, ext = os.path.splitext(f)
-            if ext.lower() not in (".xlsx", ".xlsm"):
-                continue
-            if not nome.upper().startswith("PCF-"):
-                continue
-            if "_R" not in nome:
-                continue
 
-            base = nome[4:]
-            codigo, resto = base.split("_R", 1)
-            mrev = re.match(r"([0-9A-Z]+)", resto.strip().upper())
-            if not mrev:
-                continue
+def _acumular_grd_resposta_pcf(idx, root, arquivos):
+    grd = extrair_grd_do_caminho(root)
+    if not grd:
+        return
 
-            rev = normalizar_rev(mrev.group(1))
-            caminho = os.path.join(root, f)
-            dt = _file_datetime(caminho, data_origem)
-
-            codigo = codigo.strip()
-            existente = idx.get(codigo, {}).get(rev)
-            info = {
-                "pcf": nome,
-                "path": caminho,
-                "date": dt,
-                "rev": rev
-            }
+    for f, _ in arquivos:
+        nome, ext = os.path.splitext(f)
+        if ext.lower() not in (".xlsx", ".xlsm"):
+            continue
+        if nome.upper().startswith("PCF-"):
+            idx[nome.upper()] = grd
 
-            if (existente is None) or (dt and dt > existente["date"]):
-                idx.setdefault(codigo, {})[rev] = info
-    return idx
 
 def indexar_grd_resposta_pcf():
     """
     Mapeia PCF-*.xls[xm] -> GRD-XXXX (para preencher coluna Q)
     """
     idx = {}
-    for root, _, files in os.walk(PASTA_GRD):
-        grd = extrair_grd_do_caminho(root)
-        if not grd:
-            continue
+    for root, arquivos, _ in _walk_com_stat(PASTA_GRD):
+        _acumular_grd_resposta_pcf(idx, root, arquivos)
+    return idx
+
+
+# ==========================================================
+# INDEXAÇÃO EM VARREDURA ÚNICA
+# ==========================================================
+def _dentro_de(caminho, raiz) -> bool:
+    c = os.path.normcase(os.path.normpath(caminho))
+    r = os.path.normcase(os.path.normpath(raiz))
+    return c == r or c.startswith(r.rstrip(os.sep) + os.sep)
 
-        for f in files:
-            nome, ext = os.path.splitext(f)
-            if ext.lower() not in (".xlsx", ".xlsm"):
+
+def _varrer_raiz(raiz, consumidores, cache=None):
+    """
+    Percorre uma raiz uma única vez e entrega cada pasta aos consumidores
+    cuja raiz lógica contém a pasta. Para raízes lógicas aninhadas (ex.:
+    respostas dentro de PCFs), o caminho é reescrito com a raiz configurada,
+    como se ela tivesse sido percorrida diretamente.
+    """
+    inicio = datetime.now()
+    pastas = 0
+    arquivos_total = 0
+    prefixos_reais = {}
+    mtimes = _MtimePastas()
+
+    percurso = cache.walk(raiz) if cache is not None else _walk_com_stat(raiz)
+    for root, arquivos, subpastas in percurso:
+        pastas += 1
+        arquivos_total += len(arquivos)
+        mtimes.registrar(subpastas)
+
+        for raiz_logica, consumir in consumidores:
+            if raiz_logica == raiz:
+                consumir(root, arquivos, mtimes)
+                continue
+
+            if not _dentro_de(root, raiz_logica):
                 continue
-            if nome.upper().startswith("PCF-"):
-                idx[nome.upper()] = grd
+
+            real = prefixos_reais.setdefault(raiz_logica, root)
+            consumir(raiz_logica + root[len(real):], arquivos, mtimes)
+
+    duracao = (datetime.now() - inicio).total_seconds()
+    log(f"   - Varredura {raiz}: {pastas} pastas, {arquivos_total} arquivos em {duracao:.1f}s")
+
+
+def indexar_tudo(paralelo=None, cache=None):
+    """
+    Monta os cinco índices (eng, grd, pcf, pcf_resp, grd_resp) percorrendo
+    cada raiz do servidor uma única vez, opcionalmente em paralelo por raiz.
+    Com ``cache`` (CacheVarreduraLD), pastas inalteradas não são relistadas.
+
+    Os dicionários retornados são idênticos aos de indexar_engenharia_info,
+    indexar_grds, indexar_pcfs (normal e respostas) e indexar_grd_resposta_pcf.
+    """
+    if paralelo is None:
+        paralelo = VARREDURA_PARALELA
+
+    idx = {"eng": {}, "grd": {}, "pcf": {}, "pcf_resp": {}, "grd_resp": {}}
+    excluir_resp = [os.path.normpath(PASTA_PCF_RESPOSTA).lower()]
+
+    alvos = [
+        (PASTA_DOCS, lambda root, arqs, _: _acumular_engenharia(idx["eng"], root, arqs)),
+        (PASTA_GRD, lambda root, arqs, mt: _acumular_grds(idx["grd"], root, arqs, mt)),
+        (PASTA_GRD, lambda root, arqs, _: _acumular_grd_resposta_pcf(idx["grd_resp"], root, arqs)),
+        (PASTA_PCF, lambda root, arqs, _: _acumular_pcfs(idx["pcf"], root, arqs, excluir_resp, DATA_PCF_ORIGEM)),
+        (PASTA_PCF_RESPOSTA, lambda root, arqs, _: _acumular_pcfs(idx["pcf_resp"], root, arqs, [], DATA_PCF_RESP_ORIGEM)),
+    ]
+
+    # agrupa raízes lógicas aninhadas sob a raiz física que as contém
+    raizes = []
+    for raiz, _ in alvos:
+        if raiz in raizes:
+            continue
+        if any(_dentro_de(raiz, outra) for outra in raizes):
+            continue
+        raizes = [outra for outra in raizes if not _dentro_de(outra, raiz)]
+        raizes.append(raiz)
+
+    grupos = {
+        raiz: [(logica, consumir) for logica, consumir in alvos if _dentro_de(logica, raiz)]
+        for raiz in raizes
+    }
+
+    if paralelo and len(grupos) > 1:
+        with ThreadPoolExecutor(max_workers=len(grupos), thread_name_prefix="ld-scan") as pool:
+            for futuro in [
+                pool.submit(_varrer_raiz, raiz, consumidores, cache)
+                for raiz, consumidores in grupos.items()
+            ]:
+                futuro.result()
+    else:
+        for raiz, consumidores in grupos.items():
+            _varrer_raiz(raiz, consumidores, cache)
+
     return idx
 
 
@@ -560,6 +976,33 @@ def normalizar_chave_pcf(v):
     return str(v or "").strip()
 
 
+def _indexar_status_timeline(pares):
+    """Monta {PCF LINK: STATUS FINAL} a partir dos pares (coluna B, coluna L)."""
+    idx = {}
+    duplicadas = 0
+    vazias = 0
+
+    for valor_b, status in pares:
+        chave = normalizar_chave_pcf(valor_b)
+
+        if not chave:
+            vazias += 1
+            continue
+
+        if chave in idx:
+            duplicadas += 1
+
+        idx[chave] = status
+
+    log(f"📘 Status Final PCFs carregados da Timeline: {len(idx)} chaves exatas.")
+    if duplicadas:
+        log(f"⚠️ Timeline possui {duplicadas} chave(s) duplicada(s) na coluna B; valeu a última ocorrência.")
+    if vazias:
+        log(f"ℹ️ Timeline possui {vazias} linha(s) sem PCF LINK na coluna B.")
+
+    return idx
+
+
 def carregar_status_pcfs_timeline(app):
     """
     Carrega da Timeline PCFs:
@@ -583,29 +1026,9 @@ def carregar_status_pcfs_timeline(app):
 
         last = ws_tl.range("B" + str(ws_tl.cells.last_cell.row)).end("up").row
 
-        duplicadas = 0
-        vazias = 0
-
-        for rr in range(2, last + 1):
-            chave = normalizar_chave_pcf(ws_tl[f"B{rr}"].value)
-            status = ws_tl[f"L{rr}"].value
-
-            if not chave:
-                vazias += 1
-                continue
-
-            if chave in idx:
-                duplicadas += 1
-
-            idx[chave] = status
-
-        log(f"📘 Status Final PCFs carregados da Timeline: {len(idx)} chaves exatas.")
-        if duplicadas:
-            log(f"⚠️ Timeline possui {duplicadas} chave(s) duplicada(s) na coluna B; valeu a última ocorrência.")
-        if vazias:
-            log(f"ℹ️ Timeline possui {vazias} linha(s) sem PCF LINK na coluna B.")
-
-        return idx
+        return _indexar_status_timeline(
+            (ws_tl[f"B{rr}"].value, ws_tl[f"L{rr}"].value) for rr in range(2, last + 1)
+        )
 
     except Exception as e:
         log(f"⚠️ Não foi possível carregar Status Final da Timeline PCFs: {e}")
@@ -638,11 +1061,13 @@ def inserir_revisoes_novas(ws, idx_eng):
     rev_rows = {}
     all_rows = {}
 
-    for r in range(2, last + 1):
-        codigo = str(ws[f"B{r}"].value or "").strip()
+    valores = ws.range(f"B2:C{last}").options(ndim=2).value if last >= 2 else []
+
+    for r, (valor_b, valor_c) in enumerate(valores, start=2):
+        codigo = str(valor_b or "").strip()
         if not codigo:
             continue
-        rev = normalizar_rev(ws[f"C{r}"].value)
+        rev = normalizar_rev(valor_c)
         rev_rows.setdefault(codigo, {})[rev] = r
         all_rows.setdefault(codigo, []).append(r)
 
@@ -761,13 +1186,15 @@ def aplicar_formatacao(ws):
     except Exception:
         pass
 
-    # zebra
-    for r in range(2, last_row + 1):
+    # zebra: limpa tudo numa chamada e pinta as linhas pares em faixas multiárea
+    try:
+        ws.range((2, 1), (last_row, last_col)).api.Interior.Pattern = -4142
+    except Exception:
+        pass
+    pares = [(r, r) for r in range(2, last_row + 1, 2)]
+    for endereco in enderecos_agrupados("A", pares, coluna_fim=get_column_letter(last_col)):
         try:
-            if r % 2 == 0:
-                ws.range((r, 1), (r, last_col)).api.Interior.Color = 0xF2F2F2
-            else:
-                ws.range((r, 1), (r, last_col)).api.Interior.Pattern = -4142
+            ws.range(endereco).api.Interior.Color = 0xF2F2F2
         except Exception:
             pass
 
@@ -826,6 +1253,52 @@ def _flatten(col):
     else:
         return [col]
 
+def _calcular_medicao(codigos, revs, titulos, disc_f, status, datas):
+    """
+    Uma linha por código (maior revisão; empate pela data da coluna Z), na
+    ordem da primeira ocorrência. Retorna as seis colunas A–F da MEDIÇÃO,
+    limitadas ao bloco fixo da aba, ou None quando não há códigos.
+    """
+    n = min(len(codigos), len(revs), len(titulos), len(disc_f), len(status), len(datas))
+
+    best_por_codigo = {}
+    for cod, rev, tit, disc, stat, dt in zip(codigos[:n], revs[:n], titulos[:n], disc_f[:n], status[:n], datas[:n]):
+        if cod in (None, ""):
+            continue
+        cod_str = str(cod).strip()
+        if not cod_str:
+            continue
+
+        rev_ord = rev_key(normalizar_rev(rev))
+        dt_coer = _coerce_to_date(dt)
+        dt_ord = dt_coer or date.min
+
+        atual = best_por_codigo.get(cod_str)
+        if atual is None or (rev_ord > atual["rev_ord"]) or (rev_ord == atual["rev_ord"] and dt_ord > atual["dt_ord"]):
+            best_por_codigo[cod_str] = {
+                "rev_ord": rev_ord,
+                "dt_ord": dt_ord,
+                "titulo": tit,
+                "disc": disc,
+                "status": stat,
+                "data": dt_coer,
+            }
+
+    if not best_por_codigo:
+        return None
+
+    max_qtd = MEDICAO_ULTIMA_LINHA - MEDICAO_PRIMEIRA_LINHA + 1
+    itens = list(best_por_codigo.items())[:max_qtd]
+
+    return (
+        [extrair_disciplina(cod_str) for cod_str, _ in itens],
+        [cod_str for cod_str, _ in itens],
+        [info["titulo"] for _, info in itens],
+        [info["disc"] for _, info in itens],
+        [info["status"] for _, info in itens],
+        [info["data"] for _, info in itens],
+    )
+
 def atualizar_medicao(wb, aba_origem):
     ws_origem = wb.sheets[aba_origem]
     try:
@@ -853,72 +1326,17 @@ def atualizar_medicao(wb, aba_origem):
     status_flat  = _flatten(faixa_status.value)
     datas_flat   = _flatten(faixa_data.value)
 
-    n = min(len(codigos_flat), len(revs_flat), len(titulos_flat), len(disc_f_flat), len(status_flat), len(datas_flat))
-    codigos_flat = codigos_flat[:n]
-    revs_flat    = revs_flat[:n]
-    titulos_flat = titulos_flat[:n]
-    disc_f_flat  = disc_f_flat[:n]
-    status_flat  = status_flat[:n]
-    datas_flat   = datas_flat[:n]
+    colunas = _calcular_medicao(codigos_flat, revs_flat, titulos_flat, disc_f_flat, status_flat, datas_flat)
+    if colunas is None:
+        log("⚠️ Nenhum código encontrado para copiar para MEDIÇÃO.")
+        return
 
-    best_por_codigo = {}
-    unicos_codigos = []
-    disciplinas_A  = []
-    titulos_unicos = []
-    disciplinas_F  = []
-    status_unicos  = []
-    datas_unicas   = []
-
-    for cod, rev, tit, disc, stat, dt in zip(codigos_flat, revs_flat, titulos_flat, disc_f_flat, status_flat, datas_flat):
-        if cod in (None, ""):
-            continue
-        cod_str = str(cod).strip()
-        if not cod_str:
-            continue
+    disciplinas_A, unicos_codigos, titulos_unicos, disciplinas_F, status_unicos, datas_unicas = colunas
+    qtd_linhas = len(unicos_codigos)
+    first_dest_row = MEDICAO_PRIMEIRA_LINHA
+    last_dest_row = first_dest_row + qtd_linhas - 1
 
-        rev_ord = rev_key(normalizar_rev(rev))
-        dt_coer = _coerce_to_date(dt)
-        dt_ord = dt_coer or date.min
-
-        atual = best_por_codigo.get(cod_str)
-        if atual is None or (rev_ord > atual["rev_ord"]) or (rev_ord == atual["rev_ord"] and dt_ord > atual["dt_ord"]):
-            best_por_codigo[cod_str] = {
-                "rev_ord": rev_ord,
-                "dt_ord": dt_ord,
-                "titulo": tit,
-                "disc": disc,
-                "status": stat,
-                "data": dt_coer,
-            }
-
-    for cod_str, info in best_por_codigo.items():
-        unicos_codigos.append(cod_str)
-        disciplinas_A.append(extrair_disciplina(cod_str))
-        titulos_unicos.append(info["titulo"])
-        disciplinas_F.append(info["disc"])
-        status_unicos.append(info["status"])
-        datas_unicas.append(info["data"])
-
-    first_dest_row = 4
-    max_last_row = 577
-    max_qtd = max_last_row - first_dest_row + 1
-
-    qtd_total = len(unicos_codigos)
-    if qtd_total == 0:
-        log("⚠️ Nenhum código encontrado para copiar para MEDIÇÃO.")
-        return
-
-    qtd_linhas = min(qtd_total, max_qtd)
-    unicos_codigos = unicos_codigos[:qtd_linhas]
-    disciplinas_A  = disciplinas_A[:qtd_linhas]
-    titulos_unicos = titulos_unicos[:qtd_linhas]
-    disciplinas_F  = disciplinas_F[:qtd_linhas]
-    status_unicos  = status_unicos[:qtd_linhas]
-    datas_unicas   = datas_unicas[:qtd_linhas]
-
-    last_dest_row = first_dest_row + qtd_linhas - 1
-
-    ws_destino.range("A4:F577").clear_contents()
+    ws_destino.range(f"A{MEDICAO_PRIMEIRA_LINHA}:F{MEDICAO_ULTIMA_LINHA}").clear_contents()
 
     ws_destino.range(f"A{first_dest_row}:A{last_dest_row}").value = [[d] for d in disciplinas_A]
     ws_destino.range(f"B{first_dest_row}:B{last_dest_row}").value = [[c] for c in unicos_codigos]
@@ -945,7 +1363,7 @@ def _preencher_data_por_modo(cell, modo: str, dt: datetime | None, obs: str):
     # DATA
     setar_data(cell, dt)
 
-def processar_aba(wb, aba_nome, idx_eng, idx_eng_codigos, idx_grd, idx_pcf, idx_pcf_resp, idx_grd_resp, status_pcfs):
+def processar_aba(wb, aba_nome, idx_eng, idx_eng_codigos, idx_grd, idx_pcf_base, idx_pcf_resp_base, idx_grd_resp, status_pcfs):
     ws = wb.sheets[aba_nome]
     log(f"📄 Processando aba: {aba_nome}")
 
@@ -1006,25 +1424,8 @@ def processar_aba(wb, aba_nome, idx_eng, idx_eng_codigos, idx_grd, idx_pcf, idx_
                     log(f"   [J/K] {aba_nome} L{r} | {codigo}_R{rev} => GRD NÃO encontrado")
 
             # PCF normal (L / M) - SEM subpasta de respostas
-            info_pcf = None
-            mapa = idx_pcf.get(codigo, {})
             rev_doc = normalizar_rev(ws[f"C{r}"].value)
-            best = None
-            best_key = None
-
-            if mapa and rev_doc:
-                base = (rev_doc or "").strip().upper()
-                for rev_pcf, cand in mapa.items():
-                    ok, sufixo = _split_by_base(rev_pcf, base)
-                    if not ok:
-                        continue
-
-                    k = (_suffix_key(sufixo), cand.get("date") or datetime.min)
-                    if (best_key is None) or (k[0] > best_key[0]) or (k[0] == best_key[0] and k[1] > best_key[1]):
-                        best_key = k
-                        best = cand
-
-            info_pcf = best
+            info_pcf = idx_pcf_base.get(codigo, {}).get(rev_doc)
             if info_pcf:
                 setar_hyperlink(ws[f"L{r}"], info_pcf["path"], info_pcf["pcf"])
 
@@ -1057,29 +1458,7 @@ def processar_aba(wb, aba_nome, idx_eng, idx_eng_codigos, idx_grd, idx_pcf, idx_
                     log(f"   [L/M/N] {aba_nome} L{r} | {codigo}_R{rev_doc} => PCF NÃO encontrada")
 
             # PCF resposta (O / P) - SOMENTE subpasta de respostas
-            info_resp = None
-            mapa_resp = idx_pcf_resp.get(codigo, {})
-            rev_doc = normalizar_rev(ws[f"C{r}"].value)
-            best = None
-            best_key = None
-
-            if mapa_resp and rev_doc:
-                base = (rev_doc or "").strip().upper()
-                for rev_pcf, cand in mapa_resp.items():
-                    ok, sufixo = _split_by_base(rev_pcf, base)
-                    if not ok:
-                        continue
-
-                    dtcand = cand.get("date")
-                    if dtcand is None:
-                        dtcand = datetime(1900, 1, 1)
-
-                    k = (_suffix_key(sufixo), dtcand)
-                    if (best_key is None) or (k[0] > best_key[0]) or (k[0] == best_key[0] and k[1] > best_key[1]):
-                        best_key = k
-                        best = cand
-
-            info_resp = best
+            info_resp = idx_pcf_resp_base.get(codigo, {}).get(rev_doc)
             if info_resp:
                 setar_hyperlink(ws[f"O{r}"], info_resp["path"], info_resp["pcf"])
                 _preencher_data_por_modo(ws[f"P{r}"], COL_P_MODO, info_resp.get("date"), OBS_COL_P)
@@ -1114,16 +1493,1384 @@ def processar_aba(wb, aba_nome, idx_eng, idx_eng_codigos, idx_grd, idx_pcf, idx_
         restaurar_autofiltro(ws, _af_state)
         garantir_autofiltro(ws)
 
+# ==========================================================
+# PROCESSAR UMA ABA EM BLOCOS (xlwings sem COM por célula)
+# ==========================================================
+def _hyperlinks_atuais(aba_nome, linhas, inseridas_map):
+    """
+    Hyperlinks das colunas de link de cada linha, lidos do arquivo gravado
+    (extrair_hyperlinks_xlsx) em vez de um Hyperlinks.Item pelo COM por link.
+    O arquivo ainda não tem as revisões inseridas nesta execução: elas não
+    têm link (inserir_revisoes_novas limpa essas colunas) e as demais linhas
+    correspondem, na ordem, às linhas do arquivo.
+    """
+    try:
+        hyperlinks = extrair_hyperlinks_xlsx(PLANILHA, aba_nome)
+    except Exception as e:
+        log(f"⚠️ Não foi possível ler os hyperlinks de '{aba_nome}' do arquivo: {e}")
+        hyperlinks = {}
+
+    novas = {(codigo, rev) for codigo, revs in inseridas_map.items() for rev in revs}
+    r_arquivo = 2
+    links = []
+    for linha in linhas:
+        if (str(linha["B"] or "").strip(), normalizar_rev(linha["C"])) in novas:
+            links.append({col: "" for col in COLUNAS_HYPERLINK_LD})
+            continue
+        links.append({col: hyperlinks.get(f"{col}{r_arquivo}", "") for col in COLUNAS_HYPERLINK_LD})
+        r_arquivo += 1
+    return links
+
+
+def _gravar_valores_em_bloco(ws, alteracoes):
+    """Grava só as células do change-set, em retângulos sem células inalteradas; retorna (blocos, células)."""
+    blocos = blocos_alterados(alteracoes)
+    celulas = 0
+    for col_ini, col_fim, r_ini, r_fim, valores in blocos:
+        ws.range(f"{col_ini}{r_ini}:{col_fim}{r_fim}").value = valores
+        celulas += len(valores) * len(valores[0])
+    return len(blocos), celulas
+
+
+def _aplicar_formatos_em_bloco(ws, resultados, alteracoes, primeira_linha=2):
+    """Formato de data/texto só nas células cujo valor mudou, em faixas agrupadas."""
+    por_formato = {}
+    for alteracao in alteracoes:
+        if alteracao["tipo"] != "valor":
+            continue
+        col = alteracao["coluna"]
+        formato = resultados[alteracao["linha"] - primeira_linha]["formatos"].get(col)
+        if formato:
+            por_formato.setdefault((formato, col), []).append(alteracao["linha"])
+
+    for (formato, col), linhas in por_formato.items():
+        for endereco in enderecos_agrupados(col, faixas_contiguas(linhas)):
+            faixa = ws.range(endereco)
+            if formato == "data":
+                _aplicar_formato_data(faixa)
+            else:
+                try:
+                    faixa.api.NumberFormat = "@"
+                except Exception:
+                    pass
+
+
+def _aplicar_hyperlinks_em_bloco(ws, alteracoes):
+    """
+    Hyperlinks do change-set: remoções em faixas agrupadas por coluna e um
+    Add por célula cujo endereço mudou. Retorna a quantidade de hyperlinks criados.
+    """
+    remover = {}
+    criar = []
+
+    for alteracao in alteracoes:
+        if alteracao["tipo"] != "link":
+            continue
+        if alteracao["antes"]:
+            remover.setdefault(alteracao["coluna"], []).append(alteracao["linha"])
+        if alteracao["depois"]:
+            criar.append((alteracao["celula"], alteracao["depois"], alteracao.get("texto")))
+
+    for col, linhas in remover.items():
+        for endereco in enderecos_agrupados(col, faixas_contiguas(linhas)):
+            limpar_hyperlink(ws.range(endereco))
+
+    for celula, alvo, texto in criar:
+        ws[celula].add_hyperlink(alvo, texto)
+
+    return len(criar)
+
+
+def processar_aba_em_bloco(wb, aba_nome, indices, status_pcfs, impressoes=None):
+    """
+    processar_aba com poucas chamadas COM: lê B..Q de todas as linhas num
+    único range, calcula em memória (calcular_aba_ld), monta o change-set
+    (calcular_alteracoes) e grava só as células que mudam. Formatos e
+    remoção de hyperlinks vão em faixas agrupadas. Retorna o change-set.
+    """
+    ws = wb.sheets[aba_nome]
+    log(f"📄 Processando aba: {aba_nome} (blocos)")
+
+    _af_state = capturar_autofiltro(ws)
+    remover_autofiltro(ws)
+
+    alteracoes = []
+    try:
+        # 1) inserir revisões novas vindas da Engenharia
+        inseridas_map, _ = inserir_revisoes_novas(ws, indices["eng"])
+
+        # 2) recalcular última linha depois das inserções
+        last = ws.range("B" + str(ws.cells.last_cell.row)).end("up").row
+
+        # 3) preencher status/links
+        if last >= 2:
+            matriz = ws.range(f"B2:{ULTIMA_COLUNA}{last}").options(ndim=2).value
+            linhas = [dict(zip(COLUNAS_LD, valores)) for valores in matriz]
+            for linha, links in zip(linhas, _hyperlinks_atuais(aba_nome, linhas, inseridas_map)):
+                linha["links"] = links
+
+            resultados = calcular_aba_ld(linhas, indices, status_pcfs, aba_nome, impressoes=impressoes)
+            alteracoes = calcular_alteracoes(linhas, resultados)
+
+            blocos, celulas = _gravar_valores_em_bloco(ws, alteracoes)
+            _aplicar_formatos_em_bloco(ws, resultados, alteracoes)
+            links = _aplicar_hyperlinks_em_bloco(ws, alteracoes)
+            log(f"   - {aba_nome}: {celulas} células em {blocos} blocos, {links} hyperlinks regravados")
+            log_alteracoes(aba_nome, alteracoes)
+
+        # 4) formatar
+        if APLICAR_FORMATACAO:
+            aplicar_formatacao(ws)
+    finally:
+        restaurar_autofiltro(ws, _af_state)
+        garantir_autofiltro(ws)
+
+    return alteracoes
+
 # ==========================================================
 # PROCESSAMENTO
 # ==========================================================
 
 
+# ==========================================================
+# CÁLCULO EM MEMÓRIA (sem Excel)
+# ==========================================================
+# Colunas B..ULTIMA_COLUNA da LD, na ordem da planilha
+COLUNAS_LD = tuple(
+    get_column_letter(i) for i in range(column_index_from_string("B"), column_index_from_string(ULTIMA_COLUNA) + 1)
+)
+COLUNAS_HYPERLINK_LD = ("B", "J", "L", "O", "Q")
+
+
+# data usada no desempate quando a PCF não tem data
+DATA_VAZIA_PCF = {"pcf": datetime.min, "pcf_resp": datetime(1900, 1, 1)}
+
+
+def _melhor_pcf(mapa, rev_doc, data_vazia):
+    """
+    PCF de maior sufixo sobre a revisão do documento; empate pela data.
+    Varre o mapa inteiro a cada chamada: as linhas usam pcf_por_base, e
+    esta versão fica como referência (testes e benchmark_ld).
+    """
+    if not mapa or not rev_doc:
+        return None
+
+    base = (rev_doc or "").strip().upper()
+    best = None
+    best_key = None
+    for rev_pcf, cand in mapa.items():
+        ok, sufixo = _split_by_base(rev_pcf, base)
+        if not ok:
+            continue
+
+        k = (_suffix_key(sufixo), cand.get("date") or data_vazia)
+        if (best_key is None) or (k[0] > best_key[0]) or (k[0] == best_key[0] and k[1] > best_key[1]):
+            best_key = k
+            best = cand
+    return best
+
+
+def indexar_pcf_por_base(mapa_pcfs, data_vazia):
+    """
+    Pré-escolhe, para cada código, a melhor PCF de cada revisão base que
+    pode ser consultada: {codigo: {base: candidata}}.
+
+    Toda revisão de PCF "0AB" casa com as bases "0", "0A" e "0AB" (prefixos,
+    como em _split_by_base); a escolha segue exatamente _melhor_pcf, inclusive
+    o desempate pela ordem do mapa, então a linha da LD vira uma consulta a dict.
+    """
+    chave_sufixo = {}
+    por_base = {}
+    for codigo, mapa in mapa_pcfs.items():
+        melhores = {}
+        for rev_pcf, cand in mapa.items():
+            rev_pcf = (rev_pcf or "").strip().upper()
+            data = cand.get("date") or data_vazia
+            for fim in range(1, len(rev_pcf) + 1):
+                sufixo = rev_pcf[fim:]
+                k = chave_sufixo.get(sufixo)
+                if k is None:
+                    k = chave_sufixo[sufixo] = _suffix_key(sufixo)
+
+                base = rev_pcf[:fim]
+                atual = melhores.get(base)
+                # mesma ordem de _melhor_pcf: maior sufixo, depois data; empate mantém a primeira
+                if atual is None or (k, data) > atual[0]:
+                    melhores[base] = ((k, data), cand)
+        if melhores:
+            por_base[codigo] = {base: cand for base, (_, cand) in melhores.items()}
+    return por_base
+
+
+def pcf_por_base(indices, chave):
+    """
+    indexar_pcf_por_base de indices[chave] ("pcf" ou "pcf_resp"), montado na
+    primeira consulta e guardado em indices para as duas abas reaproveitarem.
+    """
+    por_base = indices.get(f"{chave}_por_base")
+    if por_base is None:
+        por_base = indices[f"{chave}_por_base"] = indexar_pcf_por_base(indices[chave], DATA_VAZIA_PCF[chave])
+    return por_base
+
+
+def calcular_linha_ld(linha, indices, status_pcfs, aba_nome="", r=0):
+    """
+    Regras de processar_aba para uma linha, sem tocar no Excel.
+
+    ``linha`` é um dict coluna -> valor atual (B, C e H bastam) e ``indices``
+    o retorno de indexar_tudo(). Retorna None quando a linha fica como está
+    (H = Aprovado ou sem código); senão um dict com "valores" (coluna -> novo
+    valor), "links" (coluna -> endereço, ou None para remover o hyperlink) e
+    "formatos" (coluna -> "data" | "texto").
+    """
+    codigo = str(linha.get("B") or "").strip()
+    rev = normalizar_rev(linha.get("C"))
+
+    # ✅ REGRA: se a coluna H estiver "Aprovado", não substitui/atualiza nada na linha
+    status_h = str(linha.get("H") or "").strip().upper()
+    if status_h == "APROVADO":
+        if LOG_DETALHADO:
+            log(f"   [SKIP] {aba_nome} L{r} ignorada (H = Aprovado)")
+        return None
+
+    if not codigo:
+        return None
+
+    valores = {}
+    links = {}
+    formatos = {}
+
+    def preencher_data(col, modo, dt, obs):
+        m = (modo or "DATA").upper().strip()
+        if m == "MANTER":
+            return
+        if m == "OBS":
+            valores[col] = obs
+            formatos[col] = "texto"
+            return
+        valores[col] = _coerce_to_date(dt)
+        formatos[col] = "data"
+
+    def limpar_data(col, modo):
+        if (modo or "").upper() != "MANTER":
+            valores[col] = None
+
+    # Engenharia hyperlink em B
+    info_eng = indices["eng"].get(codigo, {}).get(rev)
+    valores["B"] = codigo
+    links["B"] = info_eng["path"] if info_eng else None
+    valores["H"] = "Recebido" if codigo in indices["eng"] else "Não Recebido"
+
+    # GRD (J / K)
+    info = indices["grd"].get(codigo, {}).get(rev)
+    if info:
+        valores["I"] = "Emitido"
+        valores["J"] = info["grd"]
+        links["J"] = info["path"]
+        preencher_data("K", COL_K_MODO, info.get("date"), OBS_COL_K)
+
+        if LOG_DETALHADO:
+            log(f"   [J/K] {aba_nome} L{r} | {codigo}_R{rev} => GRD={info['grd']} | link={info['path']} | K={_fmt_dt(info.get('date'))} | doc={info.get('doc_file','-')} | doc_dt={_fmt_dt(info.get('doc_dt'))} | grd_dt={_fmt_dt(info.get('grd_dt'))}")
+    else:
+        valores["I"] = "Não Emitido"
+        valores["J"] = None
+        links["J"] = None
+        limpar_data("K", COL_K_MODO)
+
+        if LOG_DETALHADO:
+            log(f"   [J/K] {aba_nome} L{r} | {codigo}_R{rev} => GRD NÃO encontrado")
+
+    # PCF normal (L / M / N) - SEM subpasta de respostas
+    info_pcf = pcf_por_base(indices, "pcf").get(codigo, {}).get(rev)
+    if info_pcf:
+        valores["L"] = info_pcf["pcf"]
+        links["L"] = info_pcf["path"]
+        preencher_data("M", COL_M_MODO, info_pcf.get("date"), OBS_COL_M)
+
+        # N = STATUS FINAL da Timeline PCFs (PROCV exato pelo valor de L)
+        status_final = status_final_da_pcf(status_pcfs, info_pcf["pcf"])
+        valores["N"] = status_final
+
+        if LOG_DETALHADO:
+            if status_final:
+                log(f"   [L/M/N] {aba_nome} L{r} | {codigo}_R{rev} => PROCV_EXATO L='{info_pcf['pcf']}' | M_DATA={_fmt_dt(info_pcf.get('date'))} | N_STATUS='{status_final}'")
+            else:
+                log(f"   [L/M/N] {aba_nome} L{r} | {codigo}_R{rev} => PROCV_EXATO SEM STATUS para L='{info_pcf['pcf']}' | M_DATA={_fmt_dt(info_pcf.get('date'))}")
+    else:
+        valores["L"] = None
+        links["L"] = None
+        limpar_data("M", COL_M_MODO)
+        valores["N"] = None
+
+        if LOG_DETALHADO:
+            log(f"   [L/M/N] {aba_nome} L{r} | {codigo}_R{rev} => PCF NÃO encontrada")
+
+    # PCF resposta (O / P / Q) - SOMENTE subpasta de respostas
+    info_resp = pcf_por_base(indices, "pcf_resp").get(codigo, {}).get(rev)
+    if info_resp:
+        valores["O"] = info_resp["pcf"]
+        links["O"] = info_resp["path"]
+        preencher_data("P", COL_P_MODO, info_resp.get("date"), OBS_COL_P)
+
+        # Q = GRD correspondente ao arquivo PCF encontrado
+        grd_resp = indices["grd_resp"].get(info_resp["pcf"].upper(), "")
+        valores["Q"] = grd_resp or None
+        links["Q"] = os.path.join(PASTA_GRD, grd_resp) if grd_resp else None
+
+        if LOG_DETALHADO:
+            log(f"   [O/P/Q] {aba_nome} L{r} | {codigo}_R{rev} => PCF_RESP base='{rev}' escolheu rev_pcf='{info_resp.get('rev','-')}' | file={info_resp['pcf']} | P={_fmt_dt(info_resp.get('date'))} | Q_GRD={grd_resp or '-'}")
+    else:
+        valores["O"] = None
+        links["O"] = None
+        limpar_data("P", COL_P_MODO)
+        valores["Q"] = None
+        links["Q"] = None
+
+        if LOG_DETALHADO:
+            log(f"   [O/P/Q] {aba_nome} L{r} | {codigo}_R{rev} => PCF_RESPOSTA NÃO encontrada")
+
+    return {"valores": valores, "links": links, "formatos": formatos}
+
+
+def _canonico(v):
+    """Valor de célula comparável entre COM e openpyxl (data sem hora = date, número = float)."""
+    tipo = type(v)
+    if tipo is str:
+        return v or None
+    if v is None or tipo is float:
+        return v
+    if tipo is datetime:
+        return v.date().isoformat() if v.time() == datetime.min.time() else v.isoformat()
+    if tipo is date:
+        return v.isoformat()
+    if tipo is int:
+        return float(v)
+    return v
+
+
+def impressao_linha_ld(linha, indices, status_pcfs):
+    """
+    Impressão digital de tudo de que calcular_linha_ld depende para a linha:
+    valores B..Q e hyperlinks atuais, a entrada da Engenharia (caminho e
+    mtime), do GRD, da PCF e da resposta escolhidas, o STATUS FINAL da
+    Timeline, o GRD da resposta e os modos de preenchimento das datas.
+    Os hyperlinks entram normalizados (_endereco_normalizado): o arquivo
+    gravado traz relativos os links que o cálculo monta absolutos.
+    """
+    pasta_planilha = ntpath.dirname(PLANILHA)
+    codigo = str(linha.get("B") or "").strip()
+    rev = normalizar_rev(linha.get("C"))
+    info_pcf = pcf_por_base(indices, "pcf").get(codigo, {}).get(rev)
+    info_resp = pcf_por_base(indices, "pcf_resp").get(codigo, {}).get(rev)
+    links = linha.get("links") or {}
+
+    # as entradas dos índices entram como estão: os indexadores montam os
+    # dicts sempre com as mesmas chaves na mesma ordem, então o repr é estável
+    entradas = (
+        [_canonico(linha.get(col)) for col in COLUNAS_LD],
+        [_endereco_normalizado(links.get(col), pasta_planilha) for col in COLUNAS_HYPERLINK_LD],
+        codigo in indices["eng"],
+        indices["eng"].get(codigo, {}).get(rev),
+        indices["grd"].get(codigo, {}).get(rev),
+        info_pcf,
+        status_final_da_pcf(status_pcfs, info_pcf["pcf"]) if info_pcf else None,
+        info_resp,
+        indices["grd_resp"].get(info_resp["pcf"].upper(), "") if info_resp else None,
+        (COL_K_MODO, COL_M_MODO, COL_P_MODO, OBS_COL_K, OBS_COL_M, OBS_COL_P, PASTA_GRD),
+    )
+    return hashlib.blake2b(repr(entradas).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _linha_apos(linha, resultado):
+    """
+    A linha como fica na planilha depois de gravado o resultado de
+    calcular_linha_ld. Link que calcular_alteracoes considera igual ao atual
+    (mesmo endereço normalizado) não é regravado e fica como está no arquivo.
+    """
+    if resultado is None:
+        return linha
+    pasta_planilha = ntpath.dirname(PLANILHA)
+    links = dict(linha.get("links") or {})
+    for col, alvo in resultado["links"].items():
+        alvo = alvo or ""
+        if _endereco_normalizado(links.get(col), pasta_planilha) != _endereco_normalizado(alvo, pasta_planilha):
+            links[col] = alvo
+    apos = dict(linha)
+    apos.update(resultado["valores"])
+    apos["links"] = links
+    return apos
+
+
+class ImpressoesLinhasLD(CacheJSON):
+    """
+    Impressões digitais (JSON, em PASTA_LOGS) das linhas da LD por
+    (aba, código, revisão), tiradas da linha como ficou depois da gravação.
+
+    Na execução seguinte, linha cuja impressão atual é igual à guardada —
+    mesmos valores na planilha e mesmas entradas em Engenharia/GRD/PCF/Timeline —
+    não é recalculada. Editar a linha à mão muda a impressão e ela volta a
+    ser processada. ``full=True`` (``--full``) recalcula todas.
+    """
+
+    CHAVE = "linhas"
+    DESCRICAO = "as impressões das linhas da LD"
+
+    def __init__(self, caminho=None, full=False):
+        super().__init__(caminho or IMPRESSOES_LINHAS_ARQUIVO, full=full, avisar=lambda mensagem: log(f"⚠️ {mensagem}"))
+        self.contagens = {}
+
+    @staticmethod
+    def chave(aba_nome, codigo, rev):
+        return f"{aba_nome}|{codigo}|{rev}"
+
+    def _contagem(self, aba_nome):
+        return self.contagens.setdefault(aba_nome, {"processadas": 0, "puladas": 0})
+
+    def pular(self, aba_nome, chave, impressao):
+        """True (e conta como pulada) quando a linha não mudou desde a última execução."""
+        if self.anterior.get(chave) == impressao:
+            self.atual[chave] = impressao
+            self._contagem(aba_nome)["puladas"] += 1
+            return True
+        self._contagem(aba_nome)["processadas"] += 1
+        return False
+
+    def registrar(self, chave, impressao):
+        self.atual[chave] = impressao
+
+    def resumo(self):
+        return {
+            "abas": {aba: dict(contagem) for aba, contagem in self.contagens.items()},
+            "processadas": sum(c["processadas"] for c in self.contagens.values()),
+            "puladas": sum(c["puladas"] for c in self.contagens.values()),
+            "full": self.full,
+        }
+
+
+def calcular_aba_ld(linhas, indices, status_pcfs, aba_nome="", primeira_linha=2, impressoes=None):
+    """
+    calcular_linha_ld para todas as linhas (de baixo para cima, como
+    processar_aba). Retorna {índice da linha: resultado} só das linhas que
+    as regras alteram. Com ``impressoes`` (ImpressoesLinhasLD), linhas
+    inalteradas desde a última execução nem são calculadas.
+    """
+    resultados = {}
+    for i in range(len(linhas) - 1, -1, -1):
+        linha = linhas[i]
+        chave = None
+        codigo = str(linha.get("B") or "").strip()
+        if impressoes is not None and codigo:
+            chave = impressoes.chave(aba_nome, codigo, normalizar_rev(linha.get("C")))
+            if impressoes.pular(aba_nome, chave, impressao_linha_ld(linha, indices, status_pcfs)):
+                continue
+
+        resultado = calcular_linha_ld(linha, indices, status_pcfs, aba_nome, primeira_linha + i)
+        if resultado is not None:
+            resultados[i] = resultado
+        if chave is not None:
+            impressoes.registrar(chave, impressao_linha_ld(_linha_apos(linha, resultado), indices, status_pcfs))
+    return resultados
+
+
+def colunas_gravadas_ld():
+    """Colunas que as regras podem escrever (K/M/P ficam de fora em modo MANTER)."""
+    manter = {
+        col for col, modo in (("K", COL_K_MODO), ("M", COL_M_MODO), ("P", COL_P_MODO))
+        if (modo or "").upper().strip() == "MANTER"
+    }
+    return ["B"] + [col for col in COLUNAS_LD[COLUNAS_LD.index("H"):] if col not in manter]
+
+
+def _mesmo_valor(atual, novo):
+    if isinstance(atual, datetime) and isinstance(novo, date) and not isinstance(novo, datetime):
+        return atual.date() == novo and atual.time() == datetime.min.time()
+    if atual in (None, "") and novo in (None, ""):
+        return True
+    return atual == novo
+
+
+_ENDERECO_ABSOLUTO = re.compile(r"^(?:[A-Za-z]:|[\\/]|[A-Za-z][A-Za-z0-9+.-]*:)")
+
+
+def _endereco_normalizado(endereco, pasta_planilha):
+    """
+    Endereço de hyperlink comparável: o Excel grava links para a mesma
+    unidade/servidor relativos à pasta da planilha (``..\\10 - Engenharia\\...``),
+    enquanto calcular_aba_ld monta caminhos absolutos. URLs e links internos
+    ficam como estão; a caixa é ignorada, como no Windows.
+    """
+    endereco = (endereco or "").strip()
+    if not endereco:
+        return ""
+    caminho, sep, local = endereco.partition("#")
+    if caminho and not _ENDERECO_ABSOLUTO.match(caminho):
+        caminho = ntpath.join(pasta_planilha, caminho)
+    if caminho and "://" not in caminho:
+        caminho = ntpath.normcase(ntpath.normpath(caminho))
+    return f"{caminho}{sep}{local}"
+
+
+def faixas_contiguas(numeros):
+    """[2, 3, 4, 9] -> [(2, 4), (9, 9)]"""
+    faixas = []
+    for n in sorted(numeros):
+        if faixas and n == faixas[-1][1] + 1:
+            faixas[-1] = (faixas[-1][0], n)
+        else:
+            faixas.append((n, n))
+    return faixas
+
+
+def calcular_alteracoes(linhas, resultados, primeira_linha=2):
+    """
+    Change-set de uma aba: compara os valores e hyperlinks atuais de
+    ``linhas`` (dicts de coluna -> valor, com "links" coluna -> endereço) com
+    o retorno de calcular_aba_ld e lista só as células que mudam, em ordem
+    de linha e coluna.
+
+    Cada entrada é {"celula", "linha", "coluna", "tipo", "antes", "depois"},
+    com tipo "valor" ou "link"; hyperlinks novos levam também o "texto" da célula.
+    Os endereços são comparados já resolvidos contra a pasta da planilha
+    (_endereco_normalizado): um link relativo que aponta para o mesmo
+    arquivo não é regravado.
+    """
+    gravadas = set(colunas_gravadas_ld())
+    pasta_planilha = ntpath.dirname(PLANILHA)
+    alteracoes = []
+
+    for i in sorted(resultados):
+        resultado = resultados[i]
+        linha = linhas[i]
+        links_atuais = linha.get("links") or {}
+        r = primeira_linha + i
+
+        for col in COLUNAS_LD:
+            if col in gravadas and col in resultado["valores"]:
+                antes = linha.get(col)
+                depois = resultado["valores"][col]
+                if not _mesmo_valor(antes, depois):
+                    alteracoes.append({
+                        "celula": f"{col}{r}", "linha": r, "coluna": col,
+                        "tipo": "valor", "antes": antes, "depois": depois,
+                    })
+
+            if col in resultado["links"]:
+                antes = links_atuais.get(col) or ""
+                depois = resultado["links"][col] or ""
+                if _endereco_normalizado(antes, pasta_planilha) != _endereco_normalizado(depois, pasta_planilha):
+                    alteracao = {
+                        "celula": f"{col}{r}", "linha": r, "coluna": col,
+                        "tipo": "link", "antes": antes, "depois": depois,
+                    }
+                    if depois:
+                        alteracao["texto"] = resultado["valores"].get(col, linha.get(col))
+                    alteracoes.append(alteracao)
+
+    return alteracoes
+
+
+def alteracoes_de_insercao(plano, chaves, primeira_linha=2):
+    """Entradas "linha" do change-set para as revisões novas de planejar_revisoes_novas."""
+    return [
+        {
+            "celula": f"C{primeira_linha + i}", "linha": primeira_linha + i, "coluna": "C",
+            "tipo": "linha", "antes": None, "depois": nova, "documento": chaves[origem][0],
+        }
+        for i, (origem, nova) in enumerate(plano)
+        if nova is not None
+    ]
+
+
+def resumir_alteracoes(alteracoes):
+    """Contagens do change-set: células por coluna, hyperlinks, linhas novas e linhas tocadas."""
+    por_coluna = {}
+    por_tipo = {}
+    linhas = set()
+    for alteracao in alteracoes:
+        tipo = alteracao["tipo"]
+        por_tipo[tipo] = por_tipo.get(tipo, 0) + 1
+        if tipo == "valor":
+            por_coluna[alteracao["coluna"]] = por_coluna.get(alteracao["coluna"], 0) + 1
+        if tipo != "linha":
+            linhas.add(alteracao["linha"])
+
+    return {
+        "total": len(alteracoes),
+        "celulas": por_tipo.get("valor", 0),
+        "hyperlinks": por_tipo.get("link", 0),
+        "linhas_novas": por_tipo.get("linha", 0),
+        "linhas": len(linhas),
+        "por_coluna": {col: por_coluna[col] for col in sorted(por_coluna, key=column_index_from_string)},
+    }
+
+
+def log_alteracoes(aba_nome, alteracoes):
+    resumo = resumir_alteracoes(alteracoes)
+    colunas = ", ".join(f"{col}={qtd}" for col, qtd in resumo["por_coluna"].items()) or "-"
+    log(
+        f"🧮 Change-set {aba_nome}: {resumo['celulas']} células em {resumo['linhas']} linhas "
+        f"({colunas}), {resumo['hyperlinks']} hyperlinks, {resumo['linhas_novas']} linhas novas"
+    )
+    return resumo
+
+
+def _json_valor(v):
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    return v
+
+
+def alteracoes_para_json(alteracoes):
+    """Change-set com datas em ISO 8601, pronto para json.dump e para o JSONField da execução."""
+    return [{chave: _json_valor(valor) for chave, valor in alteracao.items()} for alteracao in alteracoes]
+
+
+def blocos_alterados(alteracoes):
+    """
+    Agrupa as células de valor do change-set em retângulos sem nenhuma
+    célula inalterada: linhas consecutivas de uma coluna formam uma faixa e
+    colunas vizinhas com a mesma faixa viram um único bloco.
+
+    Retorna [(coluna inicial, coluna final, linha inicial, linha final, valores 2D)].
+    """
+    novos = {}
+    for alteracao in alteracoes:
+        if alteracao["tipo"] == "valor":
+            novos.setdefault(alteracao["coluna"], {})[alteracao["linha"]] = alteracao["depois"]
+
+    por_faixa = {}
+    for col, valores in novos.items():
+        for faixa in faixas_contiguas(valores):
+            por_faixa.setdefault(faixa, []).append(column_index_from_string(col))
+
+    blocos = []
+    for (r_ini, r_fim), colunas in sorted(por_faixa.items()):
+        for c_ini, c_fim in faixas_contiguas(colunas):
+            letras = [get_column_letter(c) for c in range(c_ini, c_fim + 1)]
+            blocos.append((
+                letras[0],
+                letras[-1],
+                r_ini,
+                r_fim,
+                [[novos[col][r] for col in letras] for r in range(r_ini, r_fim + 1)],
+            ))
+    return blocos
+
+
+def enderecos_agrupados(coluna, faixas, limite=250, coluna_fim=None):
+    """
+    Endereços multiárea ("K2:K5,K9:K9") de até ``limite`` caracteres, o
+    máximo aceito pelo Range() do Excel, para formatar várias faixas por chamada.
+    Com ``coluna_fim`` cada faixa vai de ``coluna`` até ela ("A2:Q2,A4:Q4").
+    """
+    coluna_fim = coluna_fim or coluna
+    enderecos = []
+    atual = ""
+    for ini, fim in faixas:
+        parte = f"{coluna}{ini}:{coluna_fim}{fim}"
+        if atual and len(atual) + 1 + len(parte) > limite:
+            enderecos.append(atual)
+            atual = parte
+        else:
+            atual = f"{atual},{parte}" if atual else parte
+    if atual:
+        enderecos.append(atual)
+    return enderecos
+
+
+def planejar_revisoes_novas(chaves, idx_eng, aba_nome=""):
+    """
+    Versão em memória de inserir_revisoes_novas.
+
+    ``chaves`` são os pares (codigo, rev normalizada) das linhas a partir da
+    linha 2. Retorna (plano, inseridas_map, total): o plano lista, na ordem
+    final das linhas, pares (índice da linha de origem, revisão nova), com
+    revisão None para as linhas que já existiam. Cada revisão nova é cópia da
+    linha base do código e entra logo após a última linha dele.
+    """
+    rev_rows = {}
+    all_rows = {}
+    for i, (codigo, rev) in enumerate(chaves):
+        if not codigo:
+            continue
+        rev_rows.setdefault(codigo, {})[rev] = i
+        all_rows.setdefault(codigo, []).append(i)
+
+    novas_apos = {}
+    inseridas_map = {}
+    total_inseridas = 0
+
+    for codigo, linhas in all_rows.items():
+        eng_revs = set(idx_eng.get(codigo, {}).keys())
+        if not eng_revs:
+            continue
+
+        sheet_revs = set(rev_rows[codigo].keys())
+        faltantes = sorted(list(eng_revs - sheet_revs), key=rev_key)
+        if not faltantes:
+            continue
+
+        base_map = rev_rows[codigo]
+        if "0" in base_map:
+            base_row = base_map["0"]
+        else:
+            menor_rev = sorted(sheet_revs, key=rev_key)[0]
+            base_row = base_map[menor_rev]
+
+        novas_apos[max(linhas)] = [(base_row, nova) for nova in faltantes]
+        inseridas_map[codigo] = faltantes
+        total_inseridas += len(faltantes)
+
+    plano = []
+    for i in range(len(chaves)):
+        plano.append((i, None))
+        plano.extend(novas_apos.get(i, ()))
+
+    if total_inseridas:
+        log(f"➕ Revisões novas inseridas na planilha ({aba_nome}): {total_inseridas}")
+        for codigo, revs in sorted(inseridas_map.items()):
+            log(f"   - {codigo}: inseriu revisões {', '.join(revs)}")
+    else:
+        log(f"ℹ️ Nenhuma revisão nova para inserir (Engenharia x Planilha) na aba {aba_nome}.")
+
+    return plano, inseridas_map, total_inseridas
+
+
+# ==========================================================
+# MOTOR OPENPYXL (sem Excel)
+# ==========================================================
+def _valor_como_excel(v):
+    """Números chegam do COM sempre como float; o openpyxl devolve int."""
+    if isinstance(v, int) and not isinstance(v, bool):
+        return float(v)
+    return v
+
+
+def _cor_excel(cor_bgr):
+    """Converte a cor do Interior.Color (BGR) para o RGB do openpyxl."""
+    return f"{cor_bgr & 0xFF:02X}{(cor_bgr >> 8) & 0xFF:02X}{(cor_bgr >> 16) & 0xFF:02X}"
+
+
+def _ultima_linha_openpyxl(ws, coluna="B"):
+    """Equivalente ao End(xlUp) a partir do fim da coluna."""
+    idx = column_index_from_string(coluna)
+    for r in range(ws.max_row, 1, -1):
+        if ws.cell(r, idx).value not in (None, ""):
+            return r
+    return 1
+
+
+def _alvo_hyperlink(cell):
+    link = cell.hyperlink
+    if link is None:
+        return ""
+    endereco = str(link.target or "").strip()
+    sub = str(link.location or "").strip()
+    if endereco and sub:
+        return f"{endereco}#{sub}"
+    return endereco or sub
+
+
+_REF_CELULAS = re.compile(r"^(\$?[A-Z]{1,3})(\$?)(\d+)(?::(\$?[A-Z]{1,3})(\$?)(\d+))?$", re.IGNORECASE)
+_REF_LINHAS = re.compile(r"^(\$?)(\d+):(\$?)(\d+)$")
+
+
+def _pontos_insercao(plano, primeira_linha=2):
+    """
+    [(linha original, quantidade)] em que o plano insere linhas, como uma
+    sequência de Insert do Excel: as novas entram logo antes dessa linha.
+    """
+    pontos = {}
+    anterior = -1
+    for origem, nova in plano:
+        if nova is None:
+            anterior = origem
+        else:
+            linha = primeira_linha + anterior + 1
+            pontos[linha] = pontos.get(linha, 0) + 1
+    return sorted(pontos.items())
+
+
+def _deslocador_linhas(pontos):
+    """Função linha original -> linha depois das inserções."""
+    linhas = [linha for linha, _ in pontos]
+    acumulado = list(accumulate(qtd for _, qtd in pontos))
+
+    def deslocar(r):
+        i = bisect_right(linhas, r)
+        return r + (acumulado[i - 1] if i else 0)
+
+    return deslocar
+
+
+def _deslocar_referencia(ref, deslocar):
+    """Desloca as linhas de uma referência A1 (célula, faixa ou linhas inteiras)."""
+    m = _REF_CELULAS.match(ref)
+    if m:
+        col1, abs1, r1, col2, abs2, r2 = m.groups()
+        texto = f"{col1}{abs1}{deslocar(int(r1))}"
+        if col2:
+            texto += f":{col2}{abs2}{deslocar(int(r2))}"
+        return texto
+
+    m = _REF_LINHAS.match(ref)
+    if m:
+        abs1, r1, abs2, r2 = m.groups()
+        return f"{abs1}{deslocar(int(r1))}:{abs2}{deslocar(int(r2))}"
+    return ref
+
+
+def _deslocar_sqref(sqref, deslocar):
+    return " ".join(_deslocar_referencia(ref, deslocar) for ref in str(sqref).split())
+
+
+def _deslocar_formula(formula, aba_da_formula, aba_alvo, deslocar):
+    """
+    Reescreve as referências de ``formula`` que apontam para linhas de
+    ``aba_alvo``; referências sem aba valem para ``aba_da_formula``.
+    """
+    alvo = aba_alvo.casefold()
+    if alvo not in formula.casefold() and (aba_da_formula or "").casefold() != alvo:
+        return formula
+
+    try:
+        tokens = Tokenizer(formula)
+    except Exception:
+        return formula
+
+    alterou = False
+    for token in tokens.items:
+        if token.type != Token.OPERAND or token.subtype != Token.RANGE:
+            continue
+        aba, sep, ref = token.value.rpartition("!")
+        nome_aba = aba.strip("'").replace("''", "'") if sep else aba_da_formula
+        if (nome_aba or "").casefold() != alvo:
+            continue
+        nova = _deslocar_referencia(ref, deslocar)
+        if nova != ref:
+            token.value = f"{aba}{sep}{nova}"
+            alterou = True
+
+    return tokens.render() if alterou else formula
+
+
+def _deslocar_expressao(texto, aba_da_formula, aba_alvo, deslocar):
+    """_deslocar_formula para textos gravados sem o '=' (nomes, validações, regras)."""
+    if not texto:
+        return texto
+    return _deslocar_formula(f"={texto}", aba_da_formula, aba_alvo, deslocar)[1:]
+
+
+def _deslocar_referencias_openpyxl(ws, deslocar):
+    """
+    Desloca, como o Insert do Excel, tudo o que aponta para linhas de ``ws``:
+    fórmulas de todas as abas, validações de dados, formatação condicional,
+    tabelas, área de impressão e nomes definidos. As células mescladas de
+    ``ws`` são desfeitas e devolvidas já deslocadas, para serem refeitas
+    depois que as linhas forem movidas.
+    """
+    wb = ws.parent
+    for aba in wb.worksheets:
+        for cel in list(aba._cells.values()):
+            valor = cel.value
+            if isinstance(valor, str) and valor.startswith("="):
+                cel.value = _deslocar_formula(valor, aba.title, ws.title, deslocar)
+            elif isinstance(valor, ArrayFormula):
+                valor.text = _deslocar_formula(valor.text or "", aba.title, ws.title, deslocar)
+                if aba is ws and valor.ref:
+                    valor.ref = _deslocar_referencia(valor.ref, deslocar)
+
+        for nome in aba.defined_names.values():
+            nome.attr_text = _deslocar_expressao(nome.attr_text, None, ws.title, deslocar)
+
+    for nome in wb.defined_names.values():
+        nome.attr_text = _deslocar_expressao(nome.attr_text, None, ws.title, deslocar)
+
+    if ws.print_area:
+        ws.print_area = _deslocar_expressao(ws.print_area, ws.title, ws.title, deslocar)
+
+    for validacao in ws.data_validations.dataValidation:
+        validacao.sqref = MultiCellRange(_deslocar_sqref(validacao.sqref, deslocar))
+        validacao.formula1 = _deslocar_expressao(validacao.formula1, ws.title, ws.title, deslocar)
+        validacao.formula2 = _deslocar_expressao(validacao.formula2, ws.title, ws.title, deslocar)
+
+    formatacoes = ws.conditional_formatting
+    ws.conditional_formatting = ConditionalFormattingList()
+    for formatacao in formatacoes:
+        faixa = _deslocar_sqref(formatacao.sqref, deslocar)
+        for regra in formatacao.rules:
+            regra.formula = [_deslocar_expressao(f, ws.title, ws.title, deslocar) for f in regra.formula]
+            ws.conditional_formatting.add(faixa, regra)
+
+    for tabela in ws.tables.values():
+        tabela.ref = _deslocar_referencia(tabela.ref, deslocar)
+        if tabela.autoFilter is not None and tabela.autoFilter.ref:
+            tabela.autoFilter.ref = _deslocar_referencia(tabela.autoFilter.ref, deslocar)
+
+    mescladas = [faixa.coord for faixa in ws.merged_cells.ranges]
+    for coord in mescladas:
+        ws.unmerge_cells(coord)
+    return mescladas
+
+
+def _reorganizar_linhas_openpyxl(ws, plano, primeira_linha=2):
+    """
+    Aplica o plano de planejar_revisoes_novas como o Rows.Copy + Insert do
+    Excel: as referências às linhas deslocadas são corrigidas em toda a pasta
+    de trabalho (_deslocar_referencias_openpyxl) e cada linha de destino
+    recebe valores, estilos, hyperlinks, mesclagens e altura da linha de
+    origem. As linhas novas ficam com a revisão em C, H–Q vazias e sem
+    hyperlinks, e suas fórmulas são traduzidas como numa cópia.
+    """
+    inicio = next(
+        (i for i, (origem, nova) in enumerate(plano) if origem != i or nova is not None),
+        None,
+    )
+    if inicio is None:
+        return
+
+    deslocar = _deslocador_linhas(_pontos_insercao(plano, primeira_linha))
+    mescladas = _deslocar_referencias_openpyxl(ws, deslocar)
+
+    max_col = ws.max_column
+    fotos = {}
+    for origem in {origem for origem, _ in plano[inicio:]}:
+        r = primeira_linha + origem
+        fotos[origem] = (
+            [
+                (cel.value, copy(cel._style), copy(cel.hyperlink) if cel.hyperlink else None)
+                for cel in (ws.cell(r, col) for col in range(1, max_col + 1))
+            ],
+            ws.row_dimensions[r].height,
+        )
+
+    col_h = column_index_from_string("H")
+    col_fim = column_index_from_string(ULTIMA_COLUNA)
+    col_rev = column_index_from_string("C")
+    cols_link = {column_index_from_string(c) for c in COLUNAS_HYPERLINK_LD}
+
+    for i in range(inicio, len(plano)):
+        origem, nova_rev = plano[i]
+        r_destino = primeira_linha + i
+        celulas, altura = fotos[origem]
+
+        for col, (valor, estilo, link) in enumerate(celulas, start=1):
+            if nova_rev is not None and (col == col_rev or col_h <= col <= col_fim):
+                valor = None
+            if nova_rev is not None and col in cols_link:
+                link = None
+            if nova_rev is not None and isinstance(valor, str) and valor.startswith("="):
+                letra = get_column_letter(col)
+                r_copiada = deslocar(primeira_linha + origem)
+                valor = Translator(valor, origin=f"{letra}{r_copiada}").translate_formula(f"{letra}{r_destino}")
+
+            cel = ws.cell(r_destino, col)
+            cel.value = valor
+            cel._style = copy(estilo)
+            cel.hyperlink = copy(link) if link else None
+
+        if nova_rev is not None:
+            ws.cell(r_destino, col_rev).value = int(nova_rev) if nova_rev.isdigit() else nova_rev
+
+        ws.row_dimensions[r_destino].height = altura
+
+    for coord in mescladas:
+        ws.merge_cells(_deslocar_referencia(coord, deslocar))
+
+    for i in range(inicio, len(plano)):
+        origem, nova_rev = plano[i]
+        if nova_rev is None:
+            continue
+        r_origem = primeira_linha + origem
+        for coord in mescladas:
+            faixa = CellRange(coord)
+            if faixa.min_row == faixa.max_row == r_origem:
+                faixa.shift(row_shift=primeira_linha + i - r_origem)
+                ws.merge_cells(faixa.coord)
+
+
+def _ajustar_autofiltro_openpyxl(ws, last_row, inseridas):
+    if ws.auto_filter.ref:
+        faixa = CellRange(ws.auto_filter.ref)
+        faixa.expand(down=inseridas)
+        ws.auto_filter.ref = faixa.coord
+    else:
+        ws.auto_filter.ref = f"A1:{ULTIMA_COLUNA}{max(last_row, 1)}"
+
+
+def aplicar_formatacao_openpyxl(ws, last_row):
+    """Mesma formatação de aplicar_formatacao, gravada direto nos estilos do arquivo."""
+    if last_row < 2:
+        return
+
+    last_col = column_index_from_string(ULTIMA_COLUNA)
+    lado = Side(style="thin")
+    borda = Border(left=lado, right=lado, top=lado, bottom=lado)
+    fonte = Font(name="Arial", size=11)
+    fonte_cabecalho = Font(name="Arial", size=11, bold=True)
+    fonte_link = Font(name="Arial", size=11, color="0563C1", underline="single")
+    centro = Alignment(horizontal="center", vertical="center")
+    esquerda = Alignment(horizontal="left", vertical="center")
+    zebra = PatternFill(fill_type="solid", fgColor=_cor_excel(0xF2F2F2))
+    sem_preenchimento = PatternFill(fill_type=None)
+    colunas_esquerda = {column_index_from_string(c) for c in ("D", "E", "F")}
+    colunas_data = {column_index_from_string(c) for c in ("K", "M", "P")}
+
+    for linha in ws.iter_rows(min_row=1, max_row=last_row, min_col=1, max_col=last_col):
+        for cel in linha:
+            r = cel.row
+            if r == 1:
+                cel.font = fonte_cabecalho
+            else:
+                cel.font = fonte_link if cel.hyperlink else fonte
+                cel.fill = zebra if r % 2 == 0 else sem_preenchimento
+                if cel.column in colunas_data:
+                    cel.number_format = DATE_NUMBERFORMAT_FALLBACK
+            cel.alignment = esquerda if cel.column in colunas_esquerda else centro
+            cel.border = borda
+
+    ws.freeze_panes = "A2" if FREEZE_PANES else None
+
+    # condicional (H, I); N é STATUS FINAL da Timeline e não recebe regra
+    ws.conditional_formatting = ConditionalFormattingList()
+    for col, valor_ok, valor_nok in (("I", "Emitido", "Não Emitido"), ("H", "Recebido", "Não Recebido")):
+        faixa = f"{col}2:{col}{last_row}"
+        for valor, cor in ((valor_ok, 0xC6EFCE), (valor_nok, 0xFCE4D6)):
+            ws.conditional_formatting.add(
+                faixa,
+                CellIsRule(
+                    operator="equal",
+                    formula=[f'"{valor}"'],
+                    fill=PatternFill(fill_type="solid", start_color=_cor_excel(cor), end_color=_cor_excel(cor)),
+                ),
+            )
+
+
+def _aplicar_alteracoes_openpyxl(ws, linhas, resultados, alteracoes, primeira_linha=2):
+    """Grava só as células do change-set e reflete as mudanças nas linhas em memória."""
+    for alteracao in alteracoes:
+        col = alteracao["coluna"]
+        linha = linhas[alteracao["linha"] - primeira_linha]
+        cel = ws[alteracao["celula"]]
+
+        if alteracao["tipo"] == "valor":
+            cel.value = alteracao["depois"]
+            linha[col] = alteracao["depois"]
+            formato = resultados[alteracao["linha"] - primeira_linha]["formatos"].get(col)
+            if formato == "data":
+                cel.number_format = DATE_NUMBERFORMAT_FALLBACK
+            elif formato == "texto":
+                cel.number_format = "@"
+
+        elif alteracao["tipo"] == "link":
+            cel.hyperlink = alteracao["depois"] or None
+            linha["links"][col] = alteracao["depois"]
+
+
+def _ler_linhas_openpyxl(ws, ultima, primeira=2):
+    """Valores (B..Q) e hyperlinks (B, J, L, O, Q) de cada linha, como o COM entregaria."""
+    linhas = []
+    if ultima < primeira:
+        return linhas
+
+    for celulas in ws.iter_rows(
+        min_row=primeira,
+        max_row=ultima,
+        min_col=column_index_from_string(COLUNAS_LD[0]),
+        max_col=column_index_from_string(COLUNAS_LD[-1]),
+    ):
+        por_coluna = dict(zip(COLUNAS_LD, celulas))
+        linha = {col: _valor_como_excel(cel.value) for col, cel in por_coluna.items()}
+        linha["links"] = {col: _alvo_hyperlink(por_coluna[col]) for col in COLUNAS_HYPERLINK_LD}
+        linhas.append(linha)
+    return linhas
+
+
+def processar_aba_openpyxl(ws, aba_nome, indices, status_pcfs, impressoes=None):
+    """
+    processar_aba sem Excel: lê a aba uma vez para listas em memória, insere
+    as revisões novas, calcula B e H–Q linha a linha e grava só as células do
+    change-set. Retorna (plano, linhas, alteracoes) para a MEDIÇÃO, o banco e o log.
+    """
+    log(f"📄 Processando aba: {aba_nome} (openpyxl)")
+
+    last = _ultima_linha_openpyxl(ws)
+    chaves = [
+        (str(linha["B"] or "").strip(), normalizar_rev(linha["C"]))
+        for linha in _ler_linhas_openpyxl(ws, last)
+    ]
+
+    # 1) inserir revisões novas vindas da Engenharia
+    plano, _, total_inseridas = planejar_revisoes_novas(chaves, indices["eng"], aba_nome)
+
+    # as linhas depois da última com código descem junto com as inseridas
+    for origem in range(len(chaves), ws.max_row - 1):
+        plano.append((origem, None))
+    _reorganizar_linhas_openpyxl(ws, plano)
+
+    # 2) recalcular última linha depois das inserções
+    last += total_inseridas
+    linhas = _ler_linhas_openpyxl(ws, last)
+
+    # 3) preencher status/links
+    resultados = calcular_aba_ld(linhas, indices, status_pcfs, aba_nome, impressoes=impressoes)
+    alteracoes = calcular_alteracoes(linhas, resultados)
+    _aplicar_alteracoes_openpyxl(ws, linhas, resultados, alteracoes)
+    alteracoes = alteracoes_de_insercao(plano, chaves) + alteracoes
+    log_alteracoes(aba_nome, alteracoes)
+
+    # 4) formatar
+    if APLICAR_FORMATACAO:
+        aplicar_formatacao_openpyxl(ws, last)
+    _ajustar_autofiltro_openpyxl(ws, last, total_inseridas)
+
+    return plano, linhas, alteracoes
+
+
+def carregar_status_pcfs_timeline_openpyxl():
+    """carregar_status_pcfs_timeline lendo o arquivo direto, sem Excel."""
+    if not os.path.exists(TIMELINE_PCF):
+        log(f"⚠️ Timeline PCFs não encontrada: {TIMELINE_PCF}")
+        return {}
+
+    wb_tl = None
+    try:
+        wb_tl = load_workbook(TIMELINE_PCF, read_only=True, data_only=True)
+        ws_tl = wb_tl["PCFs Recebidas TP"]
+
+        pares = [
+            (_valor_como_excel(linha[0]), _valor_como_excel(linha[10]))
+            for linha in ws_tl.iter_rows(min_row=2, min_col=2, max_col=12, values_only=True)
+        ]
+        while pares and pares[-1][0] in (None, ""):
+            pares.pop()
+
+        return _indexar_status_timeline(pares)
+
+    except Exception as e:
+        log(f"⚠️ Não foi possível carregar Status Final da Timeline PCFs: {e}")
+        return {}
+
+    finally:
+        if wb_tl is not None:
+            try:
+                wb_tl.close()
+            except Exception:
+                pass
+
+
+def _coluna_calculada(caminho, aba, coluna):
+    """
+    Valores já calculados pelo Excel (data_only) de uma coluna, por linha.
+    O openpyxl não recalcula fórmulas, então a MEDIÇÃO usa o último valor salvo.
+    """
+    wb_valores = load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        idx = column_index_from_string(coluna)
+        return {
+            r: valor
+            for r, (valor,) in enumerate(
+                wb_valores[aba].iter_rows(min_row=1, min_col=idx, max_col=idx, values_only=True),
+                start=1,
+            )
+        }
+    finally:
+        wb_valores.close()
+
+
+def atualizar_medicao_openpyxl(wb, aba_origem, plano, linhas, datas_calculadas=None):
+    """
+    atualizar_medicao a partir das linhas em memória. A data (coluna Z) de
+    fórmulas vem de ``datas_calculadas`` ({linha original: valor}); linhas
+    inseridas nesta execução ainda não têm valor calculado.
+    """
+    ws_origem = wb[aba_origem]
+    if ABA_MEDICAO in wb.sheetnames:
+        ws_destino = wb[ABA_MEDICAO]
+    else:
+        ws_destino = wb.create_sheet(ABA_MEDICAO)
+        log(f"🆕 Aba '{ABA_MEDICAO}' não existia e foi criada.")
+
+    if not linhas:
+        log(f"⚠️ Aba '{aba_origem}' sem linhas para copiar para MEDIÇÃO.")
+        return
+
+    datas = []
+    for i in range(len(linhas)):
+        valor = ws_origem[f"Z{i + 2}"].value
+        if isinstance(valor, str) and valor.startswith("="):
+            origem, nova_rev = plano[i]
+            valor = None if nova_rev is not None else (datas_calculadas or {}).get(origem + 2)
+        datas.append(_valor_como_excel(valor))
+
+    colunas = _calcular_medicao(
+        [linha["B"] for linha in linhas],
+        [linha["C"] for linha in linhas],
+        [linha["D"] for linha in linhas],
+        [linha["F"] for linha in linhas],
+        [linha["I"] for linha in linhas],
+        datas,
+    )
+    if colunas is None:
+        log("⚠️ Nenhum código encontrado para copiar para MEDIÇÃO.")
+        return
+
+    for linha in ws_destino.iter_rows(
+        min_row=MEDICAO_PRIMEIRA_LINHA, max_row=MEDICAO_ULTIMA_LINHA, min_col=1, max_col=6
+    ):
+        for cel in linha:
+            cel.value = None
+
+    qtd_linhas = len(colunas[1])
+    for offset, valores in enumerate(zip(*colunas)):
+        r = MEDICAO_PRIMEIRA_LINHA + offset
+        for col, valor in enumerate(valores, start=1):
+            ws_destino.cell(r, col).value = valor
+        ws_destino.cell(r, 6).number_format = DATE_NUMBERFORMAT_FALLBACK
+
+    last_dest_row = MEDICAO_PRIMEIRA_LINHA + qtd_linhas - 1
+    log(f"✅ {qtd_linhas} linhas copiadas para '{ABA_MEDICAO}' a partir de '{aba_origem}': A4:F{last_dest_row}.")
+
+
+def _linhas_banco_openpyxl(linhas):
+    """Converte as linhas em memória para o formato de coletar_linhas_ld."""
+    for linha in linhas:
+        texto = {col: _texto_valor(linha.get(col)) for col in COLUNAS_LD}
+        if not texto["B"]:
+            continue
+        texto["links"] = dict(linha["links"])
+        yield texto
+
+
+def _processar_openpyxl(indices, impressoes=None):
+    """
+    Atualiza a LD sem Excel: a planilha é carregada uma vez, as abas são
+    calculadas em memória e o arquivo é gravado numa única passada no final.
+
+    O openpyxl não preserva gráficos, imagens nem controles de formulário e
+    não recalcula fórmulas; planilhas que dependem disso devem continuar no
+    motor xlwings. As inserções corrigem fórmulas, validações, formatação
+    condicional, mesclagens, tabelas e nomes definidos desta pasta de
+    trabalho, mas não as fontes de gráficos e tabelas dinâmicas nem
+    referências vindas de outros arquivos.
+    """
+    status_pcfs = carregar_status_pcfs_timeline_openpyxl()
+
+    wb = load_workbook(PLANILHA, keep_vba=PLANILHA.lower().endswith(".xlsm"))
+    try:
+        ws_ld = wb[ABA_LD]
+        datas_calculadas = None
+        if any(
+            isinstance(valor, str) and valor.startswith("=")
+            for (valor,) in ws_ld.iter_rows(min_row=2, min_col=26, max_col=26, values_only=True)
+        ):
+            datas_calculadas = _coluna_calculada(PLANILHA, ABA_LD, "Z")
+
+        resultados = {}
+        for aba in (ABA_LD, ABA_LD_MARENOVA):
+            resultados[aba] = processar_aba_openpyxl(wb[aba], aba, indices, status_pcfs, impressoes)
+
+        plano_ld, linhas_ld, _ = resultados[ABA_LD]
+        atualizar_medicao_openpyxl(wb, ABA_LD, plano_ld, linhas_ld, datas_calculadas)
+
+        # salva antes de importar: se a gravação falhar, o banco não fica à frente da planilha
+        wb.save(PLANILHA)
+
+        log("💾 Importando LD para banco do GED...")
+        resumo_ld = importar_ld_banco(
+            linhas_por_aba={aba: _linhas_banco_openpyxl(linhas) for aba, (_, linhas, _) in resultados.items()}
+        )
+        log(f"✅ LD importada para o banco: {resumo_ld.get('total', 0)} registros.")
+
+        log("✅ LDP finalizado com sucesso!")
+    finally:
+        wb.close()
+
+    return {aba: alteracoes for aba, (_, _, alteracoes) in resultados.items()}
+
+
+# ==========================================================
+# SIMULAÇÃO (dry-run): só o change-set, sem gravar nada
+# ==========================================================
+def _ler_aba_simulacao(ws, aba_nome):
+    """Linhas B..Q (valores salvos) até a última com código em B, com os hyperlinks do XML."""
+    hyperlinks = extrair_hyperlinks_xlsx(PLANILHA, aba_nome)
+    linhas = []
+    for r, valores in enumerate(
+        ws.iter_rows(
+            min_row=2,
+            min_col=column_index_from_string(COLUNAS_LD[0]),
+            max_col=column_index_from_string(COLUNAS_LD[-1]),
+            values_only=True,
+        ),
+        start=2,
+    ):
+        linha = dict(zip(COLUNAS_LD, (_valor_como_excel(v) for v in valores)))
+        linha["links"] = {col: hyperlinks.get(f"{col}{r}", "") for col in COLUNAS_HYPERLINK_LD}
+        linhas.append(linha)
+
+    while linhas and linhas[-1]["B"] in (None, ""):
+        linhas.pop()
+    return linhas
+
+
+def _linha_nova_simulada(base, nova_rev):
+    """Como a cópia feita por inserir_revisoes_novas: revisão em C, H–Q vazias e sem hyperlinks."""
+    linha = dict(base)
+    linha["C"] = float(nova_rev) if nova_rev.isdigit() else nova_rev
+    for col in COLUNAS_LD[COLUNAS_LD.index("H"):]:
+        linha[col] = None
+    linha["links"] = {col: "" for col in COLUNAS_HYPERLINK_LD}
+    return linha
+
+
+def simular_atualizacao_ld(indices):
+    """
+    Change-set das abas da LD sem abrir o Excel e sem gravar nada: a
+    planilha é lida com openpyxl (valores salvos pelo Excel), os hyperlinks
+    direto do XML e as revisões novas são inseridas só em memória.
+    Retorna {aba: alteracoes}.
+    """
+    status_pcfs = carregar_status_pcfs_timeline_openpyxl()
+
+    wb = load_workbook(PLANILHA, read_only=True, data_only=True)
+    try:
+        alteracoes = {}
+        for aba in (ABA_LD, ABA_LD_MARENOVA):
+            log(f"📄 Simulando aba: {aba}")
+            linhas = _ler_aba_simulacao(wb[aba], aba)
+            chaves = [(str(linha["B"] or "").strip(), normalizar_rev(linha["C"])) for linha in linhas]
+
+            plano, _, _ = planejar_revisoes_novas(chaves, indices["eng"], aba)
+            simuladas = [
+                linhas[origem] if nova is None else _linha_nova_simulada(linhas[origem], nova)
+                for origem, nova in plano
+            ]
+
+            resultados = calcular_aba_ld(simuladas, indices, status_pcfs, aba)
+            alteracoes[aba] = alteracoes_de_insercao(plano, chaves) + calcular_alteracoes(simuladas, resultados)
+            log_alteracoes(aba, alteracoes[aba])
+    finally:
+        wb.close()
+
+    return alteracoes
+
+
+def salvar_alteracoes(alteracoes_por_aba, caminho):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(
+            {aba: alteracoes_para_json(alteracoes) for aba, alteracoes in alteracoes_por_aba.items()},
+            f,
+            ensure_ascii=False,
+            indent=1,
+        )
+
+
 # ==========================================================
 # IMPORTAÇÃO DA LD PARA O BANCO DO GED
 # ==========================================================
-def _valor_celula(cell):
-    v = cell.value
+def _texto_valor(v):
     if v is None:
         return ""
     try:
@@ -1136,6 +2883,10 @@ def _valor_celula(cell):
     return str(v).strip()
 
 
+def _valor_celula(cell):
+    return _texto_valor(cell.value)
+
+
 def _hyperlink_celula(cell):
     try:
         hls = cell.api.Hyperlinks
@@ -1151,32 +2902,88 @@ def _hyperlink_celula(cell):
     return ""
 
 
-def importar_aba_ld_banco(ws, origem_aba):
+# Coluna da LD -> campo de DocumentoLD
+CAMPOS_LD_BANCO = {
+    "D": "titulo",
+    "F": "disciplina",
+    "H": "status_documento",
+    "I": "status_grd",
+    "J": "grd",
+    "K": "data_grd",
+    "L": "pcf",
+    "M": "data_pcf",
+    "N": "status_final_pcf",
+    "O": "pcf_resposta",
+    "P": "data_resposta",
+    "Q": "grd_resposta",
+}
+
+# Coluna com hyperlink -> campo de caminho em DocumentoLD
+CAMINHOS_LD_BANCO = {
+    "B": "caminho_documento",
+    "J": "caminho_grd",
+    "L": "caminho_pcf",
+    "O": "caminho_resposta",
+    "Q": "caminho_grd_resposta",
+}
+
+
+def _linhas_banco_xlwings(ws, hyperlinks=None):
     """
-    Importa uma aba da LD para o banco do GED usando used_range.
-    Preserva revisões, captura hyperlinks e grava a origem correta da aba.
+    Lê a aba via COM (até o used_range) no formato de coletar_linhas_ld.
 
-    Correção crítica:
-    - a origem_aba faz parte da identidade do registro;
-    - sem origem_aba no update_or_create, registros da LD Marenova eram sobrescritos
-      ou salvos como LD, fazendo o filtro Origem zerar.
+    Os valores de B..Q vêm numa única leitura de range. Com ``hyperlinks``
+    ({"B2": endereço}, de extrair_hyperlinks_xlsx) os links não são lidos
+    célula a célula pelo COM.
     """
     ultima_linha = ws.used_range.last_cell.row
+    if ultima_linha < 2:
+        return
+
+    matriz = ws.range(f"B2:{ULTIMA_COLUNA}{ultima_linha}").options(ndim=2).value
+
+    for r, valores in enumerate(matriz, start=2):
+        linha = {col: _texto_valor(valor) for col, valor in zip(COLUNAS_LD, valores)}
+        if not linha["B"]:
+            continue
+
+        if hyperlinks is not None:
+            linha["links"] = {col: hyperlinks.get(f"{col}{r}", "") for col in CAMINHOS_LD_BANCO}
+        else:
+            linha["links"] = {col: _hyperlink_celula(ws[f"{col}{r}"]) for col in CAMINHOS_LD_BANCO}
+        yield linha
+
 
+CAMPOS_LD_IMPORTADOS = list(CAMPOS_LD_BANCO.values()) + list(CAMINHOS_LD_BANCO.values())
+
+
+def _origem_ld(origem_aba):
     origem_texto = str(origem_aba or "").strip()
-    origem_normalizada = "LD Marenova" if "MARENOVA" in origem_texto.upper() else "LD"
+    return "LD Marenova" if "MARENOVA" in origem_texto.upper() else "LD"
+
+
+def coletar_linhas_ld(linhas, origem_aba):
+    """
+    Junta as linhas de uma aba da LD nos valores a gravar por
+    (documento, revisao); chave repetida na aba vale a última linha.
+
+    ``linhas`` traz, por linha, os textos das colunas (B, C, D, F, H–Q) e em
+    "links" os endereços dos hyperlinks de B, J, L, O e Q.
+
+    Correção crítica:
+    - a origem_aba faz parte da identidade do registro;
+    - sem ela, registros da LD Marenova eram sobrescritos ou salvos como LD,
+      fazendo o filtro Origem zerar.
+    """
+    origem_normalizada = _origem_ld(origem_aba)
 
     total_linhas = 0
     documentos_exclusivos = set()
+    registros = {}
 
-    log(
-        f"📄 Importando aba {origem_aba} como origem '{origem_normalizada}' "
-        f"| used_range até linha {ultima_linha}"
-    )
-
-    for r in range(2, ultima_linha + 1):
-        documento = _valor_celula(ws[f"B{r}"])
-        revisao = _valor_celula(ws[f"C{r}"])
+    for linha in linhas:
+        documento = linha.get("B") or ""
+        revisao = linha.get("C") or ""
 
         if not documento:
             continue
@@ -1184,73 +2991,147 @@ def importar_aba_ld_banco(ws, origem_aba):
         total_linhas += 1
         documentos_exclusivos.add(documento)
 
-        DocumentoLD.objects.update_or_create(
-            origem_aba=origem_normalizada,
-            documento=documento,
-            revisao=revisao,
-            defaults={
-                "titulo": _valor_celula(ws[f"D{r}"]),
-                "disciplina": _valor_celula(ws[f"F{r}"]),
+        valores = {campo: linha.get(col) or "" for col, campo in CAMPOS_LD_BANCO.items()}
+        links = linha.get("links") or {}
+        valores.update({campo: links.get(col) or "" for col, campo in CAMINHOS_LD_BANCO.items()})
+        registros[(documento, revisao)] = valores
+
+    log(f"✅ {origem_normalizada}: {total_linhas} linhas lidas.")
+    log(f"✅ {origem_normalizada}: {len(documentos_exclusivos)} documentos exclusivos.")
+
+    return {
+        "aba": origem_normalizada,
+        "linhas": total_linhas,
+        "exclusivos": len(documentos_exclusivos),
+        "documentos": documentos_exclusivos,
+        "registros": registros,
+    }
 
-                "status_documento": _valor_celula(ws[f"H{r}"]),
-                "status_grd": _valor_celula(ws[f"I{r}"]),
 
-                "grd": _valor_celula(ws[f"J{r}"]),
-                "data_grd": _valor_celula(ws[f"K{r}"]),
+def sincronizar_documentos_ld(registros_por_origem, *, origens_preservadas=(), batch_size=None):
+    """
+    Upsert de DocumentoLD pela chave (origem_aba, documento, revisao).
+
+    Os registros atuais são lidos numa consulta e comparados com os da
+    planilha. Só os novos são inseridos, só os alterados são atualizados e
+    só os que sumiram da LD são apagados, tudo numa transação e em lotes. As
+    colunas do vínculo KM (preenchidas pelo DocumentLinkEngine) não são
+    tocadas. Registros de ``origens_preservadas`` (aba que falhou na
+    leitura) ficam como estão.
+    """
+    batch_size = max(int(batch_size or LD_BANCO_BATCH_SIZE), 1)
+    agora = timezone.now()
 
-                "pcf": _valor_celula(ws[f"L{r}"]),
-                "data_pcf": _valor_celula(ws[f"M{r}"]),
+    existentes = {}
+    consulta = DocumentoLD.objects.exclude(origem_aba__in=list(origens_preservadas)).values_list(
+        "pk", "origem_aba", "documento", "revisao", *CAMPOS_LD_IMPORTADOS
+    )
+    for pk, origem, documento, revisao, *valores in consulta.iterator(chunk_size=5000):
+        existentes[(origem, documento, revisao)] = (pk, valores)
+
+    novos = []
+    alterados = []
+    inalterados = 0
+    for origem, registros in registros_por_origem.items():
+        for (documento, revisao), valores in registros.items():
+            atual = existentes.pop((origem, documento, revisao), None)
+            if atual is None:
+                novos.append(
+                    DocumentoLD(origem_aba=origem, documento=documento, revisao=revisao, **valores)
+                )
+                continue
 
-                "status_final_pcf": _valor_celula(ws[f"N{r}"]),
+            pk, valores_atuais = atual
+            if valores_atuais == [valores[campo] for campo in CAMPOS_LD_IMPORTADOS]:
+                inalterados += 1
+                continue
 
-                "pcf_resposta": _valor_celula(ws[f"O{r}"]),
-                "data_resposta": _valor_celula(ws[f"P{r}"]),
+            alterados.append(DocumentoLD(pk=pk, atualizado_em=agora, **valores))
 
-                "grd_resposta": _valor_celula(ws[f"Q{r}"]),
+    removidos = [pk for pk, _ in existentes.values()]
 
-                "caminho_documento": _hyperlink_celula(ws[f"B{r}"]),
-                "caminho_grd": _hyperlink_celula(ws[f"J{r}"]),
-                "caminho_pcf": _hyperlink_celula(ws[f"L{r}"]),
-                "caminho_resposta": _hyperlink_celula(ws[f"O{r}"]),
-                "caminho_grd_resposta": _hyperlink_celula(ws[f"Q{r}"]),
-            },
+    with transaction.atomic():
+        DocumentoLD.objects.bulk_create(
+            novos,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=["origem_aba", "documento", "revisao"],
+            update_fields=CAMPOS_LD_IMPORTADOS + ["atualizado_em"],
         )
-
-    log(f"✅ {origem_normalizada}: {total_linhas} linhas importadas.")
-    log(f"✅ {origem_normalizada}: {len(documentos_exclusivos)} documentos exclusivos.")
+        DocumentoLD.objects.bulk_update(
+            alterados,
+            CAMPOS_LD_IMPORTADOS + ["atualizado_em"],
+            batch_size=batch_size,
+        )
+        for inicio in range(0, len(removidos), batch_size):
+            DocumentoLD.objects.filter(pk__in=removidos[inicio:inicio + batch_size]).delete()
 
     return {
-        "aba": origem_normalizada,
-        "linhas": total_linhas,
-        "exclusivos": len(documentos_exclusivos),
-        "documentos": documentos_exclusivos,
+        "criados": len(novos),
+        "atualizados": len(alterados),
+        "inalterados": inalterados,
+        "removidos": len(removidos),
     }
 
 
-def importar_ld_banco(wb):
+def _hyperlinks_do_arquivo(arquivo, aba):
+    """Hyperlinks da aba lidos do XML do arquivo salvo; None se não der para ler."""
+    try:
+        inicio = time.monotonic()
+        hyperlinks = extrair_hyperlinks_xlsx(arquivo, aba)
+        log(f"🔗 {aba}: {len(hyperlinks)} hyperlinks lidos do arquivo em {time.monotonic() - inicio:.2f}s")
+        return hyperlinks
+    except Exception as e:
+        log(f"⚠️ Não foi possível ler os hyperlinks de {aba} no arquivo ({e}); usando o Excel.")
+        return None
+
+
+def importar_aba_ld_banco(ws, origem_aba, hyperlinks=None):
+    """
+    Lê uma aba da LD para o banco do GED usando used_range.
+    Preserva revisões, captura hyperlinks e grava a origem correta da aba.
+    """
+    log(f"📄 Importando aba {origem_aba} | used_range até linha {ws.used_range.last_cell.row}")
+    return coletar_linhas_ld(_linhas_banco_xlwings(ws, hyperlinks), origem_aba)
+
+
+def importar_ld_banco(wb=None, linhas_por_aba=None, arquivo=None):
     """
     Importa as abas LD e LD MARENOVA para o banco.
     A planilha continua sendo salva na rede como backup/fonte de auditoria.
+
+    Com ``linhas_por_aba`` ({nome da aba: linhas}) as linhas já lidas em
+    memória (motor openpyxl) são usadas no lugar do workbook do xlwings.
+    Com ``arquivo`` (a planilha já salva) os hyperlinks vêm do XML do
+    arquivo, numa passada por aba, em vez de cinco chamadas COM por linha.
     """
     log("💾 Atualizando banco Django com LD + LD MARENOVA...")
-
-    DocumentoLD.objects.all().delete()
+    inicio = time.monotonic()
 
     abas = [ABA_LD, ABA_LD_MARENOVA]
     resumo = {}
+    registros_por_origem = {}
+    origens_com_falha = []
     total_linhas = 0
     todos_documentos = set()
 
     for nome_aba in abas:
         try:
-            resultado = importar_aba_ld_banco(wb.sheets[nome_aba], nome_aba)
+            if linhas_por_aba is not None:
+                resultado = coletar_linhas_ld(linhas_por_aba.get(nome_aba, []), nome_aba)
+            else:
+                hyperlinks = _hyperlinks_do_arquivo(arquivo, nome_aba) if arquivo else None
+                resultado = importar_aba_ld_banco(wb.sheets[nome_aba], nome_aba, hyperlinks)
+
+            registros_por_origem[resultado["aba"]] = resultado.pop("registros")
             resumo[nome_aba] = resultado
 
             total_linhas += resultado["linhas"]
             todos_documentos.update(resultado["documentos"])
 
         except Exception as exc:
-            log(f"⚠️ Falha ao importar aba {nome_aba}: {exc}")
+            log(f"⚠️ Falha ao importar aba {nome_aba}: {exc} (registros atuais dessa aba mantidos)")
+            origens_com_falha.append(_origem_ld(nome_aba))
             resumo[nome_aba] = {
                 "aba": nome_aba,
                 "linhas": 0,
@@ -1259,41 +3140,42 @@ def importar_ld_banco(wb):
                 "erro": str(exc),
             }
 
+    gravacao = sincronizar_documentos_ld(registros_por_origem, origens_preservadas=origens_com_falha)
+    duracao = round(time.monotonic() - inicio, 3)
+
     log("✅ Banco Django atualizado.")
     log(f"📊 Total linhas importadas: {total_linhas}")
     log(f"📊 Total documentos exclusivos geral: {len(todos_documentos)}")
+    log(
+        f"📊 Registros: {gravacao['criados']} criados, {gravacao['atualizados']} atualizados, "
+        f"{gravacao['removidos']} removidos, {gravacao['inalterados']} inalterados em {duracao:.2f}s"
+    )
 
     return {
         "abas": resumo,
         "total": total_linhas,
         "exclusivos_geral": len(todos_documentos),
+        **gravacao,
+        "duracao_segundos": duracao,
     }
 
-def processar():
-    global LOG_FILE
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    LOG_FILE = os.path.join(PASTA_LOGS, f"LDP_{ts}.log")
-    log(f"🧾 Log: {LOG_FILE}")
-
-    backup_path = backup_planilha()
-
-    log("🔎 Indexando Engenharia (código + revisão + pasta)...")
-    idx_eng = indexar_engenharia_info()
+def _processar_xlwings(indices, impressoes=None):
+    idx_eng = indices["eng"]
     idx_eng_codigos = set(idx_eng.keys())
     log(f"   - Códigos na Engenharia: {len(idx_eng_codigos)}")
 
-    log("🔎 Indexando GRDs/PCFs...")
-    idx_grd = indexar_grds()
+    idx_grd = indices["grd"]
 
-    # ✅ PCF normal (L/M): EXCLUI a subpasta de respostas
-    idx_pcf = indexar_pcfs(PASTA_PCF, excluir_subpastas=[PASTA_PCF_RESPOSTA], data_origem=DATA_PCF_ORIGEM)
+    # ✅ PCF normal (L/M): EXCLUI a subpasta de respostas (melhor candidata por revisão base)
+    idx_pcf_base = pcf_por_base(indices, "pcf")
 
-    # ✅ PCF resposta (O/P): SOMENTE a pasta de respostas
-    idx_pcf_resp = indexar_pcfs(PASTA_PCF_RESPOSTA, data_origem=DATA_PCF_RESP_ORIGEM)
+    # ✅ PCF resposta (O/P): SOMENTE a pasta de respostas (melhor candidata por revisão base)
+    idx_pcf_resp_base = pcf_por_base(indices, "pcf_resp")
 
     # ✅ Mapa PCF -> GRD para preencher Q
-    idx_grd_resp = indexar_grd_resposta_pcf()
+    idx_grd_resp = indices["grd_resp"]
 
+    alteracoes = {}
     wb = None
     try:
         with xw.App(visible=False, add_book=False) as app:
@@ -1304,26 +3186,22 @@ def processar():
 
             wb = app.books.open(PLANILHA)
 
-            processar_aba(wb, ABA_LD, idx_eng, idx_eng_codigos, idx_grd, idx_pcf, idx_pcf_resp, idx_grd_resp, status_pcfs)
-            processar_aba(wb, ABA_LD_MARENOVA, idx_eng, idx_eng_codigos, idx_grd, idx_pcf, idx_pcf_resp, idx_grd_resp, status_pcfs)
+            for aba in (ABA_LD, ABA_LD_MARENOVA):
+                if XLWINGS_EM_BLOCO:
+                    alteracoes[aba] = processar_aba_em_bloco(wb, aba, indices, status_pcfs, impressoes)
+                else:
+                    processar_aba(wb, aba, idx_eng, idx_eng_codigos, idx_grd, idx_pcf_base, idx_pcf_resp_base, idx_grd_resp, status_pcfs)
 
             atualizar_medicao(wb, ABA_LD)
 
+            # salva antes de importar: os hyperlinks do banco saem do arquivo gravado
+            wb.save()
+
             log("💾 Importando LD para banco do GED...")
-            resumo_ld = importar_ld_banco(wb)
+            resumo_ld = importar_ld_banco(wb, arquivo=PLANILHA)
             log(f"✅ LD importada para o banco: {resumo_ld.get('total', 0)} registros.")
 
-            wb.save()
             log("✅ LDP finalizado com sucesso!")
-    except Exception as e:
-        log(f"❌ Erro durante processamento: {e}")
-        log(f"🧯 Tentando restaurar backup: {backup_path}")
-        try:
-            shutil.copy2(backup_path, PLANILHA)
-            log("✅ Backup restaurado com sucesso.")
-        except Exception as rb_err:
-            log(f"❌ Falha ao restaurar backup: {rb_err}")
-        raise
     finally:
         if wb is not None:
             try:
@@ -1331,6 +3209,101 @@ def processar():
             except Exception:
                 pass
 
+    return alteracoes
+
+def processar(full=False, motor=None, simular=False):
+    """
+    Atualiza a LD e retorna {"simulacao", "alteracoes", "resumo", "arquivo_alteracoes", "linhas"}
+    com o change-set de cada aba (o modo célula a célula do xlwings não monta change-set)
+    e as linhas processadas/puladas pelas impressões digitais (None quando desligadas).
+
+    ``full=True`` ignora o cache de varredura e as impressões: relista as pastas
+    e recalcula todas as linhas.
+
+    ``simular=True`` é o dry-run: calcula o change-set sem Excel, grava-o em
+    JSON na pasta de logs e não faz backup, não mexe na planilha nem no banco.
+    """
+    global LOG_FILE
+    motor = (motor or MOTOR_LD or MOTOR_XLWINGS).strip().lower()
+    if motor not in (MOTOR_XLWINGS, MOTOR_OPENPYXL):
+        raise ValueError(f"Motor da LD desconhecido: {motor}")
+
+    # a pasta de logs é criada aqui, e não no import: importar o módulo não toca na rede
+    os.makedirs(PASTA_LOGS, exist_ok=True)
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    LOG_FILE = os.path.join(PASTA_LOGS, f"LDP_{ts}.log")
+    log(f"🧾 Log: {LOG_FILE}")
+    if simular:
+        log("🧪 Simulação: nada será gravado na planilha nem no banco.")
+    else:
+        log(f"⚙️ Motor da planilha: {motor}")
+
+    backup_path = None if simular else backup_planilha()
+
+    log("🔎 Indexando Engenharia/GRDs/PCFs (uma varredura por raiz)...")
+    cache = CacheVarreduraLD(full=full) if USAR_CACHE_VARREDURA else None
+    indices = indexar_tudo(cache=cache)
+
+    if cache is not None:
+        cache.salvar()
+        resumo = cache.resumo()
+        log(
+            f"   - Cache de varredura{' (--full)' if full else ''}: "
+            f"{resumo['hits']}/{resumo['pastas']} pastas do cache "
+            f"(hit ratio {resumo['hit_ratio']:.1%}), "
+            f"~{resumo['bytes_poupados'] / 1024:.1f} KB de metadados não relistados"
+        )
+
+    if simular:
+        alteracoes = simular_atualizacao_ld(indices)
+        arquivo = os.path.join(PASTA_LOGS, f"LDP_simulacao_{ts}.json")
+        salvar_alteracoes(alteracoes, arquivo)
+        log(f"🧾 Change-set da simulação: {arquivo}")
+        return {
+            "simulacao": True,
+            "alteracoes": alteracoes,
+            "resumo": {aba: resumir_alteracoes(lista) for aba, lista in alteracoes.items()},
+            "arquivo_alteracoes": arquivo,
+            "linhas": None,
+        }
+
+    # o modo célula a célula do xlwings não lê as linhas em memória e não usa impressões
+    impressoes = None
+    if USAR_IMPRESSOES_LINHAS and (motor == MOTOR_OPENPYXL or XLWINGS_EM_BLOCO):
+        impressoes = ImpressoesLinhasLD(full=full)
+
+    try:
+        if motor == MOTOR_OPENPYXL:
+            alteracoes = _processar_openpyxl(indices, impressoes)
+        else:
+            alteracoes = _processar_xlwings(indices, impressoes)
+    except Exception as e:
+        log(f"❌ Erro durante processamento: {e}")
+        log(f"🧯 Tentando restaurar o último backup (pré-execução: {backup_path})")
+        try:
+            restaurado = backups_ld().restaurar()
+            log(f"✅ Backup restaurado com sucesso: {restaurado}")
+        except Exception as rb_err:
+            log(f"❌ Falha ao restaurar backup: {rb_err}")
+        raise
+
+    linhas = None
+    if impressoes is not None:
+        impressoes.salvar()
+        linhas = impressoes.resumo()
+        log(
+            f"   - Linhas da LD{' (--full)' if full else ''}: {linhas['processadas']} processadas, "
+            f"{linhas['puladas']} puladas (impressão inalterada)"
+        )
+
+    return {
+        "simulacao": False,
+        "alteracoes": alteracoes,
+        "resumo": {aba: resumir_alteracoes(lista) for aba, lista in alteracoes.items()},
+        "arquivo_alteracoes": None,
+        "linhas": linhas,
+    }
+
 # ==========================================================
 # EXECUÇÃO SEGURA VIA GED
 # ==========================================================
@@ -1375,13 +3348,17 @@ def _remover_lock(lock_file: str):
         pass
 
 
-def executar():
+def executar(full=False, motor=None, simular=False):
     """
     Entry point usado pelo GED/Django.
 
     Não executa nada no import.
     Mantém a lógica original em processar().
     Protege contra execução simultânea.
+    ``full=True`` ignora o cache de varredura e as impressões das linhas:
+    relista todas as pastas e recalcula todas as linhas.
+    ``motor`` escolhe "xlwings" ou "openpyxl" (padrão: settings.LD_MOTOR).
+    ``simular=True`` só calcula o change-set e o devolve em detalhes["alteracoes"].
     Retorna dicionário padrão para a view exibir messages.
     """
     if _lock_ativo_recente(LOCK_FILE):
@@ -1396,34 +3373,83 @@ def executar():
         }
 
     _criar_lock(LOCK_FILE)
+    LOG.limpar_memoria()
 
     try:
-        print("🚀 Atualização LD iniciada pelo GED")
-        processar()
+        LOG.escrever("🚀 Atualização LD iniciada pelo GED")
+        resultado = processar(full=full, motor=motor, simular=simular)
+        total = sum(resumo["total"] for resumo in resultado["resumo"].values())
+
+        detalhes = {
+            "planilha": PLANILHA,
+            "aba_ld": ABA_LD,
+            "aba_ld_marenova": ABA_LD_MARENOVA,
+            "logs": PASTA_LOGS,
+            "full": full,
+            "motor": (motor or MOTOR_LD),
+            "simular": simular,
+            "alteracoes_resumo": resultado["resumo"],
+            "linhas_incrementais": resultado["linhas"],
+            "log": LOG.ultimas_linhas(),
+        }
+
+        if simular:
+            detalhes["arquivo_alteracoes"] = resultado["arquivo_alteracoes"]
+            detalhes["alteracoes"] = {
+                aba: alteracoes_para_json(alteracoes[:LIMITE_ALTERACOES_RESULTADO])
+                for aba, alteracoes in resultado["alteracoes"].items()
+            }
+            detalhes["alteracoes_truncadas"] = any(
+                len(alteracoes) > LIMITE_ALTERACOES_RESULTADO for alteracoes in resultado["alteracoes"].values()
+            )
+            return {
+                "ok": True,
+                "mensagem": f"Simulação da Atualização LD: {total} alterações (planilha não modificada).",
+                "quantidade_processada": total,
+                "detalhes": detalhes,
+            }
 
         return {
             "ok": True,
             "mensagem": "Atualização LD executada com sucesso.",
-            "detalhes": {
-                "planilha": PLANILHA,
-                "aba_ld": ABA_LD,
-                "aba_ld_marenova": ABA_LD_MARENOVA,
-                "logs": PASTA_LOGS,
-            },
+            "quantidade_processada": total,
+            "detalhes": detalhes,
         }
 
     except Exception as e:
-        print(f"❌ Erro na Atualização LD: {e}")
+        LOG.escrever(f"❌ Erro na Atualização LD: {e}")
         return {
             "ok": False,
             "mensagem": f"Erro na Atualização LD: {e}",
-            "detalhes": {"erro": str(e), "tipo": e.__class__.__name__},
+            "detalhes": {"erro": str(e), "tipo": e.__class__.__name__, "log": LOG.ultimas_linhas()},
         }
 
     finally:
+        LOG.descarregar()
         _remover_lock(LOCK_FILE)
 
 
 if __name__ == "__main__":
-    resultado = executar()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Atualiza a LD a partir das pastas da rede.")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Ignora o cache de varredura e as impressões das linhas: relista as pastas e recalcula tudo.",
+    )
+    parser.add_argument(
+        "--motor",
+        choices=[MOTOR_XLWINGS, MOTOR_OPENPYXL],
+        default=None,
+        help="Motor da planilha (padrão: settings.LD_MOTOR).",
+    )
+    parser.add_argument(
+        "--simular",
+        action="store_true",
+        help="Só calcula e grava o change-set em JSON, sem tocar na planilha nem no banco.",
+    )
+    args = parser.parse_args()
+
+    resultado = executar(full=args.full, motor=args.motor, simular=args.simular)
     print(resultado.get("mensagem", resultado))
@@ -0,0 +1,189 @@
+"""
+Backups das planilhas da rede (LD, Timeline PCFs).
+
+Cada backup é gravado comprimido (gzip) com o hash do conteúdo no nome:
+``{nome}{marcador}{AAAAMMDD_HHMMSS}_{hash}{ext}.gz``. Se a planilha não mudou
+desde o último backup, nada é copiado e o último backup continua valendo.
+
+A cada backup a pasta é podada: ficam os N mais recentes e o mais recente de
+cada um dos últimos dias/semanas que têm backup. Os backups antigos, sem
+compressão (``{nome}{marcador}{ts}{ext}``), entram na mesma retenção e
+continuam restauráveis.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+from datetime import datetime
+from typing import NamedTuple
+
+
+MANTER_ULTIMOS = 10
+MANTER_DIARIOS = 14
+MANTER_SEMANAIS = 8
+
+TAMANHO_HASH = 16
+_BLOCO = 1024 * 1024
+
+
+class Backup(NamedTuple):
+    caminho: str
+    data: datetime
+    hash: str | None  # None nos backups antigos, sem hash no nome
+    comprimido: bool
+
+
+def restaurar_arquivo(backup: str, destino: str) -> None:
+    """Grava o conteúdo de ``backup`` (.gz ou cópia simples) em ``destino``, via temporário ao lado."""
+    pasta = os.path.dirname(os.path.abspath(destino))
+    fd, temp = tempfile.mkstemp(prefix="~restaurar_", suffix=os.path.splitext(destino)[1], dir=pasta)
+    os.close(fd)
+
+    try:
+        abrir = gzip.open if backup.lower().endswith(".gz") else open
+        with abrir(backup, "rb") as origem, open(temp, "wb") as saida:
+            shutil.copyfileobj(origem, saida, _BLOCO)
+        os.replace(temp, destino)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+
+class BackupsPlanilha:
+    def __init__(
+        self,
+        origem: str,
+        pasta: str,
+        *,
+        marcador: str = "_BK_",
+        comprimir: bool = True,
+        manter_ultimos: int = MANTER_ULTIMOS,
+        manter_diarios: int = MANTER_DIARIOS,
+        manter_semanais: int = MANTER_SEMANAIS,
+    ):
+        self.origem = origem
+        self.pasta = pasta
+        self.marcador = marcador
+        self.comprimir = comprimir
+        self.manter_ultimos = max(int(manter_ultimos), 1)
+        self.manter_diarios = max(int(manter_diarios), 0)
+        self.manter_semanais = max(int(manter_semanais), 0)
+
+        self._nome, self._ext = os.path.splitext(os.path.basename(origem))
+        self._padrao = re.compile(
+            rf"^{re.escape(self._nome)}{re.escape(marcador)}(\d{{8}}_\d{{6}})"
+            rf"(?:_([0-9a-f]{{{TAMANHO_HASH}}}))?{re.escape(self._ext)}(\.gz)?$",
+            re.IGNORECASE,
+        )
+
+    def listar(self) -> list[Backup]:
+        """Backups desta planilha na pasta, do mais recente para o mais antigo."""
+        try:
+            entradas = list(os.scandir(self.pasta))
+        except FileNotFoundError:
+            return []
+
+        backups = []
+        for entrada in entradas:
+            m = self._padrao.match(entrada.name)
+            if not m or not entrada.is_file():
+                continue
+            try:
+                data = datetime.strptime(m.group(1), "%Y%m%d_%H%M%S")
+            except ValueError:
+                continue
+            hash_ = m.group(2).lower() if m.group(2) else None
+            backups.append(Backup(entrada.path, data, hash_, bool(m.group(3))))
+
+        backups.sort(key=lambda b: (b.data, os.path.basename(b.caminho)), reverse=True)
+        return backups
+
+    def ultimo(self) -> Backup | None:
+        backups = self.listar()
+        return backups[0] if backups else None
+
+    def criar(self, agora: datetime | None = None) -> dict:
+        """
+        Faz o backup da origem, se o conteúdo mudou desde o último.
+
+        A origem é lida uma vez: o hash é calculado enquanto o conteúdo vai
+        (comprimido) para um temporário local, que só sobe para a pasta de
+        backups quando o hash é novo.
+        """
+        agora = agora or datetime.now()
+        os.makedirs(self.pasta, exist_ok=True)
+
+        fd, temp = tempfile.mkstemp(prefix="ged_backup_", suffix=".tmp")
+        os.close(fd)
+        try:
+            sha = hashlib.sha256()
+            abrir = gzip.open if self.comprimir else open
+            with open(self.origem, "rb") as origem, abrir(temp, "wb") as saida:
+                for bloco in iter(lambda: origem.read(_BLOCO), b""):
+                    sha.update(bloco)
+                    saida.write(bloco)
+            hash_ = sha.hexdigest()[:TAMANHO_HASH]
+
+            ultimo = self.ultimo()
+            if ultimo is not None and ultimo.hash == hash_:
+                caminho, novo = ultimo.caminho, False
+            else:
+                ts = agora.strftime("%Y%m%d_%H%M%S")
+                sufixo = ".gz" if self.comprimir else ""
+                caminho = os.path.join(self.pasta, f"{self._nome}{self.marcador}{ts}_{hash_}{self._ext}{sufixo}")
+                shutil.move(temp, caminho)
+                novo = True
+        finally:
+            if os.path.exists(temp):
+                os.remove(temp)
+
+        return {
+            "caminho": caminho,
+            "novo": novo,
+            "hash": hash_,
+            "removidos": self.aplicar_retencao(),
+        }
+
+    def restaurar(self, destino: str | None = None, backup: str | None = None) -> str:
+        """Restaura ``backup`` (padrão: o mais recente) sobre ``destino`` (padrão: a origem)."""
+        if backup is None:
+            ultimo = self.ultimo()
+            if ultimo is None:
+                raise FileNotFoundError(f"Nenhum backup de {self._nome}{self._ext} em {self.pasta}")
+            backup = ultimo.caminho
+
+        restaurar_arquivo(backup, destino or self.origem)
+        return backup
+
+    def aplicar_retencao(self) -> list[str]:
+        """Remove os backups fora da política; devolve os caminhos removidos."""
+        backups = self.listar()
+        manter = {b.caminho for b in backups[: self.manter_ultimos]}
+
+        dias = {}
+        semanas = {}
+        for b in backups:
+            dia = b.data.date()
+            if dia not in dias and len(dias) < self.manter_diarios:
+                dias[dia] = b.caminho
+            semana = b.data.isocalendar()[:2]
+            if semana not in semanas and len(semanas) < self.manter_semanais:
+                semanas[semana] = b.caminho
+        manter.update(dias.values())
+        manter.update(semanas.values())
+
+        removidos = []
+        for b in backups:
+            if b.caminho in manter:
+                continue
+            try:
+                os.remove(b.caminho)
+                removidos.append(b.caminho)
+            except OSError:
+                pass
+        return removidos
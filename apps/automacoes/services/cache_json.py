@@ -0,0 +1,130 @@
+"""
+Caches em arquivo JSON das automações.
+
+Todos gravam {"versao": VERSAO, CHAVE: {...}}: o conteúdo é carregado uma
+vez no início (ou ignorado com ``full=True``) em ``anterior`` e regravado
+inteiro por salvar() a partir de ``atual``, via arquivo temporário +
+os.replace, para que uma queda no meio da gravação não deixe o cache
+truncado. Só o que foi visto na execução vai para ``atual``.
+
+CacheArquivos acrescenta a chave por arquivo (caminho, tamanho, mtime) usada
+pelos caches de PCFs e de textos de PDF.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from typing import Callable
+
+
+class CacheJSON:
+    """Base dos caches em arquivo JSON (ver o docstring do módulo)."""
+
+    VERSAO = 1
+    # chave do JSON com as entradas ("pastas", "linhas", "pcfs", "pdfs"...)
+    CHAVE = "entradas"
+    # usado na mensagem de aviso quando o arquivo não pode ser gravado
+    DESCRICAO = "o cache"
+
+    def __init__(self, caminho: str, full: bool = False, avisar: Callable[[str], None] | None = None):
+        self.caminho = caminho
+        self.full = full
+        self.avisar = avisar or (lambda mensagem: None)
+        self.anterior = {} if full else self._carregar()
+        self.atual = {}
+
+    def _carregar(self) -> dict:
+        try:
+            with open(self.caminho, "r", encoding="utf-8") as f:
+                dados = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        if not isinstance(dados, dict) or dados.get("versao") != self.VERSAO:
+            return {}
+        return dados.get(self.CHAVE) or {}
+
+    def salvar(self):
+        temporario = f"{self.caminho}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.caminho) or ".", exist_ok=True)
+            with open(temporario, "w", encoding="utf-8") as f:
+                json.dump({"versao": self.VERSAO, self.CHAVE: self.atual}, f, ensure_ascii=False)
+            os.replace(temporario, self.caminho)
+        except OSError as e:
+            self.avisar(f"Não foi possível salvar {self.DESCRICAO}: {e}")
+
+
+class CacheArquivos(CacheJSON):
+    """
+    Resultado da leitura de cada arquivo, chaveado por (caminho, tamanho,
+    mtime) e pelos campos de assinatura() (ex.: o limite de páginas).
+
+    Arquivo inalterado é servido do cache com um único stat, sem ser aberto.
+    Falhas de leitura não entram e são contadas em ``erros``; ``removidas``
+    no resumo conta só as entradas de arquivos que não foram consultados
+    nesta execução (sumiram da varredura).
+
+    As subclasses convertem entre a entrada do JSON e o resultado da leitura
+    em _de_entrada() e _para_entrada(); ler_com_cache (leitura_paralela)
+    usa consultar() e registrar().
+    """
+
+    def __init__(self, caminho: str, full: bool = False, avisar: Callable[[str], None] | None = None):
+        super().__init__(caminho, full=full, avisar=avisar)
+        self.hits = 0
+        self.misses = 0
+        self.erros = 0
+        self._chaves = {}
+
+    def assinatura(self) -> dict:
+        """Campos além de tamanho e mtime que precisam bater para usar a entrada."""
+        return {}
+
+    def _de_entrada(self, caminho: str, entrada: dict) -> dict:
+        raise NotImplementedError
+
+    def _para_entrada(self, lida: dict) -> dict:
+        raise NotImplementedError
+
+    def consultar(self, caminho) -> dict | None:
+        """Resultado da leitura vindo do cache, ou None se o arquivo precisa ser lido."""
+        caminho = str(caminho)
+        try:
+            st = os.stat(caminho)
+        except OSError:
+            self.misses += 1
+            self._chaves[caminho] = None
+            return None
+
+        chave = {"tamanho": st.st_size, "mtime": st.st_mtime, **self.assinatura()}
+        self._chaves[caminho] = chave
+        entrada = self.anterior.get(caminho)
+        if entrada is None or any(entrada.get(campo) != valor for campo, valor in chave.items()):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.atual[caminho] = entrada
+        return self._de_entrada(caminho, entrada)
+
+    def registrar(self, lida: dict):
+        """Guarda o resultado de uma leitura feita fora do cache."""
+        if lida["erro"]:
+            self.erros += 1
+            return
+        chave = self._chaves.get(lida["caminho"])
+        if chave is None:
+            return
+        self.atual[lida["caminho"]] = {**chave, **self._para_entrada(lida)}
+
+    def resumo(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "removidas": len(self.anterior.keys() - self._chaves.keys()),
+            "erros": self.erros,
+            "entradas": len(self.atual),
+            "full": self.full,
+        }
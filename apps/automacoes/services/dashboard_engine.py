@@ -37,6 +37,7 @@ def montar_automacoes_dashboard(kpis, health_map=None):
             "descricao": "Sincroniza dados documentais, revisões, PCFs, GRDs, links de rede e medição.",
             "form_url": "automacoes:atualizar_ld",
             "botao": "Executar Atualização LD",
+            "botao_simular": "Simular",
             "botao_class": "btn-primary",
             "dashboard_url": "automacoes:dashboard_ld",
             "registros_url": "automacoes:lista_ld",
@@ -16,6 +16,7 @@ from django.db import transaction
 from django.db.models import Q
 
 from apps.automacoes.models import DocumentoLD, KMFileIndex, TransmittalKM
+from apps.automacoes.services.km_resolver import existe_resolucao_km
 
 
 def _texto(valor) -> str:
@@ -124,6 +125,9 @@ def _arquivo_km_existe(numero_km: str) -> bool:
     if not compacto:
         return False
 
+    if existe_resolucao_km(compacto):
+        return True
+
     return KMFileIndex.objects.filter(
         ativo=True,
     ).filter(
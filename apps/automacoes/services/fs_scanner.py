@@ -0,0 +1,181 @@
+"""
+Varredura paralela de árvores de arquivos na rede.
+
+Usa os.scandir e reaproveita os dados de DirEntry (tipo e stat) para evitar
+uma ida ao servidor por chamada de is_file()/stat(). Subpastas são
+distribuídas em um pool de threads limitado; os arquivos são entregues por
+gerador, permitindo que o consumidor processe em fluxo.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from django.conf import settings
+
+
+SCANNER_WORKERS_PADRAO = 8
+LIMITE_ERROS_REGISTRADOS = 50
+
+
+@dataclass(frozen=True)
+class EntradaArquivo:
+    caminho: str
+    nome: str
+    pasta: str
+    tamanho: int
+    mtime: float
+
+    @property
+    def path(self) -> Path:
+        return Path(self.caminho)
+
+
+@dataclass
+class EstatisticasScanner:
+    arquivos: int = 0
+    diretorios: int = 0
+    erros: int = 0
+    duracao_segundos: float = 0.0
+    workers: int = 0
+    erros_detalhe: list[dict[str, str]] = field(default_factory=list)
+    caminhos_com_erro: set[str] = field(default_factory=set)
+
+    @property
+    def arquivos_por_segundo(self) -> float:
+        if not self.duracao_segundos:
+            return 0.0
+        return round(self.arquivos / self.duracao_segundos, 1)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "arquivos": self.arquivos,
+            "diretorios": self.diretorios,
+            "erros": self.erros,
+            "duracao_segundos": round(self.duracao_segundos, 3),
+            "arquivos_por_segundo": self.arquivos_por_segundo,
+            "workers": self.workers,
+            "erros_detalhe": list(self.erros_detalhe),
+        }
+
+
+def workers_configurados(nome_setting: str = "GED_SCANNER_WORKERS", padrao: int = SCANNER_WORKERS_PADRAO) -> int:
+    try:
+        valor = int(getattr(settings, nome_setting, padrao) or padrao)
+    except (TypeError, ValueError):
+        valor = padrao
+    return max(valor, 1)
+
+
+def sob_algum_caminho(caminho: str, caminhos: Iterable[str]) -> bool:
+    """True se ``caminho`` é um dos ``caminhos`` ou está dentro de um deles."""
+    caminhos = caminhos if isinstance(caminhos, (set, frozenset)) else set(caminhos)
+    if not caminhos:
+        return False
+
+    atual = caminho
+    while True:
+        if atual in caminhos:
+            return True
+        pai = os.path.dirname(atual)
+        if not pai or pai == atual:
+            return False
+        atual = pai
+
+
+def listar_diretorio(pasta: str) -> tuple[list[EntradaArquivo], list[str], list[tuple[str, str]]]:
+    arquivos: list[EntradaArquivo] = []
+    subpastas: list[str] = []
+    erros: list[tuple[str, str]] = []
+
+    try:
+        with os.scandir(pasta) as iterador:
+            for entrada in iterador:
+                try:
+                    if entrada.is_dir(follow_symlinks=False):
+                        subpastas.append(entrada.path)
+                        continue
+
+                    if not entrada.is_file():
+                        continue
+
+                    stat = entrada.stat()
+                except OSError as exc:
+                    erros.append((entrada.path, str(exc)))
+                    continue
+
+                arquivos.append(
+                    EntradaArquivo(
+                        caminho=entrada.path,
+                        nome=entrada.name,
+                        pasta=pasta,
+                        tamanho=int(stat.st_size or 0),
+                        mtime=stat.st_mtime,
+                    )
+                )
+    except OSError as exc:
+        erros.append((pasta, str(exc)))
+
+    return arquivos, subpastas, erros
+
+
+class ScannerDiretorios:
+    """
+    Percorre uma árvore de diretórios com scandir em paralelo.
+
+    Exemplo:
+        scanner = ScannerDiretorios(base, workers=8)
+        for entrada in scanner.iterar():
+            ...
+        scanner.estatisticas.arquivos_por_segundo
+    """
+
+    def __init__(self, raiz: Path | str, workers: int | None = None):
+        self.raiz = str(raiz)
+        self.workers = max(int(workers or workers_configurados()), 1)
+        self.estatisticas = EstatisticasScanner(workers=self.workers)
+
+    def _registrar_erros(self, erros: list[tuple[str, str]]) -> None:
+        for caminho, mensagem in erros:
+            self.estatisticas.erros += 1
+            self.estatisticas.caminhos_com_erro.add(caminho)
+            if len(self.estatisticas.erros_detalhe) < LIMITE_ERROS_REGISTRADOS:
+                self.estatisticas.erros_detalhe.append({"caminho": caminho, "erro": mensagem})
+
+    def iterar(self) -> Iterator[EntradaArquivo]:
+        inicio = time.monotonic()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ged-scan") as pool:
+                pendentes = {pool.submit(listar_diretorio, self.raiz)}
+
+                while pendentes:
+                    concluidos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+
+                    for futuro in concluidos:
+                        arquivos, subpastas, erros = futuro.result()
+
+                        self.estatisticas.diretorios += 1
+                        self._registrar_erros(erros)
+
+                        for subpasta in subpastas:
+                            pendentes.add(pool.submit(listar_diretorio, subpasta))
+
+                        for arquivo in arquivos:
+                            self.estatisticas.arquivos += 1
+                            yield arquivo
+        finally:
+            self.estatisticas.duracao_segundos = time.monotonic() - inicio
+
+    def __iter__(self) -> Iterator[EntradaArquivo]:
+        return self.iterar()
+
+
+def varrer_arquivos(raiz: Path | str, workers: int | None = None) -> Iterator[EntradaArquivo]:
+    """Atalho para consumir a varredura sem manter referência ao scanner."""
+    return ScannerDiretorios(raiz, workers=workers).iterar()
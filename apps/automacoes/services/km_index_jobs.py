@@ -8,21 +8,22 @@ JobExecution via job_manager.
 
 from __future__ import annotations
 
+from functools import partial
 from typing import Any, Callable
 
 from apps.automacoes.services.job_manager import executar_job_sincrono
 
 
-def _executar_indexador_km() -> dict[str, Any]:
+def _executar_indexador_km(incremental: bool = False, particionado: bool = False) -> dict[str, Any]:
     """
     Import tardio para evitar dependência circular com views.py.
 
-    A função _km_indexar_banco ainda vive em views.py nesta fase.
-    Em sprint futura, ela deverá ser movida para um service próprio.
+    A varredura vive em services.km_indexer; o wrapper de views.py ainda é
+    usado para invalidar o cache em memória do processo.
     """
     from apps.automacoes.views import _km_indexar_banco
 
-    resultado = _km_indexar_banco()
+    resultado = _km_indexar_banco(incremental=incremental, particionado=particionado)
     if isinstance(resultado, dict):
         return resultado
 
@@ -38,6 +39,8 @@ def executar_reindexacao_km_job(
     user=None,
     payload: dict[str, Any] | None = None,
     executor: Callable[[], dict[str, Any]] | None = None,
+    incremental: bool = False,
+    particionado: bool = False,
 ):
     """
     Executa a reindexação KM como job rastreável.
@@ -46,15 +49,24 @@ def executar_reindexacao_km_job(
         user: usuário que disparou a execução, quando disponível.
         payload: metadados opcionais da execução.
         executor: função alternativa usada principalmente em testes.
+        incremental: grava apenas arquivos novos, alterados e desaparecidos.
+        particionado: indexa por pasta de primeiro nível com checkpoint,
+            retomando a última execução incompleta.
 
     Returns:
         JobExecution atualizado com status, duração, resultado ou erro.
     """
-    executor_final = executor or _executar_indexador_km
+    executor_final = executor or partial(
+        _executar_indexador_km,
+        incremental=incremental,
+        particionado=particionado,
+    )
 
     payload_final = {
         "origem": "km_index",
         "modo": "sync",
+        "incremental": incremental,
+        "particionado": particionado,
         **(payload or {}),
     }
 
@@ -0,0 +1,599 @@
+"""
+Indexador persistente da árvore de documentos KM.
+
+Concentra a varredura da pasta KM e a gravação do KMFileIndex, antes
+implementadas diretamente em views.py.
+
+Modos:
+- completo: marca tudo como inativo e regrava cada arquivo encontrado;
+- incremental: compara tamanho/mtime com o que já está no banco e grava
+  apenas arquivos novos, alterados e desaparecidos, em lotes.
+
+Com a impressão digital habilitada (settings.KM_IMPRESSAO_DIGITAL), o modo
+incremental grava tamanho + hash parcial (blocos inicial e final) de cada
+arquivo novo ou alterado e reconhece arquivos movidos: o registro antigo é
+reaproveitado com o novo caminho em vez de desativado e recriado.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from apps.automacoes.models import KMFileIndex, KMResolucaoDocumento
+from apps.automacoes.services.fs_scanner import (
+    EntradaArquivo,
+    ScannerDiretorios,
+    sob_algum_caminho,
+    workers_configurados,
+)
+
+
+KM_DOCUMENTOS_BASE = Path(
+    r"\\virm-rgr022\FILESERVER\Projetos\05_HANDYMAX\09. Doc Control\15 - Documentos KM"
+)
+
+KM_INDEX_BATCH_SIZE = 1000
+KM_IMPRESSAO_BLOCO = 64 * 1024
+KM_CACHE_DOCUMENTO_PREFIXO = "automacoes:km:doc:"
+KM_VERIFICACAO_PADRAO_SEGUNDOS = 30
+
+CAMPOS_ATUALIZAVEIS = [
+    "nome_arquivo",
+    "pasta",
+    "extensao",
+    "tamanho_bytes",
+    "modificado_em",
+    "impressao_digital",
+    "nome_normalizado",
+    "stem_normalizado",
+    "documento_extraido",
+    "eh_transmittal_letter",
+    "ativo",
+    "indexado_em",
+]
+
+
+def normalizar_km(valor) -> str:
+    return "".join(ch for ch in str(valor or "").upper() if ch.isalnum())
+
+
+def eh_transmittal_letter(path) -> bool:
+    path = Path(path)
+    texto = str(path).replace("/", "\\").lower()
+    nome = path.name.lower()
+    return (
+        "\\0 transmittal letters\\transmittal letters\\" in texto
+        or "transmittal letters\\transmittal letters\\" in texto
+        or nome.startswith("t-")
+        or "transmittal" in nome
+    )
+
+
+def documento_extraido_do_nome(path) -> str:
+    """
+    Extrai um identificador documental provável do nome do arquivo KM.
+    Mantém formato legível quando possível; a busca usa também campos normalizados.
+    """
+    stem = Path(path).stem
+    stem = re.sub(r"[_]+", "-", stem)
+    m = re.search(r"(\d{2}-\d{4}-\d{2}-\d{3,4}-\d{2,4}-\d{2}(?:-[A-Z0-9]+)?)", stem, re.IGNORECASE)
+    if m:
+        return m.group(1).upper()
+
+    m = re.search(r"(\d{3,4}-\d{2,4}-\d{2}(?:-[A-Z0-9]+)?)", stem, re.IGNORECASE)
+    if m:
+        return m.group(1).upper()
+
+    return ""
+
+
+def geracao_indice_km() -> tuple:
+    """
+    Geração atual do KMFileIndex: (ativos, maior pk, último indexado_em).
+
+    Estruturas em memória derivadas do índice comparam esta tupla para saber
+    se precisam ser reconstruídas; a consulta usa apenas colunas indexadas.
+    """
+    dados = KMFileIndex.objects.aggregate(
+        ativos=Count("pk", filter=Q(ativo=True)),
+        maior_pk=Max("pk"),
+        ultimo=Max("indexado_em"),
+    )
+    return dados["ativos"], dados["maior_pk"], dados["ultimo"]
+
+
+def intervalo_verificacao_geracao_km() -> float:
+    """
+    Intervalo mínimo, em segundos, entre consultas de geracao_indice_km pelos
+    índices em memória (settings.KM_TRIGRAM_VERIFICACAO_SEGUNDOS; 0 = a cada uso).
+    """
+    valor = getattr(settings, "KM_TRIGRAM_VERIFICACAO_SEGUNDOS", KM_VERIFICACAO_PADRAO_SEGUNDOS)
+    return float(KM_VERIFICACAO_PADRAO_SEGUNDOS if valor is None else valor)
+
+
+def impressao_digital_habilitada() -> bool:
+    return bool(getattr(settings, "KM_IMPRESSAO_DIGITAL", False))
+
+
+def calcular_impressao_digital(caminho, tamanho: int | None = None, bloco: int = KM_IMPRESSAO_BLOCO) -> str:
+    """
+    Hash parcial do arquivo: tamanho + bloco inicial + bloco final.
+
+    Lê no máximo dois blocos, independente do tamanho do arquivo. Retorna
+    string vazia quando o arquivo não pode ser lido.
+    """
+    try:
+        if tamanho is None:
+            tamanho = os.stat(caminho).st_size
+
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(str(int(tamanho)).encode("ascii"))
+
+        with open(caminho, "rb") as arquivo:
+            digest.update(arquivo.read(bloco))
+            if tamanho > bloco:
+                arquivo.seek(max(tamanho - bloco, bloco))
+                digest.update(arquivo.read(bloco))
+    except OSError:
+        return ""
+
+    return digest.hexdigest()
+
+
+def _modificado_em(mtime: float):
+    return timezone.datetime.fromtimestamp(
+        mtime,
+        tz=timezone.get_current_timezone(),
+    )
+
+
+def campos_arquivo(arquivo: Path, tamanho: int, mtime: float) -> dict[str, Any]:
+    """Monta os campos do KMFileIndex a partir do caminho e do stat já obtido."""
+    return {
+        "nome_arquivo": arquivo.name,
+        "pasta": str(arquivo.parent),
+        "extensao": arquivo.suffix.lower(),
+        "tamanho_bytes": int(tamanho or 0),
+        "modificado_em": _modificado_em(mtime),
+        "nome_normalizado": normalizar_km(arquivo.name),
+        "stem_normalizado": normalizar_km(arquivo.stem),
+        "documento_extraido": documento_extraido_do_nome(arquivo),
+        "eh_transmittal_letter": eh_transmittal_letter(arquivo),
+        "ativo": True,
+    }
+
+
+def _contar_extensao(por_extensao: dict[str, int], arquivo: Path) -> None:
+    chave = arquivo.suffix.lower() or "sem_extensao"
+    por_extensao[chave] = por_extensao.get(chave, 0) + 1
+
+
+def _indexar_completo(scanner: ScannerDiretorios) -> dict[str, Any]:
+    impressao_digital = impressao_digital_habilitada()
+    # impressões já gravadas: arquivo com o mesmo tamanho e mtime não é relido
+    impressoes_atuais = {
+        caminho: (tamanho, modificado_em, impressao)
+        for caminho, (_, tamanho, modificado_em, _, impressao) in carregar_estado_atual().items()
+        if impressao
+    } if impressao_digital else {}
+    KMFileIndex.objects.update(ativo=False)
+
+    total = 0
+    criados = 0
+    atualizados = 0
+    erros = 0
+    impressoes_calculadas = 0
+    por_extensao: dict[str, int] = {}
+
+    for entrada in scanner:
+        try:
+            arquivo = entrada.path
+            _contar_extensao(por_extensao, arquivo)
+
+            campos = campos_arquivo(arquivo, entrada.tamanho, entrada.mtime)
+            if impressao_digital:
+                atual = impressoes_atuais.get(entrada.caminho)
+                if atual and atual[0] == campos["tamanho_bytes"] and atual[1] == campos["modificado_em"]:
+                    campos["impressao_digital"] = atual[2]
+                else:
+                    campos["impressao_digital"] = calcular_impressao_digital(entrada.caminho, entrada.tamanho)
+                    impressoes_calculadas += 1
+
+            _, created = KMFileIndex.objects.update_or_create(
+                caminho_completo=entrada.caminho,
+                defaults=campos,
+            )
+
+            total += 1
+            if created:
+                criados += 1
+            else:
+                atualizados += 1
+
+        except Exception:
+            erros += 1
+            continue
+
+    return {
+        "arquivos_ativos": total,
+        "criados": criados,
+        "atualizados": atualizados,
+        "inalterados": 0,
+        "inativos": KMFileIndex.objects.filter(ativo=False).count(),
+        "erros": erros + scanner.estatisticas.erros,
+        "impressoes_calculadas": impressoes_calculadas,
+        "por_extensao": por_extensao,
+    }
+
+
+def carregar_estado_atual(queryset=None) -> dict[str, tuple[int, int, Any, bool, str]]:
+    """Carrega (pk, tamanho, mtime, ativo, impressão digital) por caminho em uma única consulta."""
+    queryset = KMFileIndex.objects.all() if queryset is None else queryset
+    return {
+        caminho: (pk, tamanho, modificado_em, ativo, impressao)
+        for pk, caminho, tamanho, modificado_em, ativo, impressao in queryset.values_list(
+            "pk",
+            "caminho_completo",
+            "tamanho_bytes",
+            "modificado_em",
+            "ativo",
+            "impressao_digital",
+        ).iterator(chunk_size=5000)
+    }
+
+
+@dataclass
+class DeltaKM:
+    total: int = 0
+    criados: int = 0
+    atualizados: int = 0
+    inalterados: int = 0
+    desativados: int = 0
+    movidos: int = 0
+    preservados: int = 0
+    caminhos_gravados: list[str] = field(default_factory=list)
+    pks_desativados: list[int] = field(default_factory=list)
+    pks_movidos: list[int] = field(default_factory=list)
+
+
+def _candidatos_movimento(
+    novos: list[KMFileIndex],
+    desaparecidos: dict[int, str],
+    vistos: set[str],
+    batch_size: int,
+) -> dict[tuple[int, str], list[tuple[int, str]]]:
+    """
+    Registros que podem ser a origem de um arquivo novo: mesma impressão
+    digital e tamanho, inativos, desaparecidos nesta varredura ou cujo
+    caminho não existe mais no disco.
+    """
+    impressoes = sorted({item.impressao_digital for item in novos if item.impressao_digital})
+    candidatos: dict[tuple[int, str], list[tuple[int, str]]] = {}
+
+    for inicio in range(0, len(impressoes), batch_size):
+        linhas = KMFileIndex.objects.filter(
+            impressao_digital__in=impressoes[inicio:inicio + batch_size],
+        ).values_list("pk", "caminho_completo", "tamanho_bytes", "impressao_digital", "ativo")
+
+        for pk, caminho, tamanho, impressao, ativo in linhas:
+            if caminho in vistos:
+                continue
+            if ativo and pk not in desaparecidos and os.path.exists(caminho):
+                continue
+            candidatos.setdefault((tamanho, impressao), []).append((pk, caminho))
+
+    return candidatos
+
+
+def _ainda_candidato(chave: str, item: KMFileIndex) -> bool:
+    """O arquivo continua candidato à chave (substring dos nomes normalizados, como no índice de trigramas)."""
+    return any(
+        chave in texto
+        for texto in (item.nome_normalizado, item.stem_normalizado, normalizar_km(item.documento_extraido))
+        if texto
+    )
+
+
+def _invalidar_cache_movidos(pks: list[int], chaves: set[str]) -> None:
+    chaves = set(chaves)
+    for inicio in range(0, len(pks), KM_INDEX_BATCH_SIZE):
+        chaves.update(
+            KMResolucaoDocumento.objects.filter(
+                arquivo_id__in=pks[inicio:inicio + KM_INDEX_BATCH_SIZE],
+            ).values_list("chave", flat=True)
+        )
+
+    if chaves:
+        cache.delete_many([f"{KM_CACHE_DOCUMENTO_PREFIXO}{chave}" for chave in chaves if chave])
+
+
+def aplicar_delta_km(
+    entradas: Iterable[EntradaArquivo],
+    existentes: dict[str, tuple[int, int, Any, bool, str]],
+    *,
+    batch_size: int = KM_INDEX_BATCH_SIZE,
+    por_extensao: dict[str, int] | None = None,
+    impressao_digital: bool | None = None,
+    caminhos_com_erro: Iterable[str] = (),
+) -> DeltaKM:
+    """
+    Compara as entradas varridas com o estado carregado do banco e grava
+    apenas arquivos novos, alterados (tamanho/mtime) e desaparecidos.
+
+    ``existentes`` define o escopo: registros dele que não aparecem nas
+    entradas são desativados. Com ``impressao_digital``, arquivos novos cujo
+    hash parcial coincide com um registro que sumiu são tratados como
+    movidos e reaproveitam o registro (pk, resoluções) existente.
+
+    Registros em ``caminhos_com_erro`` (ou abaixo deles) não são desativados:
+    a varredura não conseguiu ler esses caminhos, o que não significa que os
+    arquivos sumiram. O iterável é lido depois de consumir as entradas, então
+    pode ser o conjunto preenchido pelo próprio scanner durante a varredura.
+    """
+    if impressao_digital is None:
+        impressao_digital = impressao_digital_habilitada()
+
+    agora = timezone.now()
+    delta = DeltaKM()
+
+    novos: list[KMFileIndex] = []
+    alterados: list[KMFileIndex] = []
+    vistos: set[str] = set()
+
+    for entrada in entradas:
+        caminho = entrada.caminho
+        arquivo = entrada.path
+        tamanho = entrada.tamanho
+        mtime = entrada.mtime
+
+        if caminho in vistos:
+            continue
+
+        vistos.add(caminho)
+        delta.total += 1
+        if por_extensao is not None:
+            _contar_extensao(por_extensao, arquivo)
+
+        atual = existentes.get(caminho)
+
+        if atual is not None:
+            pk, tamanho_atual, modificado_atual, ativo_atual, impressao_atual = atual
+            if (
+                ativo_atual
+                and tamanho_atual == tamanho
+                and modificado_atual == _modificado_em(mtime)
+                and (impressao_atual or not impressao_digital)
+            ):
+                delta.inalterados += 1
+                continue
+
+            item = KMFileIndex(pk=pk, caminho_completo=caminho, **campos_arquivo(arquivo, tamanho, mtime))
+            if impressao_digital:
+                item.impressao_digital = calcular_impressao_digital(caminho, tamanho)
+            item.indexado_em = agora
+            alterados.append(item)
+            continue
+
+        item = KMFileIndex(caminho_completo=caminho, **campos_arquivo(arquivo, tamanho, mtime))
+        if impressao_digital:
+            item.impressao_digital = calcular_impressao_digital(caminho, tamanho)
+        novos.append(item)
+
+    desaparecidos = {
+        pk: caminho
+        for caminho, (pk, _, _, ativo, _) in existentes.items()
+        if ativo and caminho not in vistos
+    }
+
+    caminhos_com_erro = set(caminhos_com_erro)
+    if caminhos_com_erro:
+        for pk, caminho in list(desaparecidos.items()):
+            if sob_algum_caminho(caminho, caminhos_com_erro):
+                del desaparecidos[pk]
+                delta.preservados += 1
+
+    movidos: list[KMFileIndex] = []
+    chaves_movidas: set[str] = set()
+
+    if impressao_digital and novos:
+        candidatos = _candidatos_movimento(novos, desaparecidos, vistos, batch_size)
+        restantes: list[KMFileIndex] = []
+
+        for item in novos:
+            origem = candidatos.get((item.tamanho_bytes, item.impressao_digital))
+            if not origem:
+                restantes.append(item)
+                continue
+
+            pk, caminho_antigo = origem.pop(0)
+            item.pk = pk
+            item.indexado_em = agora
+            movidos.append(item)
+            desaparecidos.pop(pk, None)
+            chaves_movidas.update(
+                chave
+                for chave in (
+                    normalizar_km(documento_extraido_do_nome(caminho_antigo)),
+                    normalizar_km(Path(caminho_antigo).stem),
+                    normalizar_km(item.documento_extraido),
+                    item.stem_normalizado,
+                )
+                if chave
+            )
+
+        novos = restantes
+
+    with transaction.atomic():
+        KMFileIndex.objects.bulk_create(novos, batch_size=batch_size)
+        KMFileIndex.objects.bulk_update(
+            [*alterados, *movidos],
+            [*CAMPOS_ATUALIZAVEIS, "caminho_completo"] if movidos else CAMPOS_ATUALIZAVEIS,
+            batch_size=batch_size,
+        )
+
+        pks_desaparecidos = list(desaparecidos)
+        for inicio in range(0, len(pks_desaparecidos), batch_size):
+            KMFileIndex.objects.filter(
+                pk__in=pks_desaparecidos[inicio:inicio + batch_size],
+            ).update(ativo=False, indexado_em=agora)
+
+        if movidos:
+            for item in movidos:
+                # movido com outro nome: chaves que não casam mais com o arquivo saem da tabela
+                # (voltam a ser resolvidas na próxima atualização de resoluções)
+                resolucoes = KMResolucaoDocumento.objects.filter(arquivo_id=item.pk)
+                obsoletas = [
+                    pk for pk, chave in resolucoes.values_list("pk", "chave")
+                    if not _ainda_candidato(chave, item)
+                ]
+                if obsoletas:
+                    KMResolucaoDocumento.objects.filter(pk__in=obsoletas).delete()
+                resolucoes.update(caminho_completo=item.caminho_completo)
+
+    if movidos:
+        _invalidar_cache_movidos([item.pk for item in movidos], chaves_movidas)
+
+    delta.criados = len(novos)
+    delta.atualizados = len(alterados)
+    delta.movidos = len(movidos)
+    delta.desativados = len(desaparecidos)
+    delta.caminhos_gravados = [item.caminho_completo for item in (*novos, *alterados, *movidos)]
+    delta.pks_desativados = pks_desaparecidos
+    delta.pks_movidos = [item.pk for item in movidos]
+    return delta
+
+
+def _indexar_incremental(scanner: ScannerDiretorios, batch_size: int) -> dict[str, Any]:
+    por_extensao: dict[str, int] = {}
+    delta = aplicar_delta_km(
+        scanner,
+        carregar_estado_atual(),
+        batch_size=batch_size,
+        por_extensao=por_extensao,
+        caminhos_com_erro=scanner.estatisticas.caminhos_com_erro,
+    )
+
+    return {
+        "arquivos_ativos": delta.total,
+        "criados": delta.criados,
+        "atualizados": delta.atualizados,
+        "inalterados": delta.inalterados,
+        "movidos": delta.movidos,
+        "inativos": KMFileIndex.objects.filter(ativo=False).count(),
+        "desativados_nesta_execucao": delta.desativados,
+        "preservados_por_erro": delta.preservados,
+        "erros": scanner.estatisticas.erros,
+        "por_extensao": por_extensao,
+    }
+
+
+def relatorio_duplicados_km(*, extensao: str | None = None, limite: int = 200) -> dict[str, Any]:
+    """
+    Agrupa arquivos ativos com a mesma impressão digital (mesmo conteúdo em
+    pastas diferentes). Só considera registros que já têm impressão gravada.
+    """
+    queryset = KMFileIndex.objects.filter(ativo=True).exclude(impressao_digital="")
+    if extensao:
+        queryset = queryset.filter(extensao=extensao.lower())
+
+    grupos_qs = (
+        queryset.values("tamanho_bytes", "impressao_digital")
+        .annotate(copias=Count("pk"))
+        .filter(copias__gt=1)
+        .order_by("-tamanho_bytes", "impressao_digital")
+    )
+
+    total_grupos = grupos_qs.count()
+    grupos = []
+    bytes_redundantes = 0
+
+    for grupo in grupos_qs[:limite]:
+        caminhos = list(
+            queryset.filter(
+                tamanho_bytes=grupo["tamanho_bytes"],
+                impressao_digital=grupo["impressao_digital"],
+            ).order_by("caminho_completo").values_list("caminho_completo", flat=True)
+        )
+        bytes_redundantes += grupo["tamanho_bytes"] * (len(caminhos) - 1)
+        grupos.append({
+            "impressao_digital": grupo["impressao_digital"],
+            "tamanho_bytes": grupo["tamanho_bytes"],
+            "copias": len(caminhos),
+            "caminhos": caminhos,
+        })
+
+    return {
+        "total_grupos": total_grupos,
+        "bytes_redundantes": bytes_redundantes,
+        "grupos": grupos,
+        "sem_impressao": KMFileIndex.objects.filter(ativo=True, impressao_digital="").count(),
+    }
+
+
+def indexar_km_banco(
+    base: Path | str | None = None,
+    *,
+    incremental: bool = False,
+    batch_size: int = KM_INDEX_BATCH_SIZE,
+    workers: int | None = None,
+) -> dict[str, Any]:
+    """
+    Varre a árvore KM e grava um índice persistente no banco.
+    Isso evita varredura de rede a cada abertura de documento.
+
+    Args:
+        base: raiz da árvore KM; usa KM_DOCUMENTOS_BASE quando omitida.
+        incremental: grava apenas o delta em relação ao índice atual.
+        batch_size: tamanho dos lotes de bulk_create/bulk_update.
+        workers: threads da varredura; usa settings.KM_SCANNER_WORKERS quando omitido.
+    """
+    inicio = time.monotonic()
+    base = Path(base) if base else KM_DOCUMENTOS_BASE
+    modo = "incremental" if incremental else "completo"
+
+    if not base.exists():
+        return {
+            "ok": False,
+            "mensagem": f"Pasta KM não encontrada: {base}",
+            "quantidade_processada": 0,
+            "detalhes": {"base": str(base), "modo": modo},
+        }
+
+    scanner = ScannerDiretorios(base, workers=workers or workers_configurados("KM_SCANNER_WORKERS"))
+
+    if incremental:
+        dados = _indexar_incremental(scanner, max(int(batch_size or KM_INDEX_BATCH_SIZE), 1))
+    else:
+        dados = _indexar_completo(scanner)
+
+    status = "sucesso" if dados["erros"] == 0 else "sucesso_parcial"
+
+    return {
+        "ok": True,
+        "status": status,
+        "mensagem": (
+            f"Índice KM atualizado ({modo}): {dados['arquivos_ativos']} arquivos ativos, "
+            f"{dados['criados']} novos, {dados['atualizados']} atualizados, "
+            f"{dados['inalterados']} inalterados, {dados['inativos']} inativos."
+        ),
+        "quantidade_processada": dados["arquivos_ativos"],
+        "detalhes": {
+            "base": str(base),
+            "modo": modo,
+            **dados,
+            "scanner": scanner.estatisticas.as_dict(),
+            "duracao_segundos": round(time.monotonic() - inicio, 3),
+        },
+    }
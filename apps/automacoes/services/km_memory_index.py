@@ -0,0 +1,247 @@
+"""
+Índice KM compacto em memória, por processo.
+
+Substitui a antiga lista de dicts (um ``Path`` e várias strings por arquivo)
+usada no fallback de busca de documentos KM. Os arquivos ficam em arrays
+paralelos ordenados por caminho:
+
+- pasta internada + resto do caminho, em vez do caminho completo;
+- stem normalizado guardado como comprimento do prefixo do nome normalizado;
+- extensões internadas, referenciadas por índice;
+- flags de Transmittal Letter em um bitset.
+
+A estrutura é carregada do KMFileIndex com ``values_list`` e invalidada pela
+geração do índice (``km_indexer.geracao_indice_km``), consultada no máximo uma
+vez por intervalo, como no índice de trigramas.
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from apps.automacoes.models import KMFileIndex
+from apps.automacoes.services.km_indexer import geracao_indice_km, intervalo_verificacao_geracao_km
+
+
+SEM_PASTA = 0xFFFFFFFF
+STEM_EXCECAO = 0xFFFF
+
+
+class ItemKM:
+    """Visão leve de uma posição do índice compacto."""
+
+    __slots__ = ("_indice", "_pos")
+
+    def __init__(self, indice: "IndiceCompactoKM", pos: int):
+        self._indice = indice
+        self._pos = pos
+
+    @property
+    def caminho(self) -> str:
+        return self._indice.caminho(self._pos)
+
+    @property
+    def path(self) -> Path:
+        return Path(self.caminho)
+
+    @property
+    def nome_norm(self) -> str:
+        return self._indice.nomes_norm[self._pos]
+
+    @property
+    def stem_norm(self) -> str:
+        return self._indice.stem_norm(self._pos)
+
+    @property
+    def suffix(self) -> str:
+        return self._indice.sufixos[self._indice.sufixo_idx[self._pos]]
+
+    @property
+    def is_transmittal_letter(self) -> bool:
+        return self._indice.eh_transmittal(self._pos)
+
+
+class IndiceCompactoKM:
+    __slots__ = (
+        "pastas",
+        "pasta_idx",
+        "restos",
+        "nomes_norm",
+        "stem_len",
+        "stems_excecao",
+        "sufixos",
+        "sufixo_idx",
+        "transmittal_bits",
+        "geracao",
+        "duracao_construcao",
+    )
+
+    def __init__(self):
+        self.pastas: list[str] = []
+        self.pasta_idx = array("I")
+        self.restos: list[str] = []
+        self.nomes_norm: list[str] = []
+        self.stem_len = array("H")
+        self.stems_excecao: dict[int, str] = {}
+        self.sufixos: list[str] = []
+        self.sufixo_idx = array("H")
+        self.transmittal_bits = bytearray()
+        self.geracao: tuple | None = None
+        self.duracao_construcao = 0.0
+
+    @classmethod
+    def construir(
+        cls,
+        registros: Iterable[tuple[str, str, str, str, str, bool]],
+        geracao: tuple | None = None,
+    ) -> "IndiceCompactoKM":
+        """
+        Constrói a partir de tuplas ordenadas por caminho:
+        (caminho, pasta, extensao, nome_normalizado, stem_normalizado, eh_transmittal_letter).
+        """
+        inicio = time.monotonic()
+        indice = cls()
+        pastas_pos: dict[str, int] = {}
+        sufixos_pos: dict[str, int] = {}
+
+        for caminho, pasta, extensao, nome_norm, stem_norm, transmittal in registros:
+            nome_norm = nome_norm or ""
+            if not nome_norm:
+                continue
+
+            pos = len(indice.nomes_norm)
+
+            pasta = pasta or ""
+            if pasta and caminho.startswith(pasta):
+                idx = pastas_pos.get(pasta)
+                if idx is None:
+                    idx = pastas_pos[pasta] = len(indice.pastas)
+                    indice.pastas.append(sys.intern(pasta))
+                indice.pasta_idx.append(idx)
+                indice.restos.append(caminho[len(pasta):])
+            else:
+                indice.pasta_idx.append(SEM_PASTA)
+                indice.restos.append(caminho)
+
+            indice.nomes_norm.append(nome_norm)
+
+            stem_norm = stem_norm or ""
+            if nome_norm.startswith(stem_norm) and len(stem_norm) < STEM_EXCECAO:
+                indice.stem_len.append(len(stem_norm))
+            else:
+                indice.stem_len.append(STEM_EXCECAO)
+                indice.stems_excecao[pos] = stem_norm
+
+            extensao = (extensao or "").lower()
+            idx = sufixos_pos.get(extensao)
+            if idx is None:
+                idx = sufixos_pos[extensao] = len(indice.sufixos)
+                indice.sufixos.append(sys.intern(extensao))
+            indice.sufixo_idx.append(idx)
+
+            if pos % 8 == 0:
+                indice.transmittal_bits.append(0)
+            if transmittal:
+                indice.transmittal_bits[pos >> 3] |= 1 << (pos & 7)
+
+        indice.geracao = geracao
+        indice.duracao_construcao = time.monotonic() - inicio
+        return indice
+
+    def __len__(self) -> int:
+        return len(self.nomes_norm)
+
+    def __iter__(self) -> Iterator[ItemKM]:
+        for pos in range(len(self.nomes_norm)):
+            yield ItemKM(self, pos)
+
+    def caminho(self, pos: int) -> str:
+        idx = self.pasta_idx[pos]
+        if idx == SEM_PASTA:
+            return self.restos[pos]
+        return self.pastas[idx] + self.restos[pos]
+
+    def stem_norm(self, pos: int) -> str:
+        tamanho = self.stem_len[pos]
+        if tamanho == STEM_EXCECAO:
+            return self.stems_excecao[pos]
+        return self.nomes_norm[pos][:tamanho]
+
+    def eh_transmittal(self, pos: int) -> bool:
+        return bool(self.transmittal_bits[pos >> 3] & (1 << (pos & 7)))
+
+    def memoria_estimada_bytes(self) -> int:
+        total = sys.getsizeof(self)
+        for lista in (self.pastas, self.restos, self.nomes_norm, self.sufixos):
+            total += sys.getsizeof(lista) + sum(sys.getsizeof(item) for item in lista)
+        for arr in (self.pasta_idx, self.stem_len, self.sufixo_idx, self.transmittal_bits):
+            total += sys.getsizeof(arr)
+        total += sys.getsizeof(self.stems_excecao)
+        total += sum(sys.getsizeof(valor) for valor in self.stems_excecao.values())
+        return total
+
+    def estatisticas(self) -> dict[str, Any]:
+        return {
+            "arquivos": len(self),
+            "pastas": len(self.pastas),
+            "sufixos": len(self.sufixos),
+            "stems_excecao": len(self.stems_excecao),
+            "memoria_estimada_bytes": self.memoria_estimada_bytes(),
+            "duracao_construcao_segundos": round(self.duracao_construcao, 3),
+        }
+
+
+def carregar_registros_banco():
+    return KMFileIndex.objects.filter(ativo=True).order_by("caminho_completo").values_list(
+        "caminho_completo",
+        "pasta",
+        "extensao",
+        "nome_normalizado",
+        "stem_normalizado",
+        "eh_transmittal_letter",
+    ).iterator(chunk_size=5000)
+
+
+_LOCK = threading.Lock()
+_INDICE: IndiceCompactoKM | None = None
+_VERIFICADO_EM = 0.0
+
+
+def obter_indice_compacto(forcar: bool = False, *, verificar: bool = False) -> IndiceCompactoKM:
+    """
+    Retorna o índice do processo, reconstruindo quando a geração muda.
+
+    A geração só é consultada depois do intervalo de
+    ``intervalo_verificacao_geracao_km`` (ou com ``verificar=True``).
+    """
+    global _INDICE, _VERIFICADO_EM
+
+    agora = time.monotonic()
+    if (
+        not forcar
+        and not verificar
+        and _INDICE is not None
+        and agora - _VERIFICADO_EM < intervalo_verificacao_geracao_km()
+    ):
+        return _INDICE
+
+    geracao = geracao_indice_km()
+
+    with _LOCK:
+        if forcar or _INDICE is None or _INDICE.geracao != geracao:
+            _INDICE = IndiceCompactoKM.construir(carregar_registros_banco(), geracao=geracao)
+
+        _VERIFICADO_EM = agora
+        return _INDICE
+
+
+def invalidar_indice_compacto() -> None:
+    global _INDICE
+
+    with _LOCK:
+        _INDICE = None
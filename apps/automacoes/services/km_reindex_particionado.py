@@ -0,0 +1,334 @@
+"""
+Reindexação KM particionada por pasta de primeiro nível, com checkpoint.
+
+Cada pasta de primeiro nível da árvore KM é uma partição indexada em modo
+incremental (``km_indexer.aplicar_delta_km``) com escopo restrito aos
+registros dela. O progresso de cada partição fica em KMParticaoIndexacao:
+uma execução que falhou ou foi interrompida é retomada a partir das
+partições ainda não concluídas, sem repetir as que já terminaram.
+
+Arquivos soltos na raiz formam a partição ``.``.
+
+Uma partição cuja varredura teve erros de leitura grava o que conseguiu ler,
+não desativa nada e fica como FALHOU, para ser retomada. Uma execução é
+retomada enquanto nenhuma partição pendente esgotou MAX_TENTATIVAS_PARTICAO;
+depois disso a próxima chamada começa uma execução nova.
+
+Com partições em paralelo, só a varredura corre ao mesmo tempo: a leitura do
+estado e a gravação do delta de cada partição são serializadas, porque um
+arquivo movido entre partições reaproveita um registro do escopo de outra.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.automacoes.models import KMFileIndex, KMParticaoIndexacao
+from apps.automacoes.services.fs_scanner import (
+    ScannerDiretorios,
+    listar_diretorio,
+    workers_configurados,
+)
+from apps.automacoes.services.km_indexer import (
+    KM_DOCUMENTOS_BASE,
+    KM_INDEX_BATCH_SIZE,
+    aplicar_delta_km,
+    carregar_estado_atual,
+)
+
+
+PARTICAO_RAIZ = "."
+MAX_TENTATIVAS_PARTICAO = 3
+
+_LOCK_DELTA = threading.Lock()
+
+
+def listar_particoes(base: Path | str) -> list[str]:
+    """Nomes das pastas de primeiro nível, mais a partição da raiz."""
+    _, subpastas, erros = listar_diretorio(str(base))
+    if erros and not subpastas:
+        caminho, mensagem = erros[0]
+        raise OSError(f"Falha ao listar {caminho}: {mensagem}")
+
+    return [PARTICAO_RAIZ, *sorted(os.path.basename(pasta) for pasta in subpastas)]
+
+
+def _escopo_particao(base: str, particao: str):
+    queryset = KMFileIndex.objects.all()
+    if particao == PARTICAO_RAIZ:
+        return queryset.filter(pasta=base)
+
+    pasta = os.path.join(base, particao)
+    return queryset.filter(Q(pasta=pasta) | Q(pasta__startswith=pasta + os.sep))
+
+
+def _raiz_particao(base: str, particao: str) -> str:
+    return base if particao == PARTICAO_RAIZ else os.path.join(base, particao)
+
+
+def _entradas_particao(base: str, particao: str, workers: int):
+    if particao == PARTICAO_RAIZ:
+        arquivos, _, erros = listar_diretorio(base)
+        return arquivos, len(erros), [{"caminho": c, "erro": e} for c, e in erros]
+
+    scanner = ScannerDiretorios(_raiz_particao(base, particao), workers=workers)
+    arquivos = list(scanner)
+    estatisticas = scanner.estatisticas
+    return arquivos, estatisticas.erros, estatisticas.erros_detalhe
+
+
+def indexar_particao(
+    registro: KMParticaoIndexacao,
+    base: str,
+    *,
+    workers: int,
+    batch_size: int = KM_INDEX_BATCH_SIZE,
+) -> KMParticaoIndexacao:
+    """
+    Indexa uma partição e grava seu checkpoint, com sucesso ou falha.
+
+    Com erros de leitura na varredura, o delta grava arquivos novos e
+    alterados mas não desativa nenhum registro da partição (a raiz inteira
+    entra como caminho com erro), e a partição fica como FALHOU.
+    """
+    inicio = time.monotonic()
+
+    registro.status = KMParticaoIndexacao.STATUS_EXECUTANDO
+    registro.tentativas += 1
+    registro.iniciado_em = timezone.now()
+    registro.save(update_fields=["status", "tentativas", "iniciado_em"])
+
+    try:
+        arquivos, erros, erros_detalhe = _entradas_particao(base, registro.particao, workers)
+        caminhos_com_erro = [_raiz_particao(base, registro.particao)] if erros else []
+
+        with _LOCK_DELTA:
+            existentes = carregar_estado_atual(_escopo_particao(base, registro.particao))
+            delta = aplicar_delta_km(
+                arquivos,
+                existentes,
+                batch_size=batch_size,
+                caminhos_com_erro=caminhos_com_erro,
+            )
+
+        registro.arquivos = delta.total
+        registro.criados = delta.criados
+        registro.atualizados = delta.atualizados
+        registro.desativados = delta.desativados
+        registro.erros = erros
+        registro.erros_detalhe = list(erros_detalhe)
+
+        if erros:
+            registro.status = KMParticaoIndexacao.STATUS_FALHOU
+            registro.erro = f"{erros} erro(s) de leitura na varredura; nenhum registro foi desativado."
+        else:
+            registro.status = KMParticaoIndexacao.STATUS_CONCLUIDA
+            registro.erro = ""
+
+    except Exception as exc:
+        registro.status = KMParticaoIndexacao.STATUS_FALHOU
+        registro.erros += 1
+        registro.erro = "".join(traceback.format_exception_only(type(exc), exc)).strip()
+
+    finally:
+        registro.duracao_segundos = round(time.monotonic() - inicio, 3)
+        registro.concluido_em = timezone.now()
+        registro.save()
+
+    return registro
+
+
+def _execucao_para_retomar(max_tentativas: int = MAX_TENTATIVAS_PARTICAO) -> str | None:
+    """Última execução incompleta, desde que nenhuma partição pendente tenha esgotado as tentativas."""
+    pendentes = KMParticaoIndexacao.objects.exclude(status=KMParticaoIndexacao.STATUS_CONCLUIDA)
+    esgotadas = pendentes.filter(tentativas__gte=max_tentativas).values("execucao")
+    return (
+        pendentes.exclude(execucao__in=esgotadas)
+        .order_by("-criado_em")
+        .values_list("execucao", flat=True)
+        .first()
+    )
+
+
+def _encerrar_execucao(execucao: str, particoes: list[str]) -> None:
+    """
+    Execução completa: descarta checkpoints de pastas que sumiram durante
+    ela e os de execuções anteriores, mantendo apenas o da última.
+    """
+    KMParticaoIndexacao.objects.filter(execucao=execucao).exclude(particao__in=particoes).delete()
+    KMParticaoIndexacao.objects.exclude(execucao=execucao).delete()
+
+
+def _desativar_particoes_removidas(base: str, particoes: list[str]) -> int:
+    """Desativa registros ativos de pastas de primeiro nível que não existem mais."""
+    prefixo = base.rstrip("\\/") + os.sep
+    atuais = set(particoes)
+    removidas: set[str] = set()
+
+    pastas = KMFileIndex.objects.filter(ativo=True, pasta__startswith=prefixo).values_list(
+        "pasta", flat=True
+    ).distinct()
+
+    for pasta in pastas.iterator(chunk_size=5000):
+        primeiro_nivel = pasta[len(prefixo):].split(os.sep, 1)[0]
+        if primeiro_nivel and primeiro_nivel not in atuais:
+            removidas.add(primeiro_nivel)
+
+    desativados = 0
+    for particao in removidas:
+        desativados += _escopo_particao(base, particao).filter(ativo=True).update(
+            ativo=False,
+            indexado_em=timezone.now(),
+        )
+    return desativados
+
+
+def _linha_particao(registro: KMParticaoIndexacao, retomada: bool) -> dict[str, Any]:
+    return {
+        "particao": registro.particao,
+        "status": registro.status,
+        "tentativas": registro.tentativas,
+        "ja_concluida": retomada,
+        "duracao_segundos": registro.duracao_segundos,
+        "arquivos": registro.arquivos,
+        "criados": registro.criados,
+        "atualizados": registro.atualizados,
+        "desativados": registro.desativados,
+        "erros": registro.erros,
+        "erro": registro.erro,
+    }
+
+
+def reindexar_km_particionado(
+    base: Path | str | None = None,
+    *,
+    particoes_paralelas: int = 1,
+    workers: int | None = None,
+    batch_size: int = KM_INDEX_BATCH_SIZE,
+    retomar: bool = True,
+    max_tentativas: int = MAX_TENTATIVAS_PARTICAO,
+) -> dict[str, Any]:
+    """
+    Reindexa a árvore KM partição a partição, retomando a última execução
+    incompleta quando ``retomar`` é verdadeiro.
+
+    Args:
+        base: raiz da árvore KM; usa KM_DOCUMENTOS_BASE quando omitida.
+        particoes_paralelas: partições processadas ao mesmo tempo.
+        workers: threads de varredura por partição.
+        batch_size: tamanho dos lotes de gravação.
+        retomar: reaproveita checkpoints da última execução incompleta.
+        max_tentativas: tentativas de uma partição antes de a execução deixar de ser retomada.
+    """
+    inicio = time.monotonic()
+    base_path = Path(base) if base else KM_DOCUMENTOS_BASE
+    base = str(base_path)
+
+    if not base_path.exists():
+        return {
+            "ok": False,
+            "mensagem": f"Pasta KM não encontrada: {base}",
+            "quantidade_processada": 0,
+            "detalhes": {"base": base, "modo": "particionado"},
+        }
+
+    particoes = listar_particoes(base)
+    execucao = (_execucao_para_retomar(max(int(max_tentativas or 1), 1)) if retomar else None) or (
+        f"{timezone.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+    )
+
+    existentes = set(
+        KMParticaoIndexacao.objects.filter(execucao=execucao).values_list("particao", flat=True)
+    )
+    KMParticaoIndexacao.objects.bulk_create(
+        [
+            KMParticaoIndexacao(execucao=execucao, particao=particao)
+            for particao in particoes
+            if particao not in existentes
+        ]
+    )
+
+    registros = list(KMParticaoIndexacao.objects.filter(execucao=execucao, particao__in=particoes))
+    ja_concluidas = {
+        registro.pk for registro in registros
+        if registro.status == KMParticaoIndexacao.STATUS_CONCLUIDA
+    }
+    a_executar = [registro for registro in registros if registro.pk not in ja_concluidas]
+
+    workers = max(int(workers or workers_configurados("KM_SCANNER_WORKERS")), 1)
+    particoes_paralelas = max(int(particoes_paralelas or 1), 1)
+    batch_size = max(int(batch_size or KM_INDEX_BATCH_SIZE), 1)
+
+    def executar(registro):
+        try:
+            return indexar_particao(registro, base, workers=workers, batch_size=batch_size)
+        finally:
+            if particoes_paralelas > 1:
+                close_old_connections()
+
+    if particoes_paralelas > 1 and len(a_executar) > 1:
+        with ThreadPoolExecutor(max_workers=particoes_paralelas, thread_name_prefix="ged-km-part") as pool:
+            list(pool.map(executar, a_executar))
+    else:
+        for registro in a_executar:
+            executar(registro)
+
+    registros = list(
+        KMParticaoIndexacao.objects.filter(execucao=execucao, particao__in=particoes).order_by("particao")
+    )
+    falhas = [registro for registro in registros if registro.status != KMParticaoIndexacao.STATUS_CONCLUIDA]
+    desativados_removidas = 0
+    if not falhas:
+        desativados_removidas = _desativar_particoes_removidas(base, particoes)
+        _encerrar_execucao(execucao, particoes)
+
+    linhas = [_linha_particao(registro, registro.pk in ja_concluidas) for registro in registros]
+    arquivos = sum(registro.arquivos for registro in registros)
+    criados = sum(registro.criados for registro in registros)
+    atualizados = sum(registro.atualizados for registro in registros)
+
+    if falhas:
+        esgotadas = any(registro.tentativas >= max_tentativas for registro in falhas)
+        mensagem = (
+            f"Índice KM particionado: {len(registros) - len(falhas)}/{len(registros)} partições "
+            f"concluídas; "
+            + (
+                f"{len(falhas)} esgotaram as tentativas, a próxima execução começa do zero."
+                if esgotadas
+                else f"{len(falhas)} serão retomadas na próxima execução."
+            )
+        )
+    else:
+        mensagem = (
+            f"Índice KM atualizado (particionado): {arquivos} arquivos ativos, "
+            f"{criados} novos, {atualizados} atualizados, {len(registros)} partições."
+        )
+
+    return {
+        "ok": True,
+        "status": "sucesso_parcial" if falhas or any(r.erros for r in registros) else "sucesso",
+        "mensagem": mensagem,
+        "quantidade_processada": arquivos,
+        "detalhes": {
+            "base": base,
+            "modo": "particionado",
+            "execucao": execucao,
+            "particoes_total": len(registros),
+            "particoes_executadas": len(a_executar),
+            "particoes_falhas": [registro.particao for registro in falhas],
+            "desativados_particoes_removidas": desativados_removidas,
+            "particoes": linhas,
+            "duracao_segundos": round(time.monotonic() - inicio, 3),
+        },
+    }
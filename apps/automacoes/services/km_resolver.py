@@ -0,0 +1,498 @@
+"""
+Resolução código documental → arquivo KM.
+
+Mantém as regras de pontuação usadas na abertura de documentos KM e a
+tabela KMResolucaoDocumento, pré-calculada a cada reindexação para que a
+abertura de um documento seja uma única consulta indexada. A busca ao vivo
+em views.py permanece como fallback para códigos fora da tabela.
+"""
+
+from __future__ import annotations
+
+import time
+from pathlib import Path
+from typing import Any, Iterable, NamedTuple
+
+from django.db import transaction
+from django.db.models import Q
+
+from apps.automacoes.models import KMFileIndex, KMResolucaoDocumento
+from apps.automacoes.services.km_indexer import normalizar_km
+from apps.automacoes.services.km_trigram_index import (
+    LIMITE_CANDIDATOS_PADRAO,
+    IndiceTrigramasKM,
+    obter_indice_trigramas,
+)
+
+
+KM_EXTENSOES_PRIORITARIAS = {
+    ".docx": 60,
+    ".doc": 58,
+    ".dwg": 54,
+    ".xlsx": 48,
+    ".xlsm": 46,
+    ".xls": 44,
+    ".pdf": 20,
+}
+
+RESOLUCAO_BATCH_SIZE = 1000
+CONSULTA_CHUNK = 900
+FALLBACK_RECENTES = 2000
+FALLBACK_TRANSMITTAL = 5000
+FALLBACK_ICONTAINS_LIMITE = 500
+FALLBACK_ICONTAINS_CHUNK = 50
+
+
+class RegistroKM(NamedTuple):
+    pk: int
+    nome_arquivo: str
+    caminho_completo: str
+    extensao: str
+    nome_normalizado: str
+    stem_normalizado: str
+    documento_extraido: str
+    eh_transmittal_letter: bool
+
+
+CAMPOS_REGISTRO_KM = list(RegistroKM._fields)
+
+
+def score_documento_indexado(documento, item) -> int:
+    doc_norm = normalizar_km(documento)
+
+    if not doc_norm:
+        return 0
+
+    nome_norm = item.nome_normalizado or normalizar_km(item.nome_arquivo)
+    stem_norm = item.stem_normalizado or normalizar_km(Path(item.nome_arquivo).stem)
+    suffix = (item.extensao or "").lower()
+
+    score = 0
+
+    if stem_norm == doc_norm:
+        score = 100
+    elif nome_norm == doc_norm:
+        score = 98
+    elif doc_norm in stem_norm:
+        score = 88
+    elif doc_norm in nome_norm:
+        score = 84
+    elif stem_norm in doc_norm and len(stem_norm) >= 8:
+        score = 60
+
+    documento_extraido_norm = normalizar_km(item.documento_extraido)
+    if documento_extraido_norm:
+        if documento_extraido_norm == doc_norm:
+            score = max(score, 105)
+        elif doc_norm in documento_extraido_norm or documento_extraido_norm in doc_norm:
+            score = max(score, 86)
+
+    if not score:
+        return 0
+
+    score += KM_EXTENSOES_PRIORITARIAS.get(suffix, 5)
+
+    if item.eh_transmittal_letter:
+        score -= 120
+    else:
+        score += 35
+
+    caminho_lower = (item.caminho_completo or "").replace("/", "\\").lower()
+    if "\\0 transmittal letters\\" in caminho_lower and "\\transmittal letters\\" not in caminho_lower:
+        score += 8
+
+    if item.nome_arquivo.upper().startswith("T-"):
+        score -= 80
+
+    return score
+
+
+def escolher_melhor(documento, itens: Iterable, permitir_transmittal: bool = False):
+    """
+    Aplica a pontuação e devolve (score, item) do vencedor ou None.
+    Empate: maior score e, depois, caminho mais curto.
+    """
+    melhor = None
+    melhor_chave = None
+
+    for item in itens:
+        if item.eh_transmittal_letter and not permitir_transmittal:
+            continue
+
+        score = score_documento_indexado(documento, item)
+        if score <= 0:
+            continue
+
+        chave = (score, -len(item.caminho_completo or ""))
+        if melhor_chave is None or chave > melhor_chave:
+            melhor = (score, item)
+            melhor_chave = chave
+
+    return melhor
+
+
+def _chaves_registro(registro: RegistroKM) -> set[str]:
+    chaves = {normalizar_km(registro.documento_extraido), registro.stem_normalizado or ""}
+    return {chave for chave in chaves if chave}
+
+
+def reconstruir_resolucoes_km(
+    indice: IndiceTrigramasKM | None = None,
+    *,
+    batch_size: int = RESOLUCAO_BATCH_SIZE,
+) -> dict[str, Any]:
+    """
+    Recalcula a tabela KMResolucaoDocumento para todos os arquivos ativos.
+
+    Cada documento_extraido e stem normalizado vira uma chave; os candidatos
+    são os mesmos da primeira etapa da busca ao vivo (substring nos nomes),
+    obtidos pelo índice de trigramas.
+    """
+    inicio = time.monotonic()
+    indice = indice or obter_indice_trigramas(verificar=True)
+
+    registros = {
+        registro.pk: registro
+        for registro in (
+            RegistroKM(*valores)
+            for valores in KMFileIndex.objects.filter(ativo=True).values_list(
+                *CAMPOS_REGISTRO_KM
+            ).iterator(chunk_size=5000)
+        )
+    }
+
+    chaves: set[str] = set()
+    for registro in registros.values():
+        chaves |= _chaves_registro(registro)
+
+    resolucoes: list[KMResolucaoDocumento] = []
+    sem_candidato = 0
+
+    for chave in chaves:
+        pks = indice.buscar(chave)
+        itens = [registros[pk] for pk in pks or [] if pk in registros]
+
+        for permitir_transmittal in (False, True):
+            melhor = escolher_melhor(chave, itens, permitir_transmittal=permitir_transmittal)
+            if not melhor:
+                sem_candidato += 1
+                continue
+
+            score, item = melhor
+            resolucoes.append(
+                KMResolucaoDocumento(
+                    chave=chave[:255],
+                    permitir_transmittal=permitir_transmittal,
+                    arquivo_id=item.pk,
+                    caminho_completo=item.caminho_completo,
+                    score=score,
+                )
+            )
+
+    with transaction.atomic():
+        KMResolucaoDocumento.objects.all().delete()
+        KMResolucaoDocumento.objects.bulk_create(resolucoes, batch_size=batch_size)
+
+    return {
+        "chaves": len(chaves),
+        "resolucoes": len(resolucoes),
+        "sem_candidato": sem_candidato,
+        "duracao_segundos": round(time.monotonic() - inicio, 3),
+    }
+
+
+def _substrings(texto: str, minimo: int = 3) -> set[str]:
+    return {
+        texto[inicio:fim]
+        for inicio in range(len(texto))
+        for fim in range(inicio + minimo, len(texto) + 1)
+    }
+
+
+def _em_lotes(valores: list, tamanho: int):
+    for inicio in range(0, len(valores), tamanho):
+        yield valores[inicio:inicio + tamanho]
+
+
+def chaves_afetadas_km(pks: Iterable[int], *, batch_size: int = 500) -> set[str]:
+    """
+    Chaves cuja resolução pode mudar quando os arquivos ``pks`` mudam:
+    as chaves próprias de cada arquivo, as chaves já existentes que são
+    substring dos seus nomes (o arquivo passa a ser candidato) e as chaves
+    hoje resolvidas para ele.
+    """
+    pks = list(pks)
+    chaves: set[str] = set()
+    substrings: set[str] = set()
+
+    for lote in _em_lotes(pks, batch_size):
+        for valores in KMFileIndex.objects.filter(pk__in=lote).values_list(*CAMPOS_REGISTRO_KM):
+            registro = RegistroKM(*valores)
+            chaves |= _chaves_registro(registro)
+            for texto in (
+                registro.nome_normalizado,
+                registro.stem_normalizado,
+                normalizar_km(registro.documento_extraido),
+            ):
+                substrings |= _substrings(texto or "")
+
+        chaves.update(
+            KMResolucaoDocumento.objects.filter(arquivo_id__in=lote).values_list("chave", flat=True)
+        )
+
+    for lote in _em_lotes(sorted(substrings - chaves), batch_size):
+        chaves.update(
+            KMResolucaoDocumento.objects.filter(chave__in=lote).values_list("chave", flat=True)
+        )
+
+    return chaves
+
+
+def atualizar_resolucoes_km(
+    pks: Iterable[int],
+    indice: IndiceTrigramasKM | None = None,
+    *,
+    batch_size: int = RESOLUCAO_BATCH_SIZE,
+) -> dict[str, Any]:
+    """
+    Recalcula apenas as chaves afetadas por arquivos novos, alterados ou
+    desativados, sem reconstruir a tabela inteira.
+    """
+    inicio = time.monotonic()
+    chaves = chaves_afetadas_km(pks)
+    if not chaves:
+        return {"chaves": 0, "resolucoes": 0, "sem_candidato": 0, "duracao_segundos": 0.0}
+
+    indice = indice or obter_indice_trigramas(verificar=True)
+
+    candidatos_por_chave = {chave: indice.buscar(chave) or [] for chave in chaves}
+    todos_pks = sorted({pk for lista in candidatos_por_chave.values() for pk in lista})
+
+    registros: dict[int, RegistroKM] = {}
+    for lote in _em_lotes(todos_pks, batch_size):
+        for valores in KMFileIndex.objects.filter(pk__in=lote, ativo=True).values_list(*CAMPOS_REGISTRO_KM):
+            registro = RegistroKM(*valores)
+            registros[registro.pk] = registro
+
+    resolucoes: list[KMResolucaoDocumento] = []
+    sem_candidato = 0
+
+    for chave, pks_candidatos in candidatos_por_chave.items():
+        itens = [registros[pk] for pk in pks_candidatos if pk in registros]
+
+        for permitir_transmittal in (False, True):
+            melhor = escolher_melhor(chave, itens, permitir_transmittal=permitir_transmittal)
+            if not melhor:
+                sem_candidato += 1
+                continue
+
+            score, item = melhor
+            resolucoes.append(
+                KMResolucaoDocumento(
+                    chave=chave[:255],
+                    permitir_transmittal=permitir_transmittal,
+                    arquivo_id=item.pk,
+                    caminho_completo=item.caminho_completo,
+                    score=score,
+                )
+            )
+
+    with transaction.atomic():
+        for lote in _em_lotes(sorted(chaves), batch_size):
+            KMResolucaoDocumento.objects.filter(chave__in=lote).delete()
+        KMResolucaoDocumento.objects.bulk_create(resolucoes, batch_size=batch_size)
+
+    return {
+        "chaves": len(chaves),
+        "resolucoes": len(resolucoes),
+        "sem_candidato": sem_candidato,
+        "duracao_segundos": round(time.monotonic() - inicio, 3),
+    }
+
+
+def resolver_documentos_km(documentos: Iterable, permitir_transmittal: bool = False) -> dict[str, Path]:
+    """
+    Consulta a tabela pré-calculada para vários documentos em uma query.
+    Documentos sem resolução não aparecem no dicionário retornado.
+    """
+    chaves_por_documento = {
+        documento: normalizar_km(documento)
+        for documento in documentos
+        if normalizar_km(documento)
+    }
+
+    if not chaves_por_documento:
+        return {}
+
+    caminhos = dict(
+        KMResolucaoDocumento.objects.filter(
+            chave__in=set(chaves_por_documento.values()),
+            permitir_transmittal=permitir_transmittal,
+            arquivo__ativo=True,
+        ).values_list("chave", "caminho_completo")
+    )
+
+    return {
+        documento: Path(caminhos[chave])
+        for documento, chave in chaves_por_documento.items()
+        if chave in caminhos
+    }
+
+
+def _carregar_registros(pks: Iterable[int], chunk: int = CONSULTA_CHUNK) -> dict[int, RegistroKM]:
+    registros: dict[int, RegistroKM] = {}
+    for lote in _em_lotes(sorted(set(pks)), chunk):
+        for valores in KMFileIndex.objects.filter(pk__in=lote, ativo=True).values_list(*CAMPOS_REGISTRO_KM):
+            registro = RegistroKM(*valores)
+            registros[registro.pk] = registro
+    return registros
+
+
+def resolver_documentos_km_ao_vivo(
+    documentos: Iterable,
+    permitir_transmittal: bool = False,
+    *,
+    indice: IndiceTrigramasKM | None = None,
+    chunk: int = CONSULTA_CHUNK,
+) -> dict[str, Path]:
+    """
+    Pontuação ao vivo de vários documentos de uma vez.
+
+    Os candidatos de todos os documentos saem do índice de trigramas e são
+    carregados em uma consulta por lote de pks; a pontuação acontece em
+    memória. Documentos sem candidato passam pelos mesmos fallbacks da busca
+    individual: ``icontains`` no banco para códigos curtos ou parciais que o
+    índice não consegue reduzir (uma consulta por grupo de códigos), arquivos
+    mais recentes e Transmittal Letters, estes carregados uma única vez para
+    o lote inteiro.
+    """
+    documentos = [documento for documento in dict.fromkeys(documentos) if normalizar_km(documento)]
+    if not documentos:
+        return {}
+
+    indice = indice or obter_indice_trigramas()
+
+    candidatos_por_documento: dict[str, list[int]] = {}
+    sem_indice: set[str] = set()
+    for documento in documentos:
+        pks = indice.buscar(documento)
+        if pks is None:
+            sem_indice.add(documento)
+            pks = []
+        if len(pks) > LIMITE_CANDIDATOS_PADRAO:
+            pks = pks[:500]
+        candidatos_por_documento[documento] = pks
+
+    registros = _carregar_registros(
+        (pk for pks in candidatos_por_documento.values() for pk in pks),
+        chunk=chunk,
+    )
+
+    resultados: dict[str, Path] = {}
+    pendentes: list[str] = []
+
+    for documento, pks in candidatos_por_documento.items():
+        itens = [registros[pk] for pk in pks if pk in registros]
+        melhor = escolher_melhor(documento, itens, permitir_transmittal=permitir_transmittal)
+        if melhor:
+            resultados[documento] = Path(melhor[1].caminho_completo)
+        else:
+            pendentes.append(documento)
+
+    if sem_indice and pendentes:
+        _resolver_por_icontains(
+            [documento for documento in pendentes if documento in sem_indice],
+            permitir_transmittal,
+            resultados,
+        )
+        pendentes = [documento for documento in pendentes if documento not in resultados]
+
+    if pendentes:
+        recentes = [
+            RegistroKM(*valores)
+            for valores in KMFileIndex.objects.filter(ativo=True)
+            .order_by("-indexado_em")
+            .values_list(*CAMPOS_REGISTRO_KM)[:FALLBACK_RECENTES]
+        ]
+        pendentes = _resolver_com_fallback(pendentes, recentes, permitir_transmittal, resultados)
+
+    if pendentes and permitir_transmittal:
+        letters = [
+            RegistroKM(*valores)
+            for valores in KMFileIndex.objects.filter(ativo=True, eh_transmittal_letter=True)
+            .order_by("-indexado_em")
+            .values_list(*CAMPOS_REGISTRO_KM)[:FALLBACK_TRANSMITTAL]
+        ]
+        _resolver_com_fallback(pendentes, letters, True, resultados)
+
+    return resultados
+
+
+def _resolver_por_icontains(
+    documentos: list[str],
+    permitir_transmittal: bool,
+    resultados: dict[str, Path],
+) -> None:
+    """
+    Fallback da busca individual para códigos fora do alcance do índice de
+    trigramas: substring nos nomes normalizados e no documento extraído,
+    direto no banco. Os códigos de cada grupo vão numa única consulta.
+    """
+    for lote in _em_lotes(documentos, FALLBACK_ICONTAINS_CHUNK):
+        filtro = Q()
+        termos = {}
+        for documento in lote:
+            doc_norm = normalizar_km(documento)
+            bruto = str(documento or "").strip()
+            termos[documento] = (doc_norm, bruto.upper())
+            filtro |= (
+                Q(nome_normalizado__icontains=doc_norm)
+                | Q(stem_normalizado__icontains=doc_norm)
+                | Q(documento_extraido__icontains=bruto)
+            )
+
+        registros = [
+            RegistroKM(*valores)
+            for valores in KMFileIndex.objects.filter(filtro, ativo=True).values_list(
+                *CAMPOS_REGISTRO_KM
+            )[:FALLBACK_ICONTAINS_LIMITE * len(lote)]
+        ]
+
+        for documento, (doc_norm, bruto) in termos.items():
+            itens = [
+                item for item in registros
+                if doc_norm in (item.nome_normalizado or "").upper()
+                or doc_norm in (item.stem_normalizado or "").upper()
+                or bruto in (item.documento_extraido or "").upper()
+            ]
+            melhor = escolher_melhor(documento, itens, permitir_transmittal=permitir_transmittal)
+            if melhor:
+                resultados[documento] = Path(melhor[1].caminho_completo)
+
+
+def _resolver_com_fallback(
+    documentos: list[str],
+    itens: list[RegistroKM],
+    permitir_transmittal: bool,
+    resultados: dict[str, Path],
+) -> list[str]:
+    pendentes = []
+    for documento in documentos:
+        melhor = escolher_melhor(documento, itens, permitir_transmittal=permitir_transmittal)
+        if melhor:
+            resultados[documento] = Path(melhor[1].caminho_completo)
+        else:
+            pendentes.append(documento)
+    return pendentes
+
+
+def resolver_documento_km(documento, permitir_transmittal: bool = False) -> Path | None:
+    return resolver_documentos_km([documento], permitir_transmittal=permitir_transmittal).get(documento)
+
+
+def existe_resolucao_km(documento) -> bool:
+    chave = normalizar_km(documento)
+    if not chave:
+        return False
+
+    return KMResolucaoDocumento.objects.filter(chave=chave, arquivo__ativo=True).exists()
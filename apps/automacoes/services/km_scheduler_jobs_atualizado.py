@@ -1,3 +1,5 @@
+from functools import partial
+
 from apps.automacoes.services.km_index_jobs import executar_reindexacao_km_job
 from apps.automacoes.services.km_ld_sync_engine import executar_sync_km_ld_job
 from apps.automacoes.services.scheduler import ScheduledJob, registrar_job_agendado
@@ -7,8 +9,8 @@ def registrar_km_jobs():
     job_reindex = registrar_job_agendado(
         ScheduledJob(
             name="km_reindex",
-            description="Executa reindexação KM como job gerenciado.",
-            handler=executar_reindexacao_km_job,
+            description="Executa reindexação KM incremental particionada, com retomada, como job gerenciado.",
+            handler=partial(executar_reindexacao_km_job, incremental=True, particionado=True),
             enabled=True,
         )
     )
@@ -0,0 +1,233 @@
+"""
+Índice invertido de trigramas para buscas por substring no KMFileIndex.
+
+As buscas por código documental usavam ``nome_normalizado__icontains`` e
+``stem_normalizado__icontains``, o que força varredura completa da tabela a
+cada consulta. Este módulo mantém, por processo, listas de postagem
+(trigrama -> posições ordenadas) sobre os nomes normalizados. Uma busca por
+substring vira a interseção das listas dos trigramas do termo, seguida de
+verificação da substring nos candidatos.
+
+O índice é reconstruído quando a geração do KMFileIndex muda
+(ver ``km_indexer.geracao_indice_km``). A geração é consultada no banco no
+máximo uma vez a cada settings.KM_TRIGRAM_VERIFICACAO_SEGUNDOS; dentro desse
+intervalo as buscas não fazem nenhuma consulta.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Any, Iterable
+
+from apps.automacoes.models import KMFileIndex
+from apps.automacoes.services.km_indexer import (
+    geracao_indice_km,
+    intervalo_verificacao_geracao_km,
+    normalizar_km,
+)
+
+
+TAMANHO_TRIGRAMA = 3
+LIMITE_CANDIDATOS_PADRAO = 5000
+
+
+def trigramas(texto: str) -> set[str]:
+    return {
+        texto[i:i + TAMANHO_TRIGRAMA]
+        for i in range(len(texto) - TAMANHO_TRIGRAMA + 1)
+    }
+
+
+def _contem(lista: array, valor: int) -> bool:
+    pos = bisect_left(lista, valor)
+    return pos < len(lista) and lista[pos] == valor
+
+
+class IndiceTrigramasKM:
+    """
+    Estrutura compacta em memória:
+    - ``pks``: pk de cada posição;
+    - ``textos``: textos normalizados verificáveis por posição;
+    - ``postagens``: trigrama -> array ordenado de posições;
+    - ``pastas``: pasta em minúsculas -> array de posições.
+    """
+
+    def __init__(self):
+        self.pks = array("q")
+        self.textos: list[tuple[str, ...]] = []
+        self.postagens: dict[str, array] = {}
+        self.pastas: dict[str, array] = {}
+        self.duracao_construcao = 0.0
+
+    @classmethod
+    def construir(cls, registros: Iterable[tuple[int, str, str, str, str]]) -> "IndiceTrigramasKM":
+        """
+        Constrói o índice a partir de tuplas
+        (pk, nome_normalizado, stem_normalizado, documento_extraido, pasta).
+        """
+        inicio = time.monotonic()
+        indice = cls()
+        postagens: dict[str, list[int]] = {}
+        pastas: dict[str, list[int]] = {}
+
+        for pk, nome_norm, stem_norm, documento_extraido, pasta in registros:
+            posicao = len(indice.pks)
+            nome_norm = nome_norm or ""
+
+            textos = [nome_norm]
+            for extra in (stem_norm or "", normalizar_km(documento_extraido)):
+                if extra and extra not in nome_norm:
+                    textos.append(extra)
+
+            indice.pks.append(int(pk))
+            indice.textos.append(tuple(textos))
+
+            chaves = set()
+            for texto in textos:
+                chaves |= trigramas(texto)
+
+            for chave in chaves:
+                postagens.setdefault(chave, []).append(posicao)
+
+            if pasta:
+                pastas.setdefault(str(pasta).lower(), []).append(posicao)
+
+        indice.postagens = {chave: array("I", posicoes) for chave, posicoes in postagens.items()}
+        indice.pastas = {pasta: array("I", posicoes) for pasta, posicoes in pastas.items()}
+        indice.duracao_construcao = time.monotonic() - inicio
+        return indice
+
+    def __len__(self) -> int:
+        return len(self.pks)
+
+    def _posicoes_por_nome(self, termo_norm: str) -> list[int] | None:
+        chaves = trigramas(termo_norm)
+        if not chaves:
+            return None
+
+        listas = []
+        for chave in chaves:
+            lista = self.postagens.get(chave)
+            if not lista:
+                return []
+            listas.append(lista)
+
+        listas.sort(key=len)
+        menor, demais = listas[0], listas[1:]
+
+        return [
+            posicao
+            for posicao in menor
+            if all(_contem(lista, posicao) for lista in demais)
+            and any(termo_norm in texto for texto in self.textos[posicao])
+        ]
+
+    def _posicoes_por_pasta(self, termo: str) -> list[int]:
+        termo_lower = str(termo or "").strip().lower()
+        if not termo_lower:
+            return []
+
+        posicoes: list[int] = []
+        for pasta, itens in self.pastas.items():
+            if termo_lower in pasta:
+                posicoes.extend(itens)
+        return posicoes
+
+    def buscar(self, termo: str, *, incluir_pastas: bool = False) -> list[int] | None:
+        """
+        Retorna os pks cujo nome normalizado contém o termo normalizado.
+
+        Retorna None quando o termo é curto demais para o índice; nesse caso
+        o chamador deve usar a consulta tradicional no banco.
+        """
+        termo_norm = normalizar_km(termo)
+        posicoes = self._posicoes_por_nome(termo_norm)
+        if posicoes is None:
+            return None
+
+        if incluir_pastas:
+            posicoes = sorted(set(posicoes).union(self._posicoes_por_pasta(termo)))
+
+        return [self.pks[posicao] for posicao in posicoes]
+
+    def estatisticas(self) -> dict[str, Any]:
+        return {
+            "arquivos": len(self.pks),
+            "trigramas": len(self.postagens),
+            "postagens": sum(len(lista) for lista in self.postagens.values()),
+            "pastas": len(self.pastas),
+            "duracao_construcao_segundos": round(self.duracao_construcao, 3),
+        }
+
+
+_LOCK = threading.Lock()
+_INDICE: IndiceTrigramasKM | None = None
+_GERACAO: tuple | None = None
+_VERIFICADO_EM = 0.0
+
+
+def _carregar_registros():
+    return KMFileIndex.objects.filter(ativo=True).order_by("pk").values_list(
+        "pk",
+        "nome_normalizado",
+        "stem_normalizado",
+        "documento_extraido",
+        "pasta",
+    ).iterator(chunk_size=5000)
+
+
+def obter_indice_trigramas(forcar: bool = False, *, verificar: bool = False) -> IndiceTrigramasKM:
+    """
+    Índice do processo. ``verificar=True`` consulta a geração mesmo dentro do
+    intervalo, para quem acabou de gravar no KMFileIndex; ``forcar=True``
+    reconstrói sempre.
+    """
+    global _INDICE, _GERACAO, _VERIFICADO_EM
+
+    agora = time.monotonic()
+    if (
+        not forcar
+        and not verificar
+        and _INDICE is not None
+        and agora - _VERIFICADO_EM < intervalo_verificacao_geracao_km()
+    ):
+        return _INDICE
+
+    geracao = geracao_indice_km()
+
+    with _LOCK:
+        if forcar or _INDICE is None or geracao != _GERACAO:
+            _INDICE = IndiceTrigramasKM.construir(_carregar_registros())
+            _GERACAO = geracao
+
+        _VERIFICADO_EM = agora
+        return _INDICE
+
+
+def invalidar_indice_trigramas() -> None:
+    global _INDICE, _GERACAO
+
+    with _LOCK:
+        _INDICE = None
+        _GERACAO = None
+
+
+def candidatos_km(
+    termo: str,
+    *,
+    incluir_pastas: bool = False,
+    limite: int = LIMITE_CANDIDATOS_PADRAO,
+) -> list[int] | None:
+    """
+    Pks ativos do KMFileIndex que casam com o termo por substring.
+
+    Retorna None quando o índice não se aplica (termo curto ou candidatos
+    demais para um ``pk__in``); o chamador mantém o filtro ``icontains``.
+    """
+    pks = obter_indice_trigramas().buscar(termo, incluir_pastas=incluir_pastas)
+    if pks is None or len(pks) > limite:
+        return None
+    return pks
@@ -0,0 +1,218 @@
+"""
+Observador por polling da árvore KM.
+
+O compartilhamento KM é SMB, onde notificações de sistema de arquivos não
+são confiáveis. O observador mantém um retrato (pasta -> mtime) de todas as
+pastas e, a cada ciclo, consulta apenas o stat de cada pasta. Somente pastas
+cujo mtime mudou são relistadas, e o delta é aplicado ao KMFileIndex pela
+mesma rotina do modo incremental.
+
+O mtime de uma pasta muda quando arquivos são criados, removidos ou
+renomeados nela; alterações de conteúdo dentro de um arquivo existente ficam
+para a reindexação incremental diária (job ``km_reindex``).
+
+Falhas transitórias de rede (stat ou listagem com erro) não viram delta: a
+pasta mantém o retrato anterior e é relistada no ciclo seguinte, em vez de
+ter os arquivos desativados como se tivessem sumido.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.automacoes.models import KMFileIndex
+from apps.automacoes.services.fs_scanner import listar_diretorio, workers_configurados
+from apps.automacoes.services.km_indexer import (
+    KM_DOCUMENTOS_BASE,
+    KM_INDEX_BATCH_SIZE,
+    aplicar_delta_km,
+    carregar_estado_atual,
+)
+from apps.automacoes.services.km_resolver import atualizar_resolucoes_km
+
+
+MTIME_ERRO = -1
+
+
+def _mtime_pasta(pasta: str) -> int | None:
+    try:
+        return os.stat(pasta).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    except OSError:
+        return MTIME_ERRO
+
+
+class ObservadorKM:
+    """
+    Exemplo:
+        observador = ObservadorKM(base)
+        observador.inicializar()
+        while True:
+            resultado = observador.verificar()
+            time.sleep(120)
+    """
+
+    def __init__(
+        self,
+        base: Path | str | None = None,
+        *,
+        workers: int | None = None,
+        batch_size: int = KM_INDEX_BATCH_SIZE,
+    ):
+        self.base = str(Path(base) if base else KM_DOCUMENTOS_BASE)
+        self.workers = max(int(workers or workers_configurados("KM_SCANNER_WORKERS")), 1)
+        self.batch_size = max(int(batch_size or KM_INDEX_BATCH_SIZE), 1)
+        self.retrato: dict[str, int] = {}
+
+    def _percorrer_pastas(self, raiz: str, com_erro: list[str] | None = None) -> dict[str, list]:
+        """
+        Lista a subárvore a partir de ``raiz``, registrando mtime e arquivos de
+        cada pasta. Pastas com erro de stat ou de listagem ficam no retrato com
+        MTIME_ERRO (relistadas no próximo ciclo) e fora do retorno.
+        """
+        arquivos_por_pasta: dict[str, list] = {}
+        pendentes = [raiz]
+
+        while pendentes:
+            pasta = pendentes.pop()
+            mtime = _mtime_pasta(pasta)
+            if mtime is None:
+                continue
+
+            arquivos, subpastas, erros = listar_diretorio(pasta)
+            pendentes.extend(subpastas)
+
+            if mtime == MTIME_ERRO or erros:
+                self.retrato[pasta] = MTIME_ERRO
+                if com_erro is not None:
+                    com_erro.append(pasta)
+                continue
+
+            self.retrato[pasta] = mtime
+            arquivos_por_pasta[pasta] = arquivos
+
+        return arquivos_por_pasta
+
+    def inicializar(self) -> int:
+        """Monta o retrato inicial de pastas. Retorna a quantidade de pastas."""
+        self.retrato = {}
+        self._percorrer_pastas(self.base)
+        return len(self.retrato)
+
+    def _remover_subarvore(self, pasta: str) -> list[int]:
+        prefixo = pasta.rstrip("\\/") + os.sep
+        for conhecida in [p for p in self.retrato if p == pasta or p.startswith(prefixo)]:
+            self.retrato.pop(conhecida, None)
+
+        queryset = KMFileIndex.objects.filter(ativo=True).filter(
+            Q(pasta=pasta) | Q(pasta__startswith=prefixo)
+        )
+        return list(queryset.values_list("pk", flat=True))
+
+    def verificar(self, *, atualizar_resolucoes: bool = True) -> dict[str, Any]:
+        """
+        Executa um ciclo: stat de todas as pastas conhecidas, relistagem das
+        alteradas e gravação do delta. Com ``atualizar_resolucoes``, recalcula
+        as chaves de KMResolucaoDocumento afetadas pelos arquivos do ciclo.
+        """
+        inicio = time.monotonic()
+        if not self.retrato:
+            self.inicializar()
+
+        pastas = list(self.retrato)
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ged-km-watch") as pool:
+            mtimes = dict(zip(pastas, pool.map(_mtime_pasta, pastas)))
+
+        if mtimes.get(self.base) is None:
+            # raiz inacessível (share fora do ar): não é remoção, tenta de novo no próximo ciclo
+            mtimes[self.base] = MTIME_ERRO
+
+        # só conta como removida a pasta cuja pasta-mãe respondeu ao stat neste
+        # ciclo; se a mãe também sumiu, a subárvore dela já cobre a filha
+        sumidas = sorted((pasta for pasta, mtime in mtimes.items() if mtime is None), key=len)
+        for pasta in sumidas:
+            if mtimes.get(os.path.dirname(pasta.rstrip("\\/"))) == MTIME_ERRO:
+                mtimes[pasta] = MTIME_ERRO
+        removidas = [pasta for pasta in sumidas if mtimes[pasta] is None]
+        com_erro = [pasta for pasta, mtime in mtimes.items() if mtime == MTIME_ERRO]
+        alteradas = [
+            pasta
+            for pasta, mtime in mtimes.items()
+            if mtime not in (None, MTIME_ERRO) and mtime != self.retrato.get(pasta)
+        ]
+
+        pks_desativados: list[int] = []
+        for pasta in removidas:
+            if pasta in self.retrato:
+                pks_desativados.extend(self._remover_subarvore(pasta))
+
+        if pks_desativados:
+            agora = timezone.now()
+            for inicio_lote in range(0, len(pks_desativados), self.batch_size):
+                KMFileIndex.objects.filter(
+                    pk__in=pks_desativados[inicio_lote:inicio_lote + self.batch_size],
+                ).update(ativo=False, indexado_em=agora)
+
+        arquivos_por_pasta: dict[str, list] = {}
+        for pasta in alteradas:
+            arquivos, subpastas, erros = listar_diretorio(pasta)
+            if erros:
+                # listagem incompleta: mantém o retrato anterior e tenta de novo no próximo ciclo
+                com_erro.append(pasta)
+                continue
+
+            self.retrato[pasta] = mtimes[pasta]
+            arquivos_por_pasta[pasta] = arquivos
+
+            for subpasta in subpastas:
+                if subpasta not in self.retrato:
+                    arquivos_por_pasta.update(self._percorrer_pastas(subpasta, com_erro))
+
+        criados = atualizados = movidos = 0
+        caminhos_gravados: list[str] = []
+
+        for pasta, arquivos in arquivos_por_pasta.items():
+            existentes = carregar_estado_atual(KMFileIndex.objects.filter(pasta=pasta))
+            delta = aplicar_delta_km(arquivos, existentes, batch_size=self.batch_size)
+
+            criados += delta.criados
+            atualizados += delta.atualizados
+            movidos += delta.movidos
+            caminhos_gravados.extend(delta.caminhos_gravados)
+            pks_desativados.extend(delta.pks_desativados)
+
+        pks_gravados: list[int] = []
+        for inicio_lote in range(0, len(caminhos_gravados), self.batch_size):
+            pks_gravados.extend(
+                KMFileIndex.objects.filter(
+                    caminho_completo__in=caminhos_gravados[inicio_lote:inicio_lote + self.batch_size],
+                ).values_list("pk", flat=True)
+            )
+
+        pks_afetados = pks_gravados + pks_desativados
+        resolucoes = None
+        if atualizar_resolucoes and pks_afetados:
+            resolucoes = atualizar_resolucoes_km(pks_afetados)
+
+        return {
+            "pastas_monitoradas": len(self.retrato),
+            "pastas_alteradas": len(alteradas),
+            "pastas_removidas": len(removidas),
+            "pastas_relistadas": len(arquivos_por_pasta),
+            "pastas_com_erro": len(com_erro),
+            "criados": criados,
+            "atualizados": atualizados,
+            "movidos": movidos,
+            "desativados": len(pks_desativados),
+            "pks_afetados": pks_afetados,
+            "resolucoes": resolucoes,
+            "duracao_segundos": round(time.monotonic() - inicio, 3),
+        }
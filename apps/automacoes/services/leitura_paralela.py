@@ -0,0 +1,48 @@
+"""
+Leitura de arquivos num pool de processos, com cache opcional.
+
+Usado pela Timeline de PCFs (pcf_parser) e pelo Transmittal KM (pdf_texto):
+a função de leitura roda em processos separados e não pode depender do
+Django. Os resultados voltam na ordem dos caminhos, conforme ficam prontos.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator
+
+
+def criar_pool_processos(workers, avisar: Callable[[str], None] | None = None):
+    """Pool com ``workers`` processos, ou None para ler no próprio processo."""
+    workers = int(workers)
+    if workers <= 1:
+        return None
+    try:
+        return ProcessPoolExecutor(max_workers=workers)
+    except (OSError, NotImplementedError, ValueError) as e:
+        if avisar is not None:
+            avisar(f"Pool de processos indisponível ({e}); leitura no próprio processo.")
+        return None
+
+
+def ler_com_cache(tarefa: Callable, caminhos: Iterable[str], pool=None, cache=None) -> Iterator[dict]:
+    """
+    Resultados de ``tarefa`` para cada caminho, na ordem de ``caminhos``.
+
+    Com ``cache`` (CacheArquivos), o que está no cache sai dele e só os
+    arquivos novos ou alterados vão para o pool; as leituras são
+    registradas no cache conforme passam.
+    """
+    if cache is None:
+        yield from (map(tarefa, caminhos) if pool is None else pool.map(tarefa, caminhos))
+        return
+
+    consultas = [(caminho, cache.consultar(caminho)) for caminho in caminhos]
+    faltam = [caminho for caminho, lida in consultas if lida is None]
+    lidas = map(tarefa, faltam) if pool is None else pool.map(tarefa, faltam)
+
+    for _, lida in consultas:
+        if lida is None:
+            lida = next(lidas)
+            cache.registrar(lida)
+        yield lida
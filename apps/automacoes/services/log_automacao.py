@@ -0,0 +1,101 @@
+"""
+Log bufferizado das automações (Atualização LD, Timeline PCFs, Transmittal KM).
+
+Cada mensagem continua indo para o terminal na hora, com o mesmo texto. A
+gravação no arquivo de log (na rede) passa por uma fila consumida por uma
+thread: as mensagens que chegam dentro de ``intervalo`` segundos viram um
+único open/append, em vez de uma abertura do arquivo por linha. As últimas
+linhas ficam também em memória para o resultado do job.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from collections import deque
+from itertools import groupby
+
+
+LINHAS_MEMORIA_PADRAO = 200
+
+
+class LogAutomacao:
+    def __init__(
+        self,
+        *,
+        linhas_memoria: int = LINHAS_MEMORIA_PADRAO,
+        lote: int = 1000,
+        intervalo: float = 0.5,
+        eco: bool = True,
+    ):
+        self.lote = max(int(lote), 1)
+        self.intervalo = max(float(intervalo), 0.0)
+        self.eco = eco
+        self.aberturas = 0
+        self.linhas_gravadas = 0
+        self._fila: queue.Queue = queue.Queue()
+        self._memoria: deque = deque(maxlen=max(int(linhas_memoria), 1))
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def escrever(self, mensagem="", arquivo: str | None = None) -> None:
+        """Mostra no terminal, guarda na memória e, com ``arquivo``, enfileira a gravação."""
+        mensagem = str(mensagem)
+        if self.eco:
+            print(mensagem)
+        self._memoria.extend(mensagem.splitlines() or [""])
+
+        if arquivo:
+            self._iniciar()
+            self._fila.put((arquivo, mensagem))
+
+    def descarregar(self) -> None:
+        """Espera a fila esvaziar: tudo que foi escrito até aqui está no arquivo."""
+        if self._thread is not None:
+            self._fila.join()
+
+    def ultimas_linhas(self) -> list[str]:
+        return list(self._memoria)
+
+    def limpar_memoria(self) -> None:
+        self._memoria.clear()
+
+    def _iniciar(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._consumir, name="ged-log", daemon=True)
+                self._thread.start()
+
+    def _consumir(self) -> None:
+        while True:
+            lote = [self._fila.get()]
+
+            # junta o que chegar até o fim do intervalo (ou até encher o lote)
+            prazo = time.monotonic() + self.intervalo
+            while len(lote) < self.lote:
+                restante = prazo - time.monotonic()
+                try:
+                    lote.append(self._fila.get(timeout=restante) if restante > 0 else self._fila.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self._gravar(lote)
+            finally:
+                for _ in lote:
+                    self._fila.task_done()
+
+    def _gravar(self, lote) -> None:
+        for arquivo, itens in groupby(lote, key=lambda item: item[0]):
+            mensagens = [mensagem for _, mensagem in itens]
+            try:
+                with open(arquivo, "a", encoding="utf-8") as f:
+                    f.write("".join(f"{mensagem}\n" for mensagem in mensagens))
+                self.aberturas += 1
+                self.linhas_gravadas += len(mensagens)
+            except Exception:
+                # log nunca derruba a automação (mesmo comportamento do append por linha)
+                pass
@@ -0,0 +1,265 @@
+"""
+Leitura das PCFs (planilhas de comentários) para a Timeline PCFs.
+
+Cada PCF é aberta em read_only e só uma janela fixa da primeira aba útil vai
+para a memória: as linhas 1..JANELA_LINHAS das colunas A..JANELA_COLUNAS, como
+tuplas de valores. Os limites são passados explícitos ao iter_rows, então a
+leitura não depende da dimensão gravada no arquivo (que algumas PCFs trazem
+errada e fazia o read_only devolver a aba vazia). Janela cheia é reportada em
+``aviso`` por extrair_pcf_com_tempo: o status final e os comentários abaixo
+dela não foram lidos.
+
+Os rótulos do cabeçalho ("Plan No.", "PCF Rev.", "COMMENT STATUS"...) são
+indexados uma vez por aba num mapa rótulo -> células; cada campo é uma consulta
+nesse mapa em vez de uma varredura da grade.
+
+O módulo não importa Django: extrair_pcf_com_tempo roda em processos filhos.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import time
+
+from openpyxl import load_workbook
+
+
+JANELA_LINHAS = 2000
+JANELA_COLUNAS = 30
+
+# área onde os rótulos são procurados (a maior busca: COMMENT STATUS em 60 x 30)
+ROTULOS_LINHAS = 60
+ROTULOS_COLUNAS = 30
+
+
+def safe_str(v):
+    return "" if v is None else str(v).strip()
+
+
+def norm_text(v):
+    return re.sub(r"\s+", " ", safe_str(v).upper())
+
+
+def norm_rev(v):
+    s = safe_str(v).upper()
+    if s.endswith(".0"):
+        s = s[:-2]
+    if s.startswith("R") and len(s) > 1:
+        s = s[1:]
+    return s
+
+
+def primeira_aba_util(wb_pcf):
+    for ws in wb_pcf.worksheets:
+        if getattr(ws, "sheet_state", "visible") == "visible":
+            return ws
+    return wb_pcf.worksheets[0]
+
+
+class JanelaPCF:
+    """Valores da janela lida da PCF, endereçados como no Excel (linha/coluna a partir de 1)."""
+
+    def __init__(self, linhas, max_linhas=None):
+        self.linhas = [tuple(linha) for linha in linhas]
+        self.max_row = len(self.linhas)
+        # janela cheia: a aba pode continuar abaixo da última linha lida
+        self.truncada = max_linhas is not None and self.max_row >= max_linhas
+        self._rotulos = None
+
+    def valor(self, row, col):
+        if 1 <= row <= self.max_row:
+            linha = self.linhas[row - 1]
+            if 1 <= col <= len(linha):
+                return linha[col - 1]
+        return None
+
+    @property
+    def rotulos(self):
+        """Mapa texto normalizado -> [(linha, coluna)], na ordem linha a linha."""
+        if self._rotulos is None:
+            rotulos = {}
+            for r, linha in enumerate(self.linhas[:ROTULOS_LINHAS], start=1):
+                for c, v in enumerate(linha[:ROTULOS_COLUNAS], start=1):
+                    if v is None:
+                        continue
+                    texto = norm_text(v)
+                    if texto:
+                        rotulos.setdefault(texto, []).append((r, c))
+            self._rotulos = rotulos
+        return self._rotulos
+
+    def posicoes(self, label, max_row, max_col):
+        return [(r, c) for r, c in self.rotulos.get(norm_text(label), ()) if r <= max_row and c <= max_col]
+
+
+def ler_janela_pcf(caminho, max_linhas=JANELA_LINHAS, max_colunas=JANELA_COLUNAS):
+    wb_pcf = load_workbook(caminho, data_only=True, read_only=True)
+    try:
+        ws = primeira_aba_util(wb_pcf)
+        linhas = ws.iter_rows(min_row=1, max_row=max_linhas, min_col=1, max_col=max_colunas, values_only=True)
+        return JanelaPCF(linhas, max_linhas=max_linhas)
+    finally:
+        wb_pcf.close()
+
+
+def get_by_label(janela, label, max_row=15, max_col=15):
+    for row, col in janela.posicoes(label, max_row, max_col):
+        # na PCF os valores costumam estar 1, 2 ou 3 colunas à direita
+        for offset in (2, 1, 3, 4):
+            v = janela.valor(row, col + offset)
+            if safe_str(v):
+                return v
+    return ""
+
+
+def extrair_status_final(janela):
+    status_final = ""
+    for linha in janela.linhas[8:]:  # a partir de E9
+        v = linha[4] if len(linha) > 4 else None  # coluna E
+        if safe_str(v):
+            status_final = safe_str(v)
+    return status_final
+
+
+def extrair_qtd_e_open_comments(janela):
+    posicoes = janela.posicoes("COMMENT STATUS", 60, 30)
+
+    open_count = 0
+    total_status = 0
+
+    if posicoes:
+        header_row, comment_status_col = posicoes[0]
+        for linha in janela.linhas[header_row:]:
+            st = norm_text(linha[comment_status_col - 1] if len(linha) >= comment_status_col else None)
+            if st:
+                total_status += 1
+                if st == "OPEN":
+                    open_count += 1
+
+    total_items = 0
+    for linha in janela.linhas[20:]:  # a partir de A21
+        item = linha[0] if linha else None
+        if isinstance(item, (int, float)) and item > 0:
+            total_items += 1
+
+    return open_count, max(total_status, total_items)
+
+
+def extrair_data_recebimento(janela):
+    data = get_by_label(janela, "Date", max_row=20, max_col=20)
+    if data:
+        return data
+
+    ultima = ""
+    for row in range(9, min(janela.max_row, 16) + 1):
+        for col in (9, 12):
+            v = janela.valor(row, col)
+            if safe_str(v):
+                ultima = v
+    return ultima
+
+
+def extrair_revisao_pcf(janela, caminho):
+    rev = get_by_label(janela, "PCF Rev.", max_row=20, max_col=20)
+    if safe_str(rev):
+        return norm_rev(rev)
+
+    nome = os.path.splitext(os.path.basename(caminho))[0].upper()
+    m = re.search(r"_R([A-Z0-9]+)$", nome)
+    if m:
+        raw = m.group(1)
+        if raw == "0":
+            return "0"
+        return raw[-1]
+
+    return ""
+
+
+def parece_pcf_valida(janela, caminho):
+    """
+    Validação flexível:
+    - Se o nome contém PCF, considera candidata válida.
+    - Se não contém PCF no nome, tenta validar pelo conteúdo em uma área maior da planilha.
+    Isso evita ignorar PCFs novas com cabeçalho deslocado.
+    """
+    nome = os.path.basename(caminho).upper()
+
+    if nome.startswith("LISTA "):
+        return False
+
+    if "PCF" in nome:
+        return True
+
+    tem_pcf_no = bool(safe_str(get_by_label(janela, "PCF No.", max_row=20, max_col=20)))
+    tem_plan_no = bool(safe_str(get_by_label(janela, "Plan No.", max_row=20, max_col=20)))
+    tem_status_em_e = bool(extrair_status_final(janela))
+
+    return tem_pcf_no or tem_plan_no or tem_status_em_e
+
+
+def extrair_dados_pcf(caminho, max_linhas=JANELA_LINHAS):
+    return extrair_dados_janela(ler_janela_pcf(caminho, max_linhas=max_linhas), caminho)
+
+
+def extrair_dados_janela(janela, caminho):
+    if not parece_pcf_valida(janela, caminho):
+        return None
+
+    # Busca ampliada para aceitar PCFs com cabeçalho deslocado.
+    plan_no = safe_str(get_by_label(janela, "Plan No.", max_row=20, max_col=20))
+    pcf_no = safe_str(get_by_label(janela, "PCF No.", max_row=20, max_col=20))
+    titulo = safe_str(get_by_label(janela, "Plan Title", max_row=20, max_col=20))
+
+    if not pcf_no:
+        base = os.path.splitext(os.path.basename(caminho))[0]
+        pcf_no = re.sub(r"_R[A-Z0-9]+$", "", base, flags=re.IGNORECASE)
+
+    if not plan_no and pcf_no.upper().startswith("PCF-"):
+        plan_no = pcf_no[4:]
+
+    open_comments, qtd_comentarios = extrair_qtd_e_open_comments(janela)
+    status_final = extrair_status_final(janela)
+
+    return {
+        "Caminho": caminho,
+        "PCF LINK": os.path.splitext(os.path.basename(caminho))[0],
+        "N º PCF": pcf_no,
+        "Nº DOCUMENTO": plan_no,
+        "TITULO": titulo,
+        "Revisão da PCF": extrair_revisao_pcf(janela, caminho),
+        "Data Recebimento": extrair_data_recebimento(janela),
+        "Open Comments": open_comments,
+        "Qtd Comentarios": qtd_comentarios,
+        "SRC_OPEN": "Comment Status = OPEN",
+        "SRC_TOTAL": "Comment Status/Item count",
+        "STATUS FINAL": status_final,
+    }
+
+
+def extrair_pcf_com_tempo(caminho, max_linhas=JANELA_LINHAS):
+    """
+    Tarefa de um worker: uma PCF por chamada, sem deixar exceção atravessar o pool.
+
+    Devolve {"caminho", "registro" (dict ou None se não é PCF), "erro",
+    "aviso" (PCF maior que a janela), "segundos"}.
+    """
+    inicio = time.perf_counter()
+    registro = None
+    erro = ""
+    aviso = ""
+    try:
+        janela = ler_janela_pcf(caminho, max_linhas=max_linhas)
+        registro = extrair_dados_janela(janela, caminho)
+        if registro is not None and janela.truncada:
+            aviso = f"leitura limitada a {max_linhas} linhas; status e comentários abaixo disso não foram lidos"
+    except Exception as e:
+        erro = f"{type(e).__name__}: {e}"
+
+    return {
+        "caminho": caminho,
+        "registro": registro,
+        "erro": erro,
+        "aviso": aviso,
+        "segundos": time.perf_counter() - inicio,
+    }
@@ -0,0 +1,47 @@
+"""
+Extração de texto de PDFs com pdfplumber, para rodar em processos filhos.
+
+O módulo não importa Django nem os models: extrair_texto_com_tempo é a tarefa
+do pool de processos do Transmittal KM (pdfplumber é CPU puro). pdfplumber é
+importado dentro da função, como no job.
+"""
+
+from __future__ import annotations
+
+import time
+
+
+def ler_texto_pdf(caminho, max_paginas=None) -> str:
+    """Texto das primeiras ``max_paginas`` páginas (None ou 0 = todas), páginas separadas por quebra de linha."""
+    import pdfplumber
+
+    textos = []
+    with pdfplumber.open(caminho) as pdf:
+        paginas = pdf.pages[:max_paginas] if max_paginas else pdf.pages
+        for pagina in paginas:
+            texto = pagina.extract_text()
+            if texto:
+                textos.append(texto)
+    return "\n".join(textos)
+
+
+def extrair_texto_com_tempo(caminho, max_paginas=None) -> dict:
+    """
+    Tarefa de um worker: um PDF por chamada, sem deixar exceção atravessar o pool.
+
+    Devolve {"caminho", "texto", "erro" (mensagem da exceção ou ""), "segundos"}.
+    """
+    inicio = time.perf_counter()
+    texto = ""
+    erro = ""
+    try:
+        texto = ler_texto_pdf(caminho, max_paginas=max_paginas)
+    except Exception as e:
+        erro = str(e) or e.__class__.__name__
+
+    return {
+        "caminho": str(caminho),
+        "texto": texto,
+        "erro": erro,
+        "segundos": time.perf_counter() - inicio,
+    }
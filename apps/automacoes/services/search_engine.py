@@ -15,6 +15,7 @@ from urllib.parse import quote
 from django.db.models import Q
 
 from apps.automacoes.models import DocumentoLD, KMFileIndex, PCFTimeline, SearchAudit, TransmittalKM
+from apps.automacoes.services.km_trigram_index import candidatos_km
 from apps.automacoes.services.search_audit import registrar_busca
 from apps.automacoes.services.search_ranker import ordenar_por_score, score_documento
 
@@ -156,12 +157,19 @@ def _buscar_ld(termo: str, limit: int) -> list[dict[str, Any]]:
     return resultados
 
 
-def _buscar_km(termo: str, limit: int) -> list[dict[str, Any]]:
-    if not termo:
-        return []
+def _filtro_km(termo: str) -> Q:
+    """
+    Filtro de substring do índice KM.
+
+    Usa o índice de trigramas (nome, documento extraído e pasta) quando o
+    termo permite; caso contrário mantém os ``icontains`` originais.
+    """
+    pks = candidatos_km(termo, incluir_pastas=True)
+    if pks is not None:
+        return Q(pk__in=pks)
 
     termo_norm = _termo_compacto(termo)
-    qs = KMFileIndex.objects.filter(ativo=True).filter(
+    return (
         Q(nome_arquivo__icontains=termo)
         | Q(caminho_completo__icontains=termo)
         | Q(pasta__icontains=termo)
@@ -170,6 +178,13 @@ def _buscar_km(termo: str, limit: int) -> list[dict[str, Any]]:
         | Q(stem_normalizado__icontains=termo_norm)
     )
 
+
+def _buscar_km(termo: str, limit: int) -> list[dict[str, Any]]:
+    if not termo:
+        return []
+
+    qs = KMFileIndex.objects.filter(ativo=True).filter(_filtro_km(termo))
+
     resultados = []
     for item in qs.order_by("eh_transmittal_letter", "-indexado_em", "nome_arquivo")[:limit]:
         score = _bg_score(termo, item.nome_arquivo, item.documento_extraido, item.caminho_completo)
@@ -402,16 +417,9 @@ def buscar_global_enterprise(
             )
         return contexto
 
-    termo_norm = _termo_compacto(termo)
-
     if tipo_normalizado in {"todos", "km"}:
         km_qs = KMFileIndex.objects.filter(ativo=True).filter(
-            Q(nome_arquivo__icontains=termo)
-            | Q(caminho_completo__icontains=termo)
-            | Q(pasta__icontains=termo)
-            | Q(documento_extraido__icontains=termo)
-            | Q(nome_normalizado__icontains=termo_norm)
-            | Q(stem_normalizado__icontains=termo_norm)
+            _filtro_km(termo)
         ).order_by("eh_transmittal_letter", "nome_arquivo")
 
         totais_reais["km"] = km_qs.count()
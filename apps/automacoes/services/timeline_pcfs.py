@@ -4,7 +4,8 @@
 Relatorio PCFs.py - versão ANTIBRANCO + LOG + VALIDAÇÃO FLEXÍVEL
 
 Correções desta versão:
-- Lê os arquivos PCF com openpyxl sem read_only, evitando falhas silenciosas em algumas PCFs.
+- Lê as PCFs em processos paralelos, cada uma em read_only e só numa janela fixa
+  da primeira aba (ver pcf_parser), com tempo por arquivo no resultado.
 - Não salva a Timeline se nenhuma linha válida for gerada.
 - Não limpa uma aba antes de confirmar que há linhas novas.
 - Grava em arquivo temporário e só substitui a Timeline no final, após validação.
@@ -13,10 +14,14 @@ Correções desta versão:
 """
 
 import os
-import re
 import shutil
 import tempfile
-from datetime import datetime
+import time
+from datetime import date, datetime, time as dt_time
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
 
 from apps.automacoes.models import (
     PCFTimeline,
@@ -27,6 +32,17 @@ from openpyxl import load_workbook
 from openpyxl.formatting.rule import IconSetRule
 from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
 
+from apps.automacoes.services.backups_planilha import BackupsPlanilha, restaurar_arquivo
+from apps.automacoes.services.cache_json import CacheArquivos
+from apps.automacoes.services.leitura_paralela import criar_pool_processos, ler_com_cache
+from apps.automacoes.services.log_automacao import LogAutomacao
+from apps.automacoes.services.pcf_parser import (
+    JANELA_LINHAS,
+    extrair_pcf_com_tempo,
+    norm_rev,
+    safe_str,
+)
+
 
 ARQUIVO_XLSX = r"\\virm-rgr022\FILESERVER\Projetos\05_HANDYMAX\09. Doc Control\9 - PCFs Transpetro\Timeline PCFs Transpetro.xlsx"
 
@@ -36,6 +52,8 @@ PASTAS_PCF = {
 }
 
 BACKUP_DIR = r"\\virm-rgr022\FILESERVER\Projetos\05_HANDYMAX\09. Doc Control\9 - PCFs Transpetro\_BACKUPS"
+# registros extraídos de cada PCF, por (caminho, tamanho, mtime); a pasta _BACKUPS fica fora da varredura
+CACHE_PCFS_ARQUIVO = os.path.join(BACKUP_DIR, "cache_pcfs_timeline.json")
 
 SHEET_SRC_RECEBIDAS = "PCFs Recebidas TP"
 SHEET_SRC_RESPONDIDAS = "PCFs Respondidas CMN"
@@ -65,6 +83,19 @@ HEADERS_PCF = [
 ]
 
 
+# =========================
+# LEITURA DAS PCFs
+# =========================
+# processos lendo PCFs em paralelo (1 = lê no próprio processo)
+PCF_WORKERS = getattr(settings, "PCF_TIMELINE_WORKERS", 4)
+# linhas lidas de cada PCF (colunas A..AD); cabeçalho, coluna E e Comment Status ficam dentro
+PCF_JANELA_LINHAS = getattr(settings, "PCF_JANELA_LINHAS", JANELA_LINHAS)
+# PCF com o mesmo tamanho e mtime da última execução não é aberta de novo
+USAR_CACHE_PCFS = True
+# gravação da PCFTimeline no banco: tamanho dos lotes do bulk_create/bulk_update/delete
+PCF_BANCO_BATCH_SIZE = 500
+
+
 # =========================
 # LOG NO TERMINAL
 # =========================
@@ -73,19 +104,22 @@ MOSTRAR_CADA_PCF_LIDA = True
 MOSTRAR_CADA_PCF_IGNORADA = True
 MOSTRAR_CADA_ERRO = True
 
+# terminal + últimas linhas para o resultado do job
+LOG = LogAutomacao()
+
 
 def agora_log():
     return datetime.now().strftime("%H:%M:%S")
 
 
 def log(msg=""):
-    print(f"[{agora_log()}] {msg}")
+    LOG.escrever(f"[{agora_log()}] {msg}")
 
 
 def log_secao(titulo):
-    print("\n" + "=" * 90)
+    LOG.escrever("\n" + "=" * 90)
     log(titulo)
-    print("=" * 90)
+    LOG.escrever("=" * 90)
 
 
 def log_ok(msg):
@@ -105,34 +139,18 @@ def log_debug(msg):
         log(f"DEBUG | {msg}")
 
 
-def safe_str(v):
-    return "" if v is None else str(v).strip()
-
-
-def norm_text(v):
-    return re.sub(r"\s+", " ", safe_str(v).upper())
-
-
-def norm_rev(v):
-    s = safe_str(v).upper()
-    if s.endswith(".0"):
-        s = s[:-2]
-    if s.startswith("R") and len(s) > 1:
-        s = s[1:]
-    return s
-
-
 def make_backup(path):
-    os.makedirs(BACKUP_DIR, exist_ok=True)
-    base = os.path.splitext(os.path.basename(path))[0]
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_path = os.path.join(BACKUP_DIR, f"{base}_BACKUP_{ts}.xlsx")
-    shutil.copy2(path, backup_path)
-    return backup_path
+    # comprimido e sem cópia quando a Timeline não mudou desde o último backup
+    resultado = BackupsPlanilha(path, BACKUP_DIR, marcador="_BACKUP_").criar()
+    if not resultado["novo"]:
+        log("Timeline igual ao último backup, cópia dispensada.")
+    if resultado["removidos"]:
+        log(f"Retenção: {len(resultado['removidos'])} backups antigos removidos.")
+    return resultado["caminho"]
 
 
 def restaurar_backup(backup_path, destino):
-    shutil.copy2(backup_path, destino)
+    restaurar_arquivo(backup_path, destino)
 
 
 def delete_if_exists(wb, sheet_name):
@@ -241,173 +259,16 @@ def listar_arquivos_pcf(pasta, aba):
     if encontrados[:10]:
         log("Primeiros candidatos:")
         for x in encontrados[:10]:
-            print("  +", x)
+            LOG.escrever(f"  + {x}")
 
     if ignorados[:15]:
         log("Primeiros ignorados:")
         for nome, motivo in ignorados[:15]:
-            print(f"  - {nome} :: {motivo}")
+            LOG.escrever(f"  - {nome} :: {motivo}")
 
     return encontrados
 
 
-def primeira_aba_util(wb_pcf):
-    for ws in wb_pcf.worksheets:
-        if getattr(ws, "sheet_state", "visible") == "visible":
-            return ws
-    return wb_pcf.worksheets[0]
-
-
-def get_by_label(ws, label, max_row=15, max_col=15):
-    alvo = norm_text(label)
-    for row in range(1, min(ws.max_row, max_row) + 1):
-        for col in range(1, min(ws.max_column, max_col) + 1):
-            if norm_text(ws.cell(row=row, column=col).value) == alvo:
-                # na PCF os valores costumam estar 1, 2 ou 3 colunas à direita
-                for offset in (2, 1, 3, 4):
-                    v = ws.cell(row=row, column=col + offset).value
-                    if safe_str(v):
-                        return v
-    return ""
-
-
-def extrair_status_final(ws):
-    status_final = ""
-    for row in range(9, ws.max_row + 1):
-        v = ws.cell(row=row, column=5).value  # coluna E
-        if safe_str(v):
-            status_final = safe_str(v)
-    return status_final
-
-
-def extrair_qtd_e_open_comments(ws):
-    comment_status_col = None
-    header_row = None
-
-    for r in range(1, min(ws.max_row, 60) + 1):
-        for c in range(1, min(ws.max_column, 30) + 1):
-            if norm_text(ws.cell(r, c).value) == "COMMENT STATUS":
-                comment_status_col = c
-                header_row = r
-                break
-        if comment_status_col:
-            break
-
-    open_count = 0
-    total_status = 0
-
-    if comment_status_col:
-        for r in range(header_row + 1, ws.max_row + 1):
-            st = norm_text(ws.cell(r, comment_status_col).value)
-            if st:
-                total_status += 1
-                if st == "OPEN":
-                    open_count += 1
-
-    total_items = 0
-    for r in range(21, ws.max_row + 1):
-        item = ws.cell(r, 1).value
-        if isinstance(item, (int, float)) and item > 0:
-            total_items += 1
-
-    return open_count, max(total_status, total_items)
-
-
-def extrair_data_recebimento(ws):
-    data = get_by_label(ws, "Date", max_row=20, max_col=20)
-    if data:
-        return data
-
-    ultima = ""
-    for row in range(9, min(ws.max_row, 16) + 1):
-        for col in (9, 12):
-            v = ws.cell(row=row, column=col).value
-            if safe_str(v):
-                ultima = v
-    return ultima
-
-
-def extrair_revisao_pcf(ws, caminho):
-    rev = get_by_label(ws, "PCF Rev.", max_row=20, max_col=20)
-    if safe_str(rev):
-        return norm_rev(rev)
-
-    nome = os.path.splitext(os.path.basename(caminho))[0].upper()
-    m = re.search(r"_R([A-Z0-9]+)$", nome)
-    if m:
-        raw = m.group(1)
-        if raw == "0":
-            return "0"
-        return raw[-1]
-
-    return ""
-
-
-def parece_pcf_valida(ws, caminho):
-    """
-    Validação flexível:
-    - Se o nome contém PCF, considera candidata válida.
-    - Se não contém PCF no nome, tenta validar pelo conteúdo em uma área maior da planilha.
-    Isso evita ignorar PCFs novas com cabeçalho deslocado.
-    """
-    nome = os.path.basename(caminho).upper()
-
-    if nome.startswith("LISTA "):
-        return False
-
-    if "PCF" in nome:
-        return True
-
-    tem_pcf_no = bool(safe_str(get_by_label(ws, "PCF No.", max_row=20, max_col=20)))
-    tem_plan_no = bool(safe_str(get_by_label(ws, "Plan No.", max_row=20, max_col=20)))
-    tem_status_em_e = bool(extrair_status_final(ws))
-
-    return tem_pcf_no or tem_plan_no or tem_status_em_e
-
-
-def extrair_dados_pcf(caminho):
-    wb_pcf = load_workbook(caminho, data_only=True, read_only=False)
-    try:
-        ws = primeira_aba_util(wb_pcf)
-
-        if not parece_pcf_valida(ws, caminho):
-            return None
-
-        # Busca ampliada para aceitar PCFs com cabeçalho deslocado.
-        plan_no = safe_str(get_by_label(ws, "Plan No.", max_row=20, max_col=20))
-        pcf_no = safe_str(get_by_label(ws, "PCF No.", max_row=20, max_col=20))
-        titulo = safe_str(get_by_label(ws, "Plan Title", max_row=20, max_col=20))
-
-        if not pcf_no:
-            base = os.path.splitext(os.path.basename(caminho))[0]
-            pcf_no = re.sub(r"_R[A-Z0-9]+$", "", base, flags=re.IGNORECASE)
-
-        if not plan_no and pcf_no.upper().startswith("PCF-"):
-            plan_no = pcf_no[4:]
-
-        open_comments, qtd_comentarios = extrair_qtd_e_open_comments(ws)
-        status_final = extrair_status_final(ws)
-
-        row = {
-            "Caminho": caminho,
-            "PCF LINK": os.path.splitext(os.path.basename(caminho))[0],
-            "N º PCF": pcf_no,
-            "Nº DOCUMENTO": plan_no,
-            "TITULO": titulo,
-            "Revisão da PCF": extrair_revisao_pcf(ws, caminho),
-            "Data Recebimento": extrair_data_recebimento(ws),
-            "Open Comments": open_comments,
-            "Qtd Comentarios": qtd_comentarios,
-            "SRC_OPEN": "Comment Status = OPEN",
-            "SRC_TOTAL": "Comment Status/Item count",
-            "STATUS FINAL": status_final,
-        }
-
-        return row
-    finally:
-        wb_pcf.close()
-
-
 def thin_border():
     side = Side(style="thin", color="BFBFBF")
     return Border(left=side, right=side, top=side, bottom=side)
@@ -501,32 +362,210 @@ def _safe_int(v):
         return 0
 
 
-def salvar_pcf_no_banco(tipo, row):
-    numero_documento = safe_str(row.get("Nº DOCUMENTO"))
-    revisao = safe_str(row.get("Revisão da PCF"))
-    pcf_link = safe_str(row.get("PCF LINK"))
+CAMPOS_PCF_BANCO = [
+    "caminho",
+    "numero_pcf",
+    "titulo",
+    "data_recebimento",
+    "open_comments",
+    "qtd_comentarios",
+    "status_final",
+]
+
 
+def chave_e_valores_pcf(row):
+    """
+    (numero_documento, revisao_pcf, pcf_link) e valores de CAMPOS_PCF_BANCO
+    de uma linha lida; None se a linha não tem Nº DOCUMENTO.
+    """
+    numero_documento = safe_str(row.get("Nº DOCUMENTO"))
     if not numero_documento:
-        return False
+        return None
+
+    chave = (numero_documento, safe_str(row.get("Revisão da PCF")), safe_str(row.get("PCF LINK")))
+    valores = {
+        "caminho": safe_str(row.get("Caminho")),
+        "numero_pcf": safe_str(row.get("N º PCF")),
+        "titulo": safe_str(row.get("TITULO")),
+        "data_recebimento": safe_str(row.get("Data Recebimento")),
+        "open_comments": _safe_int(row.get("Open Comments")),
+        "qtd_comentarios": _safe_int(row.get("Qtd Comentarios")),
+        "status_final": safe_str(row.get("STATUS FINAL")),
+    }
+    return chave, valores
 
-    PCFTimeline.objects.update_or_create(
-        tipo=safe_str(tipo),
-        numero_documento=numero_documento,
-        revisao_pcf=revisao,
-        pcf_link=pcf_link,
-        defaults={
-            "caminho": safe_str(row.get("Caminho")),
-            "numero_pcf": safe_str(row.get("N º PCF")),
-            "titulo": safe_str(row.get("TITULO")),
-            "data_recebimento": safe_str(row.get("Data Recebimento")),
-            "open_comments": _safe_int(row.get("Open Comments")),
-            "qtd_comentarios": _safe_int(row.get("Qtd Comentarios")),
-            "status_final": safe_str(row.get("STATUS FINAL")),
-        },
+
+def sincronizar_pcfs_timeline(registros_por_tipo, *, caminhos_preservados=(), batch_size=None):
+    """
+    Upsert de PCFTimeline pela chave (tipo, numero_documento, revisao_pcf, pcf_link).
+
+    ``registros_por_tipo`` é {tipo: {(documento, revisão, pcf_link): valores}}.
+    Os registros atuais desses tipos são lidos numa consulta e comparados com
+    os lidos das pastas: só os novos são inseridos, só os alterados são
+    atualizados e só os que sumiram são apagados, tudo numa transação e em
+    lotes. Novos e alterados vão juntos num bulk_create com update_conflicts
+    (INSERT ... ON CONFLICT DO UPDATE pela chave): o bulk_update monta um
+    CASE por campo e linha e ficava mais lento que o update_or_create. Tipos fora de ``registros_por_tipo`` (aba preservada) não são
+    tocados, nem registros de ``caminhos_preservados`` (PCF com erro de leitura).
+    """
+    batch_size = max(int(batch_size or PCF_BANCO_BATCH_SIZE), 1)
+    inicio = time.perf_counter()
+    preservados = set(caminhos_preservados)
+
+    existentes = {}
+    consulta = PCFTimeline.objects.filter(tipo__in=list(registros_por_tipo)).values_list(
+        "pk", "tipo", "numero_documento", "revisao_pcf", "pcf_link", *CAMPOS_PCF_BANCO
     )
-    return True
+    for pk, tipo, documento, revisao, pcf_link, *valores in consulta.iterator(chunk_size=5000):
+        existentes[(tipo, documento, revisao, pcf_link)] = (pk, valores)
+
+    gravar = []
+    criados = 0
+    inalterados = 0
+    for tipo, registros in registros_por_tipo.items():
+        for (documento, revisao, pcf_link), valores in registros.items():
+            atual = existentes.pop((tipo, documento, revisao, pcf_link), None)
+            if atual is None:
+                criados += 1
+            elif atual[1] == [valores[campo] for campo in CAMPOS_PCF_BANCO]:
+                inalterados += 1
+                continue
+
+            gravar.append(
+                PCFTimeline(tipo=tipo, numero_documento=documento, revisao_pcf=revisao, pcf_link=pcf_link, **valores)
+            )
+
+    removidos = [
+        pk for pk, valores in existentes.values()
+        if valores[CAMPOS_PCF_BANCO.index("caminho")] not in preservados
+    ]
+
+    with transaction.atomic():
+        PCFTimeline.objects.bulk_create(
+            gravar,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=["tipo", "numero_documento", "revisao_pcf", "pcf_link"],
+            update_fields=CAMPOS_PCF_BANCO + ["atualizado_em"],
+        )
+        for i in range(0, len(removidos), batch_size):
+            PCFTimeline.objects.filter(pk__in=removidos[i:i + batch_size]).delete()
+
+    return {
+        "criados": criados,
+        "atualizados": len(gravar) - criados,
+        "inalterados": inalterados,
+        "removidos": len(removidos),
+        "segundos": round(time.perf_counter() - inicio, 3),
+    }
+
+
+def _valor_para_json(v):
+    if isinstance(v, datetime):
+        return {"$datetime": v.isoformat()}
+    if isinstance(v, date):
+        return {"$date": v.isoformat()}
+    if isinstance(v, dt_time):
+        return {"$time": v.isoformat()}
+    if v is None or isinstance(v, (str, int, float, bool)):
+        return v
+    return str(v)
+
+
+def _valor_de_json(v):
+    if isinstance(v, dict):
+        if "$datetime" in v:
+            return datetime.fromisoformat(v["$datetime"])
+        if "$date" in v:
+            return date.fromisoformat(v["$date"])
+        if "$time" in v:
+            return dt_time.fromisoformat(v["$time"])
+    return v
+
+
+class CachePCFs(CacheArquivos):
+    """
+    Cache em arquivo (JSON, em BACKUP_DIR) do registro extraído de cada PCF,
+    chaveado por (caminho, tamanho, mtime) — ver CacheArquivos.
+
+    Arquivos que não são PCF também ficam no cache (registro None).
+    """
+
+    CHAVE = "pcfs"
+    DESCRICAO = "o cache de PCFs"
+
+    def __init__(self, caminho=None, full=False):
+        super().__init__(caminho or CACHE_PCFS_ARQUIVO, full=full, avisar=log_aviso)
+
+    def assinatura(self):
+        return {"janela_linhas": PCF_JANELA_LINHAS}
+
+    def _de_entrada(self, caminho, entrada):
+        """Resultado no formato de extrair_pcf_com_tempo."""
+        registro = entrada.get("registro")
+        return {
+            "caminho": caminho,
+            "registro": None if registro is None else {k: _valor_de_json(v) for k, v in registro.items()},
+            "erro": "",
+            "aviso": entrada.get("aviso", ""),
+            "segundos": 0.0,
+            "cache": True,
+        }
+
+    def _para_entrada(self, lida):
+        registro = lida["registro"]
+        return {
+            "registro": None if registro is None else {k: _valor_para_json(v) for k, v in registro.items()},
+            "aviso": lida.get("aviso", ""),
+        }
+
+
+def criar_pool_pcfs(workers=None):
+    """Pool de processos para ler as PCFs, ou None para ler no próprio processo."""
+    return criar_pool_processos(PCF_WORKERS if workers is None else workers, avisar=log_aviso)
+
+
+def ler_pcfs(arquivos, pool=None, cache=None):
+    """
+    Resultados de extrair_pcf_com_tempo, na ordem de ``arquivos``, conforme ficam prontos.
 
-def atualizar_abas_pcf(wb):
+    Com ``cache``, só as PCFs novas ou alteradas vão para o pool.
+    """
+    return ler_com_cache(partial(extrair_pcf_com_tempo, max_linhas=PCF_JANELA_LINHAS), arquivos, pool, cache)
+
+
+def atualizar_abas_pcf(wb, cache=None):
+    """
+    Lê as PCFs, preenche as abas e sincroniza a PCFTimeline.
+
+    Devolve (resumo por aba, resumo da gravação no banco).
+    """
+    pool = criar_pool_pcfs()
+    workers = PCF_WORKERS if pool is not None else 1
+    log(f"Leitura das PCFs: {workers} worker(s), janela de {PCF_JANELA_LINHAS} linhas por PCF")
+
+    registros_por_tipo = {}
+    caminhos_com_erro = set()
+    try:
+        resumo = _atualizar_abas_pcf(wb, pool, cache, registros_por_tipo, caminhos_com_erro)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    for info in resumo.values():
+        info["workers"] = workers
+
+    log("Gravando PCFs no banco...")
+    banco = sincronizar_pcfs_timeline(registros_por_tipo, caminhos_preservados=caminhos_com_erro)
+    log(
+        f"Banco: {banco['criados']} criadas, {banco['atualizados']} atualizadas, "
+        f"{banco['inalterados']} inalteradas, {banco['removidos']} removidas em {banco['segundos']:.2f} s"
+    )
+    return resumo, banco
+
+
+def _atualizar_abas_pcf(wb, pool, cache, registros_por_tipo, caminhos_com_erro):
+    """Preenche as abas; as linhas lidas vão para ``registros_por_tipo`` (só abas com linhas)."""
     resumo = {}
 
     for aba, pasta in PASTAS_PCF.items():
@@ -547,14 +586,35 @@ def atualizar_abas_pcf(wb):
             continue
 
         rows = []
+        registros = {}
         erros = []
+        avisos = []
         ignorados_modelo = 0
+        tempos = []
+        inicio_leitura = time.perf_counter()
 
-        for idx, caminho in enumerate(arquivos, start=1):
+        for idx, lida in enumerate(ler_pcfs(arquivos, pool, cache), start=1):
+            caminho = lida["caminho"]
             nome = os.path.basename(caminho)
+            if not lida.get("cache"):
+                tempos.append({"arquivo": nome, "segundos": round(lida["segundos"], 3)})
+            log(f"Lendo {idx}/{len(arquivos)}: {nome}")
+
+            if lida["erro"]:
+                caminhos_com_erro.add(caminho)
+                erro = f"{caminho} :: {lida['erro']}"
+                erros.append(erro)
+                if MOSTRAR_CADA_ERRO:
+                    log_erro(erro)
+                continue
+
+            if lida.get("aviso"):
+                aviso = f"{caminho} :: {lida['aviso']}"
+                avisos.append(aviso)
+                log_aviso(aviso)
+
             try:
-                log(f"Lendo {idx}/{len(arquivos)}: {nome}")
-                row = extrair_dados_pcf(caminho)
+                row = lida["registro"]
 
                 if row is None:
                     ignorados_modelo += 1
@@ -564,7 +624,9 @@ def atualizar_abas_pcf(wb):
                     continue
 
                 rows.append(row)
-                salvar_pcf_no_banco(aba, row)
+                chave_valores = chave_e_valores_pcf(row)
+                if chave_valores is not None:
+                    registros[chave_valores[0]] = chave_valores[1]
 
                 if MOSTRAR_CADA_PCF_LIDA:
                     log_ok(
@@ -576,11 +638,19 @@ def atualizar_abas_pcf(wb):
                     )
 
             except Exception as e:
+                caminhos_com_erro.add(caminho)
                 erro = f"{caminho} :: {type(e).__name__}: {e}"
                 erros.append(erro)
                 if MOSTRAR_CADA_ERRO:
                     log_erro(erro)
 
+        segundos_leitura = time.perf_counter() - inicio_leitura
+        tempos.sort(key=lambda t: t["segundos"], reverse=True)
+        log(
+            f"Leitura de {len(arquivos)} arquivos ({len(tempos)} abertos) em {segundos_leitura:.1f} s"
+            + (f" (mais lenta: {tempos[0]['arquivo']} {tempos[0]['segundos']:.2f} s)" if tempos else "")
+        )
+
         if len(rows) == 0:
             log_aviso(
                 f"{len(arquivos)} arquivos encontrados, mas 0 PCFs lidas em '{aba}'. Aba preservada."
@@ -588,12 +658,15 @@ def atualizar_abas_pcf(wb):
             if erros:
                 log("Primeiros erros:")
                 for erro in erros[:20]:
-                    print(" -", erro)
+                    LOG.escrever(f" - {erro}")
 
             resumo[aba] = {
                 "arquivos": len(arquivos),
                 "linhas": 0,
                 "erros": erros or ["0 arquivos lidos; aba preservada."],
+                "avisos": avisos,
+                "segundos_leitura": round(segundos_leitura, 3),
+                "tempos": tempos,
             }
             continue
 
@@ -605,18 +678,24 @@ def atualizar_abas_pcf(wb):
             )
         )
         links_aplicados = limpar_e_preencher_aba(ws, rows, headers)
+        registros_por_tipo[aba] = registros
 
         log_ok(f"Aba '{aba}' preenchida com {len(rows)} linhas.")
         log_ok(f"Links aplicados em '{aba}': {links_aplicados}")
         log(f"Ignorados como nao-PCF/modelo invalido: {ignorados_modelo}")
         log(f"Erros de leitura: {len(erros)}")
+        if avisos:
+            log(f"PCFs lidas só em parte (janela de {PCF_JANELA_LINHAS} linhas): {len(avisos)}")
 
         resumo[aba] = {
             "arquivos": len(arquivos),
             "linhas": len(rows),
             "links": links_aplicados,
             "erros": erros,
+            "avisos": avisos,
             "ignorados_modelo": ignorados_modelo,
+            "segundos_leitura": round(segundos_leitura, 3),
+            "tempos": tempos,
         }
 
     return resumo
@@ -836,7 +915,9 @@ def salvar_com_trava(wb, resumo, backup_path):
 
 
 
-def executar():
+def executar(full=False):
+    """``full=True`` ignora o cache de PCFs e relê todos os arquivos."""
+    LOG.limpar_memoria()
     try:
         log_secao("Início da atualização da Timeline PCFs")
         log(f"Arquivo Timeline: {ARQUIVO_XLSX}")
@@ -853,7 +934,18 @@ def executar():
 
         log("Abrindo Timeline...")
         wb = load_workbook(ARQUIVO_XLSX)
-        resumo = atualizar_abas_pcf(wb)
+        cache = CachePCFs(full=full) if USAR_CACHE_PCFS else None
+        resumo, banco = atualizar_abas_pcf(wb, cache)
+
+        resumo_cache = None
+        if cache is not None:
+            cache.salvar()
+            resumo_cache = cache.resumo()
+            log(
+                f"Cache de PCFs{' (full)' if full else ''}: {resumo_cache['hits']} hits, "
+                f"{resumo_cache['misses']} misses, {resumo_cache['removidas']} removidas (arquivo sumiu), "
+                f"{resumo_cache['erros']} com erro de leitura"
+            )
 
         total_linhas = sum(info.get("linhas", 0) for info in resumo.values())
         total_arquivos = sum(info.get("arquivos", 0) for info in resumo.values())
@@ -887,9 +979,9 @@ def executar():
             )
             log(f"Ignorados como não-PCF/modelo inválido: {info.get('ignorados_modelo', 0)}")
             if info.get("erros"):
-                print(f"Avisos/erros em {aba}:")
+                LOG.escrever(f"Avisos/erros em {aba}:")
                 for erro in info["erros"][:30]:
-                    print(" -", erro)
+                    LOG.escrever(f" - {erro}")
 
         status = "sucesso_parcial" if total_erros else "sucesso"
         return {
@@ -907,6 +999,10 @@ def executar():
                 "erros": total_erros,
                 "resumo": resumo,
                 "backup": backup_path,
+                "workers": max((info.get("workers", 1) for info in resumo.values()), default=1),
+                "cache_pcfs": resumo_cache,
+                "banco": banco,
+                "log": LOG.ultimas_linhas(),
             },
         }
 
@@ -914,5 +1010,5 @@ def executar():
         return {
             "ok": False,
             "mensagem": str(e),
-            "detalhes": {"erro": str(e), "tipo": e.__class__.__name__},
+            "detalhes": {"erro": str(e), "tipo": e.__class__.__name__, "log": LOG.ultimas_linhas()},
         }
@@ -1,10 +1,20 @@
+import os
 import re
+import time
+from functools import partial
 from apps.automacoes.models import TransmittalKM, ExecucaoAutomacao
+from apps.automacoes.services.cache_json import CacheArquivos
 from apps.automacoes.services.document_link_engine import executar_vinculo_km_ld
+from apps.automacoes.services.leitura_paralela import criar_pool_processos, ler_com_cache
+from apps.automacoes.services.log_automacao import LogAutomacao
+from apps.automacoes.services.pdf_texto import extrair_texto_com_tempo
 from pathlib import Path
 from typing import Dict, List, Tuple
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill
 
 
@@ -19,6 +29,22 @@ ARQUIVO_EXCEL_NOVO = Path(
 ABA_PLANILHA = "Planilha1"
 ABA_LOG = "LOG"
 
+# leitura dos PDFs: processos em paralelo (1 = no próprio processo)
+PDF_WORKERS = getattr(settings, "TRANSMITTAL_KM_WORKERS", 4)
+# páginas lidas por PDF (0 = todas, como sempre foi); um limite só vale para
+# lotes em que "Document Information" e "Sent By" cabem nas primeiras páginas
+MAX_PAGINAS_PDF = getattr(settings, "TRANSMITTAL_KM_MAX_PAGINAS", 0)
+# texto já extraído, por (caminho, tamanho, mtime, páginas), num arquivo local (fora da rede)
+USAR_CACHE_TEXTOS = True
+CACHE_TEXTOS_ARQUIVO = getattr(
+    settings,
+    "TRANSMITTAL_KM_CACHE_TEXTOS",
+    os.path.join(str(getattr(settings, "BASE_DIR", ".")), ".cache", "transmittal_km_textos.json"),
+)
+
+# terminal + últimas linhas para o resultado do job
+LOG = LogAutomacao()
+
 CABECALHOS = [
     "Documento",
     "Titulo",
@@ -42,7 +68,6 @@ PROPOSITOS_CONHECIDOS = [
 PREENCHIMENTO_AMARELO = PatternFill(fill_type="solid", fgColor="FFF2CC")
 PREENCHIMENTO_VERMELHO = PatternFill(fill_type="solid", fgColor="F4CCCC")
 FONTE_LINK = Font(color="0563C1", underline="single")
-pdfplumber = None
 
 
 def normalizar_data(texto: str) -> str:
@@ -59,18 +84,51 @@ def limpar_valor(valor: str) -> str:
     return valor.strip()
 
 
-def extrair_texto_pdf(caminho_pdf: Path) -> str:
-    textos = []
-    try:
-        with pdfplumber.open(caminho_pdf) as pdf:
-            for pagina in pdf.pages:
-                texto = pagina.extract_text()
-                if texto:
-                    textos.append(texto)
-    except Exception as e:
-        print(f"[ERRO] Falha ao ler PDF {caminho_pdf.name}: {e}")
-        return ""
-    return "\n".join(textos)
+class CacheTextosPDF(CacheArquivos):
+    """
+    Cache em arquivo local (JSON) do texto extraído de cada PDF, chaveado por
+    (caminho, tamanho, mtime) e pelo limite de páginas usado na extração —
+    ver CacheArquivos.
+    """
+
+    CHAVE = "pdfs"
+    DESCRICAO = "o cache de textos"
+
+    def __init__(self, caminho=None, max_paginas=None, full=False):
+        self.max_paginas = max_paginas or 0
+        super().__init__(
+            caminho or CACHE_TEXTOS_ARQUIVO,
+            full=full,
+            avisar=lambda mensagem: LOG.escrever(f"[AVISO] {mensagem}"),
+        )
+
+    def assinatura(self):
+        return {"max_paginas": self.max_paginas}
+
+    def _de_entrada(self, caminho, entrada):
+        """Resultado no formato de extrair_texto_com_tempo."""
+        return {"caminho": caminho, "texto": entrada.get("texto") or "", "erro": "", "segundos": 0.0, "cache": True}
+
+    def _para_entrada(self, lida):
+        return {"texto": lida["texto"]}
+
+
+def criar_pool_pdfs(workers=None):
+    """Pool de processos para ler os PDFs, ou None para ler no próprio processo."""
+    return criar_pool_processos(
+        PDF_WORKERS if workers is None else workers,
+        avisar=lambda mensagem: LOG.escrever(f"[AVISO] {mensagem}"),
+    )
+
+
+def ler_textos_pdfs(pdfs, pool=None, cache=None, max_paginas=None):
+    """
+    Resultados de extrair_texto_com_tempo, na ordem de ``pdfs``, conforme ficam prontos.
+
+    Com ``cache``, só os PDFs novos ou alterados vão para o pool.
+    """
+    tarefa = partial(extrair_texto_com_tempo, max_paginas=max_paginas)
+    return ler_com_cache(tarefa, [str(pdf) for pdf in pdfs], pool, cache)
 
 
 def normalizar_texto(texto: str) -> str:
@@ -295,18 +353,52 @@ def extrair_registros_pdf(texto: str, nome_arquivo: str, caminho_pdf: Path) -> L
     return registros
 
 
+CAB_LOG = ["Arquivo PDF", "Transmittal N°", "Status", "Mensagem"]
+
+LARGURAS_PLANILHA = {
+    "A": 20,
+    "B": 65,
+    "C": 22,
+    "D": 25,
+    "E": 32,
+    "F": 15,
+    "G": 18,
+}
+
+LARGURAS_LOG = {
+    "A": 28,
+    "B": 18,
+    "C": 14,
+    "D": 90,
+}
+
+# gravação no banco: linhas por INSERT ... ON CONFLICT
+TRANSMITTAL_BANCO_BATCH_SIZE = 500
+
+CAMPOS_TRANSMITTAL_BANCO = [
+    "titulo",
+    "pasta",
+    "emissao",
+    "proposito_emissao",
+    "data_envio",
+    "arquivo_pdf",
+    "status_parse",
+    "observacao_parse",
+]
+
+
 def criar_planilha_nova():
-    wb = Workbook()
-    ws = wb.active
-    ws.title = ABA_PLANILHA
+    """Workbook em modo write-only: as linhas vão direto para o arquivo, sem manter as células em memória."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(ABA_PLANILHA)
     ws_log = wb.create_sheet(ABA_LOG)
 
-    for i, nome in enumerate(CABECALHOS, start=1):
-        ws.cell(row=1, column=i).value = nome
+    # no modo write-only as larguras precisam ser definidas antes da primeira linha
+    ajustar_largura(ws)
+    ajustar_largura_log(ws_log)
 
-    cab_log = ["Arquivo PDF", "Transmittal N°", "Status", "Mensagem"]
-    for i, nome in enumerate(cab_log, start=1):
-        ws_log.cell(row=1, column=i).value = nome
+    ws.append(CABECALHOS)
+    ws_log.append(CAB_LOG)
 
     return wb, ws, ws_log
 
@@ -318,7 +410,7 @@ def aplicar_link_nativo(celula, texto_exibido: str, arquivo_pdf: str):
         celula.font = FONTE_LINK
 
 
-def destacar_linha(ws, linha: int, dados: dict):
+def destacar_linha(celulas, dados: dict):
     campos_criticos = {
         1: dados.get("Documento", ""),
         2: dados.get("Titulo", ""),
@@ -330,100 +422,168 @@ def destacar_linha(ws, linha: int, dados: dict):
 
     for coluna, valor in campos_criticos.items():
         if not str(valor).strip():
-            ws.cell(linha, coluna).fill = PREENCHIMENTO_AMARELO
+            celulas[coluna - 1].fill = PREENCHIMENTO_AMARELO
 
     if dados.get("Status Parse") == "FALHA":
         for coluna in range(1, 8):
-            ws.cell(linha, coluna).fill = PREENCHIMENTO_VERMELHO
+            celulas[coluna - 1].fill = PREENCHIMENTO_VERMELHO
 
 
 def adicionar_linha(ws, dados: dict):
-    linha = ws.max_row + 1
     arquivo_pdf = dados.get("Arquivo PDF", "")
+    celulas = [WriteOnlyCell(ws) for _ in CABECALHOS]
+
+    aplicar_link_nativo(celulas[0], dados["Documento"], arquivo_pdf)
+    celulas[1].value = dados["Titulo"]
+    celulas[2].value = dados["Pasta"]
+    celulas[3].value = dados["Emissão"]
+    celulas[4].value = dados["Proposito de Emissão"]
 
-    aplicar_link_nativo(ws.cell(linha, 1), dados["Documento"], arquivo_pdf)
-    ws.cell(linha, 2).value = dados["Titulo"]
-    ws.cell(linha, 3).value = dados["Pasta"]
-    ws.cell(linha, 4).value = dados["Emissão"]
-    ws.cell(linha, 5).value = dados["Proposito de Emissão"]
+    celulas[5].value = normalizar_data(dados["Data Envio"])
+    celulas[5].number_format = "@"
 
-    cel_data = ws.cell(linha, 6)
-    cel_data.value = normalizar_data(dados["Data Envio"])
-    cel_data.number_format = "@"
+    aplicar_link_nativo(celulas[6], dados["Transmittal N°"], arquivo_pdf)
 
-    aplicar_link_nativo(ws.cell(linha, 7), dados["Transmittal N°"], arquivo_pdf)
+    destacar_linha(celulas, dados)
+    ws.append(celulas)
 
-    destacar_linha(ws, linha, dados)
 
+def registrar_log(logs: list, arquivo_pdf: str, transmittal: str, status: str, mensagem: str):
+    """Guarda a ocorrência para a aba LOG, escrita depois das linhas da planilha."""
+    logs.append((Path(arquivo_pdf).name if arquivo_pdf else "", transmittal, status, mensagem))
 
-def registrar_log(ws_log, arquivo_pdf: str, transmittal: str, status: str, mensagem: str):
-    linha = ws_log.max_row + 1
-    ws_log.cell(linha, 1).value = Path(arquivo_pdf).name if arquivo_pdf else ""
-    ws_log.cell(linha, 2).value = transmittal
-    ws_log.cell(linha, 3).value = status
-    ws_log.cell(linha, 4).value = mensagem
+
+def adicionar_linha_log(ws_log, arquivo: str, transmittal: str, status: str, mensagem: str):
+    celulas = [WriteOnlyCell(ws_log, value=valor) for valor in (arquivo, transmittal, status, mensagem)]
 
     if status in {"FALHA", "ERRO"}:
-        for coluna in range(1, 5):
-            ws_log.cell(linha, coluna).fill = PREENCHIMENTO_VERMELHO
+        for celula in celulas:
+            celula.fill = PREENCHIMENTO_VERMELHO
     elif status in {"PARCIAL", "AVISO"}:
-        for coluna in range(1, 5):
-            ws_log.cell(linha, coluna).fill = PREENCHIMENTO_AMARELO
+        for celula in celulas:
+            celula.fill = PREENCHIMENTO_AMARELO
+
+    ws_log.append(celulas)
 
 
 def ajustar_largura(ws):
-    larguras = {
-        "A": 20,
-        "B": 65,
-        "C": 22,
-        "D": 25,
-        "E": 32,
-        "F": 15,
-        "G": 18,
-    }
-    for col, largura in larguras.items():
+    for col, largura in LARGURAS_PLANILHA.items():
         ws.column_dimensions[col].width = largura
 
 
 def ajustar_largura_log(ws_log):
-    larguras = {
-        "A": 28,
-        "B": 18,
-        "C": 14,
-        "D": 90,
-    }
-    for col, largura in larguras.items():
+    for col, largura in LARGURAS_LOG.items():
         ws_log.column_dimensions[col].width = largura
 
 
+def exportar_planilha(linhas, logs, destino=None):
+    """
+    Grava a planilha (Planilha1 + LOG) em streaming, num arquivo temporário
+    ao lado do destino, e só então substitui o arquivo anterior: quem estiver
+    com a planilha aberta na rede nunca vê um arquivo pela metade.
+    """
+    destino = Path(destino or ARQUIVO_EXCEL_NOVO)
+    wb, ws, ws_log = criar_planilha_nova()
+
+    for dados in linhas:
+        adicionar_linha(ws, dados)
+    for ocorrencia in logs:
+        adicionar_linha_log(ws_log, *ocorrencia)
 
-def salvar_no_banco(dados: dict):
+    temporario = destino.with_name(f"~{destino.stem}.tmp{destino.suffix}")
+    try:
+        wb.save(temporario)
+        os.replace(temporario, destino)
+    finally:
+        if temporario.exists():
+            temporario.unlink()
+    return destino
+
+
+def chave_e_valores_transmittal(dados: dict):
+    """
+    Chave (documento, transmittal_numero) e valores de CAMPOS_TRANSMITTAL_BANCO
+    de uma linha lida; None se a linha não tem documento.
+    """
     documento = dados.get("Documento", "").strip()
     transmittal = dados.get("Transmittal N°", "").strip()
 
     if not documento:
-        return False
-
-    TransmittalKM.objects.update_or_create(
-        documento=documento,
-        transmittal_numero=transmittal,
-        defaults={
-            "titulo": dados.get("Titulo", ""),
-            "pasta": dados.get("Pasta", ""),
-            "emissao": dados.get("Emissão", ""),
-            "proposito_emissao": dados.get("Proposito de Emissão", ""),
-            "data_envio": normalizar_data(dados.get("Data Envio", "")),
-            "arquivo_pdf": dados.get("Arquivo PDF", ""),
-            "status_parse": dados.get("Status Parse", ""),
-            "observacao_parse": dados.get("Observação Parse", ""),
-        },
-    )
-    return True
+        return None
+
+    return (documento, transmittal), {
+        "titulo": dados.get("Titulo", ""),
+        "pasta": dados.get("Pasta", ""),
+        "emissao": dados.get("Emissão", ""),
+        "proposito_emissao": dados.get("Proposito de Emissão", ""),
+        "data_envio": normalizar_data(dados.get("Data Envio", "")),
+        "arquivo_pdf": dados.get("Arquivo PDF", ""),
+        "status_parse": dados.get("Status Parse", ""),
+        "observacao_parse": dados.get("Observação Parse", ""),
+    }
 
 
-def processar():
+def sincronizar_transmittals_km(registros, *, batch_size=None):
+    """
+    Upsert de TransmittalKM pela chave (documento, transmittal_numero).
+
+    ``registros`` é {(documento, transmittal): valores}. Os registros atuais
+    são lidos numa consulta e comparados com os lidos dos PDFs: só os novos e
+    os alterados são gravados, num bulk_create com update_conflicts, em lotes
+    e numa transação (mesmo caminho da PCFTimeline). Registros cujo PDF sumiu
+    da pasta continuam no banco, como no update_or_create linha a linha.
+    """
+    batch_size = max(int(batch_size or TRANSMITTAL_BANCO_BATCH_SIZE), 1)
+    inicio = time.perf_counter()
+
+    existentes = {}
+    consulta = TransmittalKM.objects.values_list("documento", "transmittal_numero", *CAMPOS_TRANSMITTAL_BANCO)
+    for documento, transmittal, *valores in consulta.iterator(chunk_size=5000):
+        existentes[(documento, transmittal)] = valores
+
+    gravar = []
+    criados = 0
+    inalterados = 0
+    for (documento, transmittal), valores in registros.items():
+        atual = existentes.get((documento, transmittal))
+        if atual is None:
+            criados += 1
+        elif atual == [valores[campo] for campo in CAMPOS_TRANSMITTAL_BANCO]:
+            inalterados += 1
+            continue
+
+        gravar.append(TransmittalKM(documento=documento, transmittal_numero=transmittal, **valores))
+
+    with transaction.atomic():
+        TransmittalKM.objects.bulk_create(
+            gravar,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=["documento", "transmittal_numero"],
+            update_fields=CAMPOS_TRANSMITTAL_BANCO + ["atualizado_em"],
+        )
+
+    return {
+        "criados": criados,
+        "atualizados": len(gravar) - criados,
+        "inalterados": inalterados,
+        "segundos": round(time.perf_counter() - inicio, 3),
+    }
+
+
+def processar(full=False):
+    """
+    ``full=True`` ignora o cache de textos e relê todos os PDFs.
+
+    Roda em quatro etapas cronometradas (varredura da pasta, leitura dos PDFs,
+    gravação no banco e exportação da planilha); os tempos vão para o log e
+    para ``detalhes["etapas"]``.
+    """
+    etapas = {}
+    inicio = time.perf_counter()
+
     if not PASTA_PDFS.exists():
-        print(f"[ERRO] Pasta não encontrada: {PASTA_PDFS}")
+        LOG.escrever(f"[ERRO] Pasta não encontrada: {PASTA_PDFS}")
         return {
             "ok": False,
             "pdfs_lidos": 0,
@@ -433,85 +593,136 @@ def processar():
         }
 
     pdfs = sorted(PASTA_PDFS.glob("*.pdf"))
+    etapas["varredura"] = round(time.perf_counter() - inicio, 3)
+    LOG.escrever(f"[INFO] Varredura: {len(pdfs)} PDFs em {etapas['varredura']:.1f} s")
     if not pdfs:
-        print(f"[AVISO] Nenhum PDF encontrado em: {PASTA_PDFS}")
+        LOG.escrever(f"[AVISO] Nenhum PDF encontrado em: {PASTA_PDFS}")
         return {
             "ok": False,
             "pdfs_lidos": 0,
             "linhas_gravadas": 0,
             "arquivo": str(ARQUIVO_EXCEL_NOVO),
             "mensagem": f"Nenhum PDF encontrado em: {PASTA_PDFS}",
+            "etapas": etapas,
         }
 
-    wb, ws, ws_log = criar_planilha_nova()
-
     total_pdfs_lidos = 0
-    total_registros = 0
 
     vistos = set()
+    linhas = []
+    logs = []
+    registros_banco = {}
+
+    max_paginas = MAX_PAGINAS_PDF or None
+    cache = CacheTextosPDF(max_paginas=max_paginas, full=full) if USAR_CACHE_TEXTOS else None
+    pool = criar_pool_pdfs()
+    workers = PDF_WORKERS if pool is not None else 1
+    LOG.escrever(
+        f"[INFO] Leitura dos PDFs: {workers} worker(s), "
+        f"{f'até {max_paginas} página(s)' if max_paginas else 'todas as páginas'} por PDF"
+    )
+    tempos = []
+    inicio = time.perf_counter()
 
-    for pdf in pdfs:
-        print(f"[INFO] Processando: {pdf.name}")
-        texto = extrair_texto_pdf(pdf)
-
-        if not texto.strip():
-            registrar_log(
-                ws_log,
-                str(pdf),
-                "",
-                "ERRO",
-                "Não foi possível extrair texto do PDF.",
-            )
-            continue
-
-        total_pdfs_lidos += 1
-
-        try:
-            registros = extrair_registros_pdf(texto, pdf.name, pdf)
-        except Exception as e:
-            registrar_log(
-                ws_log,
-                str(pdf),
-                "",
-                "ERRO",
-                f"Erro ao interpretar conteúdo: {e}",
-            )
-            continue
-
-        for dados in registros:
-            chave = (dados["Documento"], dados["Transmittal N°"])
-            if chave in vistos:
+    try:
+        for lida in ler_textos_pdfs(pdfs, pool, cache, max_paginas):
+            pdf = Path(lida["caminho"])
+            LOG.escrever(f"[INFO] Processando: {pdf.name}")
+            if not lida.get("cache"):
+                tempos.append({"arquivo": pdf.name, "segundos": round(lida["segundos"], 3)})
+            if lida["erro"]:
+                LOG.escrever(f"[ERRO] Falha ao ler PDF {pdf.name}: {lida['erro']}")
+            texto = lida["texto"]
+
+            if not texto.strip():
                 registrar_log(
-                    ws_log,
-                    dados.get("Arquivo PDF", ""),
-                    dados.get("Transmittal N°", ""),
-                    "AVISO",
-                    f"Duplicado ignorado para documento {dados.get('Documento', '')}.",
+                    logs,
+                    str(pdf),
+                    "",
+                    "ERRO",
+                    "Não foi possível extrair texto do PDF.",
                 )
                 continue
 
-            vistos.add(chave)
-            adicionar_linha(ws, dados)
-            salvar_no_banco(dados)
-            total_registros += 1
+            total_pdfs_lidos += 1
 
-            if dados.get("Status Parse", "OK") != "OK":
+            try:
+                registros = extrair_registros_pdf(texto, pdf.name, pdf)
+            except Exception as e:
                 registrar_log(
-                    ws_log,
-                    dados.get("Arquivo PDF", ""),
-                    dados.get("Transmittal N°", ""),
-                    dados.get("Status Parse", ""),
-                    dados.get("Observação Parse", ""),
+                    logs,
+                    str(pdf),
+                    "",
+                    "ERRO",
+                    f"Erro ao interpretar conteúdo: {e}",
                 )
+                continue
 
-    ajustar_largura(ws)
-    ajustar_largura_log(ws_log)
-    wb.save(ARQUIVO_EXCEL_NOVO)
+            for dados in registros:
+                chave = (dados["Documento"], dados["Transmittal N°"])
+                if chave in vistos:
+                    registrar_log(
+                        logs,
+                        dados.get("Arquivo PDF", ""),
+                        dados.get("Transmittal N°", ""),
+                        "AVISO",
+                        f"Duplicado ignorado para documento {dados.get('Documento', '')}.",
+                    )
+                    continue
+
+                vistos.add(chave)
+                linhas.append(dados)
+                registro = chave_e_valores_transmittal(dados)
+                if registro is not None:
+                    registros_banco[registro[0]] = registro[1]
+
+                if dados.get("Status Parse", "OK") != "OK":
+                    registrar_log(
+                        logs,
+                        dados.get("Arquivo PDF", ""),
+                        dados.get("Transmittal N°", ""),
+                        dados.get("Status Parse", ""),
+                        dados.get("Observação Parse", ""),
+                    )
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    etapas["leitura"] = round(time.perf_counter() - inicio, 3)
+    tempos.sort(key=lambda t: t["segundos"], reverse=True)
+    resumo_cache = None
+    if cache is not None:
+        cache.salvar()
+        resumo_cache = cache.resumo()
+        LOG.escrever(
+            f"[INFO] Cache de textos{' (full)' if full else ''}: {resumo_cache['hits']} hits, "
+            f"{resumo_cache['misses']} misses, {resumo_cache['removidas']} removidas, "
+            f"{resumo_cache['erros']} com erro de leitura"
+        )
+    LOG.escrever(f"[INFO] Leitura: {len(pdfs)} PDFs ({len(tempos)} abertos) em {etapas['leitura']:.1f} s")
+
+    banco = sincronizar_transmittals_km(registros_banco)
+    etapas["banco"] = banco["segundos"]
+    LOG.escrever(
+        f"[INFO] Banco: {banco['criados']} criados, {banco['atualizados']} atualizados, "
+        f"{banco['inalterados']} inalterados em {etapas['banco']:.1f} s"
+    )
+
+    inicio = time.perf_counter()
+    exportar_planilha(linhas, logs)
+    etapas["exportacao"] = round(time.perf_counter() - inicio, 3)
+    LOG.escrever(f"[INFO] Exportação: {len(linhas)} linhas e {len(logs)} ocorrências em {etapas['exportacao']:.1f} s")
 
-    print("\n=== RESUMO TRANSMITTAL KM ===")
-    print(f"PDFs lidos: {total_pdfs_lidos}")
-    print(f"Linhas gravadas: {total_registros}")
-    print(f"Arquivo gerado: {ARQUIVO_EXCEL_NOVO}")
+    total_registros = len(linhas)
+
+    LOG.escrever("\n=== RESUMO TRANSMITTAL KM ===")
+    LOG.escrever(f"PDFs lidos: {total_pdfs_lidos}")
+    LOG.escrever(f"Linhas gravadas: {total_registros}")
+    LOG.escrever(f"Arquivo gerado: {ARQUIVO_EXCEL_NOVO}")
+    LOG.escrever(
+        "Etapas: "
+        + " | ".join(f"{nome} {segundos:.1f} s" for nome, segundos in etapas.items())
+    )
 
     return {
         "ok": True,
@@ -523,19 +734,23 @@ def processar():
             "pdfs_lidos": total_pdfs_lidos,
             "linhas_gravadas": total_registros,
             "arquivo": str(ARQUIVO_EXCEL_NOVO),
+            "workers": workers,
+            "max_paginas": max_paginas or 0,
+            "cache_textos": resumo_cache,
+            "etapas": etapas,
+            "banco": banco,
+            "tempos_leitura": tempos,
         },
     }
 
 
 
-def executar():
-    global pdfplumber
 
+def executar(full=False):
+    """``full=True`` ignora o cache de textos e relê todos os PDFs."""
+    LOG.limpar_memoria()
     try:
-        import pdfplumber as pdfplumber_module
-        pdfplumber = pdfplumber_module
-
-        resumo = processar()
+        resumo = processar(full=full)
         if not isinstance(resumo, dict):
             return {
                 "ok": False,
@@ -556,7 +771,13 @@ def executar():
                 "detalhes": resumo,
             }
 
+        inicio_vinculo = time.perf_counter()
         resultado_vinculo = executar_vinculo_km_ld()
+        etapas = {
+            **((resumo.get("detalhes") or {}).get("etapas") or {}),
+            "vinculo": round(time.perf_counter() - inicio_vinculo, 3),
+        }
+        LOG.escrever(f"[INFO] Vínculo KM x LD em {etapas['vinculo']:.1f} s")
         detalhes_vinculo = resultado_vinculo.get("detalhes", {}) if isinstance(resultado_vinculo, dict) else {}
 
         vinculados_auto = int(detalhes_vinculo.get("vinculados_auto") or 0)
@@ -577,9 +798,11 @@ def executar():
             ),
             "quantidade_processada": linhas_gravadas,
             "detalhes": {
+                **(resumo.get("detalhes") or {}),
                 "pdfs_lidos": pdfs_lidos,
                 "linhas_gravadas": linhas_gravadas,
                 "arquivo": arquivo,
+                "etapas": etapas,
                 "vinculo_km_ld": {
                     "ok": bool(resultado_vinculo.get("ok", False)) if isinstance(resultado_vinculo, dict) else False,
                     "mensagem": resultado_vinculo.get("mensagem", "") if isinstance(resultado_vinculo, dict) else "",
@@ -590,13 +813,14 @@ def executar():
                     "conflitos": conflitos,
                     "detalhes": detalhes_vinculo,
                 },
+                "log": LOG.ultimas_linhas(),
             },
         }
 
     except Exception as e:
-        print(f"[ERRO TRANSMITTAL KM] {e}")
+        LOG.escrever(f"[ERRO TRANSMITTAL KM] {e}")
         return {
             "ok": False,
             "mensagem": f"Erro no Transmittal KM: {e}",
-            "detalhes": {"erro": str(e), "tipo": e.__class__.__name__},
+            "detalhes": {"erro": str(e), "tipo": e.__class__.__name__, "log": LOG.ultimas_linhas()},
         }
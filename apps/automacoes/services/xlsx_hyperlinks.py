@@ -0,0 +1,95 @@
+"""
+Leitura de hyperlinks direto do pacote .xlsx/.xlsm, sem Excel.
+
+O endereço de cada hyperlink fica em duas partes do zip: o elemento
+<hyperlink ref="B2" r:id="rId3" location="..."/> no XML da aba e o destino
+do rId no _rels da aba. As duas são lidas em fluxo (iterparse), limpando as
+linhas de sheetData conforme passam, e viram um mapa {"B2": endereço} no
+mesmo formato que Hyperlinks(1).Address/SubAddress devolve pelo COM.
+"""
+
+from __future__ import annotations
+
+import posixpath
+import zipfile
+from urllib.parse import unquote
+from xml.etree.ElementTree import iterparse
+
+from openpyxl.utils import get_column_letter, range_boundaries
+
+
+NS_PLANILHA = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_RELACOES = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PACOTE = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+
+def _ler_relacoes(pacote: zipfile.ZipFile, caminho: str) -> dict[str, str]:
+    try:
+        with pacote.open(caminho) as arquivo:
+            return {
+                elem.get("Id"): elem.get("Target") or ""
+                for _, elem in iterparse(arquivo)
+                if elem.tag == f"{{{NS_PACOTE}}}Relationship"
+            }
+    except KeyError:
+        return {}
+
+
+def _caminho_da_aba(pacote: zipfile.ZipFile, aba: str) -> str:
+    relacoes = _ler_relacoes(pacote, "xl/_rels/workbook.xml.rels")
+
+    with pacote.open("xl/workbook.xml") as arquivo:
+        for _, elem in iterparse(arquivo):
+            if elem.tag == f"{{{NS_PLANILHA}}}sheet" and elem.get("name") == aba:
+                destino = relacoes.get(elem.get(f"{{{NS_RELACOES}}}id"), "")
+                if destino.startswith("/"):
+                    return destino.lstrip("/")
+                return posixpath.normpath(posixpath.join("xl", destino))
+
+    raise KeyError(f"Aba não encontrada no arquivo: {aba}")
+
+
+def _endereco_excel(destino: str) -> str:
+    """Desfaz a codificação de URL que o Excel aplica a caminhos de arquivo."""
+    destino = unquote(destino or "")
+    if destino.lower().startswith("file:///"):
+        resto = destino[len("file:///"):]
+        if resto.startswith("\\\\") or (len(resto) > 1 and resto[1] == ":"):
+            return resto
+    return destino
+
+
+def _celulas(ref: str):
+    """'B2' ou 'B2:B4' -> B2, B3, B4."""
+    min_col, min_row, max_col, max_row = range_boundaries(ref)
+    for linha in range(min_row, max_row + 1):
+        for coluna in range(min_col, max_col + 1):
+            yield f"{get_column_letter(coluna)}{linha}"
+
+
+def extrair_hyperlinks_xlsx(caminho: str, aba: str) -> dict[str, str]:
+    """
+    Mapa {referência da célula: endereço} dos hyperlinks de uma aba.
+
+    Links para arquivo/URL devolvem o destino do _rels; links internos, a
+    location; quando há os dois, "destino#location".
+    """
+    with zipfile.ZipFile(caminho) as pacote:
+        parte = _caminho_da_aba(pacote, aba)
+        pasta, nome = posixpath.split(parte)
+        relacoes = _ler_relacoes(pacote, posixpath.join(pasta, "_rels", f"{nome}.rels"))
+
+        hyperlinks = {}
+        with pacote.open(parte) as arquivo:
+            for _, elem in iterparse(arquivo):
+                tag = elem.tag
+                if tag == f"{{{NS_PLANILHA}}}row":
+                    elem.clear()
+                elif tag == f"{{{NS_PLANILHA}}}hyperlink":
+                    destino = _endereco_excel(relacoes.get(elem.get(f"{{{NS_RELACOES}}}id"), ""))
+                    local = elem.get("location") or ""
+                    endereco = f"{destino}#{local}" if destino and local else (destino or local)
+                    for celula in _celulas(elem.get("ref") or ""):
+                        hyperlinks[celula] = endereco.strip()
+
+    return hyperlinks
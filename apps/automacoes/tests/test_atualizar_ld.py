@@ -0,0 +1,738 @@
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from openpyxl import Workbook, load_workbook
+from openpyxl.workbook.defined_name import DefinedName
+from openpyxl.worksheet.datavalidation import DataValidation
+
+from apps.automacoes.models import DocumentoLD, ExecucaoAutomacao
+from apps.automacoes.services import atualizar_ld
+
+
+def _arquivo(caminho, conteudo="x"):
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    caminho.write_text(conteudo, encoding="utf-8")
+
+
+def _tocar_pasta(pasta):
+    stat = os.stat(pasta)
+    os.utime(pasta, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10_000_000_000))
+
+
+class _ArvoreLDMixin:
+    def setUp(self):
+        super().setUp()
+        self._tmp = TemporaryDirectory()
+        raiz = Path(self._tmp.name)
+
+        self.pastas = {
+            "PASTA_DOCS": str(raiz / "10 - Engenharia"),
+            "PASTA_GRD": str(raiz / "Emitidos"),
+            "PASTA_PCF": str(raiz / "9 - PCFs"),
+            "PASTA_PCF_RESPOSTA": str(raiz / "9 - PCFs" / "Respostas"),
+        }
+
+        _arquivo(raiz / "10 - Engenharia" / "Casco" / "I-DE-001_R0.pdf")
+        _arquivo(raiz / "10 - Engenharia" / "Casco" / "Rev" / "I-DE-001_R1.dwg")
+        _arquivo(raiz / "10 - Engenharia" / "I-DE-002_RA.docx")
+        _arquivo(raiz / "10 - Engenharia" / "ignorar.txt")
+
+        _arquivo(raiz / "Emitidos" / "GRD-0001" / "I-DE-001_R0.pdf")
+        _arquivo(raiz / "Emitidos" / "GRD-0001" / "PCF-I-DE-001_R0A.xlsx")
+        _arquivo(raiz / "Emitidos" / "GRD-0002" / "Sub" / "I-DE-002_RA.pdf")
+        _arquivo(raiz / "Emitidos" / "Outros" / "I-DE-003_R0.pdf")
+
+        _arquivo(raiz / "9 - PCFs" / "PCF-I-DE-001_R0A.xlsx")
+        _arquivo(raiz / "9 - PCFs" / "2025" / "PCF-I-DE-002_RAB.xlsm")
+        _arquivo(raiz / "9 - PCFs" / "Respostas" / "PCF-I-DE-001_R0A.xlsx")
+        _arquivo(raiz / "9 - PCFs" / "Respostas" / "Antigas" / "PCF-I-DE-002_RA.xlsx")
+
+        self._patches = [patch.object(atualizar_ld, nome, valor) for nome, valor in self.pastas.items()]
+        self._patches.append(patch.object(atualizar_ld, "log", lambda msg: None))
+        for p in self._patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self._patches:
+            p.stop()
+        self._tmp.cleanup()
+        super().tearDown()
+
+
+class AtualizarLDIndexacaoTests(_ArvoreLDMixin, SimpleTestCase):
+    def test_walk_com_stat_segue_ordem_do_os_walk(self):
+        esperado = [
+            (root, sorted(files))
+            for root, _, files in os.walk(self._tmp.name)
+        ]
+        obtido = [
+            (root, sorted(nome for nome, _ in arquivos))
+            for root, arquivos, _ in atualizar_ld._walk_com_stat(self._tmp.name)
+        ]
+
+        self.assertEqual(obtido, esperado)
+
+    def test_varredura_unica_gera_indices_identicos(self):
+        esperado = {
+            "eng": atualizar_ld.indexar_engenharia_info(),
+            "grd": atualizar_ld.indexar_grds(),
+            "pcf": atualizar_ld.indexar_pcfs(
+                self.pastas["PASTA_PCF"],
+                excluir_subpastas=[self.pastas["PASTA_PCF_RESPOSTA"]],
+                data_origem=atualizar_ld.DATA_PCF_ORIGEM,
+            ),
+            "pcf_resp": atualizar_ld.indexar_pcfs(
+                self.pastas["PASTA_PCF_RESPOSTA"],
+                data_origem=atualizar_ld.DATA_PCF_RESP_ORIGEM,
+            ),
+            "grd_resp": atualizar_ld.indexar_grd_resposta_pcf(),
+        }
+
+        for paralelo in (False, True):
+            with self.subTest(paralelo=paralelo):
+                self.assertEqual(atualizar_ld.indexar_tudo(paralelo=paralelo), esperado)
+
+    def test_indices_separam_pcf_normal_e_resposta(self):
+        indices = atualizar_ld.indexar_tudo(paralelo=False)
+
+        self.assertEqual(set(indices["eng"]["I-DE-001"]), {"0", "1"})
+        self.assertEqual(indices["grd"]["I-DE-002"]["A"]["grd"], "GRD-0002")
+        self.assertNotIn("I-DE-003", indices["grd"])
+        self.assertEqual(
+            indices["pcf"]["I-DE-001"]["0A"]["path"],
+            os.path.join(self.pastas["PASTA_PCF"], "PCF-I-DE-001_R0A.xlsx"),
+        )
+        self.assertNotIn("A", indices["pcf"].get("I-DE-002", {}))
+        self.assertEqual(
+            indices["pcf_resp"]["I-DE-002"]["A"]["path"],
+            os.path.join(self.pastas["PASTA_PCF_RESPOSTA"], "Antigas", "PCF-I-DE-002_RA.xlsx"),
+        )
+        self.assertEqual(indices["grd_resp"], {"PCF-I-DE-001_R0A": "GRD-0001"})
+
+    def test_pcf_por_base_equivale_a_varredura(self):
+        def cand(rev, dia=None):
+            return {"pcf": f"PCF_R{rev}", "rev": rev, "date": datetime(2025, 1, dia) if dia else None}
+
+        mapa = {
+            "0A": cand("0A", 3), "0B": cand("0B", 1), "0": cand("0", 9),
+            "1": cand("1", 2), "10A": cand("10A", 5), "1A": cand("1A"), "1B": cand("1B"),
+            "A": cand("A"), "AB": cand("AB", 1), "A1": cand("A1", 4),
+        }
+        for data_vazia in (datetime.min, datetime(1900, 1, 1)):
+            por_base = atualizar_ld.indexar_pcf_por_base({"I-DE-001": mapa}, data_vazia)["I-DE-001"]
+            for rev in ("0", "0A", "1", "10", "10A", "1A", "A", "AB", "2", ""):
+                with self.subTest(rev=rev, data_vazia=data_vazia):
+                    self.assertIs(por_base.get(rev), atualizar_ld._melhor_pcf(mapa, rev, data_vazia))
+
+        indices = atualizar_ld.indexar_tudo(paralelo=False)
+        por_base = atualizar_ld.pcf_por_base(indices, "pcf")
+        self.assertIs(atualizar_ld.pcf_por_base(indices, "pcf"), por_base)
+        self.assertEqual(por_base["I-DE-002"]["A"]["pcf"], "PCF-I-DE-002_RAB")
+
+
+class CacheVarreduraLDTests(_ArvoreLDMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.arquivo_cache = os.path.join(self._tmp.name, "cache_varredura_ld.json")
+
+    def _indexar(self, full=False):
+        cache = atualizar_ld.CacheVarreduraLD(self.arquivo_cache, full=full)
+        indices = atualizar_ld.indexar_tudo(paralelo=False, cache=cache)
+        cache.salvar()
+        return indices, cache.resumo()
+
+    def test_segunda_execucao_usa_cache_com_indices_identicos(self):
+        esperado = atualizar_ld.indexar_tudo(paralelo=False)
+
+        primeira, resumo_primeira = self._indexar()
+        segunda, resumo_segunda = self._indexar()
+
+        self.assertEqual(primeira, esperado)
+        self.assertEqual(segunda, esperado)
+        self.assertEqual(resumo_primeira["hits"], 0)
+        self.assertEqual(resumo_segunda["misses"], 0)
+        self.assertEqual(resumo_segunda["hit_ratio"], 1.0)
+        self.assertGreater(resumo_segunda["bytes_poupados"], 0)
+
+    def test_pasta_alterada_e_relistada(self):
+        self._indexar()
+
+        pasta = os.path.join(self.pastas["PASTA_GRD"], "GRD-0001")
+        _arquivo(os.path.join(pasta, "I-DE-004_R0.pdf"))
+        _tocar_pasta(pasta)
+
+        indices, resumo = self._indexar()
+
+        self.assertEqual(resumo["misses"], 1)
+        self.assertEqual(indices["grd"]["I-DE-004"]["0"]["grd"], "GRD-0001")
+        self.assertEqual(indices, atualizar_ld.indexar_tudo(paralelo=False))
+
+    def test_full_ignora_cache(self):
+        self._indexar()
+        _, resumo = self._indexar(full=True)
+
+        self.assertEqual(resumo["hits"], 0)
+        self.assertTrue(resumo["full"])
+
+    def test_cache_corrompido_e_ignorado(self):
+        Path(self.arquivo_cache).write_text("{", encoding="utf-8")
+
+        indices, resumo = self._indexar()
+
+        self.assertEqual(resumo["hits"], 0)
+        self.assertEqual(indices, atualizar_ld.indexar_tudo(paralelo=False))
+
+
+class MotorOpenpyxlLDTests(_ArvoreLDMixin, TestCase):
+    CABECALHO = ["ITEM", "DOCUMENTO", "REV", "TÍTULO", "", "DISCIPLINA", "",
+                 "STATUS DOC", "STATUS GRD", "GRD", "DATA GRD", "PCF", "DATA PCF",
+                 "STATUS PCF", "RESPOSTA", "DATA RESP", "GRD RESP"]
+
+    def setUp(self):
+        super().setUp()
+        raiz = Path(self._tmp.name)
+        self.planilha = str(raiz / "LD.xlsx")
+        self.timeline = str(raiz / "Timeline.xlsx")
+        logs = raiz / "Logs"
+        (logs / "Backups").mkdir(parents=True)
+
+        wb = Workbook()
+        ws = wb.active
+        ws.title = atualizar_ld.ABA_LD
+        ws.append(self.CABECALHO)
+        ws.append([1, "I-DE-001", 0, "Arranjo", None, "Casco"])
+        ws.append([2, "I-DE-002", "A", "Lista", None, "Elétrica"])
+        ws.append([3, "I-DE-009", 0, "Aprovado", None, "Casco", None, "Aprovado", "Emitido", "GRD-0100"])
+        for r in range(2, 5):
+            ws[f"Z{r}"] = f"=A{r}*2"
+
+        ws_marenova = wb.create_sheet(atualizar_ld.ABA_LD_MARENOVA)
+        ws_marenova.append(self.CABECALHO)
+        ws_marenova.append([1, "I-DE-002", "A", "Lista", None, "Elétrica"])
+        wb.create_sheet(atualizar_ld.ABA_MEDICAO)
+        wb.save(self.planilha)
+
+        tl = Workbook()
+        ws_tl = tl.active
+        ws_tl.title = "PCFs Recebidas TP"
+        ws_tl.append(["#", "PCF LINK"] + [None] * 9 + ["STATUS FINAL"])
+        ws_tl.append([1, "PCF-I-DE-001_R0A"] + [None] * 9 + ["APROVADA"])
+        tl.save(self.timeline)
+
+        extras = {
+            "PLANILHA": self.planilha,
+            "TIMELINE_PCF": self.timeline,
+            "PASTA_LOGS": str(logs),
+            "PASTA_BACKUPS": str(logs / "Backups"),
+            "CACHE_VARREDURA_ARQUIVO": str(logs / "cache_varredura_ld.json"),
+            "IMPRESSOES_LINHAS_ARQUIVO": str(logs / "impressoes_linhas_ld.json"),
+            "LOCK_FILE": str(logs / "atualizar_ld.lock"),
+            "LOG_FILE": None,
+            "LOG_DETALHADO": False,
+        }
+        for nome, valor in extras.items():
+            p = patch.object(atualizar_ld, nome, valor)
+            p.start()
+            self._patches.append(p)
+
+    def test_processar_sem_excel_atualiza_planilha_e_banco(self):
+        atualizar_ld.processar(motor=atualizar_ld.MOTOR_OPENPYXL)
+
+        wb = load_workbook(self.planilha)
+        ws = wb[atualizar_ld.ABA_LD]
+
+        self.assertEqual(
+            [(ws[f"B{r}"].value, ws[f"C{r}"].value) for r in range(2, 6)],
+            [("I-DE-001", 0), ("I-DE-001", 1), ("I-DE-002", "A"), ("I-DE-009", 0)],
+        )
+
+        # linha original: engenharia, GRD, PCF com status da Timeline, resposta e GRD da resposta
+        self.assertEqual(ws["H2"].value, "Recebido")
+        self.assertEqual(ws["I2"].value, "Emitido")
+        self.assertEqual(ws["J2"].value, "GRD-0001")
+        self.assertTrue(ws["J2"].hyperlink.target.endswith("GRD-0001"))
+        self.assertIsNotNone(ws["K2"].value)
+        self.assertEqual(ws["K2"].number_format, atualizar_ld.DATE_NUMBERFORMAT_FALLBACK)
+        self.assertEqual(ws["L2"].value, "PCF-I-DE-001_R0A")
+        self.assertEqual(ws["N2"].value, "APROVADA")
+        self.assertEqual(ws["Q2"].value, "GRD-0001")
+
+        # revisão nova inserida da Engenharia, sem GRD, e fórmulas deslocadas como no Excel
+        self.assertEqual(ws["I3"].value, "Não Emitido")
+        self.assertIsNone(ws["J3"].hyperlink)
+        self.assertTrue(ws["B3"].hyperlink.target.endswith(os.path.join("Casco", "Rev")))
+        self.assertEqual(ws["Z3"].value, "=A3*2")
+        self.assertEqual(ws["Z4"].value, "=A4*2")
+
+        # L pega o maior sufixo sobre a revisão; linha Aprovado fica intacta
+        self.assertEqual(ws["L4"].value, "PCF-I-DE-002_RAB")
+        self.assertEqual(ws["J5"].value, "GRD-0100")
+        self.assertEqual(ws.auto_filter.ref, "A1:Q5")
+
+        medicao = wb[atualizar_ld.ABA_MEDICAO]
+        self.assertEqual(
+            [medicao[f"B{r}"].value for r in range(4, 7)],
+            ["I-DE-001", "I-DE-002", "I-DE-009"],
+        )
+
+        self.assertEqual(DocumentoLD.objects.filter(origem_aba="LD").count(), 4)
+        self.assertEqual(DocumentoLD.objects.filter(origem_aba="LD Marenova").count(), 1)
+        registro = DocumentoLD.objects.get(origem_aba="LD", documento="I-DE-001", revisao="0.0")
+        self.assertEqual(registro.status_final_pcf, "APROVADA")
+        self.assertTrue(registro.caminho_documento.endswith("Casco"))
+        self.assertEqual(len(os.listdir(atualizar_ld.PASTA_BACKUPS)), 1)
+
+    def test_falha_ao_salvar_nao_importa_no_banco(self):
+        with patch("openpyxl.workbook.workbook.Workbook.save", side_effect=PermissionError("planilha aberta")):
+            with self.assertRaises(PermissionError):
+                atualizar_ld.processar(motor=atualizar_ld.MOTOR_OPENPYXL)
+
+        self.assertFalse(DocumentoLD.objects.exists())
+
+    def test_insercao_desloca_referencias_como_o_excel(self):
+        aba = atualizar_ld.ABA_LD
+        wb = load_workbook(self.planilha)
+        ws = wb[aba]
+        ws["AA2"] = "=SUM(A2:A4)+$A$3"
+        ws.merge_cells("AB3:AC3")
+        ws.add_data_validation(DataValidation(type="list", formula1="$A$2:$A$4", sqref="D2:D4"))
+        wb[atualizar_ld.ABA_MEDICAO]["H1"] = f"='{aba}'!Z4+'{aba}'!Z2"
+        wb.defined_names["FaixaLD"] = DefinedName("FaixaLD", attr_text=f"'{aba}'!$B$2:$B$4")
+        wb.save(self.planilha)
+
+        atualizar_ld.processar(motor=atualizar_ld.MOTOR_OPENPYXL)
+
+        wb = load_workbook(self.planilha)
+        ws = wb[aba]
+        # a revisão nova de I-DE-001 entra na linha 3: o que estava da 3 em diante desce uma linha
+        self.assertEqual(ws["AA2"].value, "=SUM(A2:A5)+$A$4")
+        self.assertEqual([faixa.coord for faixa in ws.merged_cells.ranges], ["AB4:AC4"])
+        validacao = ws.data_validations.dataValidation[0]
+        self.assertEqual(str(validacao.sqref), "D2:D5")
+        self.assertEqual(validacao.formula1, "$A$2:$A$5")
+        self.assertEqual(wb[atualizar_ld.ABA_MEDICAO]["H1"].value, f"='{aba}'!Z5+'{aba}'!Z2")
+        self.assertEqual(wb.defined_names["FaixaLD"].attr_text, f"'{aba}'!$B$2:$B$5")
+
+    def test_simulacao_devolve_change_set_sem_tocar_na_planilha(self):
+        antes = Path(self.planilha).read_bytes()
+
+        resultado = atualizar_ld.executar(simular=True)
+
+        self.assertTrue(resultado["ok"])
+        self.assertEqual(Path(self.planilha).read_bytes(), antes)
+        self.assertFalse(DocumentoLD.objects.exists())
+        self.assertEqual(os.listdir(atualizar_ld.PASTA_BACKUPS), [])
+
+        detalhes = resultado["detalhes"]
+        alteracoes = detalhes["alteracoes"][atualizar_ld.ABA_LD]
+        por_celula = {(a["tipo"], a["celula"]): a for a in alteracoes}
+        self.assertEqual(por_celula[("linha", "C3")]["depois"], "1")
+        self.assertEqual(por_celula[("valor", "J2")]["depois"], "GRD-0001")
+        self.assertEqual(por_celula[("valor", "N2")]["depois"], "APROVADA")
+        self.assertTrue(por_celula[("link", "J2")]["depois"].endswith("GRD-0001"))
+        self.assertFalse(any(a["linha"] == 5 for a in alteracoes if a["tipo"] != "linha"))
+        self.assertEqual(
+            detalhes["alteracoes_resumo"][atualizar_ld.ABA_LD]["total"], len(alteracoes)
+        )
+        self.assertEqual(resultado["quantidade_processada"], sum(
+            resumo["total"] for resumo in detalhes["alteracoes_resumo"].values()
+        ))
+
+        with open(detalhes["arquivo_alteracoes"], encoding="utf-8") as f:
+            self.assertEqual(json.load(f), detalhes["alteracoes"])
+
+    def test_segunda_execucao_nao_altera_celulas(self):
+        atualizar_ld.processar(motor=atualizar_ld.MOTOR_OPENPYXL)
+        simulacao = atualizar_ld.processar(simular=True)
+        segunda = atualizar_ld.processar(motor=atualizar_ld.MOTOR_OPENPYXL)
+
+        for resultado in (simulacao, segunda):
+            self.assertEqual(
+                resultado["alteracoes"], {atualizar_ld.ABA_LD: [], atualizar_ld.ABA_LD_MARENOVA: []}
+            )
+
+    def test_linhas_inalteradas_sao_puladas(self):
+        primeira = atualizar_ld.executar(motor=atualizar_ld.MOTOR_OPENPYXL)
+        segunda = atualizar_ld.processar(motor=atualizar_ld.MOTOR_OPENPYXL)
+
+        self.assertEqual(primeira["detalhes"]["linhas_incrementais"]["processadas"], 5)
+        self.assertEqual(segunda["linhas"]["puladas"], 5)
+        self.assertEqual(segunda["linhas"]["processadas"], 0)
+        self.assertEqual(segunda["linhas"]["abas"][atualizar_ld.ABA_LD_MARENOVA], {"processadas": 0, "puladas": 1})
+
+        # status novo na Timeline só reprocessa a linha da PCF correspondente
+        tl = load_workbook(self.timeline)
+        tl["PCFs Recebidas TP"]["L2"] = "REPROVADA"
+        tl.save(self.timeline)
+        terceira = atualizar_ld.processar(motor=atualizar_ld.MOTOR_OPENPYXL)
+
+        self.assertEqual(terceira["linhas"]["processadas"], 1)
+        self.assertEqual(
+            [(a["celula"], a["depois"]) for a in terceira["alteracoes"][atualizar_ld.ABA_LD]],
+            [("N2", "REPROVADA")],
+        )
+
+        # edição manual na planilha também muda a impressão da linha
+        wb = load_workbook(self.planilha)
+        wb[atualizar_ld.ABA_LD]["I4"] = "editado"
+        wb.save(self.planilha)
+        quarta = atualizar_ld.processar(motor=atualizar_ld.MOTOR_OPENPYXL)
+        self.assertEqual(quarta["linhas"]["processadas"], 1)
+        self.assertEqual(load_workbook(self.planilha)[atualizar_ld.ABA_LD]["I4"].value, "Emitido")
+
+        full = atualizar_ld.processar(full=True, motor=atualizar_ld.MOTOR_OPENPYXL)
+        self.assertEqual((full["linhas"]["processadas"], full["linhas"]["puladas"]), (5, 0))
+
+    def test_calcular_linha_respeita_aprovado_e_modo_obs(self):
+        indices = atualizar_ld.indexar_tudo(paralelo=False)
+
+        self.assertIsNone(
+            atualizar_ld.calcular_linha_ld({"B": "I-DE-001", "C": 0.0, "H": "Aprovado"}, indices, {})
+        )
+
+        with patch.object(atualizar_ld, "COL_K_MODO", "OBS"):
+            resultado = atualizar_ld.calcular_linha_ld({"B": "I-DE-001", "C": 0.0}, indices, {})
+
+        self.assertEqual(resultado["valores"]["K"], atualizar_ld.OBS_COL_K)
+        self.assertEqual(resultado["formatos"]["K"], "texto")
+        self.assertEqual(resultado["links"]["J"], os.path.join(self.pastas["PASTA_GRD"], "GRD-0001"))
+
+
+class _ApiFalsa:
+    def __init__(self, registro, endereco):
+        self._registro = registro
+        self._endereco = endereco
+        self.Hyperlinks = self
+
+    def Delete(self):
+        self._registro.append(("remover_link", self._endereco))
+
+    def __setattr__(self, nome, valor):
+        if nome == "NumberFormat":
+            self._registro.append(("formato", self._endereco, valor))
+        object.__setattr__(self, nome, valor)
+
+
+class _RangeFalso:
+    def __init__(self, registro, endereco):
+        self._registro = registro
+        self._endereco = endereco
+        self.api = _ApiFalsa(registro, endereco)
+
+    @property
+    def value(self):
+        return None
+
+    @value.setter
+    def value(self, valores):
+        self._registro.append(("valores", self._endereco, valores))
+
+    def add_hyperlink(self, endereco, texto):
+        self._registro.append(("link", self._endereco, endereco, texto))
+
+
+class _PlanilhaFalsa:
+    def __init__(self):
+        self.registro = []
+
+    def range(self, endereco):
+        return _RangeFalso(self.registro, endereco)
+
+    def __getitem__(self, endereco):
+        return _RangeFalso(self.registro, endereco)
+
+
+class ProcessarAbaEmBlocoTests(_ArvoreLDMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        p = patch.object(atualizar_ld, "LOG_DETALHADO", False)
+        p.start()
+        self._patches.append(p)
+
+    def _matriz(self):
+        linhas = [
+            ["I-DE-001", 0.0],
+            ["I-DE-002", "A"],
+            ["I-DE-009", 0.0, None, None, None, None, "Aprovado"],
+        ]
+        return [linha + [None] * (len(atualizar_ld.COLUNAS_LD) - len(linha)) for linha in linhas]
+
+    def test_hyperlinks_lidos_do_arquivo_e_remapeados(self):
+        planilha = Path(self._tmp.name) / "LD.xlsx"
+        wb = Workbook()
+        ws = wb.active
+        ws.title = atualizar_ld.ABA_LD
+        ws.append(["ITEM", "DOCUMENTO", "REV"])
+        ws.append([1, "I-DE-001", 0])
+        ws.append([2, "I-DE-002", "A"])
+        ws["B2"].hyperlink = r"\\servidor\Casco"
+        ws["J3"].hyperlink = r"\\servidor\GRD-0002"
+        wb.save(planilha)
+
+        # I-DE-001 rev 1 foi inserida pelo Excel entre as duas linhas do arquivo
+        linhas = [{"B": "I-DE-001", "C": 0.0}, {"B": "I-DE-001", "C": 1.0}, {"B": "I-DE-002", "C": "A"}]
+        with patch.object(atualizar_ld, "PLANILHA", str(planilha)):
+            links = atualizar_ld._hyperlinks_atuais(atualizar_ld.ABA_LD, linhas, {"I-DE-001": ["1"]})
+
+        self.assertEqual(links[0]["B"], r"\\servidor\Casco")
+        self.assertEqual(set(links[1].values()), {""})
+        self.assertEqual(links[2]["J"], r"\\servidor\GRD-0002")
+        self.assertEqual(links[2]["B"], "")
+
+    def test_faixas_e_enderecos_agrupados(self):
+        self.assertEqual(atualizar_ld.faixas_contiguas([9, 2, 3, 4]), [(2, 4), (9, 9)])
+        self.assertEqual(
+            atualizar_ld.enderecos_agrupados("K", [(2, 4), (9, 9), (11, 12)], limite=16),
+            ["K2:K4,K9:K9", "K11:K12"],
+        )
+        self.assertEqual(
+            atualizar_ld.enderecos_agrupados("A", [(2, 2), (4, 4)], coluna_fim="Q"),
+            ["A2:Q2,A4:Q4"],
+        )
+
+    def _alteracoes(self, matriz, links=None):
+        indices = atualizar_ld.indexar_tudo(paralelo=False)
+        linhas = [dict(zip(atualizar_ld.COLUNAS_LD, linha), links=links or {}) for linha in matriz]
+        resultados = atualizar_ld.calcular_aba_ld(linhas, indices, {})
+        return resultados, atualizar_ld.calcular_alteracoes(linhas, resultados)
+
+    def test_change_set_lista_so_celulas_que_mudam(self):
+        matriz = self._matriz()
+        matriz[0][atualizar_ld.COLUNAS_LD.index("H")] = "Recebido"
+        resultados, alteracoes = self._alteracoes(matriz)
+
+        self.assertEqual(set(resultados), {0, 1})
+        valores = {a["celula"] for a in alteracoes if a["tipo"] == "valor"}
+        self.assertNotIn("H2", valores)
+        self.assertNotIn("B2", valores)
+        self.assertIn("H3", valores)
+        self.assertFalse(any(a["linha"] == 4 for a in alteracoes))
+
+        resumo = atualizar_ld.resumir_alteracoes(alteracoes)
+        self.assertEqual(resumo["celulas"], len(valores))
+        self.assertEqual(resumo["linhas"], 2)
+        self.assertEqual(resumo["por_coluna"]["H"], 1)
+
+        # depois de aplicado, o change-set da mesma linha fica vazio
+        for a in alteracoes:
+            if a["tipo"] == "valor":
+                matriz[a["linha"] - 2][atualizar_ld.COLUNAS_LD.index(a["coluna"])] = a["depois"]
+        links = {a["coluna"]: a["depois"] for a in alteracoes if a["tipo"] == "link" and a["linha"] == 2}
+        _, alteracoes = self._alteracoes(matriz[:1], links)
+        self.assertEqual(alteracoes, [])
+
+    def test_link_relativo_a_planilha_nao_e_regravado(self):
+        pasta_ld = os.path.join(self._tmp.name, "3 - LD")
+        indices = atualizar_ld.indexar_tudo(paralelo=False)
+        linhas = [dict(zip(atualizar_ld.COLUNAS_LD, linha)) for linha in self._matriz()[:1]]
+        resultados = atualizar_ld.calcular_aba_ld(linhas, indices, {})
+        link_b2 = resultados[0]["links"]["B"]
+
+        # o Excel grava como "..\10 - Engenharia\Casco" o link da mesma unidade
+        relativo = os.path.relpath(link_b2, pasta_ld).replace(os.sep, "\\")
+        linhas[0]["links"] = {"B": relativo}
+        with patch.object(atualizar_ld, "PLANILHA", os.path.join(pasta_ld, "LD.xlsx")):
+            alteracoes = atualizar_ld.calcular_alteracoes(linhas, resultados)
+
+        self.assertTrue(relativo.startswith(".."))
+        self.assertFalse(any(a["tipo"] == "link" and a["celula"] == "B2" for a in alteracoes))
+
+    def test_impressao_ignora_link_relativo_gravado_pelo_excel(self):
+        pasta_ld = os.path.join(self._tmp.name, "3 - LD")
+        arquivo = os.path.join(self._tmp.name, "impressoes.json")
+        indices = atualizar_ld.indexar_tudo(paralelo=False)
+        linhas = [dict(zip(atualizar_ld.COLUNAS_LD, linha)) for linha in self._matriz()[:1]]
+
+        with patch.object(atualizar_ld, "PLANILHA", os.path.join(pasta_ld, "LD.xlsx")):
+            impressoes = atualizar_ld.ImpressoesLinhasLD(arquivo, full=True)
+            resultados = atualizar_ld.calcular_aba_ld(linhas, indices, {}, "LD", impressoes=impressoes)
+            impressoes.salvar()
+
+            # próxima execução: valores gravados e links relidos do arquivo, relativos à pasta da LD
+            linha = dict(linhas[0], **resultados[0]["valores"])
+            linha["links"] = {
+                col: os.path.relpath(alvo, pasta_ld).replace(os.sep, "\\")
+                for col, alvo in resultados[0]["links"].items()
+                if alvo
+            }
+            impressoes = atualizar_ld.ImpressoesLinhasLD(arquivo)
+            segunda = atualizar_ld.calcular_aba_ld([linha], indices, {}, "LD", impressoes=impressoes)
+
+        self.assertTrue(linha["links"])
+        self.assertTrue(all(alvo.startswith("..") for alvo in linha["links"].values()))
+        self.assertEqual(segunda, {})
+        self.assertEqual(impressoes.resumo()["puladas"], 1)
+
+    def test_grava_somente_celulas_alteradas(self):
+        matriz = self._matriz()
+        matriz[0][atualizar_ld.COLUNAS_LD.index("I")] = "Emitido"
+        _, alteracoes = self._alteracoes(matriz)
+        ws = _PlanilhaFalsa()
+
+        blocos, celulas = atualizar_ld._gravar_valores_em_bloco(ws, alteracoes)
+
+        enderecos = [item[1] for item in ws.registro]
+        self.assertEqual(celulas, len([a for a in alteracoes if a["tipo"] == "valor"]))
+        self.assertEqual(blocos, len(enderecos))
+        self.assertIn("H2:H3", enderecos)
+        self.assertIn("I3:I3", enderecos)
+        self.assertFalse(any(e.startswith("I2") for e in enderecos))
+        self.assertEqual(atualizar_ld._gravar_valores_em_bloco(_PlanilhaFalsa(), []), (0, 0))
+
+    def test_formatos_e_hyperlinks_agrupados(self):
+        matriz = self._matriz()
+        indices = atualizar_ld.indexar_tudo(paralelo=False)
+        linhas = [dict(zip(atualizar_ld.COLUNAS_LD, linha)) for linha in matriz]
+        resultados = atualizar_ld.calcular_aba_ld(linhas, indices, {})
+        link_b2 = resultados[0]["links"]["B"]
+        linhas[0]["links"] = {"B": link_b2, "Q": "/antigo/GRD-9999"}
+        alteracoes = atualizar_ld.calcular_alteracoes(linhas, resultados)
+        ws = _PlanilhaFalsa()
+
+        atualizar_ld._aplicar_formatos_em_bloco(ws, resultados, alteracoes)
+        criados = atualizar_ld._aplicar_hyperlinks_em_bloco(ws, alteracoes)
+
+        formatos = {item[1] for item in ws.registro if item[0] == "formato"}
+        self.assertEqual(formatos, {"K2:K3", "M2:M3", "P2:P3"})
+        self.assertIn(("remover_link", "Q2:Q2"), ws.registro)
+
+        links = [item for item in ws.registro if item[0] == "link"]
+        self.assertNotIn("B2", [item[1] for item in links])
+        self.assertIn("B3", [item[1] for item in links])
+        self.assertEqual(criados, len(links))
+
+
+class ImportarLDBancoTests(TestCase):
+    def setUp(self):
+        p = patch.object(atualizar_ld, "log", lambda msg: None)
+        p.start()
+        self.addCleanup(p.stop)
+
+    def _linha(self, documento, revisao, **colunas):
+        linha = {"B": documento, "C": revisao, "links": colunas.pop("links", {})}
+        linha.update(colunas)
+        return linha
+
+    def test_upsert_preserva_vinculo_km_e_remove_so_o_que_sumiu(self):
+        mantido = DocumentoLD.objects.create(
+            origem_aba="LD", documento="I-DE-001", revisao="0", titulo="Antigo",
+            numero_documento_km="108-505-02", score_vinculo_km=95,
+        )
+        igual = DocumentoLD.objects.create(origem_aba="LD", documento="I-DE-002", revisao="A", titulo="Lista")
+        DocumentoLD.objects.create(origem_aba="LD", documento="I-DE-003", revisao="0")
+        marenova = DocumentoLD.objects.create(origem_aba="LD Marenova", documento="I-DE-002", revisao="A")
+
+        resumo = atualizar_ld.importar_ld_banco(
+            linhas_por_aba={
+                atualizar_ld.ABA_LD: [
+                    self._linha("I-DE-001", "0", D="Novo", links={"J": "/grd/GRD-0001"}),
+                    self._linha("I-DE-002", "A", D="Lista"),
+                    self._linha("I-DE-004", "B", D="Criado"),
+                ],
+                atualizar_ld.ABA_LD_MARENOVA: [self._linha("I-DE-002", "A")],
+            }
+        )
+
+        self.assertEqual(
+            (resumo["criados"], resumo["atualizados"], resumo["removidos"], resumo["inalterados"]),
+            (1, 1, 1, 2),
+        )
+        mantido.refresh_from_db()
+        self.assertEqual(mantido.titulo, "Novo")
+        self.assertEqual(mantido.caminho_grd, "/grd/GRD-0001")
+        self.assertEqual(mantido.numero_documento_km, "108-505-02")
+        self.assertEqual(mantido.score_vinculo_km, 95)
+        self.assertTrue(DocumentoLD.objects.filter(pk=igual.pk).exists())
+        self.assertTrue(DocumentoLD.objects.filter(pk=marenova.pk).exists())
+        self.assertFalse(DocumentoLD.objects.filter(documento="I-DE-003").exists())
+        self.assertTrue(DocumentoLD.objects.filter(documento="I-DE-004", titulo="Criado").exists())
+
+    def test_consultas_nao_crescem_com_as_linhas(self):
+        def importar(quantidade):
+            linhas = [self._linha(f"I-DE-{n:03d}", "0", D="x") for n in range(quantidade)]
+            with CaptureQueriesContext(connection) as consultas:
+                atualizar_ld.importar_ld_banco(linhas_por_aba={atualizar_ld.ABA_LD: linhas})
+            DocumentoLD.objects.all().delete()
+            return len(consultas)
+
+        self.assertEqual(importar(3), importar(30))
+
+    def test_aba_com_falha_mantem_registros(self):
+        DocumentoLD.objects.create(origem_aba="LD Marenova", documento="I-DE-009", revisao="0")
+
+        def falhar():
+            raise OSError("aba ilegível")
+            yield
+
+        resumo = atualizar_ld.importar_ld_banco(
+            linhas_por_aba={atualizar_ld.ABA_LD: [], atualizar_ld.ABA_LD_MARENOVA: falhar()}
+        )
+
+        self.assertIn("erro", resumo["abas"][atualizar_ld.ABA_LD_MARENOVA])
+        self.assertTrue(DocumentoLD.objects.filter(documento="I-DE-009").exists())
+
+
+class _PlanilhaLeituraFalsa:
+    def __init__(self, matriz):
+        self._matriz = matriz
+        self.used_range = type("U", (), {"last_cell": type("C", (), {"row": len(matriz) + 1})()})()
+        self.leituras = []
+
+    def range(self, endereco):
+        self.leituras.append(endereco)
+        matriz = self._matriz
+        return type("R", (), {"options": lambda _, **kw: type("V", (), {"value": matriz})()})()
+
+    def __getitem__(self, endereco):
+        raise AssertionError(f"leitura célula a célula: {endereco}")
+
+
+class LinhasBancoXlwingsTests(SimpleTestCase):
+    def test_valores_em_um_range_e_links_do_arquivo(self):
+        largura = len(atualizar_ld.COLUNAS_LD)
+        matriz = [
+            ["I-DE-001", 0.0, "Arranjo"] + [None] * (largura - 3),
+            [None] * largura,
+            ["I-DE-002", "A", "Lista"] + [None] * (largura - 3),
+        ]
+        ws = _PlanilhaLeituraFalsa(matriz)
+
+        linhas = list(atualizar_ld._linhas_banco_xlwings(ws, {"B2": "/eng/Casco", "J4": "/grd/GRD-0002"}))
+
+        self.assertEqual(ws.leituras, ["B2:Q4"])
+        self.assertEqual(
+            [(linha["B"], linha["C"], linha["D"]) for linha in linhas],
+            [("I-DE-001", "0.0", "Arranjo"), ("I-DE-002", "A", "Lista")],
+        )
+        self.assertEqual(linhas[0]["links"]["B"], "/eng/Casco")
+        self.assertEqual(linhas[1]["links"], {"B": "", "J": "/grd/GRD-0002", "L": "", "O": "", "Q": ""})
+
+
+class ExecutarAtualizarLDViewTests(TestCase):
+    def setUp(self):
+        get_user_model().objects.create_user(username="ld_user", password="testpass123")
+        self.client.login(username="ld_user", password="testpass123")
+
+    def _executar(self, dados):
+        resultado = {"ok": True, "mensagem": "ok", "quantidade_processada": 0, "detalhes": {}}
+        with patch.object(atualizar_ld, "executar", return_value=resultado) as executar:
+            self.client.post(reverse("automacoes:atualizar_ld"), dados)
+        return executar
+
+    def test_botao_simular_repassa_dry_run(self):
+        self.assertEqual(self._executar({"simular": "1"}).call_args.kwargs, {"simular": True})
+        self.assertEqual(self._executar({}).call_args.kwargs, {"simular": False})
+        self.assertEqual(
+            list(ExecucaoAutomacao.objects.order_by("pk").values_list("nome", flat=True)),
+            ["Atualização LD (simulação)", "Atualização LD"],
+        )
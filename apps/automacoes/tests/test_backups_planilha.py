@@ -0,0 +1,87 @@
+import gzip
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from django.test import SimpleTestCase
+
+from apps.automacoes.services.backups_planilha import BackupsPlanilha
+
+
+class BackupsPlanilhaTests(SimpleTestCase):
+    def setUp(self):
+        self._tmp = TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.raiz = Path(self._tmp.name)
+        self.planilha = self.raiz / "LD.xlsm"
+        self.pasta = self.raiz / "Backups"
+        self.planilha.write_bytes(b"conteudo 1" * 100)
+
+    def _backups(self, **kwargs):
+        return BackupsPlanilha(str(self.planilha), str(self.pasta), **kwargs)
+
+    def test_backup_comprimido_e_sem_copia_quando_nao_mudou(self):
+        backups = self._backups()
+
+        primeiro = backups.criar(datetime(2025, 1, 1, 8, 0, 0))
+        self.assertTrue(primeiro["novo"])
+        self.assertTrue(primeiro["caminho"].endswith(f"_{primeiro['hash']}.xlsm.gz"))
+        with gzip.open(primeiro["caminho"], "rb") as f:
+            self.assertEqual(f.read(), self.planilha.read_bytes())
+
+        segundo = backups.criar(datetime(2025, 1, 1, 9, 0, 0))
+        self.assertFalse(segundo["novo"])
+        self.assertEqual(segundo["caminho"], primeiro["caminho"])
+        self.assertEqual(len(os.listdir(self.pasta)), 1)
+
+        self.planilha.write_bytes(b"conteudo 2")
+        terceiro = backups.criar(datetime(2025, 1, 1, 10, 0, 0))
+        self.assertTrue(terceiro["novo"])
+        self.assertEqual(backups.ultimo().caminho, terceiro["caminho"])
+
+    def test_restaurar_usa_o_ultimo_backup(self):
+        backups = self._backups()
+        backups.criar(datetime(2025, 1, 1, 8, 0, 0))
+        self.planilha.write_bytes(b"editada")
+        backups.criar(datetime(2025, 1, 1, 9, 0, 0))
+
+        self.planilha.write_bytes(b"corrompida")
+        restaurado = backups.restaurar()
+
+        self.assertEqual(restaurado, backups.ultimo().caminho)
+        self.assertEqual(self.planilha.read_bytes(), b"editada")
+        self.assertEqual(sorted(os.listdir(self.raiz)), ["Backups", "LD.xlsm"])
+
+    def test_backup_antigo_sem_compressao_entra_na_retencao_e_restaura(self):
+        self.pasta.mkdir()
+        antigo = self.pasta / "LD_BK_20240101_080000.xlsm"
+        antigo.write_bytes(b"backup antigo")
+        (self.pasta / "Outra_BK_20240101_080000.xlsm").write_bytes(b"outra planilha")
+
+        backups = self._backups()
+        self.assertEqual([b.caminho for b in backups.listar()], [str(antigo)])
+        self.assertIsNone(backups.ultimo().hash)
+
+        backups.restaurar()
+        self.assertEqual(self.planilha.read_bytes(), b"backup antigo")
+
+    def test_retencao_ultimos_diarios_e_semanais(self):
+        backups = self._backups(manter_ultimos=2, manter_diarios=3, manter_semanais=2)
+        inicio = datetime(2025, 3, 3, 8, 0, 0)  # segunda-feira
+
+        # 14 dias, dois backups por dia
+        for n in range(28):
+            self.planilha.write_bytes(f"versao {n}".encode())
+            resultado = backups.criar(inicio + timedelta(days=n // 2, hours=n % 2))
+
+        datas = [b.data for b in backups.listar()]
+        esperado = [
+            datetime(2025, 3, 16, 9),  # últimos 2
+            datetime(2025, 3, 16, 8),
+            datetime(2025, 3, 15, 9),  # diários
+            datetime(2025, 3, 14, 9),
+            datetime(2025, 3, 9, 9),  # semana anterior
+        ]
+        self.assertEqual(datas, esperado)
+        self.assertFalse(any(os.path.exists(c) for c in resultado["removidos"]))
@@ -0,0 +1,91 @@
+import json
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from django.test import SimpleTestCase
+
+from apps.automacoes.services.cache_json import CacheArquivos, CacheJSON
+
+
+class _CacheTamanhos(CacheArquivos):
+    CHAVE = "arquivos"
+
+    def __init__(self, caminho, versao_leitor=1, **kwargs):
+        self.versao_leitor = versao_leitor
+        super().__init__(caminho, **kwargs)
+
+    def assinatura(self):
+        return {"leitor": self.versao_leitor}
+
+    def _de_entrada(self, caminho, entrada):
+        return {"caminho": caminho, "bytes": entrada["bytes"], "erro": "", "cache": True}
+
+    def _para_entrada(self, lida):
+        return {"bytes": lida["bytes"]}
+
+
+def _ler(caminho):
+    try:
+        return {"caminho": caminho, "bytes": len(Path(caminho).read_bytes()), "erro": ""}
+    except OSError as e:
+        return {"caminho": caminho, "bytes": 0, "erro": str(e)}
+
+
+class CacheJSONTests(SimpleTestCase):
+    def test_salva_e_recarrega_pela_versao(self):
+        with TemporaryDirectory() as tmp:
+            caminho = os.path.join(tmp, "sub", "cache.json")
+            cache = CacheJSON(caminho)
+            cache.atual = {"a": 1}
+            cache.salvar()
+
+            self.assertEqual(CacheJSON(caminho).anterior, {"a": 1})
+            self.assertEqual(CacheJSON(caminho, full=True).anterior, {})
+            self.assertFalse(os.path.exists(f"{caminho}.tmp"))
+
+            with open(caminho, "w", encoding="utf-8") as f:
+                json.dump({"versao": 99, "entradas": {"a": 1}}, f)
+            self.assertEqual(CacheJSON(caminho).anterior, {})
+
+    def test_falha_ao_salvar_vira_aviso(self):
+        avisos = []
+        with TemporaryDirectory() as tmp:
+            cache = CacheJSON(tmp, avisar=avisos.append)
+            cache.salvar()
+
+        self.assertEqual(len(avisos), 1)
+        self.assertIn("Não foi possível salvar o cache", avisos[0])
+
+
+class CacheArquivosTests(SimpleTestCase):
+    def test_hits_misses_erros_e_removidas(self):
+        with TemporaryDirectory() as tmp:
+            arquivos = []
+            for n in range(3):
+                caminho = os.path.join(tmp, f"{n}.bin")
+                Path(caminho).write_bytes(b"x" * (n + 1))
+                arquivos.append(caminho)
+            arquivo_cache = os.path.join(tmp, "cache.json")
+
+            cache = _CacheTamanhos(arquivo_cache)
+            for caminho in arquivos:
+                self.assertIsNone(cache.consultar(caminho))
+                cache.registrar(_ler(caminho))
+            cache.salvar()
+
+            cache = _CacheTamanhos(arquivo_cache)
+            self.assertEqual(cache.consultar(arquivos[0])["bytes"], 1)
+            # lido de novo e com falha: conta como erro, não como removido
+            os.utime(arquivos[1], (1_900_000_000, 1_900_000_000))
+            self.assertIsNone(cache.consultar(arquivos[1]))
+            cache.registrar({"caminho": arquivos[1], "bytes": 0, "erro": "corrompido"})
+
+            resumo = cache.resumo()
+            outra_assinatura = _CacheTamanhos(arquivo_cache, versao_leitor=2)
+            self.assertIsNone(outra_assinatura.consultar(arquivos[0]))
+
+        self.assertEqual(
+            {k: resumo[k] for k in ("hits", "misses", "erros", "removidas", "entradas")},
+            {"hits": 1, "misses": 1, "erros": 1, "removidas": 1, "entradas": 1},
+        )
@@ -0,0 +1,49 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from django.test import SimpleTestCase, override_settings
+
+from apps.automacoes.services.fs_scanner import ScannerDiretorios, sob_algum_caminho, workers_configurados
+
+
+class ScannerDiretoriosTests(SimpleTestCase):
+    def test_varre_arvore_com_subpastas(self):
+        with TemporaryDirectory() as tmp:
+            raiz = Path(tmp)
+            (raiz / "a" / "b").mkdir(parents=True)
+            (raiz / "c").mkdir()
+            (raiz / "raiz.txt").write_text("1", encoding="utf-8")
+            (raiz / "a" / "doc.docx").write_text("22", encoding="utf-8")
+            (raiz / "a" / "b" / "desenho.dwg").write_text("333", encoding="utf-8")
+
+            scanner = ScannerDiretorios(raiz, workers=3)
+            entradas = sorted(scanner, key=lambda entrada: entrada.nome)
+
+        self.assertEqual([e.nome for e in entradas], ["desenho.dwg", "doc.docx", "raiz.txt"])
+        self.assertEqual([e.tamanho for e in entradas], [3, 2, 1])
+        self.assertEqual(entradas[0].pasta, str(raiz / "a" / "b"))
+        self.assertEqual(scanner.estatisticas.arquivos, 3)
+        self.assertEqual(scanner.estatisticas.diretorios, 4)
+        self.assertEqual(scanner.estatisticas.erros, 0)
+        self.assertEqual(scanner.estatisticas.as_dict()["workers"], 3)
+
+    def test_raiz_inexistente_registra_erro(self):
+        scanner = ScannerDiretorios("/caminho/que/nao/existe", workers=1)
+
+        self.assertEqual(list(scanner), [])
+        self.assertEqual(scanner.estatisticas.erros, 1)
+        self.assertEqual(len(scanner.estatisticas.erros_detalhe), 1)
+        self.assertEqual(scanner.estatisticas.caminhos_com_erro, {"/caminho/que/nao/existe"})
+
+    def test_sob_algum_caminho(self):
+        erros = {str(Path("/km/1.4 ETS"))}
+
+        self.assertTrue(sob_algum_caminho(str(Path("/km/1.4 ETS")), erros))
+        self.assertTrue(sob_algum_caminho(str(Path("/km/1.4 ETS/sub/a.pdf")), erros))
+        self.assertFalse(sob_algum_caminho(str(Path("/km/1.4 ETS-B/a.pdf")), erros))
+        self.assertFalse(sob_algum_caminho(str(Path("/km/a.pdf")), set()))
+
+    @override_settings(KM_SCANNER_WORKERS=4)
+    def test_workers_configurados_por_setting(self):
+        self.assertEqual(workers_configurados("KM_SCANNER_WORKERS"), 4)
+        self.assertEqual(workers_configurados("SETTING_INEXISTENTE", padrao=2), 2)
@@ -0,0 +1,215 @@
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+
+from apps.automacoes.models import KMFileIndex, KMResolucaoDocumento
+from apps.automacoes.services import fs_scanner, km_indexer
+from apps.automacoes.services.km_indexer import (
+    calcular_impressao_digital,
+    indexar_km_banco,
+    relatorio_duplicados_km,
+)
+
+
+class KMIndexerTests(TestCase):
+    def _criar_arquivos(self, raiz):
+        pasta = Path(raiz) / "1.4 ETS"
+        pasta.mkdir(parents=True)
+        (pasta / "108-505-02-A.docx").write_text("a", encoding="utf-8")
+        (pasta / "108-505-03-A.dwg").write_text("b", encoding="utf-8")
+        (pasta / "108-505-04-A.pdf").write_text("c", encoding="utf-8")
+        return pasta
+
+    def test_indexacao_completa_cria_registros(self):
+        with TemporaryDirectory() as tmp:
+            self._criar_arquivos(tmp)
+
+            resultado = indexar_km_banco(tmp)
+
+        self.assertTrue(resultado["ok"])
+        self.assertEqual(resultado["detalhes"]["modo"], "completo")
+        self.assertEqual(resultado["detalhes"]["criados"], 3)
+        self.assertEqual(KMFileIndex.objects.filter(ativo=True).count(), 3)
+
+    def test_indexacao_incremental_grava_apenas_delta(self):
+        with TemporaryDirectory() as tmp:
+            pasta = self._criar_arquivos(tmp)
+            indexar_km_banco(tmp, incremental=True)
+
+            alterado = pasta / "108-505-02-A.docx"
+            alterado.write_text("conteudo maior", encoding="utf-8")
+            stat = alterado.stat()
+            os.utime(alterado, (stat.st_atime, stat.st_mtime + 10))
+            (pasta / "108-505-04-A.pdf").unlink()
+            (pasta / "108-505-05-A.xlsx").write_text("d", encoding="utf-8")
+
+            resultado = indexar_km_banco(tmp, incremental=True, batch_size=1)
+
+        detalhes = resultado["detalhes"]
+        self.assertEqual(detalhes["modo"], "incremental")
+        self.assertEqual(detalhes["criados"], 1)
+        self.assertEqual(detalhes["atualizados"], 1)
+        self.assertEqual(detalhes["inalterados"], 1)
+        self.assertEqual(detalhes["desativados_nesta_execucao"], 1)
+        self.assertEqual(KMFileIndex.objects.filter(ativo=True).count(), 3)
+        self.assertFalse(
+            KMFileIndex.objects.get(nome_arquivo="108-505-04-A.pdf").ativo
+        )
+        self.assertEqual(
+            KMFileIndex.objects.get(nome_arquivo="108-505-02-A.docx").tamanho_bytes,
+            len("conteudo maior"),
+        )
+
+    def test_indexacao_incremental_sem_mudancas(self):
+        with TemporaryDirectory() as tmp:
+            self._criar_arquivos(tmp)
+            indexar_km_banco(tmp)
+
+            resultado = indexar_km_banco(tmp, incremental=True)
+
+        detalhes = resultado["detalhes"]
+        self.assertEqual(detalhes["inalterados"], 3)
+        self.assertEqual(detalhes["criados"], 0)
+        self.assertEqual(detalhes["atualizados"], 0)
+
+    def test_indexacao_incremental_preserva_subarvore_com_erro(self):
+        listar_original = fs_scanner.listar_diretorio
+
+        with TemporaryDirectory() as tmp:
+            pasta = self._criar_arquivos(tmp)
+            (pasta / "sub").mkdir()
+            (pasta / "sub" / "108-505-06-A.pdf").write_text("e", encoding="utf-8")
+            indexar_km_banco(tmp, incremental=True)
+
+            def listar_com_falha(caminho):
+                if caminho == str(pasta):
+                    return [], [], [(caminho, "rede indisponível")]
+                return listar_original(caminho)
+
+            with patch.object(fs_scanner, "listar_diretorio", side_effect=listar_com_falha):
+                resultado = indexar_km_banco(tmp, incremental=True)
+
+        detalhes = resultado["detalhes"]
+        self.assertEqual(resultado["status"], "sucesso_parcial")
+        self.assertEqual(detalhes["desativados_nesta_execucao"], 0)
+        self.assertEqual(detalhes["preservados_por_erro"], 4)
+        self.assertEqual(KMFileIndex.objects.filter(ativo=True).count(), 4)
+
+    def test_base_inexistente_retorna_falha(self):
+        resultado = indexar_km_banco("/caminho/que/nao/existe", incremental=True)
+
+        self.assertFalse(resultado["ok"])
+        self.assertEqual(resultado["quantidade_processada"], 0)
+
+
+@override_settings(KM_IMPRESSAO_DIGITAL=True)
+class KMImpressaoDigitalTests(TestCase):
+    def test_impressao_usa_inicio_e_fim(self):
+        with TemporaryDirectory() as tmp:
+            arquivo = Path(tmp) / "a.bin"
+            arquivo.write_bytes(b"x" * 100 + b"meio" + b"y" * 100)
+            original = calcular_impressao_digital(arquivo, bloco=16)
+
+            arquivo.write_bytes(b"x" * 100 + b"MEIO" + b"y" * 100)
+            meio_alterado = calcular_impressao_digital(arquivo, bloco=16)
+
+            arquivo.write_bytes(b"x" * 100 + b"meio" + b"y" * 99 + b"z")
+            fim_alterado = calcular_impressao_digital(arquivo, bloco=16)
+
+        self.assertEqual(original, meio_alterado)
+        self.assertNotEqual(original, fim_alterado)
+        self.assertEqual(calcular_impressao_digital("/caminho/que/nao/existe"), "")
+
+    def test_incremental_reconhece_arquivo_movido(self):
+        with TemporaryDirectory() as tmp:
+            origem = Path(tmp) / "1.4 ETS"
+            destino = Path(tmp) / "Reorganizado" / "ETS"
+            origem.mkdir()
+            destino.mkdir(parents=True)
+            (origem / "108-505-02-A.dwg").write_bytes(b"desenho" * 50)
+
+            indexar_km_banco(tmp, incremental=True)
+            pk_original = KMFileIndex.objects.get().pk
+
+            (origem / "108-505-02-A.dwg").rename(destino / "108-505-02-A.dwg")
+            resultado = indexar_km_banco(tmp, incremental=True)
+
+        detalhes = resultado["detalhes"]
+        self.assertEqual(detalhes["movidos"], 1)
+        self.assertEqual(detalhes["criados"], 0)
+        self.assertEqual(detalhes["desativados_nesta_execucao"], 0)
+
+        registro = KMFileIndex.objects.get()
+        self.assertEqual(registro.pk, pk_original)
+        self.assertTrue(registro.ativo)
+        self.assertEqual(registro.pasta, str(destino))
+
+    def test_completo_reaproveita_impressao_de_arquivo_inalterado(self):
+        with TemporaryDirectory() as tmp:
+            pasta = Path(tmp)
+            (pasta / "108-505-02-A.dwg").write_bytes(b"desenho" * 50)
+            (pasta / "108-505-03-A.dwg").write_bytes(b"outro" * 50)
+
+            primeiro = indexar_km_banco(tmp)
+            impressoes = dict(KMFileIndex.objects.values_list("nome_arquivo", "impressao_digital"))
+
+            alterado = pasta / "108-505-03-A.dwg"
+            alterado.write_bytes(b"alterado" * 50)
+            os.utime(alterado, (alterado.stat().st_atime, alterado.stat().st_mtime + 10))
+
+            with patch.object(
+                km_indexer, "calcular_impressao_digital", wraps=km_indexer.calcular_impressao_digital
+            ) as calcular:
+                segundo = indexar_km_banco(tmp)
+
+        self.assertEqual(primeiro["detalhes"]["impressoes_calculadas"], 2)
+        self.assertEqual(segundo["detalhes"]["impressoes_calculadas"], 1)
+        self.assertEqual([c.args[0] for c in calcular.call_args_list], [str(alterado)])
+        self.assertEqual(
+            KMFileIndex.objects.get(nome_arquivo="108-505-02-A.dwg").impressao_digital,
+            impressoes["108-505-02-A.dwg"],
+        )
+
+    def test_movido_com_outro_nome_descarta_chave_antiga(self):
+        with TemporaryDirectory() as tmp:
+            origem = Path(tmp) / "1.4 ETS"
+            destino = Path(tmp) / "Reorganizado"
+            origem.mkdir()
+            destino.mkdir()
+            (origem / "108-505-02-A.dwg").write_bytes(b"desenho" * 50)
+
+            indexar_km_banco(tmp, incremental=True)
+            registro = KMFileIndex.objects.get()
+            for chave in ("10850502A", "10850502"):
+                KMResolucaoDocumento.objects.create(
+                    chave=chave, arquivo=registro, caminho_completo=registro.caminho_completo
+                )
+
+            (origem / "108-505-02-A.dwg").rename(destino / "108-505-02-B.dwg")
+            resultado = indexar_km_banco(tmp, incremental=True)
+
+        self.assertEqual(resultado["detalhes"]["movidos"], 1)
+        self.assertEqual(
+            list(KMResolucaoDocumento.objects.values_list("chave", "caminho_completo")),
+            [("10850502", str(destino / "108-505-02-B.dwg"))],
+        )
+
+    def test_relatorio_de_duplicados(self):
+        with TemporaryDirectory() as tmp:
+            for nome in ("A", "B", "C"):
+                pasta = Path(tmp) / nome
+                pasta.mkdir()
+                (pasta / "108-505-02-A.dwg").write_bytes(b"mesmo conteudo")
+            (Path(tmp) / "A" / "108-505-03-A.dwg").write_bytes(b"outro conteudo")
+
+            indexar_km_banco(tmp, incremental=True)
+
+        relatorio = relatorio_duplicados_km(extensao=".dwg")
+
+        self.assertEqual(relatorio["total_grupos"], 1)
+        self.assertEqual(relatorio["grupos"][0]["copias"], 3)
+        self.assertEqual(relatorio["bytes_redundantes"], 2 * len(b"mesmo conteudo"))
+        self.assertEqual(relatorio["sem_impressao"], 0)
@@ -0,0 +1,80 @@
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from apps.automacoes.models import KMFileIndex
+from apps.automacoes.services.km_indexer import campos_arquivo
+from apps.automacoes.services.km_memory_index import (
+    IndiceCompactoKM,
+    invalidar_indice_compacto,
+    obter_indice_compacto,
+)
+
+
+def _criar_km(caminho):
+    arquivo = Path(caminho)
+    return KMFileIndex.objects.create(
+        caminho_completo=str(arquivo),
+        **campos_arquivo(arquivo, 10, 0),
+    )
+
+
+class IndiceCompactoKMTests(TestCase):
+    def setUp(self):
+        invalidar_indice_compacto()
+
+    def test_construir_preserva_campos(self):
+        indice = IndiceCompactoKM.construir([
+            ("/km/ets/108-505-02.docx", "/km/ets", ".DOCX", "10850502DOCX", "10850502", False),
+            ("/km/letters/T-01.pdf", "/km/letters", ".pdf", "T01PDF", "T01", True),
+            ("/fora/estranho.dwg", "/km/outra", ".dwg", "ESTRANHODWG", "OUTRO", False),
+        ])
+
+        itens = list(indice)
+
+        self.assertEqual(len(indice), 3)
+        self.assertEqual(itens[0].path, Path("/km/ets/108-505-02.docx"))
+        self.assertEqual(itens[0].stem_norm, "10850502")
+        self.assertEqual(itens[0].suffix, ".docx")
+        self.assertFalse(itens[0].is_transmittal_letter)
+        self.assertTrue(itens[1].is_transmittal_letter)
+        self.assertEqual(itens[2].caminho, "/fora/estranho.dwg")
+        self.assertEqual(itens[2].stem_norm, "OUTRO")
+        self.assertEqual(indice.estatisticas()["sufixos"], 3)
+
+    @override_settings(KM_TRIGRAM_VERIFICACAO_SEGUNDOS=0)
+    def test_obter_indice_reconstroi_quando_geracao_muda(self):
+        _criar_km("/km/ets/108-505-02.docx")
+        primeiro = obter_indice_compacto()
+
+        self.assertIs(obter_indice_compacto(), primeiro)
+
+        _criar_km("/km/ets/108-505-03.dwg")
+        segundo = obter_indice_compacto()
+
+        self.assertIsNot(segundo, primeiro)
+        self.assertEqual(len(segundo), 2)
+
+    @override_settings(KM_TRIGRAM_VERIFICACAO_SEGUNDOS=60)
+    def test_geracao_nao_e_consultada_dentro_do_intervalo(self):
+        _criar_km("/km/ets/108-505-02.docx")
+        primeiro = obter_indice_compacto()
+
+        with self.assertNumQueries(0):
+            self.assertIs(obter_indice_compacto(), primeiro)
+
+        _criar_km("/km/ets/108-505-03.dwg")
+        self.assertEqual(len(obter_indice_compacto(verificar=True)), 2)
+
+    def test_command_reporta_memoria_e_tempo(self):
+        _criar_km("/km/ets/108-505-02.docx")
+        output = StringIO()
+
+        call_command("km_memory_index_stats", "--legacy", stdout=output)
+
+        conteudo = output.getvalue()
+        self.assertIn("compacto", conteudo)
+        self.assertIn("legado", conteudo)
+        self.assertIn("MB", conteudo)
@@ -0,0 +1,128 @@
+import shutil
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from apps.automacoes.models import KMFileIndex, KMParticaoIndexacao
+from apps.automacoes.services import km_reindex_particionado
+from apps.automacoes.services.km_reindex_particionado import (
+    PARTICAO_RAIZ,
+    listar_particoes,
+    reindexar_km_particionado,
+)
+
+
+class KMReindexParticionadoTests(TestCase):
+    def _criar_arvore(self, raiz):
+        raiz = Path(raiz)
+        for pasta, nome in (("1.4 ETS", "108-505-02-A.docx"), ("2.1 Mecanica", "108-600-01-A.pdf")):
+            (raiz / pasta / "Sub").mkdir(parents=True)
+            (raiz / pasta / nome).write_text("a", encoding="utf-8")
+            (raiz / pasta / "Sub" / f"sub-{nome}").write_text("b", encoding="utf-8")
+        (raiz / "solto.txt").write_text("c", encoding="utf-8")
+
+    def test_lista_particoes_de_primeiro_nivel(self):
+        with TemporaryDirectory() as tmp:
+            self._criar_arvore(tmp)
+            particoes = listar_particoes(tmp)
+
+        self.assertEqual(particoes, [PARTICAO_RAIZ, "1.4 ETS", "2.1 Mecanica"])
+
+    def test_execucao_completa_registra_particoes(self):
+        with TemporaryDirectory() as tmp:
+            self._criar_arvore(tmp)
+            resultado = reindexar_km_particionado(tmp, workers=2)
+
+        detalhes = resultado["detalhes"]
+        self.assertTrue(resultado["ok"])
+        self.assertEqual(resultado["status"], "sucesso")
+        self.assertEqual(resultado["quantidade_processada"], 5)
+        self.assertEqual(detalhes["particoes_total"], 3)
+        self.assertEqual(detalhes["particoes_falhas"], [])
+        self.assertEqual(
+            {linha["particao"]: linha["arquivos"] for linha in detalhes["particoes"]},
+            {PARTICAO_RAIZ: 1, "1.4 ETS": 2, "2.1 Mecanica": 2},
+        )
+        self.assertTrue(all("duracao_segundos" in linha for linha in detalhes["particoes"]))
+        self.assertEqual(KMFileIndex.objects.filter(ativo=True).count(), 5)
+
+    def test_falha_e_retomada_a_partir_do_checkpoint(self):
+        original = km_reindex_particionado.aplicar_delta_km
+
+        def falhar_mecanica(arquivos, existentes, **kwargs):
+            if any("2.1 Mecanica" in entrada.caminho for entrada in arquivos):
+                raise OSError("rede indisponível")
+            return original(arquivos, existentes, **kwargs)
+
+        with TemporaryDirectory() as tmp:
+            self._criar_arvore(tmp)
+
+            with patch.object(km_reindex_particionado, "aplicar_delta_km", side_effect=falhar_mecanica):
+                primeira = reindexar_km_particionado(tmp)
+
+            segunda = reindexar_km_particionado(tmp)
+
+        self.assertEqual(primeira["status"], "sucesso_parcial")
+        self.assertEqual(primeira["detalhes"]["particoes_falhas"], ["2.1 Mecanica"])
+        falha = next(l for l in primeira["detalhes"]["particoes"] if l["particao"] == "2.1 Mecanica")
+        self.assertIn("rede indisponível", falha["erro"])
+
+        self.assertEqual(segunda["detalhes"]["execucao"], primeira["detalhes"]["execucao"])
+        self.assertEqual(segunda["detalhes"]["particoes_executadas"], 1)
+        self.assertEqual(segunda["detalhes"]["particoes_falhas"], [])
+        linhas = {linha["particao"]: linha for linha in segunda["detalhes"]["particoes"]}
+        self.assertTrue(linhas["1.4 ETS"]["ja_concluida"])
+        self.assertEqual(linhas["2.1 Mecanica"]["tentativas"], 2)
+        self.assertEqual(KMFileIndex.objects.filter(ativo=True).count(), 5)
+
+    def test_erro_de_leitura_falha_a_particao_sem_desativar(self):
+        listar_original = km_reindex_particionado.listar_diretorio
+
+        with TemporaryDirectory() as tmp:
+            self._criar_arvore(tmp)
+            reindexar_km_particionado(tmp)
+
+            def raiz_ilegivel(pasta):
+                if pasta == tmp:
+                    return [], [], [(pasta, "acesso negado")]
+                return listar_original(pasta)
+
+            with patch.object(km_reindex_particionado, "listar_diretorio", side_effect=raiz_ilegivel):
+                with patch.object(km_reindex_particionado, "listar_particoes", return_value=[PARTICAO_RAIZ]):
+                    resultado = reindexar_km_particionado(tmp)
+
+        self.assertEqual(resultado["detalhes"]["particoes_falhas"], [PARTICAO_RAIZ])
+        linha = resultado["detalhes"]["particoes"][0]
+        self.assertEqual(linha["status"], KMParticaoIndexacao.STATUS_FALHOU)
+        self.assertEqual(linha["desativados"], 0)
+        self.assertTrue(KMFileIndex.objects.get(nome_arquivo="solto.txt").ativo)
+
+    def test_execucao_que_sempre_falha_nao_e_retomada_para_sempre(self):
+        with TemporaryDirectory() as tmp:
+            self._criar_arvore(tmp)
+
+            with patch.object(km_reindex_particionado, "aplicar_delta_km", side_effect=OSError("rede indisponível")):
+                execucoes = [
+                    reindexar_km_particionado(tmp, max_tentativas=2)["detalhes"]["execucao"]
+                    for _ in range(3)
+                ]
+
+        self.assertEqual(execucoes[0], execucoes[1])
+        self.assertNotEqual(execucoes[2], execucoes[1])
+
+    def test_nova_execucao_apos_conclusao_e_pasta_removida(self):
+        with TemporaryDirectory() as tmp:
+            self._criar_arvore(tmp)
+            primeira = reindexar_km_particionado(tmp)
+
+            shutil.rmtree(Path(tmp) / "2.1 Mecanica")
+            segunda = reindexar_km_particionado(tmp)
+
+        self.assertNotEqual(segunda["detalhes"]["execucao"], primeira["detalhes"]["execucao"])
+        self.assertEqual(segunda["detalhes"]["desativados_particoes_removidas"], 2)
+        self.assertEqual(KMFileIndex.objects.filter(ativo=True).count(), 3)
+        self.assertFalse(
+            KMParticaoIndexacao.objects.filter(execucao=primeira["detalhes"]["execucao"]).exists()
+        )
@@ -0,0 +1,93 @@
+from pathlib import Path
+
+from django.test import TestCase
+
+from apps.automacoes.models import KMFileIndex, KMResolucaoDocumento
+from apps.automacoes.services.km_indexer import campos_arquivo
+from apps.automacoes.services.km_resolver import (
+    reconstruir_resolucoes_km,
+    resolver_documento_km,
+    resolver_documentos_km,
+    resolver_documentos_km_ao_vivo,
+)
+from apps.automacoes.services.km_trigram_index import invalidar_indice_trigramas, obter_indice_trigramas
+
+
+def _criar_km(caminho):
+    arquivo = Path(caminho)
+    return KMFileIndex.objects.create(
+        caminho_completo=str(arquivo),
+        **campos_arquivo(arquivo, 10, 0),
+    )
+
+
+class KMResolverTests(TestCase):
+    def setUp(self):
+        invalidar_indice_trigramas()
+
+        self.docx = _criar_km("/km/1.4 ETS/108-505-02-A.docx")
+        self.pdf = _criar_km("/km/1.4 ETS/108-505-02-A.pdf")
+        self.letter = _criar_km(
+            "/km/0 Transmittal Letters/Transmittal Letters/108-777-01 cover.pdf"
+        )
+
+    def test_reconstruir_gera_as_duas_variantes(self):
+        resultado = reconstruir_resolucoes_km()
+
+        self.assertGreater(resultado["resolucoes"], 0)
+        self.assertTrue(
+            KMResolucaoDocumento.objects.filter(chave="10850502A", permitir_transmittal=False).exists()
+        )
+        self.assertTrue(
+            KMResolucaoDocumento.objects.filter(chave="10850502A", permitir_transmittal=True).exists()
+        )
+
+    def test_resolver_prioriza_documento_tecnico(self):
+        reconstruir_resolucoes_km()
+
+        self.assertEqual(resolver_documento_km("108-505-02-A"), Path(self.docx.caminho_completo))
+
+    def test_letter_so_resolve_quando_permitido(self):
+        reconstruir_resolucoes_km()
+
+        self.assertIsNone(resolver_documento_km("108-777-01"))
+        self.assertEqual(
+            resolver_documento_km("108-777-01", permitir_transmittal=True),
+            Path(self.letter.caminho_completo),
+        )
+
+    def test_resolver_em_lote_ignora_arquivos_inativos(self):
+        reconstruir_resolucoes_km()
+        KMFileIndex.objects.filter(pk=self.docx.pk).update(ativo=False)
+
+        resultado = resolver_documentos_km(["108-505-02-A", "999-999-99"])
+
+        self.assertEqual(resultado, {})
+
+    def test_resolver_ao_vivo_em_lote_com_consultas_constantes(self):
+        _criar_km("/km/1.4 ETS/108-505-03-A.dwg")
+        _criar_km("/km/1.4 ETS/108-505-04-A.xlsx")
+        indice = obter_indice_trigramas(forcar=True)
+        documentos = ["108-505-02-A", "108-505-03-A", "108-505-04-A", "108-777-01"]
+
+        with self.assertNumQueries(2):
+            resultado = resolver_documentos_km_ao_vivo(documentos, indice=indice)
+
+        self.assertEqual(resultado["108-505-02-A"], Path(self.docx.caminho_completo))
+        self.assertEqual(resultado["108-505-03-A"], Path("/km/1.4 ETS/108-505-03-A.dwg"))
+        self.assertEqual(resultado["108-505-04-A"], Path("/km/1.4 ETS/108-505-04-A.xlsx"))
+        self.assertNotIn("108-777-01", resultado)
+
+        resultado = resolver_documentos_km_ao_vivo(["108-777-01"], permitir_transmittal=True, indice=indice)
+        self.assertEqual(resultado["108-777-01"], Path(self.letter.caminho_completo))
+
+    def test_resolver_ao_vivo_em_lote_usa_icontains_para_codigo_curto(self):
+        curto = _criar_km("/km/1.4 ETS/AB.docx")
+        indice = obter_indice_trigramas(forcar=True)
+        self.assertIsNone(indice.buscar("AB"))
+
+        with self.assertNumQueries(2):
+            resultado = resolver_documentos_km_ao_vivo(["AB", "108-505-02-A"], indice=indice)
+
+        self.assertEqual(resultado["AB"], Path(curto.caminho_completo))
+        self.assertEqual(resultado["108-505-02-A"], Path(self.docx.caminho_completo))
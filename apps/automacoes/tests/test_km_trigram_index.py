@@ -0,0 +1,68 @@
+from django.test import TestCase, override_settings
+
+from apps.automacoes.models import KMFileIndex
+from apps.automacoes.services.km_trigram_index import (
+    IndiceTrigramasKM,
+    candidatos_km,
+    invalidar_indice_trigramas,
+    obter_indice_trigramas,
+)
+
+
+def _criar_km(nome, pasta=r"\\servidor\km\1.4 ETS", documento="", ativo=True):
+    stem = nome.rsplit(".", 1)[0]
+    return KMFileIndex.objects.create(
+        caminho_completo=f"{pasta}\\{nome}",
+        nome_arquivo=nome,
+        pasta=pasta,
+        extensao="." + nome.rsplit(".", 1)[-1].lower(),
+        nome_normalizado="".join(ch for ch in nome.upper() if ch.isalnum()),
+        stem_normalizado="".join(ch for ch in stem.upper() if ch.isalnum()),
+        documento_extraido=documento,
+        ativo=ativo,
+    )
+
+
+class IndiceTrigramasKMTests(TestCase):
+    def setUp(self):
+        invalidar_indice_trigramas()
+
+    def test_construir_e_buscar_por_substring(self):
+        indice = IndiceTrigramasKM.construir([
+            (1, "10850502ADOCX", "10850502A", "108-505-02-A", r"\\km\ets"),
+            (2, "10850503ADWG", "10850503A", "108-505-03-A", r"\\km\ets"),
+            (3, "T10850502PDF", "T10850502", "", r"\\km\letters"),
+        ])
+
+        self.assertEqual(indice.buscar("108-505-02"), [1, 3])
+        self.assertEqual(indice.buscar("505-03"), [2])
+        self.assertEqual(indice.buscar("999999"), [])
+        self.assertIsNone(indice.buscar("10"))
+        self.assertEqual(indice.buscar("letters", incluir_pastas=True), [3])
+        self.assertEqual(indice.estatisticas()["arquivos"], 3)
+
+    @override_settings(KM_TRIGRAM_VERIFICACAO_SEGUNDOS=0)
+    def test_candidatos_km_ignora_inativos_e_acompanha_banco(self):
+        ativo = _criar_km("108-505-02-A.docx", documento="108-505-02-A")
+        _criar_km("108-505-02-B.docx", ativo=False)
+
+        self.assertEqual(candidatos_km("108-505-02"), [ativo.pk])
+
+        novo = _criar_km("108-505-02-C.dwg")
+
+        self.assertEqual(sorted(candidatos_km("10850502")), sorted([ativo.pk, novo.pk]))
+
+    @override_settings(KM_TRIGRAM_VERIFICACAO_SEGUNDOS=60)
+    def test_geracao_nao_e_consultada_dentro_do_intervalo(self):
+        _criar_km("108-505-02-A.docx")
+        indice = obter_indice_trigramas()
+
+        with self.assertNumQueries(0):
+            self.assertIs(obter_indice_trigramas(), indice)
+            candidatos_km("108-505-02")
+
+    def test_candidatos_km_retorna_none_acima_do_limite(self):
+        _criar_km("108-505-02-A.docx")
+        _criar_km("108-505-02-B.docx")
+
+        self.assertIsNone(candidatos_km("108-505-02", limite=1))
@@ -0,0 +1,157 @@
+import os
+import shutil
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from apps.automacoes.models import KMFileIndex, KMResolucaoDocumento
+from apps.automacoes.services import km_watcher
+from apps.automacoes.services.km_indexer import indexar_km_banco
+from apps.automacoes.services.km_resolver import reconstruir_resolucoes_km
+from apps.automacoes.services.km_trigram_index import obter_indice_trigramas
+from apps.automacoes.services.km_watcher import ObservadorKM
+
+
+def _tocar_pasta(pasta):
+    stat = pasta.stat()
+    os.utime(pasta, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10_000_000_000))
+
+
+class ObservadorKMTests(TestCase):
+    def _preparar(self, raiz):
+        pasta = Path(raiz) / "1.4 ETS"
+        outra = Path(raiz) / "2.1 Mecanica"
+        pasta.mkdir(parents=True)
+        outra.mkdir(parents=True)
+        (pasta / "108-505-02-A.docx").write_text("a", encoding="utf-8")
+        (outra / "108-600-01-A.pdf").write_text("b", encoding="utf-8")
+
+        indexar_km_banco(raiz, incremental=True)
+        reconstruir_resolucoes_km(obter_indice_trigramas(forcar=True))
+
+        observador = ObservadorKM(raiz, workers=2)
+        observador.inicializar()
+        return observador, pasta, outra
+
+    def test_sem_alteracoes_nao_relista(self):
+        with TemporaryDirectory() as tmp:
+            observador, _, _ = self._preparar(tmp)
+            resultado = observador.verificar()
+
+        self.assertEqual(resultado["pastas_monitoradas"], 3)
+        self.assertEqual(resultado["pastas_relistadas"], 0)
+        self.assertEqual(resultado["pks_afetados"], [])
+
+    def test_relista_apenas_pasta_alterada(self):
+        with TemporaryDirectory() as tmp:
+            observador, pasta, _ = self._preparar(tmp)
+
+            (pasta / "108-505-02-A.docx").unlink()
+            (pasta / "108-505-03-A.docx").write_text("c", encoding="utf-8")
+            _tocar_pasta(pasta)
+
+            resultado = observador.verificar()
+
+        self.assertEqual(resultado["pastas_alteradas"], 1)
+        self.assertEqual(resultado["pastas_relistadas"], 1)
+        self.assertEqual(resultado["criados"], 1)
+        self.assertEqual(resultado["desativados"], 1)
+        self.assertFalse(KMFileIndex.objects.get(nome_arquivo="108-505-02-A.docx").ativo)
+        self.assertTrue(KMFileIndex.objects.get(nome_arquivo="108-505-03-A.docx").ativo)
+        self.assertTrue(KMResolucaoDocumento.objects.filter(chave="10850503A").exists())
+        self.assertFalse(KMResolucaoDocumento.objects.filter(chave="10850502A").exists())
+
+    def test_nova_subpasta_e_pasta_removida(self):
+        with TemporaryDirectory() as tmp:
+            observador, pasta, outra = self._preparar(tmp)
+
+            nova = pasta / "Rev B"
+            nova.mkdir()
+            (nova / "108-505-02-B.docx").write_text("d", encoding="utf-8")
+            _tocar_pasta(pasta)
+            shutil.rmtree(outra)
+
+            resultado = observador.verificar()
+
+        self.assertEqual(resultado["pastas_removidas"], 1)
+        self.assertEqual(resultado["criados"], 1)
+        self.assertFalse(KMFileIndex.objects.get(nome_arquivo="108-600-01-A.pdf").ativo)
+        self.assertTrue(KMFileIndex.objects.get(nome_arquivo="108-505-02-B.docx").ativo)
+        self.assertNotIn(str(outra), observador.retrato)
+        self.assertIn(str(nova), observador.retrato)
+
+    def test_erro_transitorio_nao_desativa_a_pasta(self):
+        with TemporaryDirectory() as tmp:
+            observador, pasta, _ = self._preparar(tmp)
+            retrato = observador.retrato[str(pasta)]
+            _tocar_pasta(pasta)
+
+            with patch.object(
+                km_watcher,
+                "listar_diretorio",
+                return_value=([], [], [(str(pasta), "rede indisponível")]),
+            ):
+                resultado = observador.verificar()
+
+            self.assertEqual(resultado["pastas_com_erro"], 1)
+            self.assertEqual(resultado["desativados"], 0)
+            self.assertTrue(KMFileIndex.objects.get(nome_arquivo="108-505-02-A.docx").ativo)
+            self.assertEqual(observador.retrato[str(pasta)], retrato)
+
+            with patch.object(km_watcher, "_mtime_pasta", return_value=km_watcher.MTIME_ERRO):
+                resultado = observador.verificar()
+
+            self.assertEqual(resultado["pastas_com_erro"], 3)
+            self.assertEqual(resultado["pastas_relistadas"], 0)
+
+            # rede de volta: a pasta é relistada normalmente
+            resultado = observador.verificar()
+
+        self.assertEqual(resultado["pastas_relistadas"], 1)
+        self.assertEqual(resultado["desativados"], 0)
+        self.assertTrue(KMFileIndex.objects.get(nome_arquivo="108-505-02-A.docx").ativo)
+
+    def test_raiz_inacessivel_nao_desativa_o_indice(self):
+        with TemporaryDirectory() as tmp:
+            raiz = Path(tmp) / "KM"
+            observador, pasta, _ = self._preparar(raiz)
+
+            # share fora do ar: a raiz e tudo abaixo dela somem por um ciclo
+            raiz.rename(Path(tmp) / "KM fora")
+            resultado = observador.verificar()
+
+            self.assertEqual(resultado["pastas_removidas"], 0)
+            self.assertEqual(resultado["desativados"], 0)
+            self.assertEqual(resultado["pastas_com_erro"], 3)
+            self.assertFalse(KMFileIndex.objects.filter(ativo=False).exists())
+            self.assertIn(str(pasta), observador.retrato)
+
+            (Path(tmp) / "KM fora").rename(raiz)
+            resultado = observador.verificar()
+
+        self.assertEqual(resultado["pastas_removidas"], 0)
+        self.assertEqual(resultado["desativados"], 0)
+        self.assertEqual(KMFileIndex.objects.filter(ativo=True).count(), 2)
+
+
+class WatchKMIndexCommandTests(TestCase):
+    def test_comando_executa_ciclos_limitados(self):
+        with TemporaryDirectory() as tmp:
+            (Path(tmp) / "108-505-02-A.docx").write_text("a", encoding="utf-8")
+            saida = StringIO()
+
+            call_command(
+                "watch_km_index",
+                base=tmp,
+                ciclos=1,
+                intervalo=0,
+                sincronizar=True,
+                stdout=saida,
+            )
+
+        self.assertIn("Observando", saida.getvalue())
+        self.assertEqual(KMFileIndex.objects.filter(ativo=True).count(), 1)
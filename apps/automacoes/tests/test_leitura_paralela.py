@@ -0,0 +1,45 @@
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from apps.automacoes.services import leitura_paralela
+from apps.automacoes.services.leitura_paralela import criar_pool_processos, ler_com_cache
+
+
+def _dobro(caminho):
+    return {"caminho": caminho, "valor": 2 * int(caminho), "erro": ""}
+
+
+class _CacheFalso:
+    def __init__(self, guardados):
+        self.guardados = guardados
+        self.registrados = []
+
+    def consultar(self, caminho):
+        return self.guardados.get(caminho)
+
+    def registrar(self, lida):
+        self.registrados.append(lida["caminho"])
+
+
+class LeituraParalelaTests(SimpleTestCase):
+    def test_pool_so_com_mais_de_um_worker(self):
+        self.assertIsNone(criar_pool_processos(1))
+
+        avisos = []
+        with patch.object(leitura_paralela, "ProcessPoolExecutor", side_effect=OSError("sem fork")):
+            self.assertIsNone(criar_pool_processos(2, avisar=avisos.append))
+        self.assertIn("sem fork", avisos[0])
+
+    def test_resultados_na_ordem_e_so_o_que_falta_e_lido(self):
+        cache = _CacheFalso({"2": {"caminho": "2", "valor": -1, "erro": ""}})
+        pool = criar_pool_processos(2)
+        self.assertIsNotNone(pool)
+        try:
+            lidas = list(ler_com_cache(_dobro, ["1", "2", "3"], pool, cache))
+        finally:
+            pool.shutdown()
+
+        self.assertEqual([l["valor"] for l in lidas], [2, -1, 6])
+        self.assertEqual(cache.registrados, ["1", "3"])
+        self.assertEqual([l["valor"] for l in ler_com_cache(_dobro, ["4"])], [8])
@@ -0,0 +1,79 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from apps.automacoes.services import atualizar_ld
+from apps.automacoes.services.log_automacao import LogAutomacao
+
+
+class LogAutomacaoTests(SimpleTestCase):
+    def test_grava_em_lotes_com_o_mesmo_texto(self):
+        with TemporaryDirectory() as tmp:
+            arquivo = str(Path(tmp) / "LDP.log")
+            sink = LogAutomacao(eco=False, intervalo=5.0)
+
+            mensagens = [f"linha {n} ✅" for n in range(300)]
+            for mensagem in mensagens:
+                sink.escrever(mensagem, arquivo=arquivo)
+            sink.descarregar()
+
+            self.assertEqual(Path(arquivo).read_text(encoding="utf-8").splitlines(), mensagens)
+            self.assertLess(sink.aberturas, 10)
+            self.assertEqual(sink.linhas_gravadas, 300)
+
+    def test_mantem_ordem_entre_arquivos(self):
+        with TemporaryDirectory() as tmp:
+            a = str(Path(tmp) / "a.log")
+            b = str(Path(tmp) / "b.log")
+            sink = LogAutomacao(eco=False)
+
+            sink.escrever("a1", arquivo=a)
+            sink.escrever("b1", arquivo=b)
+            sink.escrever("a2", arquivo=a)
+            sink.escrever("só terminal")
+            sink.descarregar()
+
+            self.assertEqual(Path(a).read_text(encoding="utf-8"), "a1\na2\n")
+            self.assertEqual(Path(b).read_text(encoding="utf-8"), "b1\n")
+
+    def test_memoria_guarda_as_ultimas_linhas(self):
+        sink = LogAutomacao(eco=False, linhas_memoria=3)
+
+        sink.escrever("um")
+        sink.escrever("\n" + "=" * 5)
+        sink.escrever("dois")
+        sink.escrever("três")
+
+        self.assertEqual(sink.ultimas_linhas(), ["=====", "dois", "três"])
+        sink.limpar_memoria()
+        self.assertEqual(sink.ultimas_linhas(), [])
+
+    def test_falha_no_arquivo_nao_interrompe(self):
+        with TemporaryDirectory() as tmp:
+            sink = LogAutomacao(eco=False)
+
+            sink.escrever("perdida", arquivo=str(Path(tmp) / "nao_existe" / "LDP.log"))
+            sink.descarregar()
+            sink.escrever("ok", arquivo=str(Path(tmp) / "LDP.log"))
+            sink.descarregar()
+
+            self.assertEqual(sink.aberturas, 1)
+            self.assertEqual(Path(tmp, "LDP.log").read_text(encoding="utf-8"), "ok\n")
+
+    def test_log_da_ld_usa_o_arquivo_da_execucao(self):
+        with TemporaryDirectory() as tmp:
+            arquivo = str(Path(tmp) / "LDP.log")
+            sink = LogAutomacao(eco=False)
+
+            with patch.object(atualizar_ld, "LOG", sink), patch.object(atualizar_ld, "LOG_FILE", arquivo):
+                atualizar_ld.log("🧾 Log: teste")
+                atualizar_ld.log("[1/3] Indexando")
+                sink.descarregar()
+
+            self.assertEqual(
+                Path(arquivo).read_text(encoding="utf-8"),
+                "🧾 Log: teste\n[1/3] Indexando\n",
+            )
+            self.assertEqual(sink.ultimas_linhas(), ["🧾 Log: teste", "[1/3] Indexando"])
@@ -0,0 +1,208 @@
+import os
+from datetime import datetime
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from openpyxl import Workbook
+
+from apps.automacoes.services import timeline_pcfs
+from apps.automacoes.services.pcf_parser import (
+    JanelaPCF,
+    extrair_dados_pcf,
+    extrair_pcf_com_tempo,
+    get_by_label,
+)
+
+
+def _salvar_pcf(caminho, itens=3, status=("OPEN", "CLOSED", "OPEN"), status_final="APROVADA"):
+    wb = Workbook()
+    oculta = wb.active
+    oculta.title = "Modelo"
+    oculta.sheet_state = "hidden"
+    oculta["B3"] = "Plan No."
+    oculta["D3"] = "ERRADO"
+
+    ws = wb.create_sheet("PCF")
+    ws["B3"] = "Plan  No."
+    ws["D3"] = "I-DE-001"
+    ws["B4"] = "PCF No."
+    ws["C4"] = "PCF-I-DE-001"
+    ws["B5"] = "Plan Title"
+    ws["E5"] = "Arranjo Geral"
+    ws["H5"] = "PCF Rev."
+    ws["J5"] = "R0"
+    ws["H6"] = "Date"
+    ws["J6"] = datetime(2025, 3, 10)
+    ws["G20"] = "Comment Status"
+    for n in range(itens):
+        ws.cell(row=21 + n, column=1, value=n + 1)
+        ws.cell(row=21 + n, column=7, value=status[n % len(status)])
+    ws["E9"] = "EM ANÁLISE"
+    ws.cell(row=21 + itens + 5, column=5, value=status_final)
+    wb.save(caminho)
+
+
+class PcfParserTests(SimpleTestCase):
+    def test_extrai_registro_da_primeira_aba_visivel(self):
+        with TemporaryDirectory() as tmp:
+            caminho = str(Path(tmp) / "PCF-I-DE-001_R0.xlsx")
+            _salvar_pcf(caminho)
+
+            registro = extrair_dados_pcf(caminho)
+
+        self.assertEqual(registro["Nº DOCUMENTO"], "I-DE-001")
+        self.assertEqual(registro["N º PCF"], "PCF-I-DE-001")
+        self.assertEqual(registro["TITULO"], "Arranjo Geral")
+        self.assertEqual(registro["Revisão da PCF"], "0")
+        self.assertEqual(registro["Data Recebimento"], datetime(2025, 3, 10))
+        self.assertEqual((registro["Open Comments"], registro["Qtd Comentarios"]), (2, 3))
+        self.assertEqual(registro["STATUS FINAL"], "APROVADA")
+        self.assertEqual(registro["PCF LINK"], "PCF-I-DE-001_R0")
+
+    def test_janela_limita_as_linhas_lidas(self):
+        with TemporaryDirectory() as tmp:
+            caminho = str(Path(tmp) / "PCF-I-DE-001_R0.xlsx")
+            _salvar_pcf(caminho, itens=50)
+
+            registro = extrair_dados_pcf(caminho, max_linhas=30)
+
+        self.assertEqual(registro["Qtd Comentarios"], 10)
+        self.assertEqual(registro["STATUS FINAL"], "EM ANÁLISE")
+
+    def test_janela_cheia_e_reportada_em_aviso(self):
+        with TemporaryDirectory() as tmp:
+            caminho = str(Path(tmp) / "PCF-I-DE-001_R0.xlsx")
+            _salvar_pcf(caminho, itens=50)
+
+            truncada = extrair_pcf_com_tempo(caminho, max_linhas=30)
+            inteira = extrair_pcf_com_tempo(caminho)
+
+        self.assertEqual(truncada["erro"], "")
+        self.assertIn("30 linhas", truncada["aviso"])
+        self.assertEqual(truncada["registro"]["Qtd Comentarios"], 10)
+        self.assertEqual(inteira["aviso"], "")
+        self.assertEqual(inteira["registro"]["Qtd Comentarios"], 50)
+
+    def test_rotulo_sem_valor_ao_lado_passa_para_a_proxima_ocorrencia(self):
+        janela = JanelaPCF([
+            (None, "Plan No.", None, None, None, None, None),
+            (None, "Plan No.", None, "I-DE-002"),
+        ])
+
+        self.assertEqual(get_by_label(janela, "PLAN NO.", max_row=20, max_col=20), "I-DE-002")
+        self.assertEqual(get_by_label(janela, "Plan No.", max_row=1, max_col=20), "")
+
+    def test_erro_de_leitura_volta_como_resultado(self):
+        with TemporaryDirectory() as tmp:
+            caminho = Path(tmp) / "PCF-corrompida.xlsx"
+            caminho.write_bytes(b"nao e um xlsx")
+
+            lida = extrair_pcf_com_tempo(str(caminho))
+
+        self.assertIsNone(lida["registro"])
+        self.assertTrue(lida["erro"].startswith("BadZipFile"))
+        self.assertGreaterEqual(lida["segundos"], 0)
+
+
+class LerPcfsTests(SimpleTestCase):
+    def test_pool_devolve_os_mesmos_registros_na_ordem(self):
+        with TemporaryDirectory() as tmp:
+            arquivos = []
+            for n in range(4):
+                caminho = str(Path(tmp) / f"PCF-I-DE-00{n}_R0.xlsx")
+                _salvar_pcf(caminho, itens=n + 1)
+                arquivos.append(caminho)
+
+            serial = list(timeline_pcfs.ler_pcfs(arquivos))
+            pool = timeline_pcfs.criar_pool_pcfs(workers=2)
+            self.assertIsNotNone(pool)
+            try:
+                paralelo = list(timeline_pcfs.ler_pcfs(arquivos, pool))
+            finally:
+                pool.shutdown()
+
+        self.assertEqual([l["caminho"] for l in paralelo], arquivos)
+        self.assertEqual([l["registro"] for l in paralelo], [l["registro"] for l in serial])
+        self.assertEqual([l["registro"]["Qtd Comentarios"] for l in paralelo], [1, 2, 3, 4])
+
+
+class CachePCFsTests(SimpleTestCase):
+    def test_pcf_inalterada_nao_e_aberta_de_novo(self):
+        with TemporaryDirectory() as tmp:
+            arquivos = []
+            for n in range(3):
+                caminho = str(Path(tmp) / f"PCF-I-DE-00{n}_R0.xlsx")
+                _salvar_pcf(caminho, itens=n + 1)
+                arquivos.append(caminho)
+            arquivo_cache = str(Path(tmp) / "cache_pcfs.json")
+
+            cache = timeline_pcfs.CachePCFs(arquivo_cache)
+            primeira = list(timeline_pcfs.ler_pcfs(arquivos, cache=cache))
+            cache.salvar()
+            self.assertEqual((cache.hits, cache.misses), (0, 3))
+
+            # segunda execução: nada é aberto
+            cache = timeline_pcfs.CachePCFs(arquivo_cache)
+            with patch.object(timeline_pcfs, "extrair_pcf_com_tempo", side_effect=AssertionError("abriu a PCF")):
+                segunda = list(timeline_pcfs.ler_pcfs(arquivos, cache=cache))
+            self.assertEqual([l["registro"] for l in segunda], [l["registro"] for l in primeira])
+            self.assertEqual(segunda[0]["registro"]["Data Recebimento"], datetime(2025, 3, 10))
+            cache.salvar()
+
+            # PCF alterada é relida; PCF apagada sai do cache
+            _salvar_pcf(arquivos[1], itens=7)
+            os.utime(arquivos[1], (1_900_000_000, 1_900_000_000))
+            os.remove(arquivos[2])
+
+            cache = timeline_pcfs.CachePCFs(arquivo_cache)
+            terceira = list(timeline_pcfs.ler_pcfs(arquivos[:2], cache=cache))
+            self.assertEqual(terceira[1]["registro"]["Qtd Comentarios"], 7)
+            self.assertEqual(
+                {k: cache.resumo()[k] for k in ("hits", "misses", "removidas", "erros", "entradas")},
+                {"hits": 1, "misses": 1, "removidas": 1, "erros": 0, "entradas": 2},
+            )
+
+    def test_aviso_de_janela_cheia_vem_do_cache_e_janela_entra_na_chave(self):
+        with TemporaryDirectory() as tmp:
+            caminho = str(Path(tmp) / "PCF-I-DE-001_R0.xlsx")
+            arquivo_cache = str(Path(tmp) / "cache_pcfs.json")
+            _salvar_pcf(caminho, itens=50)
+
+            with patch.object(timeline_pcfs, "PCF_JANELA_LINHAS", 30):
+                cache = timeline_pcfs.CachePCFs(arquivo_cache)
+                list(timeline_pcfs.ler_pcfs([caminho], cache=cache))
+                cache.salvar()
+
+                cache = timeline_pcfs.CachePCFs(arquivo_cache)
+                lida = next(timeline_pcfs.ler_pcfs([caminho], cache=cache))
+            self.assertTrue(lida["cache"])
+            self.assertIn("30 linhas", lida["aviso"])
+
+            # janela maior: a entrada antiga não serve e a PCF é relida inteira
+            cache = timeline_pcfs.CachePCFs(arquivo_cache)
+            lida = next(timeline_pcfs.ler_pcfs([caminho], cache=cache))
+
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        self.assertEqual(lida["aviso"], "")
+        self.assertEqual(lida["registro"]["Qtd Comentarios"], 50)
+
+    def test_erro_de_leitura_nao_entra_no_cache(self):
+        with TemporaryDirectory() as tmp:
+            caminho = Path(tmp) / "PCF-corrompida.xlsx"
+            arquivo_cache = str(Path(tmp) / "cache_pcfs.json")
+            _salvar_pcf(str(caminho), itens=1)
+            cache = timeline_pcfs.CachePCFs(arquivo_cache)
+            list(timeline_pcfs.ler_pcfs([str(caminho)], cache=cache))
+            cache.salvar()
+
+            caminho.write_bytes(b"nao e um xlsx")
+            os.utime(caminho, (1_900_000_000, 1_900_000_000))
+            cache = timeline_pcfs.CachePCFs(arquivo_cache)
+            lidas = list(timeline_pcfs.ler_pcfs([str(caminho)], cache=cache))
+
+        self.assertTrue(lidas[0]["erro"])
+        self.assertEqual(cache.atual, {})
+        # a PCF continua na varredura: é erro de leitura, não remoção
+        self.assertEqual({k: cache.resumo()[k] for k in ("removidas", "erros")}, {"removidas": 0, "erros": 1})
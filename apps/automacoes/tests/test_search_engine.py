@@ -1,10 +1,14 @@
 from django.test import TestCase
 
 from apps.automacoes.models import DocumentoLD, KMFileIndex
+from apps.automacoes.services.km_trigram_index import invalidar_indice_trigramas
 from apps.automacoes.services.search_engine import buscar_global, normalizar_termo_busca
 
 
 class SearchEngineTests(TestCase):
+    def setUp(self):
+        invalidar_indice_trigramas()
+
     def test_normalizar_termo_busca_remove_espacos_externos(self):
         self.assertEqual(normalizar_termo_busca("  24-7141  "), "24-7141")
 
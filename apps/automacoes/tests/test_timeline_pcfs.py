@@ -0,0 +1,81 @@
+from datetime import datetime
+
+from django.test import TestCase
+
+from apps.automacoes.models import PCFTimeline
+from apps.automacoes.services import timeline_pcfs
+
+
+def _linha(doc, rev, status="APROVADA", qtd=3):
+    return {
+        "Caminho": f"/pcf/PCF-{doc}_R{rev}.xlsx",
+        "PCF LINK": f"PCF-{doc}_R{rev}",
+        "N º PCF": f"PCF-{doc}",
+        "Nº DOCUMENTO": doc,
+        "TITULO": "Arranjo",
+        "Revisão da PCF": rev,
+        "Data Recebimento": datetime(2025, 3, 10),
+        "Open Comments": "1",
+        "Qtd Comentarios": qtd,
+        "STATUS FINAL": status,
+    }
+
+
+def _registros(*linhas):
+    return dict(timeline_pcfs.chave_e_valores_pcf(linha) for linha in linhas)
+
+
+class SincronizarPcfsTimelineTests(TestCase):
+    def test_insere_atualiza_remove_so_o_que_mudou(self):
+        recebidas = "PCFs Recebidas TP"
+        respondidas = "PCFs Respondidas CMN"
+
+        primeira = timeline_pcfs.sincronizar_pcfs_timeline({
+            recebidas: _registros(_linha("I-DE-001", "0"), _linha("I-DE-002", "0"), _linha("I-DE-003", "B")),
+            respondidas: _registros(_linha("I-DE-001", "A")),
+        })
+        self.assertEqual(
+            {k: primeira[k] for k in ("criados", "atualizados", "inalterados", "removidos")},
+            {"criados": 4, "atualizados": 0, "inalterados": 0, "removidos": 0},
+        )
+        self.assertIn("segundos", primeira)
+
+        registro = PCFTimeline.objects.get(tipo=recebidas, numero_documento="I-DE-001")
+        self.assertEqual(registro.data_recebimento, "2025-03-10 00:00:00")
+        self.assertEqual(registro.open_comments, 1)
+        criado_em = registro.criado_em
+
+        # respondidas fica de fora (aba preservada): nada dela é tocado
+        segunda = timeline_pcfs.sincronizar_pcfs_timeline({
+            recebidas: _registros(
+                _linha("I-DE-001", "0", status="REPROVADA"),
+                _linha("I-DE-002", "0"),
+                _linha("I-DE-004", "0"),
+            ),
+        })
+        self.assertEqual(
+            {k: segunda[k] for k in ("criados", "atualizados", "inalterados", "removidos")},
+            {"criados": 1, "atualizados": 1, "inalterados": 1, "removidos": 1},
+        )
+
+        registro = PCFTimeline.objects.get(tipo=recebidas, numero_documento="I-DE-001")
+        self.assertEqual(registro.status_final, "REPROVADA")
+        self.assertEqual(registro.criado_em, criado_em)
+        self.assertFalse(PCFTimeline.objects.filter(numero_documento="I-DE-003").exists())
+        self.assertTrue(PCFTimeline.objects.filter(tipo=respondidas).exists())
+
+    def test_pcf_com_erro_de_leitura_nao_e_removida(self):
+        tipo = "PCFs Recebidas TP"
+        timeline_pcfs.sincronizar_pcfs_timeline({tipo: _registros(_linha("I-DE-001", "0"), _linha("I-DE-002", "0"))})
+
+        resultado = timeline_pcfs.sincronizar_pcfs_timeline(
+            {tipo: _registros(_linha("I-DE-001", "0"))},
+            caminhos_preservados={"/pcf/PCF-I-DE-002_R0.xlsx"},
+            batch_size=1,
+        )
+
+        self.assertEqual(resultado["removidos"], 0)
+        self.assertEqual(PCFTimeline.objects.filter(tipo=tipo).count(), 2)
+
+    def test_linha_sem_documento_nao_vai_para_o_banco(self):
+        self.assertIsNone(timeline_pcfs.chave_e_valores_pcf(_linha("", "0")))
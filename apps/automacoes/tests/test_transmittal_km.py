@@ -0,0 +1,201 @@
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, TestCase
+from openpyxl import load_workbook
+
+from apps.automacoes.models import TransmittalKM
+from apps.automacoes.services import transmittal_km
+from apps.automacoes.services.pdf_texto import extrair_texto_com_tempo, ler_texto_pdf
+
+
+def _pdf_com_paginas(paginas):
+    """PDF mínimo (Helvetica, uma linha de texto por item) sem depender de gerador de PDF."""
+    objetos = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for linhas in paginas:
+        conteudo = "BT /F1 10 Tf 50 800 Td 14 TL " + " ".join(f"({l}) Tj T*" for l in linhas) + " ET"
+        objetos.append(f"<< /Length {len(conteudo)} >>\nstream\n{conteudo}\nendstream")
+        objetos.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objetos)} 0 R >>"
+        )
+        kids.append(f"{len(objetos)} 0 R")
+    objetos[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    saida = b"%PDF-1.4\n"
+    offsets = []
+    for n, obj in enumerate(objetos, start=1):
+        offsets.append(len(saida))
+        saida += f"{n} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(saida)
+    saida += f"xref\n0 {len(objetos) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        saida += f"{offset:010d} 00000 n \n".encode()
+    saida += f"trailer\n<< /Size {len(objetos) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return saida
+
+
+class PdfTextoTests(SimpleTestCase):
+    def test_limite_de_paginas(self):
+        with TemporaryDirectory() as tmp:
+            caminho = Path(tmp) / "T-123.pdf"
+            caminho.write_bytes(_pdf_com_paginas([["Transmittal number: 123"], ["Page 2 of 2"]]))
+
+            self.assertEqual(ler_texto_pdf(caminho), "Transmittal number: 123\nPage 2 of 2")
+            self.assertEqual(ler_texto_pdf(caminho, max_paginas=1), "Transmittal number: 123")
+
+    def test_erro_de_leitura_volta_como_resultado(self):
+        with TemporaryDirectory() as tmp:
+            caminho = Path(tmp) / "T-999.pdf"
+            caminho.write_bytes(b"nao e um pdf")
+
+            lida = extrair_texto_com_tempo(caminho)
+
+        self.assertEqual(lida["texto"], "")
+        self.assertTrue(lida["erro"])
+
+
+class LerTextosPdfsTests(SimpleTestCase):
+    def setUp(self):
+        self._tmp = TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.pasta = Path(self._tmp.name)
+        self.pdfs = []
+        for n in range(3):
+            caminho = self.pasta / f"T-{n}.pdf"
+            caminho.write_bytes(_pdf_com_paginas([[f"Transmittal number: {n}"], ["Anexo"]]))
+            self.pdfs.append(caminho)
+        self.arquivo_cache = str(self.pasta / "textos.json")
+
+    def test_pool_devolve_os_textos_na_ordem(self):
+        pool = transmittal_km.criar_pool_pdfs(workers=2)
+        self.assertIsNotNone(pool)
+        try:
+            lidas = list(transmittal_km.ler_textos_pdfs(self.pdfs, pool, max_paginas=1))
+        finally:
+            pool.shutdown()
+
+        self.assertEqual([l["caminho"] for l in lidas], [str(p) for p in self.pdfs])
+        self.assertEqual([l["texto"] for l in lidas], [f"Transmittal number: {n}" for n in range(3)])
+
+    def test_pdf_inalterado_sai_do_cache(self):
+        cache = transmittal_km.CacheTextosPDF(self.arquivo_cache, max_paginas=1)
+        primeira = list(transmittal_km.ler_textos_pdfs(self.pdfs, cache=cache, max_paginas=1))
+        cache.salvar()
+
+        cache = transmittal_km.CacheTextosPDF(self.arquivo_cache, max_paginas=1)
+        with patch.object(transmittal_km, "extrair_texto_com_tempo", side_effect=AssertionError("abriu o PDF")):
+            segunda = list(transmittal_km.ler_textos_pdfs(self.pdfs, cache=cache, max_paginas=1))
+        self.assertEqual([l["texto"] for l in segunda], [l["texto"] for l in primeira])
+        self.assertTrue(all(l.get("cache") for l in segunda))
+        cache.salvar()
+
+        # PDF alterado é relido; PDF apagado sai do cache
+        self.pdfs[0].write_bytes(_pdf_com_paginas([["Transmittal number: 100"]]))
+        os.utime(self.pdfs[0], (1_900_000_000, 1_900_000_000))
+        self.pdfs[2].unlink()
+
+        cache = transmittal_km.CacheTextosPDF(self.arquivo_cache, max_paginas=1)
+        terceira = list(transmittal_km.ler_textos_pdfs(self.pdfs[:2], cache=cache, max_paginas=1))
+        self.assertEqual(terceira[0]["texto"], "Transmittal number: 100")
+        self.assertEqual(
+            {k: cache.resumo()[k] for k in ("hits", "misses", "removidas")},
+            {"hits": 1, "misses": 1, "removidas": 1},
+        )
+
+    def test_outro_limite_de_paginas_nao_usa_o_cache(self):
+        cache = transmittal_km.CacheTextosPDF(self.arquivo_cache, max_paginas=1)
+        list(transmittal_km.ler_textos_pdfs(self.pdfs, cache=cache, max_paginas=1))
+        cache.salvar()
+
+        cache = transmittal_km.CacheTextosPDF(self.arquivo_cache, max_paginas=None)
+        lidas = list(transmittal_km.ler_textos_pdfs(self.pdfs, cache=cache))
+
+        self.assertEqual(cache.hits, 0)
+        self.assertEqual(lidas[0]["texto"], "Transmittal number: 0\nAnexo")
+
+
+def _dados(documento, transmittal="KM-001", titulo="Arranjo", status="OK", data="10/03/2025"):
+    return {
+        "Documento": documento,
+        "Titulo": titulo,
+        "Pasta": "Hull",
+        "Emissão": "A",
+        "Proposito de Emissão": "For Approval",
+        "Data Envio": data,
+        "Transmittal N°": transmittal,
+        "Arquivo PDF": f"/pdfs/{transmittal}.pdf",
+        "Status Parse": status,
+        "Observação Parse": "",
+    }
+
+
+def _registros(*linhas):
+    return dict(
+        r for r in (transmittal_km.chave_e_valores_transmittal(dados) for dados in linhas) if r is not None
+    )
+
+
+class SincronizarTransmittalsKmTests(TestCase):
+    def test_grava_so_o_que_mudou(self):
+        primeira = transmittal_km.sincronizar_transmittals_km(
+            _registros(_dados("I-DE-001"), _dados("I-DE-002"), _dados("I-DE-001", transmittal="KM-002"))
+        )
+        self.assertEqual(
+            {k: primeira[k] for k in ("criados", "atualizados", "inalterados")},
+            {"criados": 3, "atualizados": 0, "inalterados": 0},
+        )
+        registro = TransmittalKM.objects.get(documento="I-DE-001", transmittal_numero="KM-001")
+        criado_em = registro.criado_em
+
+        # PDF do KM-002 saiu da pasta: o registro continua no banco
+        segunda = transmittal_km.sincronizar_transmittals_km(
+            _registros(_dados("I-DE-001", titulo="Arranjo Geral"), _dados("I-DE-002"), _dados("I-DE-003")),
+            batch_size=1,
+        )
+        self.assertEqual(
+            {k: segunda[k] for k in ("criados", "atualizados", "inalterados")},
+            {"criados": 1, "atualizados": 1, "inalterados": 1},
+        )
+
+        registro.refresh_from_db()
+        self.assertEqual(registro.titulo, "Arranjo Geral")
+        self.assertEqual(registro.criado_em, criado_em)
+        self.assertEqual(TransmittalKM.objects.count(), 4)
+
+    def test_linha_sem_documento_nao_vai_para_o_banco(self):
+        self.assertIsNone(transmittal_km.chave_e_valores_transmittal(_dados("  ")))
+
+
+class ExportarPlanilhaTests(SimpleTestCase):
+    def test_links_destaques_e_log(self):
+        with TemporaryDirectory() as tmp:
+            destino = Path(tmp) / "Lista KM.xlsx"
+            destino.write_bytes(b"versao anterior")
+            logs = []
+            transmittal_km.registrar_log(logs, "/pdfs/KM-009.pdf", "KM-009", "ERRO", "Sem texto.")
+
+            transmittal_km.exportar_planilha(
+                [_dados("I-DE-001"), _dados("I-DE-002", titulo="", status="FALHA")], logs, destino
+            )
+
+            self.assertEqual([p.name for p in Path(tmp).iterdir()], ["Lista KM.xlsx"])
+            wb = load_workbook(destino)
+
+        ws = wb[transmittal_km.ABA_PLANILHA]
+        self.assertEqual([c.value for c in ws[1]], transmittal_km.CABECALHOS)
+        self.assertEqual(ws["A2"].value, "I-DE-001")
+        self.assertEqual(ws["A2"].hyperlink.target, "/pdfs/KM-001.pdf")
+        self.assertEqual(ws["F2"].number_format, "@")
+        self.assertIsNone(ws["B2"].fill.fill_type)
+        self.assertEqual(ws["A3"].fill.fgColor.rgb, "00F4CCCC")
+        self.assertEqual(ws.column_dimensions["B"].width, 65)
+
+        ws_log = wb[transmittal_km.ABA_LOG]
+        self.assertEqual(
+            [c.value for c in ws_log[2]], ["KM-009.pdf", "KM-009", "ERRO", "Sem texto."]
+        )
+        self.assertEqual(ws_log["D2"].fill.fgColor.rgb, "00F4CCCC")
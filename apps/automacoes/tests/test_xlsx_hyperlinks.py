@@ -0,0 +1,64 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from django.test import SimpleTestCase
+from openpyxl import Workbook
+from openpyxl.worksheet.hyperlink import Hyperlink
+
+from apps.automacoes.services.xlsx_hyperlinks import (
+    _celulas,
+    _endereco_excel,
+    extrair_hyperlinks_xlsx,
+)
+
+
+class ExtrairHyperlinksXlsxTests(SimpleTestCase):
+    def test_mapa_de_links_externos_e_internos_por_aba(self):
+        with TemporaryDirectory() as tmp:
+            caminho = str(Path(tmp) / "LD.xlsm")
+
+            wb = Workbook()
+            ws = wb.active
+            ws.title = "LD"
+            ws["B2"] = "I-DE-001"
+            ws["B2"].hyperlink = r"\\servidor\Engenharia\Casco"
+            ws["J2"] = "GRD-0001"
+            ws["J2"].hyperlink = Hyperlink(ref="J2", target=r"\\servidor\Emitidos\GRD-0001", location="A1")
+            ws["L3"] = "Ir"
+            ws["L3"].hyperlink = Hyperlink(ref="L3", location="'LD MARENOVA'!B2")
+            for r in range(4, 300):
+                ws[f"A{r}"] = r
+
+            outra = wb.create_sheet("LD MARENOVA")
+            outra["B2"] = "I-DE-002"
+            outra["B2"].hyperlink = r"\\servidor\Engenharia\Eletrica"
+            wb.save(caminho)
+
+            ld = extrair_hyperlinks_xlsx(caminho, "LD")
+            marenova = extrair_hyperlinks_xlsx(caminho, "LD MARENOVA")
+
+        self.assertEqual(
+            ld,
+            {
+                "B2": r"\\servidor\Engenharia\Casco",
+                "J2": r"\\servidor\Emitidos\GRD-0001#A1",
+                "L3": "'LD MARENOVA'!B2",
+            },
+        )
+        self.assertEqual(marenova, {"B2": r"\\servidor\Engenharia\Eletrica"})
+
+    def test_aba_inexistente(self):
+        with TemporaryDirectory() as tmp:
+            caminho = str(Path(tmp) / "LD.xlsx")
+            Workbook().save(caminho)
+
+            with self.assertRaises(KeyError):
+                extrair_hyperlinks_xlsx(caminho, "LD")
+
+    def test_referencia_em_faixa_e_destino_codificado(self):
+        self.assertEqual(list(_celulas("J2:J4")), ["J2", "J3", "J4"])
+        self.assertEqual(
+            _endereco_excel("file:///\\\\servidor\\Doc%20Control\\GRD-0001"),
+            "\\\\servidor\\Doc Control\\GRD-0001",
+        )
+        self.assertEqual(_endereco_excel("https://exemplo.com/a%20b"), "https://exemplo.com/a b")
@@ -1,3 +1,4 @@
+from functools import partial
 from pathlib import Path
 
 from django.conf import settings
@@ -30,6 +31,23 @@ from apps.automacoes.services.status_normalizer import normalizar_status
 from apps.automacoes.services.search_engine import buscar_global_enterprise
 from apps.automacoes.services.search_analytics import obter_search_analytics
 from apps.automacoes.services.km_index_jobs import executar_reindexacao_km_job
+from apps.automacoes.services.km_indexer import (
+    KM_CACHE_DOCUMENTO_PREFIXO,
+    KM_DOCUMENTOS_BASE,
+    indexar_km_banco,
+    normalizar_km as _km_normalizar,
+)
+from apps.automacoes.services.km_memory_index import invalidar_indice_compacto, obter_indice_compacto
+from apps.automacoes.services.km_reindex_particionado import reindexar_km_particionado
+from apps.automacoes.services.km_resolver import (
+    KM_EXTENSOES_PRIORITARIAS,
+    reconstruir_resolucoes_km,
+    resolver_documento_km,
+    resolver_documentos_km,
+    resolver_documentos_km_ao_vivo,
+    score_documento_indexado as _km_score_documento_indexado,
+)
+from apps.automacoes.services.km_trigram_index import candidatos_km, obter_indice_trigramas
 from apps.automacoes.services.ops_center_service import OperationsCenterService
 from apps.automacoes.services.runtime_events import RuntimeEventStreamService
 from apps.automacoes.services.runtime_health_api import RuntimeHealthAPIService
@@ -38,21 +56,6 @@ from apps.automacoes.services.kongsberg_document_list import importar_ld_kongsbe
 
 
 
-KM_DOCUMENTOS_BASE = Path(
-    r"\\virm-rgr022\FILESERVER\Projetos\05_HANDYMAX\09. Doc Control\15 - Documentos KM"
-)
-
-KM_EXTENSOES_PRIORITARIAS = {
-    ".docx": 60,
-    ".doc": 58,
-    ".dwg": 54,
-    ".xlsx": 48,
-    ".xlsm": 46,
-    ".xls": 44,
-    ".pdf": 20,
-}
-
-
 def _cache_ttl(nome, padrao):
     return int(getattr(settings, nome, padrao) or padrao)
 
@@ -304,6 +307,7 @@ def painel(request):
                 "descricao": "Sincroniza dados documentais, revisões, PCFs, GRDs, links de rede e medição.",
                 "form_url": "automacoes:atualizar_ld",
                 "botao": "Executar Atualização LD",
+                "botao_simular": "Simular",
                 "botao_class": "btn-primary",
                 "dashboard_url": "automacoes:dashboard_ld",
                 "registros_url": "automacoes:lista_ld",
@@ -598,10 +602,12 @@ def logs_automacoes(request):
 
 @login_required
 def executar_atualizar_ld(request):
+    # "simular" vem do botão de simulação do painel: só calcula o change-set
+    simular = request.POST.get("simular") in ("1", "true", "on")
     return _executar_automacao(
         request,
-        atualizar_ld.executar,
-        "Atualização LD",
+        partial(atualizar_ld.executar, simular=simular),
+        "Atualização LD (simulação)" if simular else "Atualização LD",
     )
 
 
@@ -632,111 +638,29 @@ def executar_grd_ghenova(request):
     )
 
 
-def _km_documento_extraido_do_nome(path):
-    """
-    Extrai um identificador documental provável do nome do arquivo KM.
-    Mantém formato legível quando possível; a busca usa também campos normalizados.
-    """
-    stem = Path(path).stem
-    stem = re.sub(r"[_]+", "-", stem)
-    m = re.search(r"(\d{2}-\d{4}-\d{2}-\d{3,4}-\d{2,4}-\d{2}(?:-[A-Z0-9]+)?)", stem, re.IGNORECASE)
-    if m:
-        return m.group(1).upper()
-
-    m = re.search(r"(\d{3,4}-\d{2,4}-\d{2}(?:-[A-Z0-9]+)?)", stem, re.IGNORECASE)
-    if m:
-        return m.group(1).upper()
-
-    return ""
-
-
-def _km_indexar_banco():
+def _km_indexar_banco(incremental=False, particionado=False):
     """
     Varre a árvore KM e grava um índice persistente no banco.
-    Isso evita varredura de rede a cada abertura de documento.
+    A rotina vive em services.km_indexer (ou km_reindex_particionado); aqui
+    invalida o cache do processo, reconstrói o índice de trigramas e a
+    tabela de resolução de documentos.
     """
-    inicio = time.monotonic()
-
-    if not KM_DOCUMENTOS_BASE.exists():
-        return {
-            "ok": False,
-            "mensagem": f"Pasta KM não encontrada: {KM_DOCUMENTOS_BASE}",
-            "quantidade_processada": 0,
-            "detalhes": {"base": str(KM_DOCUMENTOS_BASE)},
-        }
-
-    KMFileIndex.objects.update(ativo=False)
-
-    total = 0
-    criados = 0
-    atualizados = 0
-    erros = 0
-    por_extensao = {}
-
-    for arquivo in KM_DOCUMENTOS_BASE.rglob("*"):
-        try:
-            if not arquivo.is_file():
-                continue
-
-            stat = arquivo.stat()
-            extensao = arquivo.suffix.lower()
-            por_extensao[extensao or "sem_extensao"] = por_extensao.get(extensao or "sem_extensao", 0) + 1
-
-            defaults = {
-                "nome_arquivo": arquivo.name,
-                "pasta": str(arquivo.parent),
-                "extensao": extensao,
-                "tamanho_bytes": int(stat.st_size or 0),
-                "modificado_em": timezone.datetime.fromtimestamp(
-                    stat.st_mtime,
-                    tz=timezone.get_current_timezone(),
-                ),
-                "nome_normalizado": _km_normalizar(arquivo.name),
-                "stem_normalizado": _km_normalizar(arquivo.stem),
-                "documento_extraido": _km_documento_extraido_do_nome(arquivo),
-                "eh_transmittal_letter": _km_eh_transmittal_letter(arquivo),
-                "ativo": True,
-            }
-
-            _, created = KMFileIndex.objects.update_or_create(
-                caminho_completo=str(arquivo),
-                defaults=defaults,
-            )
-
-            total += 1
-            if created:
-                criados += 1
-            else:
-                atualizados += 1
-
-        except Exception:
-            erros += 1
-            continue
-
+    if particionado:
+        resultado = reindexar_km_particionado(
+            KM_DOCUMENTOS_BASE,
+            particoes_paralelas=getattr(settings, "KM_REINDEX_PARTICOES_PARALELAS", 1),
+        )
+    else:
+        resultado = indexar_km_banco(KM_DOCUMENTOS_BASE, incremental=incremental)
     _km_limpar_cache()
 
-    removidos = KMFileIndex.objects.filter(ativo=False).count()
-    status = "sucesso" if erros == 0 else "sucesso_parcial"
+    if resultado.get("ok"):
+        indice = obter_indice_trigramas(forcar=True)
+        detalhes = resultado.setdefault("detalhes", {})
+        detalhes["indice_trigramas"] = indice.estatisticas()
+        detalhes["resolucoes"] = reconstruir_resolucoes_km(indice)
 
-    return {
-        "ok": True,
-        "status": status,
-        "mensagem": (
-            f"Índice KM atualizado: {total} arquivos ativos, "
-            f"{criados} novos, {atualizados} atualizados, {removidos} inativos."
-        ),
-        "quantidade_processada": total,
-        "detalhes": {
-            "base": str(KM_DOCUMENTOS_BASE),
-            "arquivos_ativos": total,
-            "criados": criados,
-            "atualizados": atualizados,
-            "inativos": removidos,
-            "erros": erros,
-            "por_extensao": por_extensao,
-            "duracao_segundos": round(time.monotonic() - inicio, 3),
-        },
-    }
+    return resultado
 
 
 @login_required
@@ -749,75 +673,19 @@ def executar_indice_km(request):
 
 
 
-_KM_INDEX_CACHE = None
-
-
 def _km_limpar_cache():
-    global _KM_INDEX_CACHE
-    _KM_INDEX_CACHE = None
-
-
-def _km_normalizar(valor):
-    return "".join(ch for ch in str(valor or "").upper() if ch.isalnum())
-
-
-def _km_eh_transmittal_letter(path):
-    texto = str(path).replace("/", "\\").lower()
-    nome = path.name.lower()
-    return (
-        "\\0 transmittal letters\\transmittal letters\\" in texto
-        or "transmittal letters\\transmittal letters\\" in texto
-        or nome.startswith("t-")
-        or "transmittal" in nome
-    )
+    invalidar_indice_compacto()
 
 
 def _km_indexar_documentos():
     """
-    Indexa arquivos da árvore KM uma vez por processo do Django.
+    Índice KM compacto do processo, carregado do KMFileIndex.
 
     Importante:
     - Mantém os Transmittal Letters no índice apenas como fallback.
-    - Prioriza documentos técnicos em subpastas como 1.4 ETS.
+    - É reconstruído quando a geração do índice persistido muda.
     """
-    global _KM_INDEX_CACHE
-
-    if _KM_INDEX_CACHE is not None:
-        return _KM_INDEX_CACHE
-
-    itens = []
-
-    if not KM_DOCUMENTOS_BASE.exists():
-        _KM_INDEX_CACHE = itens
-        return itens
-
-    try:
-        for arquivo in KM_DOCUMENTOS_BASE.rglob("*"):
-            try:
-                if not arquivo.is_file():
-                    continue
-            except OSError:
-                continue
-
-            nome_norm = _km_normalizar(arquivo.name)
-            stem_norm = _km_normalizar(arquivo.stem)
-            suffix = arquivo.suffix.lower()
-
-            if not nome_norm:
-                continue
-
-            itens.append({
-                "path": arquivo,
-                "nome_norm": nome_norm,
-                "stem_norm": stem_norm,
-                "suffix": suffix,
-                "is_transmittal_letter": _km_eh_transmittal_letter(arquivo),
-            })
-    except Exception:
-        itens = []
-
-    _KM_INDEX_CACHE = itens
-    return itens
+    return obter_indice_compacto()
 
 
 def _km_score_documento(documento, item):
@@ -826,10 +694,9 @@ def _km_score_documento(documento, item):
     if not doc_norm:
         return 0
 
-    nome_norm = item["nome_norm"]
-    stem_norm = item["stem_norm"]
-    path = item["path"]
-    suffix = item["suffix"]
+    nome_norm = item.nome_norm
+    stem_norm = item.stem_norm
+    suffix = item.suffix
 
     score = 0
 
@@ -850,11 +717,13 @@ def _km_score_documento(documento, item):
     # Prioriza documentos reais de engenharia sobre PDF do transmittal.
     score += KM_EXTENSOES_PRIORITARIAS.get(suffix, 5)
 
-    if item["is_transmittal_letter"]:
+    if item.is_transmittal_letter:
         score -= 120
     else:
         score += 35
 
+    path = item.path
+
     # Subpastas técnicas costumam ter arquivos reais; raiz de letters tende a ser só carta.
     texto_path = str(path).replace("/", "\\").lower()
     if "\\0 transmittal letters\\" in texto_path and "\\transmittal letters\\" not in texto_path:
@@ -867,56 +736,6 @@ def _km_score_documento(documento, item):
     return score
 
 
-def _km_score_documento_indexado(documento, item):
-    doc_norm = _km_normalizar(documento)
-
-    if not doc_norm:
-        return 0
-
-    nome_norm = item.nome_normalizado or _km_normalizar(item.nome_arquivo)
-    stem_norm = item.stem_normalizado or _km_normalizar(Path(item.nome_arquivo).stem)
-    suffix = (item.extensao or "").lower()
-
-    score = 0
-
-    if stem_norm == doc_norm:
-        score = 100
-    elif nome_norm == doc_norm:
-        score = 98
-    elif doc_norm in stem_norm:
-        score = 88
-    elif doc_norm in nome_norm:
-        score = 84
-    elif stem_norm in doc_norm and len(stem_norm) >= 8:
-        score = 60
-
-    documento_extraido_norm = _km_normalizar(item.documento_extraido)
-    if documento_extraido_norm:
-        if documento_extraido_norm == doc_norm:
-            score = max(score, 105)
-        elif doc_norm in documento_extraido_norm or documento_extraido_norm in doc_norm:
-            score = max(score, 86)
-
-    if not score:
-        return 0
-
-    score += KM_EXTENSOES_PRIORITARIAS.get(suffix, 5)
-
-    if item.eh_transmittal_letter:
-        score -= 120
-    else:
-        score += 35
-
-    caminho_lower = (item.caminho_completo or "").replace("/", "\\").lower()
-    if "\\0 transmittal letters\\" in caminho_lower and "\\transmittal letters\\" not in caminho_lower:
-        score += 8
-
-    if item.nome_arquivo.upper().startswith("T-"):
-        score -= 80
-
-    return score
-
-
 def _km_buscar_documento_indexado(documento, permitir_transmittal=False):
     doc_norm = _km_normalizar(documento)
 
@@ -925,12 +744,17 @@ def _km_buscar_documento_indexado(documento, permitir_transmittal=False):
 
     qs = KMFileIndex.objects.filter(ativo=True)
 
-    # Primeiro tenta reduzir no banco; se o código vier abreviado, ainda há fallback abaixo.
-    candidatos_qs = qs.filter(
-        Q(nome_normalizado__icontains=doc_norm)
-        | Q(stem_normalizado__icontains=doc_norm)
-        | Q(documento_extraido__icontains=str(documento or "").strip())
-    )[:500]
+    # Primeiro tenta reduzir pelo índice de trigramas; sem ele, reduz no banco.
+    # Se o código vier abreviado, ainda há fallback abaixo.
+    pks = candidatos_km(doc_norm)
+    if pks is not None:
+        candidatos_qs = qs.filter(pk__in=pks)[:500]
+    else:
+        candidatos_qs = qs.filter(
+            Q(nome_normalizado__icontains=doc_norm)
+            | Q(stem_normalizado__icontains=doc_norm)
+            | Q(documento_extraido__icontains=str(documento or "").strip())
+        )[:500]
 
     candidatos = []
 
@@ -972,8 +796,13 @@ def _km_buscar_documento_indexado(documento, permitir_transmittal=False):
 def _km_buscar_documento(documento, permitir_transmittal=False):
     """
     Busca o documento real no índice KM persistido.
+    Primeiro consulta a resolução pré-calculada; depois pontua ao vivo.
     Se o índice ainda não existir, usa a varredura antiga como fallback.
     """
+    arquivo = resolver_documento_km(documento, permitir_transmittal=permitir_transmittal)
+    if arquivo:
+        return arquivo
+
     arquivo = _km_buscar_documento_indexado(documento, permitir_transmittal=permitir_transmittal)
     if arquivo:
         return arquivo
@@ -986,16 +815,16 @@ def _km_buscar_documento(documento, permitir_transmittal=False):
         if score <= 0:
             continue
 
-        if item["is_transmittal_letter"] and not permitir_transmittal:
+        if item.is_transmittal_letter and not permitir_transmittal:
             continue
 
-        candidatos.append((score, item["path"]))
+        candidatos.append((score, item.path))
 
     if not candidatos and permitir_transmittal:
         for item in _km_indexar_documentos():
             score = _km_score_documento(documento, item)
             if score > 0:
-                candidatos.append((score, item["path"]))
+                candidatos.append((score, item.path))
 
     if not candidatos:
         return None
@@ -1008,7 +837,7 @@ def _km_buscar_documento_com_debug(documento):
     for item in _km_indexar_documentos():
         score = _km_score_documento(documento, item)
         if score > 0:
-            candidatos.append((score, item["path"], item["is_transmittal_letter"]))
+            candidatos.append((score, item.path, item.is_transmittal_letter))
 
     candidatos.sort(key=lambda par: (par[0], -len(str(par[1]))), reverse=True)
     return candidatos
@@ -1198,9 +1027,37 @@ def _tr_caminho_documento_ld(item_ld):
 
 
 
+def _km_buscar_documentos_em_memoria(documentos, permitir_transmittal=False):
+    """
+    Último fallback do lote: uma única passada pelo índice compacto,
+    pontuando todos os documentos pendentes a cada item.
+    """
+    melhores = {}
+
+    for item in _km_indexar_documentos():
+        for documento in documentos:
+            score = _km_score_documento(documento, item)
+            if score <= 0:
+                continue
+
+            if item.is_transmittal_letter and not permitir_transmittal:
+                continue
+
+            chave = (score, -len(item.caminho))
+            atual = melhores.get(documento)
+            if atual is None or chave > atual[0]:
+                melhores[documento] = (chave, item.path)
+
+    return {documento: par[1] for documento, par in melhores.items()}
+
+
 def _km_buscar_documentos_em_lote(documentos, permitir_transmittal=False):
     """
-    Resolve documentos KM em lote usando cache para evitar N+1 e scans repetidos.
+    Resolve documentos KM em lote, sem consultas por documento:
+    tabela de resolução pré-calculada, cache (get_many), pontuação ao vivo
+    com candidatos carregados em uma consulta por lote e, por fim, uma
+    única passada pelo índice em memória. Os achados vão para o cache com
+    set_many.
     """
     resultados = {}
 
@@ -1210,27 +1067,42 @@ def _km_buscar_documentos_em_lote(documentos, permitir_transmittal=False):
         if _tr_texto(doc)
     }
 
-    for documento in docs_unicos:
-        cache_key = f"automacoes:km:doc:{_km_normalizar(documento)}"
+    resolvidos = resolver_documentos_km(docs_unicos, permitir_transmittal=permitir_transmittal)
+    resultados.update(resolvidos)
 
-        cached = cache.get(cache_key)
-        if cached:
-            resultados[documento] = Path(cached)
-            continue
+    chaves_cache = {
+        documento: f"{KM_CACHE_DOCUMENTO_PREFIXO}{_km_normalizar(documento)}"
+        for documento in docs_unicos
+        if documento not in resolvidos
+    }
+    cached = cache.get_many(list(chaves_cache.values())) if chaves_cache else {}
+
+    pendentes = []
+    for documento, cache_key in chaves_cache.items():
+        if cached.get(cache_key):
+            resultados[documento] = Path(cached[cache_key])
+        else:
+            pendentes.append(documento)
 
-        arquivo = _km_buscar_documento(
-            documento,
-            permitir_transmittal=permitir_transmittal,
+    if not pendentes:
+        return resultados
+
+    encontrados = resolver_documentos_km_ao_vivo(pendentes, permitir_transmittal=permitir_transmittal)
+
+    restantes = [documento for documento in pendentes if documento not in encontrados]
+    if restantes:
+        encontrados.update(
+            _km_buscar_documentos_em_memoria(restantes, permitir_transmittal=permitir_transmittal)
         )
 
-        if arquivo:
-            cache.set(
-                cache_key,
-                str(arquivo),
-                _cache_ttl("CACHE_TTL_MEDIUM", 300),
-            )
+    if encontrados:
+        cache.set_many(
+            {chaves_cache[documento]: str(arquivo) for documento, arquivo in encontrados.items()},
+            _cache_ttl("CACHE_TTL_MEDIUM", 300),
+        )
 
-        resultados[documento] = arquivo
+    for documento in pendentes:
+        resultados[documento] = encontrados.get(documento)
 
     return resultados
 
@@ -2750,11 +2622,19 @@ def api_busca_global_ged(request):
     q_norm = _km_normalizar(q)
     results = []
 
+    km_pks = candidatos_km(q)
+    if km_pks is not None:
+        km_filtro = Q(pk__in=km_pks)
+    else:
+        km_filtro = (
+            Q(nome_arquivo__icontains=q)
+            | Q(documento_extraido__icontains=q)
+            | Q(nome_normalizado__icontains=q_norm)
+            | Q(stem_normalizado__icontains=q_norm)
+        )
+
     for item in KMFileIndex.objects.filter(ativo=True).filter(
-        Q(nome_arquivo__icontains=q)
-        | Q(documento_extraido__icontains=q)
-        | Q(nome_normalizado__icontains=q_norm)
-        | Q(stem_normalizado__icontains=q_norm)
+        km_filtro
     ).order_by("eh_transmittal_letter", "nome_arquivo")[:8]:
         results.append({
             "type": "KM",
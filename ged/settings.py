@@ -311,3 +311,30 @@ CACHES = {
 CACHE_TTL_SHORT = 60
 CACHE_TTL_MEDIUM = 300
 CACHE_TTL_LONG = 900
+
+# ======================
+# AUTOMAÇÕES / VARREDURA DE REDE
+# ======================
+
+KM_SCANNER_WORKERS = int(os.getenv("KM_SCANNER_WORKERS", "8"))
+KM_WATCHER_INTERVALO_SEGUNDOS = int(os.getenv("KM_WATCHER_INTERVALO_SEGUNDOS", "120"))
+KM_IMPRESSAO_DIGITAL = os.getenv("KM_IMPRESSAO_DIGITAL", "0").strip().lower() in ("1", "true", "yes", "on")
+KM_REINDEX_PARTICOES_PARALELAS = int(os.getenv("KM_REINDEX_PARTICOES_PARALELAS", "2"))
+# Índices KM em memória: intervalo mínimo entre consultas da geração do KMFileIndex (0 = a cada busca)
+KM_TRIGRAM_VERIFICACAO_SEGUNDOS = int(os.getenv("KM_TRIGRAM_VERIFICACAO_SEGUNDOS", "30"))
+
+# Timeline PCFs: processos lendo as PCFs em paralelo (1 = no próprio processo)
+PCF_TIMELINE_WORKERS = int(os.getenv("PCF_TIMELINE_WORKERS", "4"))
+
+# Transmittal KM: processos extraindo texto dos PDFs, páginas lidas por PDF (0 = todas)
+# e cache local do texto já extraído
+TRANSMITTAL_KM_WORKERS = int(os.getenv("TRANSMITTAL_KM_WORKERS", "4"))
+TRANSMITTAL_KM_MAX_PAGINAS = int(os.getenv("TRANSMITTAL_KM_MAX_PAGINAS", "0"))
+TRANSMITTAL_KM_CACHE_TEXTOS = os.getenv(
+    "TRANSMITTAL_KM_CACHE_TEXTOS", str(BASE_DIR / ".cache" / "transmittal_km_textos.json")
+)
+
+# Motor da atualização da LD: "xlwings" (Excel via COM, só Windows) ou "openpyxl" (sem Excel)
+LD_MOTOR = os.getenv("LD_MOTOR", "xlwings").strip().lower()
+# No motor xlwings: lê/grava a aba em blocos de range em vez de uma chamada COM por célula
+LD_XLWINGS_EM_BLOCO = os.getenv("LD_XLWINGS_EM_BLOCO", "1").strip().lower() in ("1", "true", "yes", "on")